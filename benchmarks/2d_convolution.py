@@ -34,3 +34,10 @@ wsize = (5,5)
 w = np.random.randn(*wsize)
 
 compare_perf(conv, [x,w])
+
+def conv_zero_padded(x, weights):
+    # windows which run off the edge of x see zeros
+    return parakeet.stencil(lambda window: np.sum(window * weights), 
+                            x, weights.shape, fill_value = 0.0)
+
+compare_perf(conv_zero_padded, [x,w], numba = False, cpython = False)
@@ -0,0 +1,29 @@
+import time 
+import numpy as np 
+from parakeet import jit, config 
+
+def add(x, y):
+  return x + y 
+
+def measure(fn, args, n = 100000):
+  # warm up 
+  fn(*args)
+  start_t = time.time()
+  for _ in xrange(n):
+    fn(*args)
+  return (time.time() - start_t) / n 
+
+scalar_args = (3, 4)
+vec = np.arange(10.0)
+array_args = (vec, vec)
+
+if __name__ == '__main__':
+  for label, args in [('scalars', scalar_args), ('small arrays', array_args)]:
+    python_t = measure(add, args)
+    config.opt_dispatch_cache = True 
+    cached_t = measure(jit(add), args)
+    config.opt_dispatch_cache = False 
+    uncached_t = measure(jit(add), args, n = 5000)
+    config.opt_dispatch_cache = True 
+    print "%s -- Python: %0.2fus, Parakeet: %0.2fus, Parakeet (no dispatch cache): %0.2fus" % \
+      (label, python_t * 10**6, cached_t * 10**6, uncached_t * 10**6)
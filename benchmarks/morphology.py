@@ -223,6 +223,9 @@ def dilate_decompose_interior(x, k):
   m,n = x.shape
   y = np.array([dilate_1d_interior(x[row_idx, :],k) for row_idx in xrange(m)])
   return np.array([dilate_1d_interior(y[:, col_idx],k) for col_idx in xrange(n)]).T
+
+def dilate_stencil(x, k):
+  return stencil(np.max, x, k, border_fn = np.max)
  
 if __name__ == '__main__':
   if not running_pypy: 
@@ -231,7 +234,7 @@ if __name__ == '__main__':
     with timer('scipy'):
       scipy_result = scipy.ndimage.grey_dilation(image, k, mode='nearest')
     from numba import autojit 
-    from parakeet import jit 
+    from parakeet import jit, stencil 
     jit(dilate_naive)(image, k)
 
     run(dilate_naive, 'naive', imshow=False)
@@ -240,6 +243,7 @@ if __name__ == '__main__':
     run(dilate_decompose_loops_inline, 'decompose-loops-inline')
     run(dilate_decompose, 'decompose-slices' )
     run(dilate_decompose_interior, 'decompose-interior')
+    run(dilate_stencil, 'stencil')
 
   with timer('cpython-naive'):
     dilate_naive(image, k,)
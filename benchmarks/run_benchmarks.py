@@ -0,0 +1,327 @@
+"""
+Run the benchmark kernels under each backend and write the measurements as JSON:
+
+  python run_benchmarks.py -o results.json
+  python run_benchmarks.py -o new.json --baseline results.json
+  python run_benchmarks.py --compare new.json --baseline results.json
+
+Kernels are discovered by running each script in this directory with
+compare_perf switched into collection mode, so that every compare_perf(fn, args)
+call records its function and arguments instead of timing them. Scripts which
+don't mention compare_perf are skipped without being run.
+
+Every (script, backend, scale) runs in its own child process with the on-disk
+caches turned off, so that compile times are cold and the peak RSS belongs to
+that run alone. At a scale s < 1, every long axis of every array argument gets
+cut down to a fraction s of its length (but no shorter than min_scaled_length),
+while short axes such as the coordinates of points are left alone.
+
+For each kernel we record:
+  - cold_compile: time spent compiling during the first call
+    (along with its breakdown from parakeet.profile_compilation)
+  - first_call: wall-clock time of the first call
+  - warm: median, interquartile range, min and max of the later calls
+  - dispatch_overhead: median difference between calling the jit function and
+    calling its compiled entry point directly
+  - peak_rss_kb: peak resident set size of the child process
+
+When given a baseline, any kernel whose warm median or cold compile time grew
+by more than the threshold (and by more than min-delta seconds), or which
+now fails, is reported as a regression and the exit status is 1.
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+# helpers which aren't benchmarks themselves
+skip_scripts = ['__init__', 'compare_perf', 'timer', 'run_benchmarks']
+
+def discover_scripts():
+  names = []
+  for filename in sorted(glob.glob(os.path.join(benchmarks_dir, "*.py"))):
+    name = os.path.splitext(os.path.basename(filename))[0]
+    if name in skip_scripts:
+      continue
+    # don't run scripts which time things on their own just to find out 
+    # that they've got no kernels 
+    with open(filename) as f:
+      if 'compare_perf' not in f.read():
+        continue
+    names.append(name)
+  return names
+
+def collect_kernels(script):
+  """
+  Run a benchmark script, returning the (fn, args) pairs it passes to compare_perf
+  """
+  if benchmarks_dir not in sys.path:
+    sys.path.insert(0, benchmarks_dir)
+  import compare_perf
+  compare_perf.collected = []
+  filename = os.path.join(benchmarks_dir, script + ".py")
+  execfile(filename, {'__name__' : '__benchmark__', '__file__' : filename})
+  kernels = compare_perf.collected
+  compare_perf.collected = None
+  return kernels
+
+# axes shorter than this don't get scaled
+min_scaled_length = 16
+
+def scale_dim(d, scale):
+  if d <= min_scaled_length:
+    return d
+  return max(min_scaled_length, int(d * scale))
+
+def scale_arg(x, scale):
+  if isinstance(x, np.ndarray) and scale != 1:
+    index = tuple(slice(0, scale_dim(d, scale)) for d in x.shape)
+    return x[index].copy()
+  elif isinstance(x, tuple):
+    return tuple(scale_arg(elt, scale) for elt in x)
+  elif isinstance(x, list):
+    return [scale_arg(elt, scale) for elt in x]
+  else:
+    return x
+
+def arg_shape(x):
+  if isinstance(x, np.ndarray):
+    return list(x.shape)
+  elif isinstance(x, (tuple, list)):
+    return [arg_shape(elt) for elt in x]
+  else:
+    return None
+
+def summarize(times):
+  times = np.array(times)
+  return {'median' : float(np.median(times)),
+          'iqr' : float(np.percentile(times, 75) - np.percentile(times, 25)),
+          'min' : float(times.min()),
+          'max' : float(times.max()),
+          'n' : len(times)}
+
+def time_call(fn, *args, **kwargs):
+  start = time.time()
+  fn(*args, **kwargs)
+  return time.time() - start
+
+def measure(fn, args, backend, repeat, max_time):
+  import parakeet
+  f = parakeet.jit(fn)
+  result = {}
+  with parakeet.profile_compilation() as records:
+    result['first_call'] = time_call(f, *args, _backend = backend)
+  result['cold_compile'] = sum(rec['total'] for rec in records)
+  compile_times = {}
+  for rec in records:
+    for (step, t) in rec['times'].iteritems():
+      compile_times[step] = compile_times.get(step, 0.0) + t
+  result['compile_times'] = compile_times
+
+  # stop repeating early if the kernel is slow
+  times = []
+  start = time.time()
+  while len(times) < repeat and (len(times) < 3 or time.time() - start < max_time):
+    times.append(time_call(f, *args, _backend = backend))
+  result['warm'] = summarize(times)
+
+  entries = [entry for (key, entry) in f.dispatch_cache.iteritems() if key[0] == backend]
+  if len(entries) == 1:
+    entry = entries[0]
+    linear_args = f.linearize(tuple(args))
+    diffs = []
+    for _ in xrange(len(times)):
+      direct = time_call(entry, linear_args)
+      diffs.append(time_call(f, *args, _backend = backend) - direct)
+    result['dispatch_overhead'] = float(np.median(diffs))
+  else:
+    # the interpreter (and calls with kwargs) don't go through the dispatch cache
+    result['dispatch_overhead'] = None
+  return result
+
+def run_child(script, backend, scale, repeat, max_time, output_filename):
+  """
+  Measure every kernel of one script, meant to be run in a fresh process
+  """
+  from parakeet import config
+  from parakeet.c_backend import config as c_config
+  config.persistent_dispatch_cache = False
+  c_config.cache_dir = None
+  results = []
+  names = []
+  for (fn, args) in collect_kernels(script):
+    name = fn.__name__
+    if name in names:
+      name = "%s#%d" % (name, names.count(name))
+    names.append(fn.__name__)
+    args = scale_arg(list(args), scale)
+    record = {'benchmark' : script,
+              'kernel' : name,
+              'backend' : backend,
+              'scale' : scale,
+              'arg_shapes' : arg_shape(args)}
+    try:
+      record.update(measure(fn, args, backend, repeat, max_time))
+    except Exception, e:
+      record['error'] = "%s: %s" % (e.__class__.__name__, e)
+    record['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.append(record)
+  with open(output_filename, 'w') as f:
+    json.dump(results, f)
+
+def spawn_child(script, backend, scale, options):
+  """
+  Run one script's kernels in a child process and return their records
+  """
+  fd, output_filename = tempfile.mkstemp(prefix = "parakeet_benchmark_", suffix = ".json")
+  os.close(fd)
+  log = tempfile.TemporaryFile()
+  cmd = [sys.executable, os.path.abspath(__file__), '--child',
+         script, backend, repr(scale), str(options.repeat), str(options.max_time),
+         output_filename]
+  proc = subprocess.Popen(cmd, stdout = log, stderr = subprocess.STDOUT)
+  start = time.time()
+  while proc.poll() is None and time.time() - start < options.timeout:
+    time.sleep(0.1)
+  error = None
+  if proc.poll() is None:
+    proc.kill()
+    proc.wait()
+    error = "timed out after %ds" % options.timeout
+  elif proc.returncode != 0:
+    log.seek(0)
+    lines = log.read().strip().splitlines()
+    error = "exited with status %d: %s" % (proc.returncode, lines[-1] if lines else "")
+  try:
+    if error is None:
+      with open(output_filename) as f:
+        return json.load(f)
+    else:
+      return [{'benchmark' : script, 'kernel' : None, 'backend' : backend,
+               'scale' : scale, 'error' : error}]
+  finally:
+    os.remove(output_filename)
+
+def machine_info():
+  from parakeet import package_info
+  return {'platform' : platform.platform(),
+          'python' : sys.version.split()[0],
+          'numpy' : np.__version__,
+          'parakeet' : package_info.__version__,
+          'cores' : os.sysconf('SC_NPROCESSORS_ONLN')}
+
+def result_key(record):
+  return (record['benchmark'], record['kernel'], record['backend'], record['scale'])
+
+def find_regressions(results, baseline, threshold, min_delta):
+  """
+  Compare a list of result records against a baseline, returning
+  a description of every regression
+  """
+  old_records = dict((result_key(r), r) for r in baseline)
+  # runs where the whole script failed to produce kernels
+  old_runs = set((r['benchmark'], r['backend'], r['scale']) for r in baseline if 'error' not in r)
+  regressions = []
+  for new in results:
+    key = result_key(new)
+    if new['kernel'] is None and (new['benchmark'], new['backend'], new['scale']) in old_runs:
+      regressions.append("%s (backend = %s, scale = %s) now fails: %s" % \
+                         (new['benchmark'], new['backend'], new['scale'], new['error']))
+      continue
+    old = old_records.get(key)
+    if old is None or 'error' in old:
+      continue
+    label = "%s.%s (backend = %s, scale = %s)" % key
+    if 'error' in new:
+      regressions.append("%s now fails: %s" % (label, new['error']))
+      continue
+    comparisons = [('warm median', old['warm']['median'], new['warm']['median']),
+                   ('cold compile', old['cold_compile'], new['cold_compile'])]
+    for (what, old_t, new_t) in comparisons:
+      if new_t > old_t * (1 + threshold) and new_t - old_t > min_delta:
+        regressions.append("%s %s: %0.4fs -> %0.4fs (%+0.1f%%)" % \
+                           (label, what, old_t, new_t, 100 * (new_t / old_t - 1)))
+  return regressions
+
+def print_summary(results):
+  for r in results:
+    label = "%s.%s [%s, scale=%s]" % (r['benchmark'], r['kernel'], r['backend'], r['scale'])
+    if 'error' in r:
+      print "%-60s FAILED: %s" % (label, r['error'])
+    else:
+      print "%-60s compile %8.4fs  warm %10.6fs (+/- %0.6f)" % \
+        (label, r['cold_compile'], r['warm']['median'], r['warm']['iqr'])
+
+def main(argv):
+  parser = argparse.ArgumentParser(description = "Run Parakeet's benchmark kernels")
+  parser.add_argument('-o', '--output', help = "JSON file to write results to")
+  parser.add_argument('--benchmarks', nargs = '*', default = None,
+                      help = "scripts to run (default: all of them)")
+  parser.add_argument('--backends', nargs = '*', default = ['c', 'openmp', 'interp'])
+  parser.add_argument('--scales', nargs = '*', type = float, default = [0.25, 0.5, 1.0],
+                      help = "fractions of each script's own input sizes")
+  parser.add_argument('--repeat', type = int, default = 10,
+                      help = "most number of warm calls per kernel")
+  parser.add_argument('--max-time', type = float, default = 10.0,
+                      help = "stop repeating warm calls after this many seconds")
+  parser.add_argument('--timeout', type = float, default = 600,
+                      help = "seconds before giving up on a script")
+  parser.add_argument('--baseline', help = "JSON results to check for regressions against")
+  parser.add_argument('--compare', help = "check existing JSON results instead of running")
+  parser.add_argument('--threshold', type = float, default = 0.25,
+                      help = "relative slowdown which counts as a regression")
+  parser.add_argument('--min-delta', type = float, default = 0.001,
+                      help = "ignore slowdowns smaller than this many seconds")
+  parser.add_argument('--child', nargs = 6, help = argparse.SUPPRESS)
+  options = parser.parse_args(argv)
+
+  if options.child:
+    script, backend, scale, repeat, max_time, output_filename = options.child
+    run_child(script, backend, float(scale), int(repeat), float(max_time), output_filename)
+    return 0
+
+  if options.compare:
+    with open(options.compare) as f:
+      results = json.load(f)['results']
+  else:
+    scripts = options.benchmarks if options.benchmarks else discover_scripts()
+    results = []
+    for script in scripts:
+      for backend in options.backends:
+        for scale in options.scales:
+          records = spawn_child(script, backend, scale, options)
+          print_summary(records)
+          results.extend(records)
+    if options.output:
+      with open(options.output, 'w') as f:
+        json.dump({'machine' : machine_info(),
+                   'settings' : {'repeat' : options.repeat,
+                                 'scales' : options.scales,
+                                 'backends' : options.backends},
+                   'results' : results}, f, indent = 2, sort_keys = True)
+
+  if options.baseline:
+    with open(options.baseline) as f:
+      baseline = json.load(f)['results']
+    regressions = find_regressions(results, baseline, options.threshold, options.min_delta)
+    if regressions:
+      print
+      print "%d REGRESSIONS against %s:" % (len(regressions), options.baseline)
+      for regression in regressions:
+        print "  " + regression
+      return 1
+    print "No regressions against %s" % options.baseline
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))
@@ -22,6 +22,13 @@ from lib import *
 from prims import *
 
 from frontend import jit, macro, run_python_fn, run_untyped_fn, run_typed_fn
-from frontend import typed_repr, specialize, find_broken_transform
+from frontend import typed_repr, specialize, find_broken_transform, precompile
 
+from c_backend.pool_allocator import allocator_stats, trim_allocator_pool
+from c_backend.instrumentation import kernel_stats
+from num_threads import set_num_threads, get_num_threads, threads
+from compile_profile import clear_compile_stats, compile_stats, profile_compilation
 
+
+
+import aot
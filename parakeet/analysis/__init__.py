@@ -1,11 +1,13 @@
+from array_lifetimes import array_lifetimes, ArrayLifetimes
 from collect_vars import (collect_binding_names, 
                           collect_bindings, 
                           collect_var_names, 
                           collect_var_names_from_exprs, 
                           collect_var_names_list)
+from cost_model import estimate_cost
 from contains import (contains_adverbs, contains_calls, contains_functions, 
-                      contains_loops, contains_slices, contains_structs, 
-                      contains_array_operators)
+                      contains_loops, contains_parfor, contains_slices, 
+                      contains_structs, contains_array_operators)
  
 from escape_analysis import may_alias, may_escape, escape_analysis 
 
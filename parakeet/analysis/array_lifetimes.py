@@ -0,0 +1,142 @@
+from .. syntax import Var, Tuple, Alloc, AllocArray, IndexScan, IndexFilter
+from .. syntax import Assign, ForLoop, If, Return, While
+from collect_vars import collect_binding_names, collect_var_names_from_exprs
+from escape_analysis import EscapeAnalysis, collect_nonscalar_names_from_list
+
+# right-hand sides which always give back a freshly malloc'd buffer
+fresh_buffer_classes = (Alloc, AllocArray, IndexScan, IndexFilter)
+
+class LocalEscapeAnalysis(EscapeAnalysis):
+  """
+  Unlike the general escape analysis, passing an array to a function
+  (or an adverb) doesn't make it escape: the only way the callee can hand
+  the array back is through its result, which already aliases all the
+  arguments of the call.
+  """
+
+  def visit_Call(self, expr):
+    self.visit_expr(expr.fn)
+    self.visit_expr_list(expr.args)
+
+  def visit_Map(self, expr):
+    self.visit_expr(expr.fn)
+    self.visit_if_expr(expr.axis)
+
+  def visit_Reduce(self, expr):
+    self.visit_expr(expr.fn)
+    self.visit_expr(expr.combine)
+    self.visit_if_expr(expr.axis)
+    self.visit_if_expr(expr.init)
+
+  def visit_Scan(self, expr):
+    self.visit_expr(expr.fn)
+    self.visit_expr(expr.combine)
+    self.visit_if_expr(expr.axis)
+    self.visit_if_expr(expr.init)
+
+  def visit_OuterMap(self, expr):
+    self.visit_expr(expr.fn)
+    self.visit_if_expr(expr.axis)
+
+  def visit_Closure(self, expr):
+    self.visit_expr_list(expr.args)
+
+class ArrayLifetimes(object):
+  """
+  Find the variables bound directly to a freshly allocated buffer
+  whose data can be released once the block which allocated
+  them finishes, and the returned variables whose buffers are never
+  referenced by anything else the function returns.
+  """
+
+  def __init__(self, fn):
+    self.escape = LocalEscapeAnalysis()
+    self.escape.visit_fn(fn)
+
+    # map each name bound in the function to the statement list
+    # whose scope it lives in
+    self.defining_block = {}
+    # names referenced by some flow merge, which get read after
+    # the block they come from has already finished
+    self.merged_names = set([])
+    # fresh allocations and the block they occur in
+    self.fresh = {}
+    self.returned = []
+    self.visit_block(fn.body, ())
+
+  def visit_merge(self, merge, block_path):
+    for (name, (left, right)) in merge.iteritems():
+      self.defining_block[name] = block_path
+      self.merged_names.update(collect_var_names_from_exprs([left, right]))
+
+  def visit_block(self, stmts, parent_path):
+    block_path = parent_path + (id(stmts),)
+    for stmt in stmts:
+      c = stmt.__class__
+      if c is Assign:
+        for name in collect_binding_names(stmt.lhs):
+          self.defining_block[name] = block_path
+        if stmt.lhs.__class__ is Var and stmt.rhs.__class__ in fresh_buffer_classes:
+          self.fresh[stmt.lhs.name] = (block_path, stmt.rhs.__class__)
+      elif c is ForLoop:
+        self.defining_block[stmt.var.name] = block_path
+        self.visit_merge(stmt.merge, block_path)
+        self.visit_block(stmt.body, block_path)
+      elif c is While:
+        self.visit_merge(stmt.merge, block_path)
+        self.visit_block(stmt.body, block_path)
+      elif c is If:
+        self.visit_merge(stmt.merge, block_path)
+        self.visit_block(stmt.true, block_path)
+        self.visit_block(stmt.false, block_path)
+      elif c is Return:
+        self.returned.append(stmt.value)
+
+  def within(self, name, block_path):
+    path = self.defining_block.get(name)
+    return path is not None and path[:len(block_path)] == block_path
+
+  def freeable(self):
+    """
+    Names whose buffer can be freed at the end of their defining block
+    """
+    result = set([])
+    for (name, (block_path, _)) in self.fresh.iteritems():
+      if name in self.escape.may_escape:
+        continue
+      aliases = self.escape.may_alias.get(name, set([name]))
+      if any(alias in self.merged_names or not self.within(alias, block_path)
+             for alias in aliases):
+        continue
+      result.add(name)
+    return result
+
+  def owned_returns(self):
+    """
+    Returned arrays holding a fresh buffer which nothing else in the same
+    return value can share, so the caller can take ownership of it
+    """
+    owned = set([])
+    shared = set([])
+    for value in self.returned:
+      if value.__class__ is Tuple:
+        components = value.elts
+      else:
+        components = [value]
+      names = collect_nonscalar_names_from_list(components)
+      for elt in components:
+        if elt.__class__ is not Var:
+          continue
+        name = elt.name
+        if name not in self.fresh or self.fresh[name][1] is Alloc:
+          continue
+        n_refs = len([other for other in names
+                      if name in self.escape.may_alias.get(other, ())])
+        if n_refs == 1:
+          owned.add(name)
+        else:
+          shared.add(name)
+    return owned.difference(shared)
+
+def array_lifetimes(fn):
+  return ArrayLifetimes(fn)
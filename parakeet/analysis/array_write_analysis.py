@@ -1,30 +1,68 @@
-
-from collect_vars import collect_var_names, collect_var_names_from_exprs
-from escape_analysis import escape_analysis
+from .. syntax import (Var, Const, Tuple, TupleProj, Index, PrimCall, Select, Cast, Attribute,
+                       Slice, Alloc, AllocArray, ArrayView, Shape, Strides, Struct, Closure,
+                       TypedFn, Assign, Check, ExprStmt, If, ForLoop, While, Comment)
 from syntax_visitor import SyntaxVisitor
 
+# expressions which don't touch memory other than through the Index
+# expressions nested inside them
+known_exprs = set([Var, Const, Tuple, TupleProj, Index, PrimCall, Select, Cast, Attribute,
+                   Slice, Alloc, AllocArray, ArrayView, Shape, Strides, Struct, Closure,
+                   TypedFn])
+
+known_stmts = set([Assign, Check, ExprStmt, If, ForLoop, While, Comment])
 
 class ArrayWriteAnalysis(SyntaxVisitor):
-  def __init__(self, fn, fresh_alloc_args = set([])):
-    self.fn = fn 
-    self.fresh_alloc_args = fresh_alloc_args
-    
-  def visit_fn(self, fn):
-    escape_info = escape_analysis(fn, self.fresh_alloc_args)
-    self.may_alias = escape_info.may_alias 
-    SyntaxVisitor.visit_fn(self, fn)
+  """
+  Gather the arrays which some statements read and write (each along
+  with everything it may alias) and every Index expression through
+  which they get accessed. Anything whose effect on memory can't be seen
+  from here, such as a function call, sets unknown_effects instead.
+  """
+
+  def __init__(self, may_alias):
+    self.may_alias = may_alias
+    self.reads = set([])
     self.writes = set([])
-    
+    self.accesses = []
+    self.unknown_effects = False
+
+  def aliases(self, name):
+    return self.may_alias.get(name, set([])).union([name])
+
+  def visit_expr(self, expr):
+    if expr.__class__ not in known_exprs:
+      self.unknown_effects = True
+    else:
+      SyntaxVisitor.visit_expr(self, expr)
+
+  def visit_stmt(self, stmt):
+    if stmt.__class__ not in known_stmts:
+      self.unknown_effects = True
+    else:
+      SyntaxVisitor.visit_stmt(self, stmt)
+
   def visit_Assign(self, stmt):
-    if stmt.lhs.__class__ is Tuple:
-      for elt in stmt.lhs.elts:
-        self.visit_Assign(elt)
-    elif stmt.lhs.__class__ is Index:
-      for name in collect_var_names(stmt.lhs.value):
-        self.writes.append(name)
-        for alias_name in self.may_alias[name]:
-          self.writes.append(alias_name)
-      
-    
-  def visit_Index(self):
-   
+    lhs = stmt.lhs
+    if lhs.__class__ is Index:
+      if lhs.value.__class__ is Var:
+        self.writes.update(self.aliases(lhs.value.name))
+        self.accesses.append(lhs)
+      else:
+        self.unknown_effects = True
+      self.visit_expr(lhs.index)
+    elif lhs.__class__ not in (Var, Tuple):
+      self.unknown_effects = True
+    self.visit_expr(stmt.rhs)
+
+  def visit_Index(self, expr):
+    if expr.value.__class__ is Var:
+      self.reads.update(self.aliases(expr.value.name))
+      self.accesses.append(expr)
+    else:
+      self.unknown_effects = True
+    self.visit_expr(expr.index)
+
+def array_accesses(stmts, may_alias):
+  analysis = ArrayWriteAnalysis(may_alias)
+  analysis.visit_block(stmts)
+  return analysis
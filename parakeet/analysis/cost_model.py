@@ -0,0 +1,130 @@
+from .. import prims
+from ..syntax import Const, Tuple
+
+from contains import memoize
+from syntax_visitor import SyntaxVisitor
+
+# how many times we guess a loop runs when its bounds aren't constants
+unknown_trip_count = 100
+
+# rough cost of calling a primitive, relative to an addition
+prim_costs = {
+  prims.divide : 4, prims.remainder : 4, prims.mod : 4, prims.fmod : 4,
+  prims.sqrt : 6, prims.power : 30,
+  prims.exp : 20, prims.exp2 : 20, prims.expm1 : 20,
+  prims.log : 20, prims.log2 : 20, prims.log10 : 20, prims.log1p : 20,
+  prims.sin : 20, prims.cos : 20, prims.tan : 20,
+  prims.arcsin : 25, prims.arccos : 25, prims.arctan : 25, prims.arctan2 : 25,
+  prims.sinh : 25, prims.cosh : 25, prims.tanh : 25,
+  prims.arcsinh : 25, prims.arccosh : 25, prims.arctanh : 25,
+}
+
+# allocating an array goes through the pool allocator or malloc
+alloc_cost = 50
+
+def trip_count(expr):
+  """Number of iterations covered by the bounds of an adverb or ParFor"""
+  if expr.__class__ is Const:
+    return max(expr.value, 0)
+  elif expr.__class__ is Tuple:
+    total = 1
+    for elt in expr.elts:
+      total *= trip_count(elt)
+    return total
+  else:
+    return unknown_trip_count
+
+class EstimateCost(SyntaxVisitor):
+  """
+  Roughly how many operations one call to a function evaluates, counting
+  arithmetic, comparisons and array accesses as one each, taking the more
+  expensive branch of every If and guessing the trip count of loops
+  """
+
+  def __init__(self):
+    self.cost = 0
+    self.scale = 1
+
+  def add(self, units):
+    self.cost += self.scale * units
+
+  def repeat(self, n, visit):
+    old_scale = self.scale
+    self.scale *= n
+    visit()
+    self.scale = old_scale
+
+  def visit_PrimCall(self, expr):
+    self.add(prim_costs.get(expr.prim, 1))
+    SyntaxVisitor.visit_PrimCall(self, expr)
+
+  def visit_Index(self, expr):
+    self.add(1)
+    SyntaxVisitor.visit_Index(self, expr)
+
+  def visit_Select(self, expr):
+    self.add(1)
+    SyntaxVisitor.visit_Select(self, expr)
+
+  def visit_Alloc(self, expr):
+    self.add(alloc_cost)
+    SyntaxVisitor.visit_Alloc(self, expr)
+
+  def visit_AllocArray(self, expr):
+    self.add(alloc_cost)
+    SyntaxVisitor.visit_AllocArray(self, expr)
+
+  def visit_TypedFn(self, expr):
+    self.add(estimate_cost(expr))
+
+  def visit_If(self, stmt):
+    self.visit_expr(stmt.cond)
+    before = self.cost
+    self.visit_block(stmt.true)
+    true_cost = self.cost - before
+    self.cost = before
+    self.visit_block(stmt.false)
+    false_cost = self.cost - before
+    self.cost = before + max(true_cost, false_cost)
+
+  def visit_While(self, stmt):
+    def body():
+      self.visit_expr(stmt.cond)
+      self.visit_block(stmt.body)
+    self.repeat(unknown_trip_count, body)
+
+  def visit_ForLoop(self, stmt):
+    start, stop, step = stmt.start, stmt.stop, stmt.step
+    if start.__class__ is Const and stop.__class__ is Const and \
+       step.__class__ is Const and step.value > 0:
+      n = max(stop.value - start.value, 0) / step.value
+    else:
+      n = unknown_trip_count
+    self.repeat(n, lambda: self.visit_block(stmt.body))
+
+  def visit_ParFor(self, stmt):
+    self.repeat(trip_count(stmt.bounds), lambda: self.visit_expr(stmt.fn))
+
+  def visit_index_adverb(self, expr, fns):
+    self.repeat(trip_count(expr.shape), lambda: self.visit_expr_list(fns))
+
+  def visit_IndexMap(self, expr):
+    self.visit_index_adverb(expr, [expr.fn])
+
+  def visit_IndexReduce(self, expr):
+    self.visit_index_adverb(expr, [expr.fn, expr.combine])
+
+  def visit_IndexScan(self, expr):
+    self.visit_index_adverb(expr, [expr.fn, expr.combine])
+
+  def visit_IndexFilter(self, expr):
+    self.visit_index_adverb(expr, [expr.fn, expr.pred])
+
+  def visit_IndexFilterReduce(self, expr):
+    self.visit_index_adverb(expr, [expr.fn, expr.pred, expr.combine])
+
+@memoize
+def estimate_cost(fn):
+  estimator = EstimateCost()
+  estimator.visit_fn(fn)
+  return estimator.cost
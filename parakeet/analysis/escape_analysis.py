@@ -39,7 +39,10 @@ class EscapeAnalysis(SyntaxVisitor):
     
   
   def nested_mutable_types(self, t):
-    if isinstance(t, (PtrT, ArrayT)):
+    if isinstance(t, ArrayT):
+      # arrays with different layouts can still be views of the same data
+      return set([t.without_layout()])
+    elif isinstance(t, PtrT):
       return set([t])
     elif isinstance(t, TupleT):
       result = set([])
@@ -1,6 +1,6 @@
 from .. ndtypes import ArrayT, PtrT 
 from .. syntax import (Var, Alloc, ArrayView, Array, Struct, AllocArray, 
-                       Map, IndexMap, OuterMap, Scan, IndexScan, 
+                       Map, IndexMap, OuterMap, Scan, IndexScan, IndexFilter, 
                        ConstArray, ConstArrayLike
                        )
 from syntax_visitor import SyntaxVisitor
@@ -9,7 +9,7 @@ from syntax_visitor import SyntaxVisitor
 
 array_alloc_classes = (AllocArray, Array, 
                        Map, IndexMap, OuterMap, 
-                       Scan, IndexScan, 
+                       Scan, IndexScan, IndexFilter, 
                        ConstArray, ConstArrayLike)
 
 class FindLocalArrays(SyntaxVisitor):
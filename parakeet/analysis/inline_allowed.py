@@ -1,5 +1,5 @@
 
-from ..syntax import Assign, ExprStmt, If, While, ForLoop, Comment, Return, ParFor  
+from ..syntax import Assign, Check, ExprStmt, If, While, ForLoop, Comment, Return, ParFor  
 
 def all_branches_return(stmt):
   if isinstance(stmt, Return):
@@ -31,7 +31,7 @@ def can_inline_block(stmts, outer = False):
     elif stmt_class in (While, ForLoop):
       if not can_inline_block(stmt.body):
         return False
-    elif stmt_class is Comment:
+    elif stmt_class in (Comment, Check):
       continue
     
     else:
@@ -1,6 +1,7 @@
 from syntax_visitor import SyntaxVisitor
 
-from .. ndtypes  import TupleT, StructT, Type, PtrT, ClosureT, FnT
+from .. ndtypes  import TupleT, StructT, Type, PtrT, ClosureT, FnT, ArrayT, make_array_type
+from .. ndtypes.array_type import layouts 
 
 class TypeBasedMutabilityAnalysis(SyntaxVisitor):
   """
@@ -19,7 +20,12 @@ class TypeBasedMutabilityAnalysis(SyntaxVisitor):
     self.mutable_types = set([])
   
   def _mark_type(self, t):
-    if self._has_mutable_fields(t):
+    if isinstance(t, ArrayT):
+      # views with other layouts might share this array's data
+      for layout in layouts:
+        self.mutable_types.add(make_array_type(t.elt_type, t.rank, layout))
+      self._mark_children(t)
+    elif self._has_mutable_fields(t):
       self.mutable_types.add(t)
       self._mark_children(t)
     elif isinstance(t, PtrT):
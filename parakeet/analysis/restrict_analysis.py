@@ -0,0 +1,227 @@
+from .. ndtypes import ArrayT, ClosureT, FnT, PtrT
+from .. syntax import Closure, TypedFn, Var
+from escape_analysis import escape_analysis
+from syntax_visitor import SyntaxVisitor
+
+class RestrictAnalysis(SyntaxVisitor):
+  """
+  Find the arrays whose data a C function can access through a 'restrict'
+  pointer. That promise only holds if no other pointer reaches the same
+  elements while one of them gets modified, so an array qualifies when:
+    - it's bound once (as an input or by a single assignment),
+    - it only ever gets indexed or has its metadata read, so its data
+      can't be handed off to other code or other views,
+    - and either nothing else in the function may alias it or neither it
+      nor anything it aliases is ever written to.
+  """
+
+  def __init__(self, distinct_args = frozenset()):
+    self.distinct_args = distinct_args
+    self.indexed = set([])
+    self.written = set([])
+    # any use of an array other than indexing it or reading its metadata
+    self.other_uses = set([])
+    self.n_bindings = {}
+
+  def visit_Var(self, expr):
+    self.other_uses.add(expr.name)
+
+  def visit_lhs_Var(self, lhs):
+    self.n_bindings[lhs.name] = self.n_bindings.get(lhs.name, 0) + 1
+
+  def visit_lhs_Index(self, lhs):
+    if lhs.value.__class__ is Var:
+      self.written.add(lhs.value.name)
+    self.visit_Index(lhs)
+
+  def visit_Index(self, expr):
+    if expr.value.__class__ is Var:
+      self.indexed.add(expr.value.name)
+    else:
+      self.visit_expr(expr.value)
+    self.visit_expr(expr.index)
+
+  def visit_Attribute(self, expr):
+    if expr.value.__class__ is Var and expr.name != 'data':
+      return
+    self.visit_expr(expr.value)
+
+  def visit_merge(self, phi_nodes):
+    for (name, (l, r)) in phi_nodes.iteritems():
+      # values merged from several places can't keep a single pointer
+      self.n_bindings[name] = 2
+      self.visit_expr(l)
+      self.visit_expr(r)
+
+  def visit_merge_loop_start(self, phi_nodes):
+    self.visit_merge(phi_nodes)
+
+  def visit_fn(self, fn):
+    self.visit_block(fn.body)
+    aliases = array_aliases(fn, self.distinct_args)
+    # arrays handed off elsewhere might get written there
+    modified = self.written.union(self.other_uses)
+    result = set([])
+    for name in self.indexed:
+      if name in self.other_uses or not isinstance(fn.type_env.get(name), ArrayT):
+        continue
+      if self.n_bindings.get(name, 0) != (0 if name in fn.arg_names else 1):
+        continue
+      others = aliases.get(name, set([])).difference([name])
+      if len(others) == 0 or \
+         (name not in self.written and len(others.intersection(modified)) == 0):
+        result.add(name)
+    return result
+
+def array_aliases(fn, distinct_args = frozenset()):
+  """
+  Map each variable of a function to the others which might share data 
+  with it. Escape analysis only pairs up inputs of the same type, but any 
+  inputs which aren't known to be distinct might be views of the same data
+  if they have the same element type, even at different ranks. 
+  """
+  aliases = escape_analysis(fn, distinct_args).may_alias
+  groups = {}
+  for name in fn.arg_names:
+    t = fn.type_env[name]
+    if isinstance(t, ArrayT) and name not in distinct_args:
+      groups.setdefault(t.elt_type, set([])).add(name)
+  result = dict((name, set(names)) for (name, names) in aliases.iteritems())
+  for group in groups.itervalues():
+    combined = set([])
+    for name in group:
+      combined.update(aliases.get(name, [name]))
+    for name in combined:
+      result[name] = result.get(name, set([])).union(combined)
+  return result
+
+def restrict_arrays(fn, distinct_args = frozenset()):
+  """
+  Names of the arrays in a function which can be accessed through restrict
+  pointers, given the names of the inputs which are known not to share
+  any data with the other inputs
+  """
+  return RestrictAnalysis(frozenset(distinct_args)).visit_fn(fn)
+
+class InputWrites(SyntaxVisitor):
+  """
+  Which inputs of a function might get written to, either directly or
+  by the functions it calls
+  """
+
+  def __init__(self, fn):
+    self.fn = fn
+    self.aliases = array_aliases(fn)
+    self.written = set([])
+
+  def mark(self, name):
+    self.written.add(name)
+    self.written.update(self.aliases.get(name, []))
+
+  def mark_all(self, exprs):
+    for expr in exprs:
+      if expr.__class__ is Var:
+        self.mark(expr.name)
+
+  def visit_Var(self, expr):
+    # we can't see into functions which get passed around as values
+    if isinstance(expr.type, (ClosureT, FnT)):
+      self.mark_all(Var(name, type = t) for (name, t) in self.fn.type_env.iteritems())
+
+  def visit_lhs_Index(self, lhs):
+    if lhs.value.__class__ is Var:
+      self.mark(lhs.value.name)
+    SyntaxVisitor.visit_lhs_Index(self, lhs)
+
+  def visit_fn_args(self, fn, args):
+    if fn.__class__ is Closure:
+      self.visit_fn_args(fn.fn, tuple(fn.args) + tuple(args))
+    elif fn.__class__ is TypedFn:
+      callee_writes = written_inputs(fn)
+      for (param, arg) in zip(fn.arg_names, args):
+        if param in callee_writes and arg.__class__ is Var:
+          self.mark(arg.name)
+    else:
+      self.visit_expr(fn)
+      self.mark_all(args)
+
+  def visit_Closure(self, expr):
+    self.visit_fn_args(expr, ())
+    self.visit_expr_list(expr.args)
+
+  def visit_Call(self, expr):
+    self.visit_fn_args(expr.fn, expr.args)
+    if expr.fn.__class__ is Closure:
+      self.visit_expr_list(expr.fn.args)
+    self.visit_expr_list(expr.args)
+
+  def visit_fn(self, fn):
+    self.visit_block(fn.body)
+    return self.written.intersection(fn.arg_names)
+
+_written_inputs_cache = {}
+def written_inputs(fn):
+  """Names of the inputs whose data a function (or anything it calls) might write to"""
+  key = fn.cache_key
+  if key not in _written_inputs_cache:
+    _written_inputs_cache[key] = InputWrites(fn).visit_fn(fn)
+  return _written_inputs_cache[key]
+
+class LoopIndexing(SyntaxVisitor):
+  """
+  Does a function (or anything it calls) index into arrays from inside 
+  a loop? Functions handed to ParFor or an adverb run once per iteration, 
+  so their bodies count as being inside a loop. 
+  """
+
+  def __init__(self, in_loop = False):
+    self.in_loop = in_loop
+    self.found = False
+
+  def visit_Index(self, expr):
+    if self.in_loop and isinstance(expr.value.type, (ArrayT, PtrT)):
+      self.found = True
+    SyntaxVisitor.visit_Index(self, expr)
+
+  def visit_loop(self, visit, stmt):
+    old_in_loop = self.in_loop
+    self.in_loop = True
+    visit(self, stmt)
+    self.in_loop = old_in_loop
+
+  def visit_ForLoop(self, stmt):
+    self.visit_loop(SyntaxVisitor.visit_ForLoop, stmt)
+
+  def visit_While(self, stmt):
+    self.visit_loop(SyntaxVisitor.visit_While, stmt)
+
+  def visit_TypedFn(self, expr):
+    if indexes_in_loop(expr, in_loop = True):
+      self.found = True
+
+  def visit_Call(self, expr):
+    fn = expr.fn
+    if fn.__class__ is Closure:
+      self.visit_expr_list(fn.args)
+      fn = fn.fn
+    if fn.__class__ is TypedFn:
+      if indexes_in_loop(fn, self.in_loop):
+        self.found = True
+    else:
+      self.visit_expr(fn)
+    self.visit_expr_list(expr.args)
+
+  def visit_fn(self, fn):
+    self.visit_block(fn.body)
+    return self.found
+
+_indexes_in_loop_cache = {}
+def indexes_in_loop(fn, in_loop = False):
+  """
+  Whether any loop run by a function accesses array elements, which is when 
+  knowing that its inputs are distinct might let the C compiler do better
+  """
+  key = (fn.cache_key, in_loop)
+  if key not in _indexes_in_loop_cache:
+    _indexes_in_loop_cache[key] = LoopIndexing(in_loop).visit_fn(fn)
+  return _indexes_in_loop_cache[key]
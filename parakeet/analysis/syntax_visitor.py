@@ -1,4 +1,4 @@
-from .. syntax import (Expr, Assign, ExprStmt, ForLoop, If, Return, While, Comment, ParFor, 
+from .. syntax import (Expr, Assign, Check, ExprStmt, ForLoop, If, Return, While, Comment, ParFor, 
                        TypedFn, UntypedFn,  Closure, ClosureElt, Select,  
                        Attribute, Const, Index, PrimCall, Tuple, Var, 
                        Alloc, Array, Call, Struct, Shape, Strides, Range, Ravel, Transpose,
@@ -116,6 +116,18 @@ class SyntaxVisitor(object):
     self.visit_expr(expr.shape)
     self.visit_expr(expr.init)
 
+  def visit_IndexFilter(self, expr):
+    self.visit_expr(expr.fn)
+    self.visit_expr(expr.pred)
+    self.visit_expr(expr.shape)
+
+  def visit_IndexFilterReduce(self, expr):
+    self.visit_expr(expr.fn)
+    self.visit_expr(expr.pred)
+    self.visit_expr(expr.combine)
+    self.visit_expr(expr.shape)
+    self.visit_if_expr(expr.init)
+
   def visit_Map(self, expr):
     self.visit_expr(expr.fn)
     self.visit_if_expr(expr.axis)
@@ -128,6 +140,27 @@ class SyntaxVisitor(object):
     for arg in expr.args:
       self.visit_expr(arg)
 
+  def visit_TiledOuterMap(self, expr):
+    self.visit_OuterMap(expr)
+    self.visit_if_expr(expr.fixed_tile_size)
+
+  def visit_Conv(self, expr):
+    self.visit_expr(expr.fn)
+    self.visit_expr(expr.x)
+    self.visit_expr(expr.window_shape)
+
+  def visit_ConvBorderFn(self, expr):
+    self.visit_Conv(expr)
+    self.visit_expr(expr.border_fn)
+
+  def visit_ConvBorderValue(self, expr):
+    self.visit_Conv(expr)
+    self.visit_expr(expr.border_value)
+
+  def visit_ConvPadding(self, expr):
+    self.visit_Conv(expr)
+    self.visit_expr(expr.fill_value)
+
   def visit_Reduce(self, expr):
     self.visit_expr(expr.fn)
     self.visit_expr(expr.combine)
@@ -136,6 +169,16 @@ class SyntaxVisitor(object):
     for arg in expr.args:
       self.visit_expr(arg)
 
+  def visit_Filter(self, expr):
+    self.visit_expr(expr.fn)
+    self.visit_if_expr(expr.axis)
+    for arg in expr.args:
+      self.visit_expr(arg)
+
+  def visit_FilterReduce(self, expr):
+    self.visit_Reduce(expr)
+    self.visit_expr(expr.pred)
+
   def visit_Scan(self, expr):
     self.visit_expr(expr.fn)
     self.visit_expr(expr.combine)
@@ -168,6 +211,12 @@ class SyntaxVisitor(object):
   def visit_TypeValue(self, expr):
     pass 
   
+  def visit_NumCores(self, expr):
+    pass 
+  
+  def visit_ThreadId(self, expr):
+    pass 
+  
   def visit_generic_expr(self, expr):
     for v in expr.children():
       self.visit_expr(v)
@@ -320,9 +369,13 @@ class SyntaxVisitor(object):
   def visit_Comment(self, stmt):
     pass
 
+  def visit_Check(self, stmt):
+    self.visit_expr(stmt.cond)
+
   def visit_ParFor(self, expr):
     self.visit_expr(expr.fn)
     self.visit_expr(expr.bounds)
+    self.visit_if_expr(expr.tile_sizes)
   
   _stmt_method_names = {
     Assign : 'visit_Assign', 
@@ -333,6 +386,7 @@ class SyntaxVisitor(object):
     ExprStmt : 'visit_ExprStmt', 
     ParFor : 'visit_ParFor', 
     Comment : 'visit_Comment',                    
+    Check : 'visit_Check', 
   }
   
   def visit_stmt(self, stmt):
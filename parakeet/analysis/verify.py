@@ -252,6 +252,10 @@ class Verify(SyntaxVisitor):
     take tuples of indices but have to take each index as a separate parameter
     """
     self.visit_expr(stmt.bounds)
+    if stmt.tile_sizes is not None:
+      self.visit_expr(stmt.tile_sizes)
+      assert stmt.tile_sizes.type == stmt.bounds.type, \
+        "ParFor tile sizes %s don't match bounds %s" % (stmt.tile_sizes, stmt.bounds)
     fn, closure_arg_types = self.get_fn_and_closure(stmt.fn)
     verify(fn)
     bounds_t = stmt.bounds.type
@@ -0,0 +1,206 @@
+"""
+Ahead-of-time compilation: specialize Parakeet functions for an explicit
+list of type signatures and link them all into a single Python extension
+module. The resulting shared library can be imported on machines without a
+C compiler (or Parakeet) and never pays first-call compilation latency.
+
+  from parakeet import aot, Float64, make_array_type
+  vec = make_array_type(Float64, 1)
+  aot.compile_module("kernels", {norm : [(vec,)], axpy : [(Float64, vec, vec)]}, "build/")
+
+  # later, with build/ on sys.path
+  import kernels
+  kernels.norm(np.ones(10))
+
+Functions compiled with the 'openmp' backend also accept a thread count
+following their arguments (kernels.norm(np.ones(10), 4)), otherwise they
+use as many threads as OpenMP would by default.
+"""
+
+import os
+
+from . import config, type_inference
+from c_backend import PyModuleCompiler, instrumentation, pool_allocator, type_mappings
+from c_backend.compile_util import (create_module_source, compile_module_to_file,
+                                    python_headers)
+from frontend import ast_conversion
+from ndtypes import (Type, typeof, ArrayT, ScalarT, TupleT, NoneT, Bool, Int64, Float64)
+from openmp_backend import MulticoreCompiler
+from transforms.pipeline import loopify, prealloc_arrays, final_loop_optimizations
+
+class UnsupportedAOTType(Exception):
+  def __init__(self, t):
+    self.t = t
+
+  def __str__(self):
+    return "Can't compile ahead of time for arguments of type %s" % (self.t,)
+
+_scalar_check_fn = """
+static int parakeet_is_scalar_of_type(PyObject* x, int typenum) {
+  PyArray_Descr* descr;
+  int result;
+  if (!PyArray_IsScalar(x, Generic)) { return 0; }
+  descr = PyArray_DescrFromScalar(x);
+  result = PyArray_EquivTypenums(descr->type_num, typenum);
+  Py_DECREF(descr);
+  return result;
+}
+"""
+
+def type_check(x, t):
+  """
+  C expression which is true if the PyObject x would have been given
+  the Parakeet type t by type_conv.typeof
+  """
+  if isinstance(t, ArrayT):
+    checks = ["PyArray_Check(%s)" % x, 
+              "PyArray_NDIM((PyArrayObject*) %s) == %d" % (x, t.rank), 
+              "PyArray_EquivTypenums(PyArray_TYPE((PyArrayObject*) %s), %s)" % \
+              (x, type_mappings.to_dtype(t.elt_type))]
+    # code compiled for contiguous arrays can't run on strided ones 
+    if t.layout == 'C':
+      checks.append("PyArray_IS_C_CONTIGUOUS((PyArrayObject*) %s)" % x)
+    elif t.layout == 'F':
+      checks.append("PyArray_IS_F_CONTIGUOUS((PyArrayObject*) %s)" % x)
+    return "(%s)" % " && ".join(checks)
+  elif isinstance(t, ScalarT):
+    numpy_check = "parakeet_is_scalar_of_type(%s, %s)" % (x, type_mappings.to_dtype(t))
+    if t == Bool:
+      return "(PyBool_Check(%s) || %s)" % (x, numpy_check)
+    elif t == Int64:
+      return "((PyInt_Check(%s) && !PyBool_Check(%s)) || %s)" % (x, x, numpy_check)
+    elif t == Float64:
+      return "(PyFloat_Check(%s) || %s)" % (x, numpy_check)
+    else:
+      return numpy_check
+  elif isinstance(t, TupleT):
+    n = len(t.elt_types)
+    checks = ["PyTuple_Check(%s)" % x, "PyTuple_GET_SIZE(%s) == %d" % (x, n)]
+    for i, elt_t in enumerate(t.elt_types):
+      checks.append(type_check("PyTuple_GET_ITEM(%s, %d)" % (x, i), elt_t))
+    return "(%s)" % " && ".join(checks)
+  elif isinstance(t, NoneT):
+    return "(%s == Py_None)" % x
+  else:
+    raise UnsupportedAOTType(t)
+
+def normalize_signature(sig):
+  """
+  A signature is a sequence of Parakeet types or example values
+  """
+  if not isinstance(sig, (list, tuple)):
+    sig = (sig,)
+  return tuple(t if isinstance(t, Type) else typeof(t) for t in sig)
+
+def lower(typed_fn, backend):
+  if backend == 'openmp':
+    fn = prealloc_arrays(typed_fn)
+  else:
+    fn = loopify.apply(typed_fn)
+  return final_loop_optimizations.apply(fn)
+
+def exported_name(fn):
+  while hasattr(fn, 'f'):
+    fn = fn.f
+  return fn.__name__
+
+def compile_module(module_name, signatures, output_dir = ".", backend = None):
+  """
+  Compile every function in the 'signatures' dictionary for each of its
+  listed argument signatures, and link them all into an extension module
+  which exports one dispatch function per Python function.
+  Returns the path of the shared library.
+  """
+  if backend is None:
+    backend = config.backend
+  assert backend in ('c', 'openmp'), \
+    "Ahead-of-time compilation requires the 'c' or 'openmp' backend, not '%s'" % backend
+  compiler_class = MulticoreCompiler if backend == 'openmp' else PyModuleCompiler
+
+  declarations = []
+  extra_function_signatures = []
+  extra_functions = {}
+  extra_objects = set([])
+  extra_compile_flags = []
+  extra_link_flags = []
+
+  def add_unique(xs, new_xs):
+    for x in new_xs:
+      if x not in xs:
+        xs.append(x)
+
+  entry_sources = []
+  method_names = []
+  for fn in sorted(signatures.keys(), key = exported_name):
+    name = exported_name(fn)
+    assert name not in method_names, "Duplicate function name '%s' in module %s" % (name, module_name)
+    method_names.append(name)
+    untyped = ast_conversion.translate_function_value(fn)
+    assert len(untyped.python_nonlocals()) == 0, \
+      "Can't compile '%s' ahead of time since it refers to global arrays" % name
+
+    dispatch_cases = []
+    # calls with a trailing thread count only get tried after every 
+    # signature which takes all of the arguments 
+    num_threads_cases = []
+    for i, sig in enumerate(signatures[fn]):
+      arg_types = normalize_signature(sig)
+      typed_fn = lower(type_inference.specialize(untyped, arg_types), backend)
+      compiler = compiler_class()
+      entry_name = "%s_entry%d" % (name, i)
+      _, _, src = compiler.visit_fn(typed_fn, c_fn_name = entry_name)
+      entry_sources.append(src)
+      add_unique(declarations, compiler.declarations)
+      for extra_sig in compiler.extra_function_signatures:
+        if extra_sig not in extra_functions:
+          extra_function_signatures.append(extra_sig)
+          extra_functions[extra_sig] = compiler.extra_functions[extra_sig]
+      extra_objects.update(compiler.extra_objects)
+      add_unique(extra_compile_flags, compiler.extra_compile_flags)
+      add_unique(extra_link_flags, compiler.extra_link_flags)
+
+      n = len(arg_types)
+      checks = [type_check("PyTuple_GET_ITEM(args, %d)" % j, t) 
+                for j, t in enumerate(arg_types)]
+      dispatch_cases.append("if (%s) { return %s(self, args); }" % \
+                            (" && ".join(["PyTuple_GET_SIZE(args) == %d" % n] + checks), 
+                             entry_name))
+      if backend == 'openmp':
+        count = "PyTuple_GET_ITEM(args, %d)" % n 
+        count_checks = ["PyTuple_GET_SIZE(args) == %d" % (n + 1), 
+                        "(PyInt_Check(%s) || PyLong_Check(%s))" % (count, count)]
+        num_threads_cases.append("if (%s) { return %s(self, args); }" % \
+                                 (" && ".join(count_checks + checks), entry_name))
+
+    entry_sources.append("""
+    PyObject* %(name)s(PyObject* self, PyObject* args) {
+      %(cases)s
+      PyErr_SetString(PyExc_TypeError,
+        "No compiled version of '%(name)s' matches the types and memory layouts of the given arguments");
+      return NULL;
+    }""" % {'name' : name, 'cases' : "\n      ".join(dispatch_cases + num_threads_cases)})
+
+  ordered_function_sources = [_scalar_check_fn] + \
+    [extra_functions[extra_sig] for extra_sig in extra_function_signatures]
+  if pool_allocator.alloc_sig in extra_functions:
+    for (method_name, method_source) in pool_allocator.method_sources:
+      ordered_function_sources.append(method_source)
+      method_names.append(method_name)
+  instrumented = instrumentation.instrumented_entries(extra_function_signatures)
+  if instrumented:
+    ordered_function_sources.append(instrumentation.stats_source(instrumented))
+    method_names.append(instrumentation.stats_method_name)
+  full_src = create_module_source("\n\n".join(entry_sources),
+                                  fn_name = None,
+                                  module_name = module_name,
+                                  method_names = method_names,
+                                  extra_headers = python_headers,
+                                  declarations = declarations,
+                                  extra_function_sources = ordered_function_sources)
+
+  if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+  return compile_module_to_file(full_src, module_name, output_dir,
+                                extra_objects = extra_objects,
+                                extra_compile_flags = extra_compile_flags,
+                                extra_link_flags = extra_link_flags)
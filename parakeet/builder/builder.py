@@ -48,12 +48,13 @@ class Builder(AdverbBuilder, CallBuilder):
     return is_eq 
   
     
-  def parfor(self, fn, bounds):
+  def parfor(self, fn, bounds, tile_sizes = None):
     assert isinstance(bounds, Expr)
     assert isinstance(bounds.type, (TupleT, IntT))
     assert isinstance(fn, Expr)
     assert isinstance(fn.type, (FnT, ClosureT))
-    self.blocks += [ParFor(fn = fn, bounds = bounds)]
+    assert tile_sizes is None or tile_sizes.type == bounds.type
+    self.blocks += [ParFor(fn = fn, bounds = bounds, tile_sizes = tile_sizes)]
   
   def imap(self, fn, bounds):
 
@@ -12,6 +12,9 @@ class BaseCompiler(object):
     self.name_mappings = {}
     self.extra_link_flags = extra_link_flags if extra_link_flags else []
     self.extra_compile_flags = extra_compile_flags if extra_compile_flags else []
+    # when set, returns after an error jump to this label instead  
+    self.error_label = None 
+    self.error_label_used = False 
     
   def add_compile_flag(self, flag):
     if flag not in self.extra_compile_flags:
@@ -147,8 +150,14 @@ class BaseCompiler(object):
     self.name_mappings[ssa_name] = name 
     return name
    
+  def error_return(self):
+    if self.error_label is None:
+      return "return NULL;"
+    self.error_label_used = True 
+    return "goto %s;" % self.error_label 
+  
   def return_if_null(self, obj):
-    self.append("if (!%s) { return NULL; }" % obj)
+    self.append("if (!%s) { %s }" % (obj, self.error_return()))
     
   def not_(self, x):
     if x == "1":
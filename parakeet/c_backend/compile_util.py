@@ -2,10 +2,12 @@ import collections
 import hashlib
 import imp
 import os
+import sys
 
 from tempfile import NamedTemporaryFile
 
 from .. import config as root_config 
+from ..compile_profile import timed
 import config 
 from system_info import (python_lib_dir,  
                          windows,  
@@ -43,12 +45,32 @@ python_headers = core_python_headers + numpy_headers
 global_preprocessor_defs = ["#define NPY_NO_DEPRECATED_API NPY_1_7_API_VERSION"]
 
 
+def load_module(module_name, shared_filename):
+  """
+  Load a compiled extension module. Py_InitModule reuses any module already 
+  registered under the same name, so drop that one first to keep the methods 
+  of an earlier compile (e.g. its stats functions) from showing up in this one 
+  """
+  sys.modules.pop(module_name, None)
+  with timed("load"):
+    return imp.load_dynamic(module_name, shared_filename)
+
 def create_module_source(raw_src, fn_name, 
                             extra_headers = [], 
                             declarations = [], 
                             extra_function_sources = [], 
-                            print_source = None):
-    # when compiling with NVCC, other headers get implicitly included 
+                            print_source = None, 
+                            module_name = None, 
+                            method_names = None):
+  """
+  Wrap the generated C source in a Python extension module. By default the 
+  module is named after its single method fn_name, but a module can export
+  any number of methods (e.g. when compiled ahead of time). 
+  """
+  if module_name is None: module_name = fn_name 
+  if method_names is None: method_names = [fn_name]
+  
+  # when compiling with NVCC, other headers get implicitly included 
   # and cause warnings since Python redefines this constant
   src_lines = list(global_preprocessor_defs) 
   if config.undef_posix_c_source:
@@ -67,20 +89,22 @@ def create_module_source(raw_src, fn_name,
   src_lines.extend(extra_function_sources)
   
   src_lines.append(raw_src)
+  method_defs = "".join("""
+      {"%(method_name)s",  %(method_name)s, METH_VARARGS,
+       "%(method_name)s"},
+  """ % {'method_name' : method_name} for method_name in method_names)
   module_init = """
     \n\n
-    static PyMethodDef %(fn_name)sMethods[] = {
-      {"%(fn_name)s",  %(fn_name)s, METH_VARARGS,
-       "%(fn_name)s"},
-
+    static PyMethodDef %(module_name)sMethods[] = {
+      %(method_defs)s
       {NULL, NULL, 0, NULL}        /* Sentinel */
     };
   
     PyMODINIT_FUNC
-    init%(fn_name)s(void)
+    init%(module_name)s(void)
     {
       //Py_Initialize();
-      Py_InitModule("%(fn_name)s", %(fn_name)sMethods);
+      Py_InitModule("%(module_name)s", %(module_name)sMethods);
       import_array();
     }
   """ % locals()
@@ -145,7 +169,8 @@ def compile_object(src_filename,
     
   compiler_cmd += compiler_flags 
   compiler_cmd += ['-c', src_filename, '-o', object_name]
-  run_cmd(compiler_cmd, label = "Compile source")
+  with timed("compile"):
+    run_cmd(compiler_cmd, label = "Compile source")
   
   return CompiledObject(src_filename = src_filename, 
                         object_filename = object_name, 
@@ -169,7 +194,8 @@ def link_module(compiler, object_name, shared_name,
   env = os.environ.copy()
   if not windows:
     env["LD_LIBRARY_PATH"] = python_lib_dir
-  run_cmd(linker_cmd, env = env, label = "Linking")
+  with timed("link"):
+    run_cmd(linker_cmd, env = env, label = "Linking")
 
 def compile_with_distutils(extension_name, 
                               src_filename,
@@ -207,7 +233,8 @@ def compile_with_distutils(extension_name,
     dist.parse_command_line()
     obj_build_ext = dist.get_command_obj("build_ext")
     
-    dist.run_commands()
+    with timed("compile"):
+      dist.run_commands()
     shared_name = obj_build_ext.get_outputs()[0]
     return shared_name
   
@@ -222,6 +249,7 @@ def compile_module_from_source(
       partial_src, 
       fn_name,
       fn_signature = None,  
+      method_names = None, 
       src_filename = None,
       src_extension = None, 
       declarations = [],
@@ -244,7 +272,8 @@ def compile_module_from_source(
                                  extra_headers = python_headers + extra_headers, 
                                  declarations = declarations,  
                                  extra_function_sources = extra_function_sources, 
-                                 print_source = print_source)
+                                 print_source = print_source, 
+                                 method_names = method_names)
 
   import hashlib
   digest = hashlib.sha224(full_src).hexdigest()
@@ -306,13 +335,18 @@ def compile_module_from_source(
     if print_commands:
       print 'Caching... %s -> %s' % (shared_name, cached_name)
     if not os.path.exists(config.cache_dir):
-      os.makedirs(config.cache_dir)
+      try:
+        os.makedirs(config.cache_dir)
+      except OSError:
+        # another compile job may have just created it
+        if not os.path.isdir(config.cache_dir):
+          raise
     os.rename(shared_name, cached_name)
     shared_name = cached_name
 
   if print_commands:
     print "Loading newly compiled extension module %s..." % shared_name
-  module =  imp.load_dynamic(fn_name, shared_name)
+  module = load_module(fn_name, shared_name)
   
   #on a UNIX-style filesystem it should be OK to delete a file while it's open
   #since the inode will just float untethered from any name
@@ -335,3 +369,45 @@ def compile_module_from_source(
                              fn_signature = fn_signature)
   return compiled_fn
 
+
+def compile_module_to_file(
+      full_src, 
+      module_name, 
+      output_dir, 
+      src_extension = None, 
+      extra_objects = [], 
+      extra_compile_flags = [], 
+      extra_link_flags = [], 
+      print_commands = None, 
+      compiler = None, 
+      compiler_flag_prefix = None, 
+      linker_flag_prefix = None):
+  """
+  Compile the full source of an extension module into a shared library 
+  which can be imported from output_dir as 'module_name', 
+  returns the path of the shared library 
+  """
+  if print_commands is None: print_commands = config.print_commands
+  if src_extension is None: src_extension = get_source_extension()
+  if compiler is None: compiler = get_compiler()
+  
+  src_filename = os.path.join(output_dir, module_name + src_extension)
+  create_source_file(full_src, src_filename = src_filename)
+  compiled_object = compile_object(src_filename,
+                                   fn_name = module_name,
+                                   src_extension = src_extension,
+                                   extra_objects = extra_objects,
+                                   extra_compile_flags = extra_compile_flags,
+                                   print_commands = print_commands,
+                                   compiler = compiler,
+                                   compiler_flag_prefix = compiler_flag_prefix)
+  object_name = compiled_object.object_filename
+  shared_name = os.path.join(output_dir, module_name + shared_extension)
+  link_module(compiler, object_name, shared_name,
+              extra_objects = extra_objects,
+              extra_link_flags = extra_link_flags,
+              linker_flag_prefix = linker_flag_prefix)
+  if config.delete_temp_files:
+    os.remove(object_name)
+    os.remove(src_filename)
+  return shared_name
@@ -7,6 +7,36 @@ opt_level = '-O2'
 # overload the default compiler path  
 compiler_path = None
 
+# free local arrays which don't escape when their scope exits and
+# hand freshly allocated return values over to NumPy
+free_local_arrays = True
+
+# recycle array buffers through a thread-local pool with power-of-two 
+# size classes (starting at 2**pool_min_size_class bytes) instead of
+# going back to malloc on every call
+pool_allocator = True
+pool_min_size_class = 6
+# most bytes kept in free lists, summed over every thread and every 
+# module (see parakeet.trim_allocator_pool to release them early)
+pool_max_retained_bytes = 16 * 2**20
+
+# access arrays which alias analysis shows can't share data with anything 
+# else (or which nothing writes to) through restrict pointers 
+restrict_pointers = True 
+
+# when inputs which get written to might share data with other inputs, 
+# check whether they actually overlap on entry and if they don't run a 
+# version of the function which treats them all as distinct 
+check_input_overlap = True 
+
+##########################
+#    Instrumentation     #
+##########################
+# time the parallel regions and top-level loop nests of each compiled
+# entry point, along with the boxing and unboxing of its arguments 
+# (read the counters back with parakeet.kernel_stats)
+instrument_kernels = False
+
 ##########################
 # Insert Debugging Code  #
 ##########################
@@ -2,11 +2,18 @@ from collections import namedtuple
 import numpy as np 
 
 from .. import names, prims  
+from ..analysis.array_lifetimes import array_lifetimes
+from ..analysis.restrict_analysis import array_aliases, restrict_arrays
 from ..ndtypes import (IntT, FloatT, TupleT, FnT, Type, BoolT, NoneT, Float32, Float64, Bool, 
                        ClosureT, ScalarT, PtrT, NoneType, ArrayT, SliceT, TypeValueT)    
 from ..syntax import (Const, Var,  PrimCall, Attribute, TupleProj, Tuple, ArrayView,
-                      Expr, Closure, TypedFn)
+                      Expr, Closure, TypedFn, Return)
+from ..transforms.vectorize import (accessed_arrays, simd_reductions, unit_stride_axes, 
+                                    written_arrays)
 # from ..syntax.helpers import get_types   
+import config
+import pool_allocator
+import runtime_errors
 import type_mappings
 from base_compiler import BaseCompiler
 
@@ -19,6 +26,12 @@ CompiledFlatFn = namedtuple("CompiledFlatFn",
                              "declarations"))
 
 
+# OpenMP reduction operators for the primitives which Vectorize accumulates with 
+simd_reduction_ops = {prims.add : '+', 
+                      prims.multiply : '*', 
+                      prims.minimum : 'min', 
+                      prims.maximum : 'max'}
+
 # mapping from (field_types, struct_name, field_names) to type names 
 _struct_type_names = {}
 
@@ -30,6 +43,7 @@ class FnCompiler(BaseCompiler):
   def __init__(self,  
                module_entry = False, 
                struct_type_cache = None, 
+               distinct_args = frozenset(), 
                **kwargs):
     BaseCompiler.__init__(self, **kwargs)
     
@@ -49,6 +63,25 @@ class FnCompiler(BaseCompiler):
     # if so, expect some of the methods like visit_Return to be overloaded 
     # to return PyObjects
     self.module_entry = module_entry
+    
+    # local arrays whose buffers get released when their block exits
+    # and, for each open block, the C values allocated so far 
+    self.freeable_arrays = set([])
+    self.owned_returns = set([])
+    self.pending_frees = []
+    
+    # while compiling the SIMD version of a loop, maps the C names of arrays 
+    # to the axes along which they're known to have unit strides 
+    self.unit_strides = {}
+    
+    # inputs which the caller guarantees don't share data with any other input, 
+    # what every array in the function being compiled may share data with, 
+    # and which of them get accessed through restrict pointers (mapped to 
+    # the C names of those pointers once they're declared) 
+    self.distinct_args = frozenset(distinct_args)
+    self.aliases = None 
+    self.restrict_arrays = set([])
+    self.restrict_ptrs = {}
      
   def add_decl(self, decl):
     if decl not in self.declarations:
@@ -162,7 +195,7 @@ class FnCompiler(BaseCompiler):
     nelts = self.fresh_var("npy_intp", "nelts", self.visit_expr(expr.count))
     bytes_per_elt = elt_t.nbytes
     nbytes = self.mul(nelts, bytes_per_elt)#"%s * %d" % (nelts, bytes_per_elt)
-    raw_ptr = "(%s) malloc(%s)" % (type_mappings.to_ctype(expr.type), nbytes)
+    raw_ptr = self.malloc(type_mappings.to_ctype(expr.type), nbytes)
     struct_type = self.to_ctype(expr.type)
     return self.fresh_var(struct_type, "new_ptr", "{%s, NULL}" % raw_ptr)
     
@@ -333,15 +366,23 @@ class FnCompiler(BaseCompiler):
     else:
       assert isinstance(expr.value.type, ArrayT)
       offset = self.fresh_var("int64_t", "offset", "%s.offset" % arr)
+      unit_axes = self.unit_strides.get(arr, ())
+      layout_unit_axis = expr.value.type.unit_stride_dim()
       for i, idx in enumerate(indices):
-        stride = "%s.strides[%d]" % (arr, i)
-        self.append("%s += %s * %s;" % (offset, idx, stride))
-      raw_ptr = "%s.data.raw_ptr" % arr 
+        if i in unit_axes or i == layout_unit_axis:
+          self.append("%s += %s;" % (offset, idx))
+        else:
+          stride = "%s.strides[%d]" % (arr, i)
+          self.append("%s += %s * %s;" % (offset, idx, stride))
+      if expr.value.__class__ is Var and expr.value.name in self.restrict_ptrs:
+        raw_ptr = self.restrict_ptrs[expr.value.name]
+      else:
+        raw_ptr = "%s.data.raw_ptr" % arr 
 
     return "%s[%s]" % (raw_ptr, offset)
   
   def visit_Call(self, expr):
-    fn_name = self.get_fn_name(expr.fn)
+    fn_name = self.get_fn_name(expr.fn, call_args = expr.args)
     closure_args = self.get_closure_args(expr.fn)
     args = self.visit_expr_list(expr.args)
     return "%s(%s)" % (fn_name, ", ".join(tuple(closure_args) + tuple(args)))
@@ -360,7 +401,12 @@ class FnCompiler(BaseCompiler):
 
     if stmt.lhs.__class__ is Var:
       lhs = self.visit_expr(stmt.lhs)
-      return "%s %s = %s;" % (self.to_ctype(stmt.lhs.type), lhs, rhs)
+      if stmt.lhs.name in self.freeable_arrays:
+        self.pending_frees[-1].append((lhs, stmt.lhs.type))
+      decl = "%s %s = %s;" % (self.to_ctype(stmt.lhs.type), lhs, rhs)
+      if stmt.lhs.name in self.restrict_arrays:
+        decl += "\n" + self.restrict_ptr_decl(stmt.lhs.name, lhs, stmt.lhs.type)
+      return decl 
     elif stmt.lhs.__class__ is Tuple:
       struct_value = self.fresh_var(self.to_ctype(stmt.lhs.type), "lhs_tuple")
       self.assign(struct_value, rhs)
@@ -423,9 +469,20 @@ class FnCompiler(BaseCompiler):
     # by default we're running sequentially 
     return "1"
   
+  def visit_ThreadId(self, expr):
+    return "0"
+  
   def visit_Comment(self, stmt):
     return "// " + stmt.text
     
+  def visit_Check(self, stmt):
+    if runtime_errors.error_sig not in self.extra_function_signatures:
+      self.extra_function_signatures.append(runtime_errors.error_sig)
+      self.extra_functions[runtime_errors.error_sig] = runtime_errors.error_source
+    cond = self.visit_expr(stmt.cond)
+    message = stmt.message.replace('\\', '\\\\').replace('"', '\\"')
+    return 'if (!(%s)) { parakeet_set_error(PyExc_%s, "%s"); }' % (cond, stmt.error, message)
+    
   def visit_PrintString(self, stmt):
     self.printf(stmt.text)
     return "// done with printf"
@@ -468,7 +525,10 @@ class FnCompiler(BaseCompiler):
     down_loop = \
         "\nfor (%(var)s = %(start)s; %(var)s > %(stop)s; %(var)s += %(step)s) {%(body)s}"
       
-    if stmt.step.__class__ is Const:
+    if stmt.vectorize and simd_reductions(stmt) is not None:
+      s = s % locals()
+      return s + self.visit_simd_loop(stmt, up_loop % locals())
+    elif stmt.step.__class__ is Const:
       if stmt.step.value >= 0:
         s += up_loop
       else:
@@ -481,9 +541,172 @@ class FnCompiler(BaseCompiler):
       s += "\n}"
     return s % locals()
 
+  def array_extent(self, arr, rank):
+    """
+    Declare pointers to the lowest byte of an array's data and just past its highest byte
+    """
+    lowest = ["(%s.strides[%d] < 0 ? (%s.shape[%d] - 1) * %s.strides[%d] : 0)" % \
+              (arr, i, arr, i, arr, i) for i in xrange(rank)]
+    highest = ["(%s.strides[%d] > 0 ? (%s.shape[%d] - 1) * %s.strides[%d] : 0)" % \
+               (arr, i, arr, i, arr, i) for i in xrange(rank)]
+    # count in bytes, so that the last element's size gets included 
+    # even when views of one buffer aren't aligned to each other 
+    elt_size = "sizeof(*%s.data.raw_ptr)" % arr
+    start = "(char*) (%s.data.raw_ptr + %s.offset)" % (arr, arr)
+    lo = self.fresh_var("char*", "lo", "%s + (%s) * %s" % (start, " + ".join(lowest), elt_size))
+    hi = self.fresh_var("char*", "hi", "%s + (%s) * %s + %s" % \
+                        (start, " + ".join(highest), elt_size, elt_size))
+    return lo, hi
+  
+  def visit_simd_loop(self, stmt, plain_loop):
+    """
+    Run a loop marked by the Vectorize transform under '#pragma omp simd' 
+    when every array it steps through has a unit stride along the loop's axis 
+    and the arrays it writes to don't overlap any of the others, 
+    otherwise fall back on the plain loop 
+    """
+    self.add_compile_flag("-fopenmp-simd")
+    # at -O2 GCC's 'very cheap' cost model leaves min/max reductions 
+    # bouncing through memory 
+    self.add_compile_flag("-fvect-cost-model=dynamic")
+    self.push()
+    conds = []
+    unit_strides = {}
+    arrays = accessed_arrays(stmt)
+    for (name, axes) in sorted(unit_stride_axes(stmt).items()):
+      arr = self.name(name)
+      unit_strides[arr] = axes 
+      # no need to check the stride which the array's layout already fixes 
+      arr_t = arrays[name]
+      layout_unit_axis = arr_t.unit_stride_dim() if isinstance(arr_t, ArrayT) else None
+      conds.extend("%s.strides[%d] == 1" % (arr, axis) 
+                   for axis in sorted(axes) if axis != layout_unit_axis)
+    written = written_arrays(stmt)
+    extents = {}
+    if len(written) > 0 and len(arrays) > 1:
+      for name in sorted(arrays):
+        extents[name] = self.array_extent(self.name(name), arrays[name].rank)
+    for w in sorted(written):
+      for other in sorted(arrays):
+        if other != w and (other not in written or other > w):
+          (w_lo, w_hi), (lo, hi) = extents[w], extents[other]
+          conds.append("(%s <= %s || %s <= %s)" % (w_hi, lo, hi, w_lo))
+    
+    ops = {}
+    for (name, prim) in sorted(simd_reductions(stmt).items()):
+      ops.setdefault(simd_reduction_ops[prim], []).append(self.name(name))
+    pragma = "#pragma omp simd" + \
+      "".join(" reduction(%s:%s)" % (op, ", ".join(names)) for (op, names) in sorted(ops.items()))
+    var = self.visit_expr(stmt.var)
+    start = self.visit_expr(stmt.start)
+    stop = self.visit_expr(stmt.stop)
+    step = self.visit_expr(stmt.step)
+    self.unit_strides = unit_strides 
+    body = self.visit_block(stmt.body)
+    body += self.visit_merge_right(stmt.merge)
+    self.unit_strides = {}
+    body = self.indent("\n" + body)
+    simd_loop = "\n%s\nfor (%s = %s; %s < %s; %s += %s) {%s}" % \
+      (pragma, var, start, var, stop, var, step, body)
+    if len(conds) == 0:
+      self.append(simd_loop)
+    else:
+      self.append("if (%s) {%s\n} else {%s\n}" % \
+                  (" && ".join(conds), self.indent(simd_loop), self.indent(plain_loop)))
+    return self.indent("\n" + self.pop())
+  
+  def analyze_aliasing(self, fn, distinct_args = None):
+    if distinct_args is None:
+      distinct_args = self.distinct_args
+    if config.restrict_pointers:
+      self.aliases = array_aliases(fn, distinct_args)
+      self.restrict_arrays = restrict_arrays(fn, distinct_args)
+    else:
+      self.aliases = None 
+      self.restrict_arrays = set([])
+    self.restrict_ptrs = {}
+  
+  def restrict_ptr_decl(self, name, c_name, t):
+    """
+    Declare a restrict pointer to an array's data, which gets used for 
+    every access to it from then on 
+    """
+    elt_t = self.to_ctype(t.elt_type)
+    ptr = self.fresh_name(c_name + "_data")
+    self.restrict_ptrs[name] = ptr 
+    return "%s* __restrict__ %s = %s.data.raw_ptr;" % (elt_t, ptr, c_name)
+  
+  def declare_restrict_args(self, fn):
+    for name in fn.arg_names:
+      if name in self.restrict_arrays:
+        self.append(self.restrict_ptr_decl(name, self.name(name), fn.type_env[name]))
+  
+  def distinct_params(self, fn, actuals):
+    """
+    Names of a callee's inputs which get arrays that don't share data 
+    with any of its other inputs 
+    """
+    if self.aliases is None:
+      return frozenset()
+    result = []
+    for (i, (param, actual)) in enumerate(zip(fn.arg_names, actuals)):
+      if actual.__class__ is not Var or not isinstance(actual.type, ArrayT):
+        continue
+      aliases = self.aliases.get(actual.name, set([])).union([actual.name])
+      distinct = True 
+      for (j, other) in enumerate(actuals):
+        if j == i or not isinstance(other.type, (ArrayT, PtrT, TupleT, ClosureT)):
+          continue
+        if other.__class__ is not Var or other.name in aliases:
+          distinct = False
+      if distinct:
+        result.append(param)
+    return frozenset(result)
+    
+  def analyze_lifetimes(self, fn):
+    if config.free_local_arrays:
+      lifetimes = array_lifetimes(fn)
+      self.freeable_arrays = lifetimes.freeable()
+      self.owned_returns = lifetimes.owned_returns()
+  
+  def use_pool_allocator(self):
+    if pool_allocator.alloc_sig not in self.extra_function_signatures:
+      self.extra_function_signatures.append(pool_allocator.alloc_sig)
+      self.extra_functions[pool_allocator.alloc_sig] = pool_allocator.pool_source()
+  
+  def malloc(self, ptr_t, nbytes):
+    if config.pool_allocator:
+      self.use_pool_allocator()
+      return "(%s) parakeet_pool_alloc(%s)" % (ptr_t, nbytes)
+    else:
+      return "(%s) malloc(%s)" % (ptr_t, nbytes)
+  
+  def free_stmt(self, c_name, t):
+    if isinstance(t, ArrayT):
+      ptr = "%s.data.raw_ptr" % c_name
+    else:
+      ptr = "%s.raw_ptr" % c_name
+    if config.pool_allocator:
+      return "parakeet_pool_free(%s);" % ptr
+    else:
+      return "free(%s);" % ptr
+  
+  def has_pending_frees(self):
+    return any(len(frees) > 0 for frees in self.pending_frees)
+  
+  def free_all_pending(self):
+    """
+    Release the buffers allocated by every enclosing block 
+    before returning from the function 
+    """
+    for frees in self.pending_frees:
+      for (c_name, t) in frees:
+        self.append(self.free_stmt(c_name, t))
+  
   def visit_Return(self, stmt):
     assert not self.return_by_ref, "Returning multiple values by ref not yet implemented: %s" % stmt
     if self.return_void:
+      self.free_all_pending()
       return "return;"
     elif isinstance(stmt.value, Tuple):
       # if not returning multiple values by reference, then make a struct for them
@@ -491,33 +714,57 @@ class FnCompiler(BaseCompiler):
       result_elts = ", ".join(self.visit_expr(elt) for elt in stmt.value.elts)
       result_value = "{" + result_elts + "}"
       result = self.fresh_var(struct_type, "result", result_value)
+      self.free_all_pending()
       return "return %s;" % result 
     else:
       v = self.visit_expr(stmt.value)
+      if self.has_pending_frees():
+        v = self.fresh_var(self.to_ctype(stmt.value.type), "result", v)
+        self.free_all_pending()
       return "return %s;" % v
   
-
-  
-  def visit_block(self, stmts, push = True):
-    if push: self.push()
+  def visit_stmts(self, stmts):
+    """
+    Append the C code for a block of statements, followed by 
+    the frees of any local arrays it allocated 
+    """
+    self.pending_frees.append([])
     for stmt in stmts:
       s = self.visit_stmt(stmt)
       self.append(s)
+    frees = self.pending_frees.pop()
+    if len(stmts) == 0 or stmts[-1].__class__ is not Return:
+      for (c_name, t) in frees:
+        self.append(self.free_stmt(c_name, t))
     self.append("\n")
+
+  def visit_block(self, stmts, push = True):
+    if push: self.push()
+    self.visit_stmts(stmts)
     return self.indent("\n" + self.pop())
       
   
-  def get_fn_name(self, expr, compiler_kwargs = {}, attributes = [], inline = True):
+  def get_fn_name(self, expr, compiler_kwargs = {}, attributes = [], inline = True, 
+                  call_args = ()):
     if expr.__class__ is  TypedFn:
       fn = expr 
+      closure_args = ()
     elif expr.__class__ is Closure:
       fn = expr.fn 
+      closure_args = tuple(expr.args)
     else:
       assert isinstance(expr.type, (FnT, ClosureT)), \
         "Expected function or closure, got %s : %s" % (expr, expr.type)
       fn = expr.type.fn
-
-    compiler = self.__class__(module_entry = False, **compiler_kwargs)
+      closure_args = None 
+    
+    if closure_args is None:
+      distinct_args = frozenset()
+    else:
+      distinct_args = self.distinct_params(fn, closure_args + tuple(call_args))
+    compiler = self.__class__(module_entry = False, 
+                              distinct_args = distinct_args, 
+                              **compiler_kwargs)
     compiled = compiler.compile_flat_source(fn, attributes = attributes, inline = inline)
     
     if compiled.sig not in self.extra_function_signatures:
@@ -615,7 +862,11 @@ class FnCompiler(BaseCompiler):
       self.return_by_ref = False 
     args_str = ", ".join("%s %s" % (t, name) for (t,name) in zip(arg_types,arg_names))
     
-    body_str = self.visit_block(fn.body) 
+    self.analyze_lifetimes(fn)
+    self.analyze_aliasing(fn)
+    self.push()
+    self.declare_restrict_args(fn)
+    body_str = self.visit_block(fn.body, push = False) 
     
     if inline:
       # "__attribute__((always_inline))",
@@ -644,7 +895,10 @@ class FnCompiler(BaseCompiler):
     
     # include your own class in the cache key so that we get distinct code 
     # for derived compilers like OpenMP and CUDA 
-    key = parakeet_fn.cache_key, frozenset(struct_types), self.cache_key, tuple(attributes)
+    # buffers allocated from the pool have to be released to it, so don't mix
+    # code compiled with and without the pool allocator 
+    key = parakeet_fn.cache_key, frozenset(struct_types), self.cache_key, tuple(attributes), \
+          config.pool_allocator, config.restrict_pointers, self.distinct_args
     
     if key in self._flat_compile_cache:
       return self._flat_compile_cache[key]
@@ -0,0 +1,140 @@
+"""
+Timers and counters compiled into extension modules when
+config.instrument_kernels is set. Each entry point counts its calls along
+with the total time it ran and the time it spent unboxing arguments and boxing
+its result. Every parallel region (ParFor, IndexReduce, IndexScan, IndexFilter,
+IndexFilterReduce) and every top-level loop nest of the entry function also
+counts its calls, its iterations (of the outermost loop) and its elapsed time on
+a monotonic clock.
+
+The counters of every entry point in a module can be read through the
+module's parakeet_kernel_stats method, or with kernel_stats(fn) for the
+entry points compiled for a jit function.
+"""
+
+clock_sig = "int64_t parakeet_clock_ns(void)"
+clock_source = """
+#include <time.h>
+
+typedef struct parakeet_region_counters {
+  const char* name;
+  int64_t calls;
+  int64_t iterations;
+  int64_t elapsed_ns;
+} parakeet_region_counters;
+
+typedef struct parakeet_entry_counters {
+  int64_t calls;
+  int64_t elapsed_ns;
+  int64_t unboxing_ns;
+  int64_t boxing_ns;
+  int64_t n_regions;
+  parakeet_region_counters* regions;
+} parakeet_entry_counters;
+
+static int64_t parakeet_clock_ns(void) {
+  struct timespec ts;
+  clock_gettime(CLOCK_MONOTONIC, &ts);
+  return (int64_t) ts.tv_sec * 1000000000LL + ts.tv_nsec;
+}
+
+static PyObject* parakeet_counters_to_dict(parakeet_entry_counters* counters) {
+  int64_t i;
+  PyObject* regions = PyList_New(counters->n_regions);
+  if (!regions) { return NULL; }
+  for (i = 0; i < counters->n_regions; ++i) {
+    parakeet_region_counters* region = &counters->regions[i];
+    PyObject* region_dict = Py_BuildValue("{s:s,s:L,s:L,s:d}",
+      "name", region->name,
+      "calls", (long long) region->calls,
+      "iterations", (long long) region->iterations,
+      "time", region->elapsed_ns / 1e9);
+    if (!region_dict) { Py_DECREF(regions); return NULL; }
+    PyList_SET_ITEM(regions, i, region_dict);
+  }
+  return Py_BuildValue("{s:L,s:d,s:d,s:d,s:N}",
+    "calls", (long long) counters->calls,
+    "time", counters->elapsed_ns / 1e9,
+    "unboxing", counters->unboxing_ns / 1e9,
+    "boxing", counters->boxing_ns / 1e9,
+    "regions", regions);
+}"""
+
+stats_method_name = "parakeet_kernel_stats"
+
+_counters_sig_prefix = "parakeet_entry_counters "
+_counters_sig_suffix = "_counters"
+
+def counters_name(entry_name):
+  return entry_name + _counters_sig_suffix
+
+def counters_sig(entry_name):
+  return _counters_sig_prefix + counters_name(entry_name)
+
+def counters_source(entry_name, region_names):
+  """
+  Zeroed counters for an entry point and the regions of its body
+  """
+  n = len(region_names)
+  # C doesn't allow empty arrays
+  region_inits = ", ".join('{"%s", 0, 0, 0}' % name for name in region_names) or '{"", 0, 0, 0}'
+  return """
+static parakeet_region_counters %(name)s_regions[%(size)d] = {%(inits)s};
+static parakeet_entry_counters %(name)s_counters = {0, 0, 0, 0, %(n)d, %(name)s_regions};
+""" % {'name' : entry_name, 'size' : max(n, 1), 'inits' : region_inits, 'n' : n}
+
+def instrumented_entries(extra_function_signatures):
+  return [sig[len(_counters_sig_prefix):-len(_counters_sig_suffix)]
+          for sig in extra_function_signatures
+          if sig.startswith(_counters_sig_prefix)]
+
+def stats_source(entry_names):
+  """
+  Module method which returns a dictionary mapping the name of
+  each instrumented entry point to its counters
+  """
+  adds = "".join("""
+  entry = parakeet_counters_to_dict(&%(counters)s);
+  if (!entry) { Py_DECREF(result); return NULL; }
+  PyDict_SetItemString(result, "%(name)s", entry);
+  Py_DECREF(entry);""" % {'counters' : counters_name(name), 'name' : name}
+                 for name in entry_names)
+  return """
+static PyObject* parakeet_kernel_stats(PyObject* self, PyObject* args) {
+  PyObject* entry;
+  PyObject* result = PyDict_New();
+  if (!result) { return NULL; }
+  %s
+  return result;
+}""" % adds
+
+# compiled entry points mapped to the stats function of the
+# extension module they live in
+_stats_fns = {}
+
+def register(c_fn, module):
+  stats_fn = getattr(module, stats_method_name, None)
+  if stats_fn is not None:
+    _stats_fns[c_fn] = stats_fn
+
+def kernel_stats(fn = None):
+  """
+  Counters of every instrumented entry point or, if given a jit function,
+  of just the entry points compiled for it. Returns a list of dictionaries
+  with the calls of each entry point, its total, unboxing and boxing times
+  (in seconds) and the calls, iterations and time of each of its regions.
+  """
+  if fn is None:
+    entries = _stats_fns.items()
+  else:
+    entries = [(entry.c_fn, _stats_fns[entry.c_fn])
+               for entry in fn.dispatch_cache.itervalues()
+               if entry.c_fn in _stats_fns]
+  result = []
+  for (c_fn, stats_fn) in entries:
+    name = c_fn.__name__
+    stats = stats_fn().get(name)
+    if stats is not None:
+      stats['function'] = name
+      result.append(stats)
+  return result
@@ -0,0 +1,281 @@
+"""
+Thread-local pool of freed array buffers, compiled into every extension
+module which allocates arrays. Buffers are rounded up to a power-of-two size
+class and, when released, go back onto that class's free list (as long as the
+process isn't already holding on to too many bytes) so that the next call with
+the same shapes can reuse them without going through malloc or faulting in new
+pages.
+
+Each block is preceded by a small header recording its size class, so buffers
+handed over to NumPy have to be released with parakeet_pool_release
+rather than plain free. A thread's free lists are emptied when it exits, 
+and trim_allocator_pool empties every thread's lists (including those of 
+OpenMP workers, which never exit). 
+
+The limit config.pool_max_retained_bytes applies to the whole process: 
+every module loaded by Parakeet counts its free lists against one shared
+total (modules compiled ahead of time count against their own). 
+"""
+
+import ctypes 
+
+import config
+
+alloc_sig = "void* parakeet_pool_alloc(int64_t nbytes)"
+free_sig = "void parakeet_pool_free(void* ptr)"
+stats_method_name = "parakeet_pool_stats"
+trim_method_name = "parakeet_pool_trim"
+share_method_name = "parakeet_pool_share"
+
+def pool_source():
+  return """
+#include <pthread.h>
+
+#define PARAKEET_POOL_MIN_CLASS %(min_class)d
+#define PARAKEET_POOL_N_CLASSES 40
+#define PARAKEET_POOL_MAX_RETAINED %(max_retained)dLL
+/* not static, since the (extern) inline functions which allocate arrays 
+   aren't allowed to call static functions */
+#define PARAKEET_POOL_FN __attribute__((visibility("hidden")))
+
+typedef struct parakeet_block_header {
+  struct parakeet_block_header* next;
+  int64_t size_class;
+} parakeet_block_header;
+
+/* the only other thread which touches a thread's pool is one trimming it, 
+   so the lock is almost never contended */
+typedef struct parakeet_thread_pool {
+  parakeet_block_header* bins[PARAKEET_POOL_N_CLASSES];
+  int64_t retained;
+  int lock;
+  int registered;
+  struct parakeet_thread_pool* prev;
+  struct parakeet_thread_pool* next;
+} parakeet_thread_pool;
+
+static __thread parakeet_thread_pool parakeet_pool_local;
+
+/* every thread which holds on to buffers, so that they can be trimmed */
+static parakeet_thread_pool* parakeet_pool_threads = NULL;
+static int parakeet_pool_threads_lock = 0;
+
+/* only used to get a destructor called at thread exit */ 
+static pthread_key_t parakeet_pool_key;
+static pthread_once_t parakeet_pool_key_once = PTHREAD_ONCE_INIT;
+
+static int64_t parakeet_pool_hits = 0;
+static int64_t parakeet_pool_misses = 0;
+static int64_t parakeet_pool_retained = 0;
+/* bytes retained across every module sharing the limit */
+static int64_t* parakeet_pool_total = &parakeet_pool_retained;
+
+PARAKEET_POOL_FN void parakeet_pool_lock(int* lock) {
+  while (__sync_lock_test_and_set(lock, 1)) { }
+}
+
+PARAKEET_POOL_FN void parakeet_pool_unlock(int* lock) {
+  __sync_lock_release(lock);
+}
+
+/* free every buffer in a thread's pool and return how many bytes that was */
+PARAKEET_POOL_FN int64_t parakeet_pool_empty(parakeet_thread_pool* pool) {
+  int64_t size_class, nbytes;
+  parakeet_block_header* block;
+  parakeet_pool_lock(&pool->lock);
+  for (size_class = 0; size_class < PARAKEET_POOL_N_CLASSES; size_class++) {
+    while ((block = pool->bins[size_class])) {
+      pool->bins[size_class] = block->next;
+      free(block);
+    }
+  }
+  nbytes = pool->retained;
+  pool->retained = 0;
+  parakeet_pool_unlock(&pool->lock);
+  __sync_fetch_and_sub(&parakeet_pool_retained, nbytes);
+  if (parakeet_pool_total != &parakeet_pool_retained) {
+    __sync_fetch_and_sub(parakeet_pool_total, nbytes);
+  }
+  return nbytes;
+}
+
+PARAKEET_POOL_FN void parakeet_pool_thread_exit(void* unused) {
+  parakeet_thread_pool* pool = &parakeet_pool_local;
+  parakeet_pool_lock(&parakeet_pool_threads_lock);
+  if (pool->prev) { pool->prev->next = pool->next; } 
+  else { parakeet_pool_threads = pool->next; }
+  if (pool->next) { pool->next->prev = pool->prev; }
+  parakeet_pool_unlock(&parakeet_pool_threads_lock);
+  parakeet_pool_empty(pool);
+}
+
+PARAKEET_POOL_FN void parakeet_pool_make_key(void) {
+  pthread_key_create(&parakeet_pool_key, parakeet_pool_thread_exit);
+}
+
+PARAKEET_POOL_FN void parakeet_pool_register(parakeet_thread_pool* pool) {
+  /* destructors only run for threads with a non-NULL value */
+  pthread_once(&parakeet_pool_key_once, parakeet_pool_make_key);
+  pthread_setspecific(parakeet_pool_key, (void*) 1);
+  parakeet_pool_lock(&parakeet_pool_threads_lock);
+  pool->prev = NULL;
+  pool->next = parakeet_pool_threads;
+  if (pool->next) { pool->next->prev = pool; }
+  parakeet_pool_threads = pool;
+  parakeet_pool_unlock(&parakeet_pool_threads_lock);
+  pool->registered = 1;
+}
+
+PARAKEET_POOL_FN int64_t parakeet_pool_trim_all(void) {
+  int64_t nbytes = 0;
+  parakeet_thread_pool* pool;
+  parakeet_pool_lock(&parakeet_pool_threads_lock);
+  for (pool = parakeet_pool_threads; pool; pool = pool->next) {
+    nbytes += parakeet_pool_empty(pool);
+  }
+  parakeet_pool_unlock(&parakeet_pool_threads_lock);
+  return nbytes;
+}
+
+PARAKEET_POOL_FN void* parakeet_pool_alloc(int64_t nbytes) {
+  int64_t size_class = PARAKEET_POOL_MIN_CLASS;
+  parakeet_thread_pool* pool = &parakeet_pool_local;
+  parakeet_block_header* block = NULL;
+  while (size_class < PARAKEET_POOL_N_CLASSES && ((int64_t) 1 << size_class) < nbytes) {
+    size_class++;
+  }
+  if (size_class < PARAKEET_POOL_N_CLASSES && pool->bins[size_class]) {
+    parakeet_pool_lock(&pool->lock);
+    block = pool->bins[size_class];
+    if (block) {
+      pool->bins[size_class] = block->next;
+      pool->retained -= (int64_t) 1 << size_class;
+    }
+    parakeet_pool_unlock(&pool->lock);
+  }
+  if (block) {
+    __sync_fetch_and_sub(&parakeet_pool_retained, (int64_t) 1 << size_class);
+    if (parakeet_pool_total != &parakeet_pool_retained) {
+      __sync_fetch_and_sub(parakeet_pool_total, (int64_t) 1 << size_class);
+    }
+    __sync_fetch_and_add(&parakeet_pool_hits, 1);
+  } else {
+    __sync_fetch_and_add(&parakeet_pool_misses, 1);
+    if (size_class < PARAKEET_POOL_N_CLASSES) {
+      block = (parakeet_block_header*) malloc(sizeof(parakeet_block_header) + ((int64_t) 1 << size_class));
+    } else {
+      block = (parakeet_block_header*) malloc(sizeof(parakeet_block_header) + nbytes);
+    }
+    if (!block) { return NULL; }
+    block->size_class = size_class;
+  }
+  return (void*) (block + 1);
+}
+
+PARAKEET_POOL_FN void parakeet_pool_free(void* ptr) {
+  parakeet_thread_pool* pool = &parakeet_pool_local;
+  parakeet_block_header* block;
+  int64_t nbytes;
+  if (!ptr) { return; }
+  block = ((parakeet_block_header*) ptr) - 1;
+  if (block->size_class < PARAKEET_POOL_N_CLASSES) {
+    nbytes = (int64_t) 1 << block->size_class;
+    /* reserve the bytes against the limit before keeping the buffer */
+    if (__sync_add_and_fetch(parakeet_pool_total, nbytes) <= PARAKEET_POOL_MAX_RETAINED) {
+      if (parakeet_pool_total != &parakeet_pool_retained) {
+        __sync_fetch_and_add(&parakeet_pool_retained, nbytes);
+      }
+      if (!pool->registered) {
+        parakeet_pool_register(pool);
+      }
+      parakeet_pool_lock(&pool->lock);
+      block->next = pool->bins[block->size_class];
+      pool->bins[block->size_class] = block;
+      pool->retained += nbytes;
+      parakeet_pool_unlock(&pool->lock);
+      return;
+    }
+    __sync_fetch_and_sub(parakeet_pool_total, nbytes);
+  }
+  free(block);
+}
+
+PARAKEET_POOL_FN void parakeet_pool_release(void* ptr) {
+  if (ptr) { free(((parakeet_block_header*) ptr) - 1); }
+}""" % {'min_class' : config.pool_min_size_class,
+        'max_retained' : config.pool_max_retained_bytes}
+
+stats_source = """
+static PyObject* parakeet_pool_stats(PyObject* self, PyObject* args) {
+  return Py_BuildValue("(LLL)",
+                       (long long) parakeet_pool_hits,
+                       (long long) parakeet_pool_misses,
+                       (long long) parakeet_pool_retained);
+}"""
+
+trim_source = """
+static PyObject* parakeet_pool_trim(PyObject* self, PyObject* args) {
+  return Py_BuildValue("L", (long long) parakeet_pool_trim_all());
+}"""
+
+share_source = """
+static PyObject* parakeet_pool_share(PyObject* self, PyObject* args) {
+  long long address;
+  int64_t* total;
+  if (!PyArg_ParseTuple(args, "L", &address)) { return NULL; }
+  total = (int64_t*) address;
+  if (parakeet_pool_total != total) {
+    /* only called right after loading, before any buffers get retained */
+    __sync_fetch_and_add(total, parakeet_pool_retained);
+    parakeet_pool_total = total;
+  }
+  Py_RETURN_NONE;
+}"""
+
+# Python methods of every extension module which uses the pool 
+method_sources = [(stats_method_name, stats_source), 
+                  (trim_method_name, trim_source), 
+                  (share_method_name, share_source)]
+
+# bytes held in the free lists of every module sharing this total
+_shared_retained = ctypes.c_int64(0)
+
+# compiled entry points mapped to the stats and trim functions of the
+# extension module they live in
+_stats_fns = {}
+_trim_fns = {}
+
+def register(c_fn, module):
+  stats_fn = getattr(module, stats_method_name, None)
+  if stats_fn is not None:
+    _stats_fns[c_fn] = stats_fn
+    _trim_fns[c_fn] = getattr(module, trim_method_name)
+    getattr(module, share_method_name)(ctypes.addressof(_shared_retained))
+
+def allocator_stats(fn = None):
+  """
+  Count how many array allocations were served from the buffer pool (hits)
+  and how many had to go to malloc (misses), along with the number of bytes
+  currently held in free lists. If given a jit function, only count the
+  entry points compiled for it, otherwise count every compiled module.
+  """
+  if fn is None:
+    stats_fns = _stats_fns.values()
+  else:
+    stats_fns = [_stats_fns[entry.c_fn] for entry in fn.dispatch_cache.itervalues()
+                 if entry.c_fn in _stats_fns]
+  result = {'hits' : 0, 'misses' : 0, 'retained_bytes' : 0}
+  # entry points compiled into the same module share a pool
+  for stats_fn in set(stats_fns):
+    hits, misses, retained = stats_fn()
+    result['hits'] += hits
+    result['misses'] += misses
+    result['retained_bytes'] += retained
+  return result
+
+def trim_allocator_pool():
+  """
+  Free the buffers held in the pools of every thread in every compiled
+  module, returns how many bytes were released
+  """
+  return sum(trim_fn() for trim_fn in set(_trim_fns.values()))
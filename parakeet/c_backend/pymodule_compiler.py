@@ -1,5 +1,8 @@
 from ..analysis import use_count
-from ..syntax import Tuple,  Expr
+from ..analysis.restrict_analysis import indexes_in_loop, written_inputs
+from .. import names
+from ..syntax import (Tuple,  Expr, Var, Assign, ExprStmt, Return, ForLoop, While, SourceStmt,
+                      ParFor, IndexReduce, IndexScan, IndexFilter, IndexFilterReduce)
  
 from ..ndtypes import (TupleT,  ArrayT, 
                        NoneT, NoneType,  
@@ -12,10 +15,14 @@ from ..ndtypes import (TupleT,  ArrayT,
                        SliceT, ptr_type)
  
 
+import instrumentation
+import pool_allocator
+import runtime_errors
 import type_mappings
 from fn_compiler import FnCompiler
 from compile_util import compile_module_from_source
 from .. import config as root_config 
+from ..compile_profile import timed
 import config 
 
 def attr_from_kwargs(obj, kwargs, attr, value = None):
@@ -43,6 +50,12 @@ class PyModuleCompiler(FnCompiler):
     attr_from_kwargs(self, kwargs, 'linker_flag_prefix')  
     attr_from_kwargs(self, kwargs, 'src_extension')
     FnCompiler.__init__(self, module_entry = module_entry, *args, **kwargs)
+    # name of the entry point's counters if it's being instrumented 
+    self.entry_counters = None
+    self.region_names = []
+    self.instrument_regions = False
+    # methods defined among the extra functions which the module should export 
+    self.extra_method_names = []
     
   def unbox_scalar(self, x, t, target = None):
     assert isinstance(t, ScalarT), "Expected scalar type, got %s" % t
@@ -160,10 +173,13 @@ class PyModuleCompiler(FnCompiler):
     unboxed_elts = self.tuple_elts(x, elt_types)
     boxed_elts = [self.box(elt, elt_t) for elt, elt_t in zip(unboxed_elts, elt_types)]
     n = len(boxed_elts)
-    if n == 0:
-      return "PyTuple_Pack(0)"
-    else:
-      return "PyTuple_Pack(%d, %s)" % (n, ", ".join(boxed_elts))
+    # PyTuple_Pack would take new references to the freshly boxed elements,
+    # so instead let the tuple steal them
+    result = self.fresh_var("PyObject*", "boxed_tuple", "PyTuple_New(%d)" % n)
+    self.return_if_null(result)
+    for i, boxed_elt in enumerate(boxed_elts):
+      self.append("PyTuple_SET_ITEM(%s, %d, (PyObject*) %s);" % (result, i, boxed_elt))
+    return result
   
   def box_slice(self, x, t):
     start = self.box("%s.start" % x, t.start_type)
@@ -489,20 +505,26 @@ class PyModuleCompiler(FnCompiler):
   
   def alloc_array(self, array_t, shape_expr):
     if isinstance(shape_expr.type, ScalarT):
-      dim = self.visit_expr(shape_expr)
-      nelts = dim 
-      shape_elts = [dim]
-      ndims = 1 
+      shape_elts = [self.visit_expr(shape_expr)]
     else:
       shape = self.visit_expr(shape_expr)
-      ndims = array_t.rank
-      shape_elts = ["%s.elt%d" % (shape, i) for i in xrange(ndims)]
+      shape_elts = ["%s.elt%d" % (shape, i) for i in xrange(array_t.rank)]
+    return self.alloc_array_of_dims(array_t, shape_elts)
+  
+  def alloc_array_of_dims(self, array_t, shape_elts):
+    """
+    Allocate an array given the C expressions for each of its dimensions
+    """
+    ndims = len(shape_elts)
+    if ndims == 1:
+      nelts = shape_elts[0]
+    else:
       nelts = self.fresh_var("int64_t", "nelts", " * ".join(shape_elts))
     bytes_per_elt = array_t.elt_type.dtype.itemsize
     typename = self.to_ctype(array_t)
     result = self.fresh_var(typename, "new_array")
     raw_ptr_t = self.to_ctype(array_t.elt_type) + "*"
-    self.setfield(result, "data.raw_ptr", "(%s) malloc(%s * %s)" % (raw_ptr_t, nelts, bytes_per_elt) )
+    self.setfield(result, "data.raw_ptr", self.malloc(raw_ptr_t, "%s * %s" % (nelts, bytes_per_elt)))
     self.setfield(result, "data.base", "(PyObject*) NULL")
     self.setfield(result, "offset", "0")
     self.setfield(result, "size", nelts)
@@ -661,9 +683,57 @@ class PyModuleCompiler(FnCompiler):
     v = self.visit_expr(expr.value) 
     return self.attribute(v, attr, expr.type)
   
+  def give_ownership(self, arr):
+    """
+    Wrap a freshly allocated buffer in a capsule which frees it once
+    the boxed NumPy array (the capsule's only owner) is collected 
+    """
+    sig = "void parakeet_free_capsule(PyObject* capsule)"
+    if sig not in self.extra_function_signatures:
+      self.extra_function_signatures.append(sig)
+      if config.pool_allocator:
+        self.use_pool_allocator()
+        release = "parakeet_pool_release"
+      else:
+        release = "free"
+      self.extra_functions[sig] = """
+static void parakeet_free_capsule(PyObject* capsule) {
+  %s(PyCapsule_GetPointer(capsule, NULL));
+}""" % release
+    self.append("""
+      if (%(arr)s.data.raw_ptr && !%(arr)s.data.base) { 
+        %(arr)s.data.base = PyCapsule_New(%(arr)s.data.raw_ptr, NULL, parakeet_free_capsule); 
+      }""" % locals())
+  
   def visit_Return(self, stmt):
     if self.module_entry:
+      if self.entry_counters:
+        box_start = self.fresh_var("int64_t", "box_start", "parakeet_clock_ns()")
+      if stmt.value.__class__ is Tuple:
+        components = stmt.value.elts
+      else:
+        components = [stmt.value]
+      owned = [self.visit_expr(elt) for elt in components 
+               if elt.__class__ is Var and elt.name in self.owned_returns]
+      for arr in owned:
+        self.give_ownership(arr)
       v = self.as_pyobj(stmt.value)
+      # the boxed arrays hold their own references to the capsules 
+      for arr in owned:
+        self.append("Py_XDECREF(%s.data.base);" % arr)
+      self.before_module_return()
+      if self.entry_counters:
+        v = self.fresh_var("PyObject*", "result", "(PyObject*) %s" % v)
+        box_stop = self.fresh_var("int64_t", "box_stop", "parakeet_clock_ns()")
+        self.add_to_counter("boxing_ns", "%s - %s" % (box_stop, box_start))
+        self.add_to_counter("elapsed_ns", "%s - %s" % (box_stop, self.entry_start))
+        self.add_to_counter("calls", "1")
+      if self.has_pending_frees():
+        v = self.fresh_var("PyObject*", "result", "(PyObject*) %s" % v)
+        self.free_all_pending()
+      if runtime_errors.error_sig in self.extra_function_signatures:
+        v = self.fresh_var("PyObject*", "result", "(PyObject*) %s" % v)
+        self.append(runtime_errors.raise_if_error(v))
       if config.debug: 
         self.print_pyobj_type(v, "Return type: ")
         self.print_pyobj(v, "Return value: ")
@@ -673,12 +743,90 @@ class PyModuleCompiler(FnCompiler):
   
   def visit_block(self, stmts, push = True):
     if push: self.push()
-    for stmt in stmts:
-      s = self.visit_stmt(stmt)
-      self.append(s)
-    self.append("\n")
+    self.visit_stmts(stmts)
     return self.pop()
   
+  def add_to_counter(self, field, value, region = None):
+    counters = self.entry_counters 
+    if region is not None:
+      counters = "%s.regions[%d]" % (counters, region)
+    self.append("__sync_fetch_and_add(&%s.%s, %s);" % (counters, field, value))
+  
+  def region_name(self, stmt):
+    """
+    If a statement of the entry function is a parallel region or a loop nest, 
+    return a name for it along with its loop (or adverb), otherwise None 
+    """
+    c = stmt.__class__
+    if c is Assign:
+      node = stmt.rhs 
+    elif c is ExprStmt:
+      node = stmt.value 
+    else:
+      node = stmt 
+    if node.__class__ not in (ParFor, IndexReduce, IndexScan, IndexFilter, IndexFilterReduce, 
+                              ForLoop, While):
+      return None 
+    name = node.__class__.__name__
+    source_info = getattr(stmt, 'source_info', None) or getattr(node, 'source_info', None)
+    if source_info is not None and source_info.line is not None:
+      name += " at line %d of %s" % (source_info.line, source_info.function) 
+    return name, node  
+  
+  def n_iterations(self, shape_expr):
+    if isinstance(shape_expr.type, TupleT):
+      shape = self.visit_expr(shape_expr)
+      dims = ["%s.elt%d" % (shape, i) for i in xrange(len(shape_expr.type.elt_types))]
+      return " * ".join(["((int64_t) 1)"] + dims)
+    else:
+      return self.visit_expr(shape_expr)
+  
+  def visit_region(self, stmt, name, node):
+    """
+    Time a statement of the entry function and count the iterations
+    of its outermost loop 
+    """
+    region = len(self.region_names)
+    self.region_names.append(name)
+    if node.__class__ is ParFor:
+      iterations = self.n_iterations(node.bounds)
+    elif node.__class__ in (IndexReduce, IndexScan, IndexFilter, IndexFilterReduce):
+      iterations = self.n_iterations(node.shape)
+    else:
+      iterations = self.fresh_var("int64_t", "iterations", "0")
+      members = dict(stmt.iteritems())
+      members['body'] = [SourceStmt("++%s;" % iterations)] + stmt.body
+      stmt = stmt.__class__(**members)
+    start = self.fresh_var("int64_t", "region_start", "parakeet_clock_ns()")
+    self.instrument_regions = False 
+    self.append(FnCompiler.visit_stmt(self, stmt))
+    self.instrument_regions = True 
+    self.add_to_counter("elapsed_ns", "parakeet_clock_ns() - %s" % start, region)
+    self.add_to_counter("iterations", iterations, region)
+    self.add_to_counter("calls", "1", region)
+    return ""
+  
+  def visit_stmt(self, stmt):
+    if self.instrument_regions:
+      if stmt.__class__ is Return and \
+         stmt.value.__class__ in (IndexReduce, IndexScan, IndexFilter, IndexFilterReduce):
+        # time the region separately from boxing its result 
+        result = Var(names.fresh("region_result"), type = stmt.value.type)
+        self.append(self.visit_stmt(Assign(lhs = result, rhs = stmt.value)))
+        return self.visit_stmt(Return(value = result))
+      region = self.region_name(stmt)
+      if region is not None:
+        name, node = region 
+        return self.visit_region(stmt, name, node)
+    return FnCompiler.visit_stmt(self, stmt)
+  
+  def use_instrumentation(self, c_fn_name):
+    if instrumentation.clock_sig not in self.extra_function_signatures:
+      self.extra_function_signatures.append(instrumentation.clock_sig)
+      self.extra_functions[instrumentation.clock_sig] = instrumentation.clock_source
+    self.entry_counters = instrumentation.counters_name(c_fn_name)
+    self.entry_start = self.fresh_var("int64_t", "entry_start", "parakeet_clock_ns()")
+  
   
   def enter_module_body(self):
     """
@@ -690,18 +838,86 @@ class PyModuleCompiler(FnCompiler):
   def exit_module_body(self):
     pass 
   
-  def visit_fn(self, fn):
+  def before_module_return(self):
+    """
+    Called at each return from the module entry, once its result 
+    has been computed but before it's returned  
+    """
+    pass 
+  
+  def visit_error_exit(self):
+    """
+    Errors raised in the body of the module entry jump here, so that 
+    they also go through before_module_return on their way out
+    """
+    self.push()
+    self.append("%s: ;" % self.error_label)
+    self.before_module_return()
+    self.append("return NULL;")
+    return self.pop()
+  
+  def overlap_checks(self, fn, uses):
+    """
+    Pairs of array inputs which might share data, where one of them gets 
+    written to by the entry function or anything it calls. If they turn out
+    not to overlap at runtime, the body can treat every input as distinct. 
+    Only worth compiling the body twice if it has loops over array elements. 
+    """
+    if not config.check_input_overlap or not config.restrict_pointers or \
+       self.entry_counters or not indexes_in_loop(fn):
+      return []
+    inputs = [name for name in fn.arg_names 
+              if isinstance(fn.type_env[name], ArrayT) and uses[name] > 1]
+    written = written_inputs(fn)
+    pairs = []
+    for (i, x) in enumerate(inputs):
+      for y in inputs[i+1:]:
+        if (x in written or y in written) and y in self.aliases.get(x, ()):
+          pairs.append((x, y))
+    return pairs
+  
+  def visit_distinct_inputs_dispatch(self, fn, pairs):
+    conds = []
+    for (x, y) in pairs:
+      x_lo, x_hi = self.array_extent(self.name(x), fn.type_env[x].rank)
+      y_lo, y_hi = self.array_extent(self.name(y), fn.type_env[y].rank)
+      conds.append("(%s <= %s || %s <= %s)" % (x_hi, y_lo, y_hi, x_lo))
+    inputs = frozenset(name for name in fn.arg_names 
+                       if isinstance(fn.type_env[name], ArrayT))
+    self.comment("Inputs which don't overlap get compiled as distinct arrays")
+    self.analyze_aliasing(fn, inputs)
+    self.push()
+    self.declare_restrict_args(fn)
+    distinct_body = self.visit_block(fn.body, push = False)
+    self.analyze_aliasing(fn)
+    self.push()
+    self.declare_restrict_args(fn)
+    overlapping_body = self.visit_block(fn.body, push = False)
+    self.append("if (%s) {\n%s\n} else {\n%s\n}" % \
+                (" && ".join(conds), distinct_body, overlapping_body))
+  
+  def visit_fn(self, fn, c_fn_name = None):
     if config.print_input_ir:
       print "=== Compiling to C with %s (entry function) ===" % self.__class__.__name__ 
       print fn
-    c_fn_name = self.fresh_name(fn.name)
+    if c_fn_name is None:
+      c_fn_name = self.fresh_name(fn.name)
     uses = use_count(fn)
+    self.analyze_lifetimes(fn)
+    self.analyze_aliasing(fn)
     self.push()
     
     
     dummy = self.fresh_name("dummy")
     args = self.fresh_name("args")
     
+    # the arguments tuple and how many of its leading elements are inputs
+    self.entry_args = args
+    self.n_entry_args = len(fn.arg_names)
+
+    if config.instrument_kernels:
+      self.use_instrumentation(c_fn_name)
+    
     if config.debug: 
       self.newline()
       self.printf("\\nStarting %s : %s..." % (c_fn_name, fn.type))
@@ -731,9 +947,31 @@ class PyModuleCompiler(FnCompiler):
         self.name_mappings[argname] = var
       
 
+    if self.entry_counters:
+      self.add_to_counter("unboxing_ns", "parakeet_clock_ns() - %s" % self.entry_start)
+      self.instrument_regions = True 
+    
     self.enter_module_body()
-    c_body = self.visit_block(fn.body, push=False)
+    self.error_label = self.fresh_name("error")
+    overlap_checks = self.overlap_checks(fn, uses)
+    if len(overlap_checks) > 0:
+      self.visit_distinct_inputs_dispatch(fn, overlap_checks)
+      c_body = self.pop()
+    else:
+      self.declare_restrict_args(fn)
+      c_body = self.visit_block(fn.body, push=False)
+    if self.error_label_used:
+      c_body += "\n" + self.visit_error_exit()
+    self.error_label = None 
+    self.error_label_used = False 
     self.exit_module_body()
+    
+    if self.entry_counters:
+      self.instrument_regions = False 
+      counters_sig = instrumentation.counters_sig(c_fn_name)
+      self.extra_function_signatures.append(counters_sig)
+      self.extra_functions[counters_sig] = \
+        instrumentation.counters_source(c_fn_name, self.region_names)
     c_body = self.indent(c_body )
     c_args = "PyObject* %s, PyObject* %s" % (dummy, args) #", ".join("PyObject* %s" % self.name(n) for n in fn.arg_names)
     c_sig = "PyObject* %(c_fn_name)s (%(c_args)s)" % locals() 
@@ -742,23 +980,34 @@ class PyModuleCompiler(FnCompiler):
   
   _entry_compile_cache = {} 
   def compile_entry(self, parakeet_fn):  
-    # we include the compiler's class as part of the key
-    # since this function might get reused by descendant backends like OpenMP and CUDA
-    key = parakeet_fn.cache_key, self.__class__ 
+    # we include the compiler's cache key (its class and any settings) as part of 
+    # the key since this function might get reused by descendant backends like OpenMP and CUDA
+    key = parakeet_fn.cache_key, self.cache_key, config.instrument_kernels
     compiled_fn = self._entry_compile_cache.get(key)
     if compiled_fn: return compiled_fn 
     
-    name, sig, src = self.visit_fn(parakeet_fn)
+    with timed("codegen"):
+      name, sig, src = self.visit_fn(parakeet_fn)
     
     if config.print_function_source: 
       print "Generated C source for %s: %s" %(name, src)
     ordered_function_sources = [self.extra_functions[extra_sig] for 
                                 extra_sig in self.extra_function_signatures]
+    method_names = [name] + self.extra_method_names
+    if pool_allocator.alloc_sig in self.extra_function_signatures:
+      for (method_name, method_source) in pool_allocator.method_sources:
+        ordered_function_sources.append(method_source)
+        method_names.append(method_name)
+    instrumented = instrumentation.instrumented_entries(self.extra_function_signatures)
+    if instrumented:
+      ordered_function_sources.append(instrumentation.stats_source(instrumented))
+      method_names.append(instrumentation.stats_method_name)
 
     compiled_fn = compile_module_from_source(
       src, 
       fn_name = name,
       fn_signature = sig, 
+      method_names = method_names, 
       src_extension = self.src_extension,
       extra_objects = set(self.extra_objects),
       extra_function_sources = ordered_function_sources, 
@@ -769,6 +1018,8 @@ class PyModuleCompiler(FnCompiler):
       compiler = self.compiler_cmd, 
       compiler_flag_prefix = self.compiler_flag_prefix, 
       linker_flag_prefix = self.linker_flag_prefix)
+    pool_allocator.register(compiled_fn.c_fn, compiled_fn.module)
+    instrumentation.register(compiled_fn.c_fn, compiled_fn.module)
     self._entry_compile_cache[key]  = compiled_fn
     return compiled_fn
 
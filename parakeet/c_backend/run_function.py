@@ -1,25 +1,31 @@
-from prepare_args import prepare_args
 from ..transforms.pipeline  import loopify, final_loop_optimizations  
 from ..value_specialization import specialize
 from ..config import value_specialization
+from ..compile_lock import compile_lock
 from pymodule_compiler import PyModuleCompiler 
-
+from prepare_args import prepare_args
+import config
 
 
 _cache = {}
+def compile_fn(fn, args):
+  """
+  Given a typed function and its already prepared arguments, 
+  return the CompiledPyFn whose entry point c_fn runs it 
+  """
+  with compile_lock:
+    transformed_fn = loopify.apply(fn)
+    transformed_fn = final_loop_optimizations.apply(transformed_fn)
+    if value_specialization: 
+      transformed_fn = specialize(transformed_fn, args)
+
+    key = transformed_fn.cache_key, config.instrument_kernels
+    if key in _cache:
+      return _cache[key]
+    compiled_fn = PyModuleCompiler().compile_entry(transformed_fn)
+    _cache[key] = compiled_fn 
+    return compiled_fn
+
 def run(fn, args):
   args = prepare_args(args, fn.input_types)
-  
-  transformed_fn = loopify.apply(fn)
-  transformed_fn = final_loop_optimizations.apply(transformed_fn)
-  if value_specialization: 
-    transformed_fn = specialize(transformed_fn, args)
-
-  key = transformed_fn.cache_key
-  if key in _cache:
-    return _cache[key](*args)
-  compiled_fn = PyModuleCompiler().compile_entry(transformed_fn)
-  c_fn = compiled_fn.c_fn 
-  _cache[key] = c_fn 
-  return c_fn(*args)
-  
\ No newline at end of file
+  return compile_fn(fn, args).c_fn(*args)
@@ -0,0 +1,35 @@
+"""
+Errors raised by Check statements in compiled code. Only the entry point of
+an extension module can return NULL to Python, so a failed check (which might
+be in a function called from an OpenMP worker thread) just records its error,
+keeping the first one, and the computation carries on with its indices kept in
+bounds. The entry point raises the recorded error before returning.
+"""
+
+error_sig = "void parakeet_set_error(PyObject* type, const char* message)"
+error_source = """
+static PyObject* parakeet_error_type = NULL;
+static const char* parakeet_error_message = NULL;
+
+/* not static, since the (extern) inline functions which run checks
+   aren't allowed to call static functions */
+__attribute__((visibility("hidden")))
+void parakeet_set_error(PyObject* type, const char* message) {
+  if (__sync_bool_compare_and_swap(&parakeet_error_type, NULL, type)) {
+    parakeet_error_message = message;
+  }
+}"""
+
+def raise_if_error(result):
+  """
+  Release the boxed result of the entry point and return NULL
+  if any check failed while computing it
+  """
+  return """
+    if (parakeet_error_type) {
+      Py_XDECREF(%(result)s);
+      PyErr_SetString(parakeet_error_type, parakeet_error_message);
+      parakeet_error_message = NULL;
+      parakeet_error_type = NULL;
+      return NULL;
+    }""" % {'result' : result}
@@ -3,6 +3,7 @@ import subprocess
 import time
 
 import config 
+from ..compile_lock import compile_lock
 
 class CommandFailed(Exception):
   def __init__(self, cmd, env, label):
@@ -25,12 +26,14 @@ def run_cmd(cmd, env = None, label = ""):
   
   # first compile silently
   # if you encounter an error, then recompile with output printing
+  # let other threads keep translating and generating code while we wait
   try:
-    if config.suppress_compiler_output: 
-      with open(os.devnull, "w") as fnull:
-        subprocess.check_call(cmd, stdout = fnull, stderr = fnull, env = env)
-    else:
-      subprocess.check_call(cmd, env = env)
+    with compile_lock.released():
+      if config.suppress_compiler_output: 
+        with open(os.devnull, "w") as fnull:
+          subprocess.check_call(cmd, stdout = fnull, stderr = fnull, env = env)
+      else:
+        subprocess.check_call(cmd, env = env)
   except:
     raise CommandFailed(cmd, env, label)
     
@@ -37,3 +37,56 @@ include_dirs = numpy_include_dirs + python_include_dirs
 
 python_lib_dir = distutils.sysconfig.get_python_lib() + "/../../"
 python_version = distutils.sysconfig.get_python_version()
+
+# used when the cache sizes can't be read from the OS
+default_cache_sizes = {1 : 32 * 1024, 2 : 256 * 1024}
+
+def _parse_cache_size(s):
+  s = s.strip().upper()
+  units = {'K' : 1024, 'M' : 1024 ** 2, 'G' : 1024 ** 3}
+  if s and s[-1] in units:
+    return int(s[:-1]) * units[s[-1]]
+  return int(s)
+
+def _linux_cache_sizes():
+  import glob 
+  sizes = {}
+  for cache_dir in glob.glob("/sys/devices/system/cpu/cpu0/cache/index*"):
+    with open(cache_dir + "/type") as f:
+      if f.read().strip() == "Instruction":
+        continue 
+    with open(cache_dir + "/level") as f:
+      level = int(f.read())
+    with open(cache_dir + "/size") as f:
+      sizes[level] = _parse_cache_size(f.read())
+  return sizes 
+
+def _mac_cache_sizes():
+  import subprocess 
+  sizes = {}
+  for level, key in [(1, "hw.l1dcachesize"), (2, "hw.l2cachesize")]:
+    value = subprocess.Popen(["sysctl", "-n", key], stdout = subprocess.PIPE).communicate()[0]
+    if value.strip():
+      sizes[level] = int(value)
+  return sizes 
+
+def get_cache_sizes(_cache = []):
+  """
+  Sizes in bytes of the data caches of the first core, 
+  returned as a dictionary keyed by cache level
+  """
+  if _cache:
+    return _cache[0]
+  sizes = dict(default_cache_sizes)
+  try:
+    sizes.update(_mac_cache_sizes() if mac_os else _linux_cache_sizes())
+  except (IOError, OSError, ValueError):
+    pass 
+  _cache.append(sizes)
+  return sizes 
+
+def l1_cache_size():
+  return get_cache_sizes()[1]
+
+def l2_cache_size():
+  return get_cache_sizes()[2]
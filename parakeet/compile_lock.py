@@ -0,0 +1,46 @@
+"""
+Parakeet's translation, type inference, optimization and code generation all
+mutate shared state (name counters, specialization caches, phase memo tables),
+so only one thread at a time may be running them. Compiler subprocesses
+don't touch any of that state, so the lock gets handed off while we wait for
+them, which lets several background compile jobs keep gcc busy at once.
+"""
+
+import threading
+from contextlib import contextmanager
+
+class CompileLock(object):
+  def __init__(self):
+    self._lock = threading.RLock()
+    self._local = threading.local()
+
+  def _depth(self):
+    return getattr(self._local, 'depth', 0)
+
+  def __enter__(self):
+    self._lock.acquire()
+    self._local.depth = self._depth() + 1
+    return self
+
+  def __exit__(self, *exc_info):
+    self._local.depth -= 1
+    self._lock.release()
+
+  @contextmanager
+  def released(self):
+    """
+    Completely give up the lock (if this thread holds it) for the duration
+    of the block and then reacquire it to the same depth
+    """
+    depth = self._depth()
+    for _ in xrange(depth):
+      self._lock.release()
+    self._local.depth = 0
+    try:
+      yield
+    finally:
+      for _ in xrange(depth):
+        self._lock.acquire()
+      self._local.depth = depth
+
+compile_lock = CompileLock()
@@ -0,0 +1,186 @@
+"""
+Structured timings of each step it takes to compile a jit function for a
+new signature: AST conversion, type inference, every optimization Phase
+(along with how often its cache answered), C code generation, compiling,
+linking and loading the extension module.
+
+Each compile produces one record, a plain dictionary which can be dumped
+straight to JSON:
+
+  {'function' : 'f', 'backend' : 'c', 'signature' : ['array1(float64)'],
+   'total' : 0.41,
+   'times' : {'ast_conversion' : 0.01, 'type_inference' : 0.02,
+              'codegen' : 0.03, 'compile' : 0.3, 'link' : 0.02, 'load' : 0.001},
+   'phases' : {'Loopify' : {'time' : 0.01, 'calls' : 3,
+                            'cache_hits' : 1, 'cache_misses' : 2}, ...}}
+
+Times are exclusive: when one step runs inside another (type inference
+translating a callee, a Phase running the phases it depends on), the inner
+step's time is only counted once, under the inner step. Work done on a thread
+before its compile record begins (e.g. translating a function to find its
+global references) gets charged to the next record started on that thread.
+Nothing gets recorded unless config.record_compile_stats is set or a
+profile_compilation() block is running, and only the most recent
+config.max_compile_stats records are kept around for compile_stats().
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+# (function, record) pairs, oldest first 
+_records = []
+_local = threading.local()
+# records collected by each running profile_compilation() block
+_listeners = []
+
+def enabled():
+  return config.record_compile_stats or len(_listeners) > 0
+
+def _frames():
+  frames = getattr(_local, 'frames', None)
+  if frames is None:
+    frames = _local.frames = []
+  return frames
+
+def _current():
+  stack = getattr(_local, 'records', None)
+  if stack:
+    return stack[-1]
+  pending = getattr(_local, 'pending', None)
+  if pending is None:
+    pending = _local.pending = {'times' : {}, 'phases' : {}}
+  return pending
+
+def _unwrap(fn):
+  while hasattr(fn, 'f'):
+    fn = fn.f
+  return fn 
+
+def _fn_name(fn):
+  fn = _unwrap(fn)
+  if hasattr(fn, '__name__'):
+    return fn.__name__
+  return getattr(fn, 'name', str(fn))
+
+def _phase_stats(rec, phase_name):
+  phases = rec['phases']
+  if phase_name not in phases:
+    phases[phase_name] = {'time' : 0.0, 'calls' : 0, 'cache_hits' : 0, 'cache_misses' : 0}
+  return phases[phase_name]
+
+def _merge(rec, other):
+  for (k, t) in other['times'].iteritems():
+    rec['times'][k] = rec['times'].get(k, 0.0) + t
+  for (phase_name, stats) in other['phases'].iteritems():
+    merged = _phase_stats(rec, phase_name)
+    for (k, v) in stats.iteritems():
+      merged[k] += v
+
+class timed(object):
+  """
+  Charge the time spent in a block (minus any nested timed blocks)
+  to a compile step or, if phase = True, to the Phase of that name
+  """
+
+  def __init__(self, name, phase = False):
+    self.name = name
+    self.phase = phase
+
+  def __enter__(self):
+    self.active = enabled()
+    if self.active:
+      self.child_time = 0.0
+      _frames().append(self)
+      self.start = time.time()
+    return self
+
+  def __exit__(self, *exc_info):
+    if not self.active:
+      return
+    elapsed = time.time() - self.start
+    frames = _frames()
+    frames.pop()
+    if len(frames) > 0:
+      frames[-1].child_time += elapsed
+    own_time = elapsed - self.child_time
+    rec = _current()
+    if self.phase:
+      stats = _phase_stats(rec, str(self.name))
+      stats['time'] += own_time
+      stats['calls'] += 1
+    else:
+      rec['times'][self.name] = rec['times'].get(self.name, 0.0) + own_time
+
+def phase_cache_lookup(phase, hit):
+  if enabled():
+    stats = _phase_stats(_current(), str(phase))
+    if hit: stats['cache_hits'] += 1
+    else: stats['cache_misses'] += 1
+
+@contextmanager
+def record(fn, backend, input_types):
+  """
+  Collect the timings of everything which happens on this thread
+  during the block into a new record
+  """
+  if not enabled():
+    yield None
+    return
+  rec = {'function' : _fn_name(fn),
+         'backend' : backend,
+         'signature' : [str(t) for t in input_types],
+         'total' : 0.0,
+         'times' : {},
+         'phases' : {}}
+  pending = getattr(_local, 'pending', None)
+  if pending is not None:
+    _merge(rec, pending)
+    _local.pending = None
+  stack = getattr(_local, 'records', None)
+  if stack is None:
+    stack = _local.records = []
+  stack.append(rec)
+  start = time.time()
+  try:
+    yield rec
+  finally:
+    rec['total'] = time.time() - start
+    stack.pop()
+    _records.append((_unwrap(fn), rec))
+    if len(_records) > config.max_compile_stats:
+      del _records[:len(_records) - config.max_compile_stats]
+    for listener in _listeners:
+      listener.append(rec)
+
+@contextmanager
+def profile_compilation():
+  """
+  Record every compile which happens during the block,
+  returns the list of records it collects:
+
+    with parakeet.profile_compilation() as records:
+      f(x)
+    json.dump(records, output_file)
+  """
+  records = []
+  _listeners.append(records)
+  try:
+    yield records
+  finally:
+    _listeners.remove(records)
+
+def compile_stats(fn = None):
+  """
+  All compile records collected so far or, if given a jit function,
+  just the records of that function (and not others which share its name)
+  """
+  if fn is None:
+    return [rec for (_, rec) in _records]
+  fn = _unwrap(fn)
+  return [rec for (rec_fn, rec) in _records if rec_fn is fn]
+
+def clear_compile_stats():
+  del _records[:]
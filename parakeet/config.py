@@ -19,10 +19,22 @@ backend = 'openmp'
 opt_inline = True
 
 opt_fusion = True
+
+# merge neighboring loops (and ParFors) which run over the same indices 
+# when none of their iterations depend on a later iteration of the other
+opt_loop_fusion = True
 opt_combine_nested_maps = True
 
+# turn reductions of rows or columns into Maps of scalar reductions 
+# when the axis being reduced is contiguous 
+opt_permute_reductions = True
+
 opt_specialize_fn_args = True 
 
+# elementwise Maps over C-contiguous arrays run as a single 
+# loop over their data instead of one loop per dimension 
+opt_flatten_contiguous_maps = True
+
 # experimental!
 opt_simplify_array_operators = False
 
@@ -44,12 +56,24 @@ opt_shape_elim = True
 #     a = b[i:j]  
 opt_copy_elimination = True
 
+# temporary arrays allocated in every iteration of a ParFor 
+# get carved out of per-thread buffers allocated before the loop 
+opt_prealloc_arrays = True
+
+# break OuterMaps between the rows of two matrices (e.g. np.dot) into 
+# tiles sized to fit the L1 and L2 caches 
+opt_tiling = True
+
 # may dramatically increase compile time
 opt_loop_unrolling = False
 
 # suspiciously complex optimizations may introduce bugs 
 # TODO: comb through carefully 
 opt_scalar_replacement = False
+
+# mark innermost loops whose iterations are independent so that the 
+# C backends run them under '#pragma omp simd' when their arrays have unit strides 
+opt_vectorize = True
     
 # run verifier after each transformation 
 opt_verify = False
@@ -57,6 +81,21 @@ opt_verify = False
 # recompile functions for distinct patterns of unit strides and 0 or 1 input values 
 value_specialization = True 
 
+# remember the compiled entry point of each @jit function for every 
+# distinct signature of argument types, so that repeated calls skip 
+# type inference and the optimization pipeline 
+opt_dispatch_cache = True 
+
+# save the compiled entry points found by the dispatch cache under 
+# c_backend.config.cache_dir, so that new processes can load them 
+# without translating, specializing or optimizing the function 
+persistent_dispatch_cache = True 
+
+# number of worker threads which run the compile jobs submitted by 
+# parakeet.precompile and jit(..., eager_signatures = [...]), most of their 
+# time is spent waiting on the C compiler so they can all make progress at once
+background_compile_threads = 4 
+
 
 
 #####################################
@@ -95,6 +134,13 @@ print_escape_analysis = False
 # how long did each transform take?
 print_transform_timings = False
 
+# keep a record of how long each step of compiling every function took, 
+# see parakeet.compile_stats() and parakeet.profile_compilation()
+record_compile_stats = False
+
+# most compile records kept for parakeet.compile_stats(), older ones get dropped
+max_compile_stats = 1000
+
 # print each transform's name when it runs
 print_transform_names = False
 
@@ -249,14 +249,15 @@ class CudaCompiler(MulticoreCompiler):
   def in_gpu(self):
     return self.gpu_depth > 0
   
-  def get_fn_name(self, fn_expr, attributes = [], inline = True):
+  def get_fn_name(self, fn_expr, attributes = [], inline = True, call_args = ()):
     if self.in_gpu() and not attributes:
       attributes = ["__device__"] 
     kwargs = {'depth':self.depth, 'gpu_depth':self.gpu_depth}
     return PyModuleCompiler.get_fn_name(self, fn_expr, 
                                         compiler_kwargs = kwargs,
                                         attributes = attributes, 
-                                        inline = inline)
+                                        inline = inline, 
+                                        call_args = call_args)
     
 
   
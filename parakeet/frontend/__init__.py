@@ -2,6 +2,7 @@ from ast_conversion import translate_function_value, translate_function_ast
 from closure_specializations import print_specializations
 from decorators import jit, macro, staged_macro, typed_macro, axis_macro
 from diagnose import find_broken_transform
+from compile_pool import precompile
 from run_function import run_untyped_fn, run_typed_fn, run_python_fn, specialize
 import type_conv_decls as _decls 
 from typed_repr import typed_repr
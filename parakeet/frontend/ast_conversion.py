@@ -8,6 +8,8 @@ import numpy as np
 from dsltools import NestedBlocks, ScopedDict
  
 from .. import config, names, prims, syntax
+from ..compile_lock import compile_lock
+from ..compile_profile import timed
 
 from ..names import NameNotFound
 from ..ndtypes import Type
@@ -32,6 +34,7 @@ from ..syntax.wrappers import build_untyped_prim_fn, build_untyped_expr_fn, buil
 from ..transforms import subst_expr, subst_stmt_list
 
 from decorators import jit, macro  
+import output_param
 from python_ref import GlobalValueRef,  ClosureCellRef
 
 
@@ -266,7 +269,7 @@ class AST_Translator(ast.NodeVisitor):
       if is_static_value(value):
         return value_to_syntax(value)
       elif isinstance(value, np.ndarray): 
-        ref = GlobalValueRef(value)
+        ref = GlobalValueRef(value, name)
         return self.local_ref_name(ref, name)
       else:
         # assume that this is a module or object which will have some 
@@ -520,6 +523,11 @@ class AST_Translator(ast.NodeVisitor):
       return value.transform(positional, keywords_dict)
       
     fn = translate_function_value(value)
+    if 'out' in keywords_dict and not output_param.takes_output_param(fn):
+      keywords_dict = dict(keywords_dict)
+      out = keywords_dict.pop('out')
+      value_expr = Call(fn, ActualArgs(positional, keywords_dict, starargs_expr))
+      return output_param.output_call(out, value_expr)
     return Call(fn, ActualArgs(positional, keywords_dict, starargs_expr))
     
   def visit_Call(self, expr):
@@ -1062,9 +1070,6 @@ def _translate_function_value(fn):
     _known_python_functions[fn] = fundef
   return fundef 
 
-import threading 
-_lock = threading.RLock()
-
 def translate_function_value(fn):
   if fn in _known_python_functions:
     return _known_python_functions[fn]
@@ -1100,7 +1105,7 @@ def translate_function_value(fn):
     if fn in _known_python_functions:
       return _known_python_functions[fn]
   
-    with _lock:
+    with compile_lock, timed("ast_conversion"):
       fundef = _translate_function_value(fn)
            
   _known_python_functions[fn] = fundef 
@@ -0,0 +1,142 @@
+"""
+Background compilation: a small bounded pool of worker threads which run
+compile jobs and hand back futures. Parakeet's own passes run one at a time
+under the compile lock, but each job gives it up while gcc is running, so
+specializations of many functions can be compiled and linked concurrently.
+"""
+
+import Queue
+import sys
+import threading
+
+from .. import config
+
+class CompileTimeout(Exception):
+  def __init__(self, timeout):
+    self.timeout = timeout
+
+  def __str__(self):
+    return "Compilation didn't finish within %s seconds" % (self.timeout,)
+
+class Future(object):
+  """
+  Result of a background compile job, which might not start 
+  until something waits for it (see submit_deferred)
+  """
+  def __init__(self, start = None):
+    self._finished = threading.Event()
+    self._result = None
+    self._exc_info = None
+    self._start = start
+    self._start_lock = threading.Lock()
+
+  def start(self):
+    with self._start_lock:
+      start, self._start = self._start, None
+    if start is not None:
+      start()
+
+  def done(self):
+    return self._finished.is_set()
+
+  def set_result(self, result):
+    self._result = result
+    self._finished.set()
+
+  def set_exception(self, exc_info):
+    self._exc_info = exc_info
+    self._finished.set()
+
+  def exception(self, timeout = None):
+    self.wait(timeout)
+    return self._exc_info[1] if self._exc_info else None
+
+  def wait(self, timeout = None):
+    self.start()
+    # Event.wait without a timeout can't be interrupted with Ctrl-C,
+    # so poll in short intervals instead
+    if timeout is None:
+      while not self._finished.wait(0.1):
+        pass
+    elif not self._finished.wait(timeout):
+      raise CompileTimeout(timeout)
+
+  def result(self, timeout = None):
+    self.wait(timeout)
+    if self._exc_info is not None:
+      raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+    return self._result
+
+def completed(result):
+  future = Future()
+  future.set_result(result)
+  return future
+
+class CompilePool(object):
+  def __init__(self, n_threads = None):
+    self.n_threads = n_threads
+    self.queue = Queue.Queue()
+    self.workers = []
+    self._lock = threading.Lock()
+
+  def _start_workers(self):
+    n_threads = self.n_threads
+    if n_threads is None:
+      n_threads = config.background_compile_threads
+    with self._lock:
+      while len(self.workers) < max(n_threads, 1):
+        worker = threading.Thread(target = self._work, name = "parakeet-compile")
+        # don't keep the interpreter alive just to finish compiling
+        worker.daemon = True
+        worker.start()
+        self.workers.append(worker)
+
+  def _work(self):
+    while True:
+      future, fn, args = self.queue.get()
+      try:
+        future.set_result(fn(*args))
+      except:
+        future.set_exception(sys.exc_info())
+
+  def _put(self, future, fn, args):
+    self._start_workers()
+    self.queue.put((future, fn, args))
+
+  def submit(self, fn, *args):
+    future = Future()
+    self._put(future, fn, args)
+    return future
+
+  def submit_deferred(self, fn, *args):
+    future = Future(start = lambda: self._put(future, fn, args))
+    return future
+
+_pool = CompilePool()
+
+def submit(fn, *args):
+  return _pool.submit(fn, *args)
+
+def submit_deferred(fn, *args):
+  """
+  Like submit, but the job only gets queued once its future's start method 
+  is called (which waiting for it also does)
+  """
+  return _pool.submit_deferred(fn, *args)
+
+def precompile(fns, signatures, backend = None):
+  """
+  Start compiling each @jit function for every signature in the background and
+  return a list of futures, one per (function, signature) pair.
+  A signature is a sequence of example argument values or Parakeet types.
+  """
+  from decorators import jit
+  if not isinstance(fns, (list, tuple)):
+    fns = [fns]
+  futures = []
+  for fn in fns:
+    # the compiled entry points are kept by the jit object, 
+    # so a throwaway wrapper would just discard them 
+    assert isinstance(fn, jit), "Can only precompile @jit functions, got %s" % (fn,)
+    futures.extend(fn.precompile(signatures, backend = backend))
+  return futures
@@ -4,27 +4,290 @@ from .. import names
 from .. syntax import (Expr, Var, Const, Return, UntypedFn, FormalArgs, DelayUntilTyped,  
                        const, is_python_constant)
 
-from run_function import run_untyped_fn, run_typed_fn, specialize 
+import imp 
+import threading
+import types 
+
+from .. import compile_profile, config 
+from ..compile_lock import compile_lock
+from ..ndtypes import typeof 
+from ..num_threads import threads
+from ..openmp_backend import schedule_tuning
+import disk_cache
+import compile_pool
+import output_param
+from dispatch import DispatchEntry, TunedDispatchEntry, example_value, signature
+from run_function import run_untyped_fn, run_typed_fn, specialize, compile_typed_fn 
 
 class jit(object):
-  def __init__(self, f):
+  def __new__(cls, f = None, **options):
+    if f is None:
+      # called with only keyword options, as in @jit(eager_signatures = [...])
+      return lambda f: cls(f, **options)
+    return object.__new__(cls)
+  
+  def __init__(self, f, eager_signatures = None, fallback = None, schedule = None):
+    assert fallback in (None, 'python', 'interp'), \
+      "Unknown fallback '%s', expected 'python' or 'interp'" % (fallback,)
+    assert schedule is None or isinstance(schedule, str), \
+      "Expected OpenMP schedule string, got %s" % (schedule,)
     self.f = f
     self.fn = f
     self.untyped = None 
-
+    
+    # references to global arrays and closure cells which get passed 
+    # to the compiled function ahead of its own arguments 
+    self.nonlocal_refs = None 
+    
+    # maps (backend, argument signature) to a compiled entry point 
+    self.dispatch_cache = {}
+    
+    # background compile jobs which haven't finished yet, 
+    # keyed by backend and the signature of the positional args
+    self.pending = {}
+    # held while adding or removing background jobs, so that a job which
+    # finishes right away can't try to remove itself before it's been added 
+    self.pending_lock = threading.Lock()
+    
+    # how to run calls which arrive while their signature is still being 
+    # compiled in the background: None waits for the compiler, 'python' calls 
+    # the original function and 'interp' uses Parakeet's interpreter
+    self.fallback = fallback 
+    
+    # how the OpenMP backend splits parallel loops between threads: None uses 
+    # openmp_backend.config.schedule, 'auto' times a few candidates on the 
+    # first calls of each signature and keeps the fastest  
+    self.schedule = schedule 
+    
+    self._fingerprint = None 
+    
+    # for calls with an 'out' array: maps the signature of the arguments 
+    # (and the output) to the typed function whose shape we need to check 
+    # and a wrapper which writes its result into the output array 
+    self.output_wrappers = {}
+    
+    if eager_signatures:
+      self.precompile(eager_signatures)
+  
+  @property 
+  def use_disk_cache(self):
+    return config.persistent_dispatch_cache and isinstance(self.fn, types.FunctionType)
+  
+  @property 
+  def fingerprint(self):
+    if self._fingerprint is None:
+      self._fingerprint = disk_cache.fingerprint(self.fn)
+    return self._fingerprint 
+  
+  def translate(self):
+    with compile_lock:
+      if self.untyped is None:
+        import ast_conversion 
+        self.untyped = ast_conversion.translate_function_value(self.fn)
+        self.nonlocal_refs = list(self.untyped.python_refs or [])
+        if self.use_disk_cache:
+          disk_cache.save_refs(self.fn, self.fingerprint, self.nonlocal_refs)
+    return self.untyped 
+  
+  def linearize(self, args):
+    """
+    Without keywords, the linearized arguments are just 
+    the function's nonlocals followed by the positional args
+    """
+    if self.nonlocal_refs is None:
+      if self.use_disk_cache:
+        self.nonlocal_refs = disk_cache.load_refs(self.fn, self.fingerprint)
+      if self.nonlocal_refs is None:
+        self.translate()
+    return tuple([ref.deref() for ref in self.nonlocal_refs]) + args 
+  
+  def run(self, args, kwargs, backend_name):
+    typed_fn, linear_args = specialize(self.translate(), args, kwargs)
+    return run_typed_fn(typed_fn, linear_args, backend_name, self.schedule)
+  
+  def compile_dispatch_entry(self, args, linear_args, backend_name, sig):
+    """
+    Get the compiled entry point for a signature not yet seen by this process, 
+    either from the on-disk cache or by running the whole compiler
+    """
+    input_types = tuple(typeof(arg) for arg in linear_args)
+    with compile_profile.record(self.fn, backend_name, input_types) as rec:
+      key = None 
+      if self.use_disk_cache:
+        key = disk_cache.entry_key(self.fingerprint, backend_name, sig, self.schedule)
+        c_fn = disk_cache.load_entry(key)
+        if rec is not None: 
+          rec['disk_cache_hit'] = c_fn is not None
+        if c_fn is not None:
+          return self.dispatch_entry(c_fn, input_types, linear_args, key)
+      
+      typed_fn, linear_args = specialize(self.translate(), args, {})
+      compiled_fn = compile_typed_fn(typed_fn, linear_args, backend_name, self.schedule)
+      if compiled_fn is None:
+        return None 
+      if key is not None:
+        disk_cache.save_entry(key, compiled_fn)
+      return self.dispatch_entry(compiled_fn.c_fn, typed_fn.input_types, linear_args, key)
+  
+  def dispatch_entry(self, c_fn, input_types, linear_args, key):
+    """
+    Entry points whose schedule gets picked at runtime first use the one 
+    recorded in the on-disk cache or, if there isn't one yet, try out each candidate 
+    """
+    if not schedule_tuning.is_tunable(c_fn):
+      return DispatchEntry(c_fn, input_types, linear_args)
+    if key is not None:
+      schedule = disk_cache.load_schedule(key)
+      if schedule is not None:
+        schedule_tuning.set_schedule(c_fn, schedule)
+        return DispatchEntry(c_fn, input_types, linear_args)
+      on_choice = lambda schedule: disk_cache.save_schedule(key, schedule)
+    else:
+      on_choice = None 
+    tuner = schedule_tuning.ScheduleTuner(c_fn, on_choice)
+    return TunedDispatchEntry(c_fn, input_types, linear_args, tuner)
+    
+  def _compile_in_background(self, args, backend_name, pending_key):
+    try:
+      linear_args = self.linearize(args)
+      sig = signature(linear_args)
+      if sig is None:
+        return None 
+      key = (backend_name, sig)
+      entry = self.dispatch_cache.get(key)
+      if entry is None:
+        entry = self.compile_dispatch_entry(args, linear_args, backend_name, sig)
+        if entry is not None:
+          self.dispatch_cache[key] = entry 
+      return entry 
+    finally:
+      with self.pending_lock:
+        self.pending.pop(pending_key, None)
+  
+  def precompile(self, signatures, backend = None):
+    """
+    Compile this function in the background for each signature (a sequence of 
+    example arguments or Parakeet types) and return a list of futures 
+    whose results are the compiled entry points. 
+    
+    During an import, the module defining this function may not have 
+    defined all of its helpers yet, so jobs only start once the function 
+    gets called or their futures are waited on. 
+    """
+    if backend is None:
+      backend = config.backend 
+    futures = []
+    for sig in signatures:
+      if not isinstance(sig, (list, tuple)):
+        sig = (sig,)
+      args = tuple(example_value(x) for x in sig)
+      pending_key = (backend, signature(args))
+      with self.pending_lock:
+        future = self.pending.get(pending_key)
+        if future is None:
+          if imp.lock_held():
+            submit = compile_pool.submit_deferred 
+          else:
+            submit = compile_pool.submit 
+          future = submit(self._compile_in_background, args, backend, pending_key)
+          self.pending[pending_key] = future 
+      futures.append(future)
+    return futures 
+  
+  def wait_for_pending(self, args, backend_name):
+    """
+    If this call's signature is being compiled in the background then wait for 
+    it to finish, unless we're inside an import (which would keep the compile job
+    from ever starting) or a fallback was requested.  
+    Returns False if the call should go to the fallback instead. 
+    """
+    future = self.pending.get((backend_name, signature(args)))
+    if future is None or future.done():
+      return True
+    elif self.fallback is not None:
+      return False 
+    elif not imp.lock_held():
+      future.wait()
+    return True 
+  
+  def run_fallback(self, args):
+    if self.fallback == 'python':
+      return self.f(*args)
+    else:
+      return self.run(args, {}, 'interp')
+    
+  def call_with_output(self, args, kwargs, out, backend_name):
+    """
+    Write the result of this function directly into the array 'out'
+    and return it, after checking that its type and shape match the result  
+    """
+    assert len(kwargs) == 0, \
+      "Can't combine 'out' with other keyword arguments: %s" % kwargs.keys()
+    linear_args = self.linearize(args)
+    sig = signature(linear_args + (out,))
+    key = (backend_name, sig)
+    if key in self.output_wrappers:
+      typed_fn, wrapper = self.output_wrappers[key]
+    else:
+      typed_fn, _ = specialize(self.translate(), args)
+      output_param.check_output_type(typed_fn.return_type, out)
+      wrapper = jit(output_param.output_wrapper(self.translate(), len(args)),
+                    schedule = self.schedule)
+      if sig is not None:
+        self.output_wrappers[key] = (typed_fn, wrapper) 
+    expected_shape = output_param.expected_shape(typed_fn, linear_args)
+    if expected_shape is None or output_param.overlaps_inputs(out, linear_args):
+      # can't tell how big the result will be without computing it, 
+      # or writing into the output might clobber inputs we haven't read yet 
+      out[...] = self.__call__(*args, _backend = backend_name)
+    elif expected_shape != out.shape:
+      raise ValueError("Expected 'out' array of shape %s, got %s" % (expected_shape, out.shape))
+    else:
+      wrapper(*(args + (out,)), _backend = backend_name)
+    return out 
+    
   def __call__(self, *args, **kwargs):
+    if '_num_threads' in kwargs:
+      with threads(kwargs.pop('_num_threads')):
+        return self.__call__(*args, **kwargs)
+    
     if '_backend' in kwargs:
       backend_name = kwargs['_backend']
       del kwargs['_backend']
     else:
       backend_name = None
     
-    if self.untyped is None:
-      import ast_conversion 
-      self.untyped = ast_conversion.translate_function_value(self.fn)
+    if 'out' in kwargs and not output_param.takes_output_param(self.translate()):
+      out = kwargs.pop('out')
+      return self.call_with_output(args, kwargs, out, backend_name)
     
-    typed_fn, linear_args = specialize(self.untyped, args, kwargs)
-    return run_typed_fn(typed_fn, linear_args, backend_name)
+    if kwargs or not config.opt_dispatch_cache:
+      return self.run(args, kwargs, backend_name)
+    
+    linear_args = self.linearize(args)
+    sig = signature(linear_args)
+    if sig is None:
+      return self.run(args, kwargs, backend_name)
+    
+    if backend_name is None:
+      backend_name = config.backend 
+    key = (backend_name, sig)
+    entry = self.dispatch_cache.get(key)
+    if entry is None:
+      if self.pending:
+        if not imp.lock_held():
+          # jobs deferred until after an import 
+          for future in self.pending.values():
+            future.start()
+        if not self.wait_for_pending(args, backend_name):
+          return self.run_fallback(args)
+        entry = self.dispatch_cache.get(key)
+      if entry is None:
+        entry = self.compile_dispatch_entry(args, linear_args, backend_name, sig)
+        if entry is None:
+          return self.run(args, kwargs, backend_name)
+        self.dispatch_cache[key] = entry
+    return entry(linear_args)
 
 
 class macro(object):
@@ -118,6 +381,10 @@ class macro(object):
     if self.call_from_python is not None:
       return self.call_from_python(*args, **kwargs)
     
+    if '_num_threads' in kwargs:
+      with threads(kwargs.pop('_num_threads')):
+        return self.__call__(*args, **kwargs)
+    
     if '_backend' in kwargs:
       backend_name = kwargs['_backend']
       del kwargs['_backend']
@@ -135,7 +402,12 @@ class macro(object):
     untyped = self._create_wrapper(n_pos, static_pairs, dynamic_keywords)
 
     dynamic_kwargs = dict( (k, kwargs[k]) for k in dynamic_keywords)
-    return run_untyped_fn(untyped, args, dynamic_kwargs, backend = backend_name)
+    result = run_untyped_fn(untyped, args, dynamic_kwargs, backend = backend_name)
+    if 'out' in dynamic_kwargs:
+      # adverbs which wrote into an output array should return that array 
+      # itself rather than a view of it 
+      return dynamic_kwargs['out']
+    return result
     
 
   def transform(self, args, kwargs = {}):
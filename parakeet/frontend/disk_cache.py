@@ -0,0 +1,280 @@
+"""
+Persistent cache of compiled entry points, so that a fresh process
+can call a @jit function without re-running AST conversion, type inference
+or any of the optimization pipeline.
+
+Each jit function gets a fingerprint from its source, its bytecode and
+everything it references (helper functions, constant globals, closure cells,
+attributes of imported modules along with the source of those modules).
+Under that fingerprint we store a description of the function's nonlocal
+references and, for each argument signature, the name and location of the
+compiled shared library.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import types
+
+import numpy as np
+
+from .. import config, package_info
+from ..c_backend import config as c_config
+from ..openmp_backend import config as openmp_config, parallel_threshold, schedule_tuning
+from ..c_backend import instrumentation, pool_allocator
+from ..c_backend.compile_util import load_module
+from python_ref import GlobalValueRef, ClosureCellRef
+
+
+_simple_types = (bool, int, long, float, complex, str, unicode, type(None))
+
+def _update_with_code(h, code, fn_globals, seen):
+  h.update(code.co_code)
+  h.update(repr(code.co_names))
+  h.update(repr(code.co_varnames))
+  for const in code.co_consts:
+    if isinstance(const, types.CodeType):
+      # nested functions and lambdas
+      _update_with_code(h, const, fn_globals, seen)
+    else:
+      h.update(repr(const))
+  modules = []
+  for name in code.co_names:
+    if name in fn_globals:
+      h.update(name)
+      _update_with_value(h, fn_globals[name], seen)
+      if isinstance(fn_globals[name], types.ModuleType) and \
+         not _is_library_module(fn_globals[name]):
+        modules.append(fn_globals[name])
+  # attribute loads such as helper_mod.g reach into other modules,
+  # which might themselves be attributes (e.g. helper_pkg.sub.g), 
+  # whereas libraries are covered by the build fingerprint 
+  visited = set(id(module) for module in modules)
+  while modules:
+    module = modules.pop(0)
+    for name in code.co_names:
+      v = getattr(module, name, None)
+      if v is None:
+        continue
+      h.update("%s.%s" % (module.__name__, name))
+      _update_with_value(h, v, seen)
+      if isinstance(v, types.ModuleType) and id(v) not in visited and \
+         not _is_library_module(v):
+        visited.add(id(v))
+        modules.append(v)
+
+def _is_library_module(module):
+  filename = getattr(module, '__file__', None)
+  if filename is None:
+    return True
+  filename = os.path.abspath(filename)
+  parakeet_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+  # Parakeet's own files are covered by the build fingerprint
+  return any(filename.startswith(prefix)
+             for prefix in (sys.prefix, sys.exec_prefix, parakeet_root))
+
+def _update_with_module(h, module, seen):
+  if id(module) in seen:
+    return
+  seen.add(id(module))
+  h.update(module.__name__)
+  if _is_library_module(module):
+    return
+  filename = module.__file__
+  if filename.endswith(".pyc") or filename.endswith(".pyo"):
+    filename = filename[:-1]
+  try:
+    with open(filename, 'rb') as f:
+      h.update(f.read())
+  except IOError:
+    pass
+
+def _update_with_fn(h, fn, seen):
+  if id(fn) in seen:
+    return
+  seen.add(id(fn))
+  try:
+    h.update(inspect.getsource(fn))
+  except (IOError, TypeError):
+    pass
+  _update_with_code(h, fn.func_code, fn.func_globals, seen)
+  if fn.func_defaults:
+    for v in fn.func_defaults:
+      _update_with_value(h, v, seen)
+  if fn.func_closure:
+    for cell in fn.func_closure:
+      _update_with_value(h, cell.cell_contents, seen)
+
+def _update_with_value(h, v, seen):
+  from decorators import jit
+  while isinstance(v, jit):
+    v = v.f
+  if isinstance(v, types.FunctionType):
+    _update_with_fn(h, v, seen)
+  elif isinstance(v, _simple_types):
+    # constants get baked into the generated code
+    h.update(repr(v))
+  elif isinstance(v, tuple):
+    for elt in v:
+      _update_with_value(h, elt, seen)
+  elif isinstance(v, types.ModuleType):
+    _update_with_module(h, v, seen)
+  else:
+    # arrays are passed as arguments and covered by the call signature
+    h.update(type(v).__name__)
+
+def fingerprint(python_fn):
+  """
+  Hash of a Python function's source, bytecode and everything reachable from it
+  """
+  h = hashlib.sha1()
+  _update_with_value(h, python_fn, set([]))
+  return h.hexdigest()
+
+def _config_items(module):
+  return sorted((k,v) for (k,v) in vars(module).iteritems()
+                if not k.startswith("_") and isinstance(v, _simple_types))
+
+_build_fingerprint = None
+def build_fingerprint():
+  """
+  Identify this version of Parakeet, Python and NumPy, including
+  any modifications to Parakeet's own source files
+  """
+  global _build_fingerprint
+  if _build_fingerprint is None:
+    h = hashlib.sha1()
+    h.update(package_info.__version__)
+    h.update(sys.version)
+    h.update(np.__version__)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for dirpath, dirnames, filenames in os.walk(root):
+      dirnames.sort()
+      for filename in sorted(filenames):
+        if filename.endswith(".py"):
+          stat = os.stat(os.path.join(dirpath, filename))
+          h.update("%s:%d:%d" % (filename, stat.st_size, stat.st_mtime))
+    _build_fingerprint = h.hexdigest()
+  return _build_fingerprint
+
+def entry_key(fn_fingerprint, backend, sig, schedule = None):
+  h = hashlib.sha1()
+  h.update(fn_fingerprint)
+  h.update(backend)
+  h.update(repr(sig))
+  if schedule is not None:
+    h.update(schedule)
+  h.update(build_fingerprint())
+  for module in (config, c_config, openmp_config):
+    h.update(repr(_config_items(module)))
+  if backend == 'openmp' and openmp_config.parallel_if_clause:
+    # the compiled code depends on this machine's calibration 
+    h.update(repr(parallel_threshold.min_parallel_work()))
+  return h.hexdigest()
+
+def _cache_path(filename):
+  return os.path.join(c_config.cache_dir, "dispatch", filename)
+
+def _read(filename):
+  path = _cache_path(filename)
+  if not os.path.exists(path):
+    return None
+  try:
+    with open(path, 'r') as f:
+      return json.load(f)
+  except (IOError, ValueError):
+    return None
+
+def _write(filename, value):
+  path = _cache_path(filename)
+  dirname = os.path.dirname(path)
+  if not os.path.exists(dirname):
+    os.makedirs(dirname)
+  # write to a temporary file first so that concurrent processes
+  # never see a partially written record
+  tmp_path = "%s.%d" % (path, os.getpid())
+  with open(tmp_path, 'w') as f:
+    json.dump(value, f)
+  os.rename(tmp_path, path)
+
+def save_refs(python_fn, fn_fingerprint, refs):
+  if not c_config.cache_dir:
+    return
+  descriptions = []
+  for ref in refs:
+    if isinstance(ref, GlobalValueRef) and ref.name is not None:
+      descriptions.append(("global", ref.name))
+    elif isinstance(ref, ClosureCellRef):
+      descriptions.append(("closure", ref.name))
+    else:
+      return
+  _write(fn_fingerprint + ".refs", descriptions)
+
+def load_refs(python_fn, fn_fingerprint):
+  """
+  Reconstruct the nonlocal references of a function without translating it,
+  returns None if they haven't been recorded
+  """
+  if not c_config.cache_dir:
+    return None
+  descriptions = _read(fn_fingerprint + ".refs")
+  if descriptions is None:
+    return None
+  refs = []
+  for (kind, name) in descriptions:
+    if kind == "global" and name in python_fn.func_globals:
+      refs.append(GlobalValueRef(python_fn.func_globals[name], name))
+    elif kind == "closure" and name in python_fn.func_code.co_freevars:
+      cell = python_fn.func_closure[python_fn.func_code.co_freevars.index(name)]
+      refs.append(ClosureCellRef(cell, name))
+    else:
+      return None
+  return refs
+
+def save_entry(key, compiled_fn):
+  if not c_config.cache_dir:
+    return
+  shared_filename = os.path.abspath(compiled_fn.shared_filename)
+  if not shared_filename.startswith(os.path.abspath(c_config.cache_dir)):
+    return
+  _write(key + ".entry", {'fn_name' : compiled_fn.fn_name,
+                          'shared_filename' : shared_filename})
+
+def load_entry(key):
+  """
+  Returns the compiled C entry point for the given key or None
+  """
+  if not c_config.cache_dir:
+    return None
+  record = _read(key + ".entry")
+  if record is None:
+    return None
+  fn_name = str(record['fn_name'])
+  shared_filename = str(record['shared_filename'])
+  if not os.path.exists(shared_filename):
+    return None
+  if c_config.print_commands:
+    print "Loading cached extension module %s..." % shared_filename
+  module = load_module(fn_name, shared_filename)
+  c_fn = getattr(module, fn_name)
+  pool_allocator.register(c_fn, module)
+  instrumentation.register(c_fn, module)
+  schedule_tuning.register(c_fn, module)
+  return c_fn
+
+def save_schedule(key, schedule):
+  """Record the schedule chosen for an entry compiled with schedule = 'auto'"""
+  if not c_config.cache_dir:
+    return
+  _write(key + ".schedule", list(schedule))
+
+def load_schedule(key):
+  if not c_config.cache_dir:
+    return None
+  schedule = _read(key + ".schedule")
+  if schedule is None:
+    return None
+  kind, chunk = schedule
+  return (str(kind), chunk)
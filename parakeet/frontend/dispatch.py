@@ -0,0 +1,127 @@
+import numpy as np
+from numpy import ndarray
+
+from ..c_backend.prepare_args import prepare_args
+from ..ndtypes import Type, ArrayT, ScalarT, TupleT, NoneT, Bool, Int64, Float64
+from ..num_threads import with_num_threads
+
+NoneType = type(None)
+
+# values of these types can be handed directly to a compiled entry point
+# without first going through c_backend.prepare_args
+_passthrough_types = (ndarray, int, float, bool, NoneType, np.generic)
+
+def _value_class(x):
+  """
+  Mirrors the 0/1 specialization of value_specialization.from_python
+  """
+  if x == 0:
+    return 0
+  elif x == 1:
+    return 1
+  else:
+    return 2
+
+def arg_signature(x):
+  """
+  Cheap summary of everything about an argument which can change the
+  compiled code: its type, the number and kind of an array's dimensions,
+  its memory layout and whether its strides (or a scalar's value) are 
+  0, 1 or something else. Returns None for values we don't know how to 
+  summarize.
+  """
+  t = type(x)
+  if t is ndarray:
+    itemsize = x.dtype.itemsize
+    flags = x.flags
+    return (t, x.dtype, flags.c_contiguous, flags.f_contiguous, 
+            tuple([_value_class(s / itemsize) for s in x.strides]))
+  elif t is tuple:
+    elts = signature(x)
+    if elts is None:
+      return None
+    return (t, elts)
+  elif t is NoneType:
+    return (t,)
+  elif t in (int, long, float, bool) or isinstance(x, np.generic):
+    return (t, _value_class(x))
+  else:
+    return None
+
+def signature(args):
+  sig = []
+  for arg in args:
+    arg_sig = arg_signature(arg)
+    if arg_sig is None:
+      return None
+    sig.append(arg_sig)
+  return tuple(sig)
+
+def example_value(t):
+  """
+  A value whose argument signature is that of a typical (contiguous array, 
+  non-0/1 scalar) argument of type t, so that types can stand in for values 
+  when compiling ahead of the first call
+  """
+  if not isinstance(t, Type):
+    return t
+  elif isinstance(t, ArrayT):
+    x = np.empty((2,) * t.rank, dtype = t.elt_type.dtype)
+    return np.asfortranarray(x) if t.layout == 'F' else x
+  elif isinstance(t, TupleT):
+    return tuple(example_value(elt_t) for elt_t in t.elt_types)
+  elif isinstance(t, NoneT):
+    return None
+  elif t == Bool:
+    return True
+  elif t == Int64:
+    return 2
+  elif t == Float64:
+    return 2.0
+  else:
+    assert isinstance(t, ScalarT), "Can't create an example value of type %s" % t
+    return t.dtype.type(2)
+
+def is_passthrough(x):
+  t = type(x)
+  if t is tuple:
+    return all(is_passthrough(elt) for elt in x)
+  elif t is ndarray:
+    # zero-dimensional arrays get typed as scalars  
+    return x.ndim > 0
+  return isinstance(x, _passthrough_types) and t is not long
+
+class DispatchEntry(object):
+  """
+  Compiled entry point for one argument signature of a jit function
+  """
+  __slots__ = ['c_fn', 'input_types', 'prepare']
+
+  def __init__(self, c_fn, input_types, args):
+    self.c_fn = c_fn
+    self.input_types = input_types
+    # only convert the arguments when they wouldn't unbox correctly as-is
+    self.prepare = not all(is_passthrough(arg) for arg in args)
+
+  def __call__(self, args):
+    if self.prepare:
+      args = prepare_args(args, self.input_types)
+    return self.c_fn(*with_num_threads(args))
+
+class TunedDispatchEntry(DispatchEntry):
+  """
+  Entry point compiled with schedule = 'auto' whose first calls
+  go through a ScheduleTuner
+  """
+  __slots__ = ['tuner']
+
+  def __init__(self, c_fn, input_types, args, tuner):
+    DispatchEntry.__init__(self, c_fn, input_types, args)
+    self.tuner = tuner
+
+  def __call__(self, args):
+    if self.tuner.done:
+      return DispatchEntry.__call__(self, args)
+    if self.prepare:
+      args = prepare_args(args, self.input_types)
+    return self.tuner(with_num_threads(args))
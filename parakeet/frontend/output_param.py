@@ -0,0 +1,97 @@
+"""
+Support for the 'out' keyword, which makes a function (or adverb) write its
+result into a caller-provided array instead of allocating a new one:
+
+  f(x, y, out = buf)        =>    write_output(buf, f(x, y))
+
+Once the call is inlined, copy elimination turns the result's allocation into
+a view of 'buf' so the values get written into it directly.
+"""
+
+import numpy as np
+
+from .. import names
+from ..ndtypes import ArrayT
+from ..shape_inference.shape_eval import result_shape
+from ..syntax import ActualArgs, Call, FormalArgs, Return, UntypedFn, Var
+
+def write_output(out, value):
+  out[:] = value
+  return out
+
+def takes_output_param(fn):
+  """
+  Does this untyped function have its own argument called 'out'?
+  """
+  return 'out' in fn.args.local_names
+
+def output_call(out, value):
+  """
+  Syntax for writing the value of an expression into the array 'out'
+  """
+  import ast_conversion
+  writer = ast_conversion.translate_function_value(write_output)
+  return Call(writer, ActualArgs([out, value]))
+
+_wrappers = {}
+def output_wrapper(untyped, n_args):
+  """
+  Untyped function which takes the same nonlocals as 'untyped', followed
+  by its n_args positional arguments and an output array
+  """
+  key = (untyped.name, n_args)
+  if key in _wrappers:
+    return _wrappers[key]
+  args = FormalArgs()
+  arg_vars = []
+  for i in xrange(n_args):
+    local_name = names.fresh("input_%d" % i)
+    args.add_positional(local_name)
+    arg_vars.append(Var(local_name))
+  out_name = names.fresh("out")
+  args.add_positional(out_name, "out")
+  n_nonlocals = len(untyped.python_refs) if untyped.python_refs else 0
+  nonlocal_names = [names.fresh("nonlocal_%d" % i) for i in xrange(n_nonlocals)]
+  args.prepend_nonlocal_args(nonlocal_names)
+  nonlocal_vars = [Var(name) for name in nonlocal_names]
+  value = Call(untyped, ActualArgs(nonlocal_vars + arg_vars))
+  body = [Return(output_call(Var(out_name), value))]
+  wrapper = UntypedFn(name = names.fresh("%s_with_output" % untyped.name),
+                      args = args,
+                      body = body,
+                      python_refs = untyped.python_refs)
+  _wrappers[key] = wrapper
+  return wrapper
+
+def check_output_type(result_type, out):
+  if not isinstance(out, np.ndarray):
+    raise TypeError("Expected 'out' to be an array, got %s" % type(out))
+  if not isinstance(result_type, ArrayT):
+    raise TypeError("Can't write result of type %s into 'out' array" % result_type)
+  if result_type.rank != out.ndim:
+    raise ValueError("Expected %d-dimensional 'out' array, got %d dimensions" % \
+                     (result_type.rank, out.ndim))
+  if result_type.elt_type.dtype != out.dtype:
+    raise TypeError("Expected 'out' array with dtype %s, got %s" % \
+                    (result_type.elt_type.dtype, out.dtype))
+
+def expected_shape(typed_fn, linear_args):
+  """
+  Evaluate the symbolic shape of a function's result for the given inputs,
+  or return None if it depends on more than the shapes of the inputs
+  """
+  try:
+    shape = result_shape(typed_fn, linear_args)
+  except:
+    return None
+  if not isinstance(shape, tuple) or not all(isinstance(d, (int, long)) for d in shape):
+    return None
+  return shape
+
+def overlaps_inputs(out, args):
+  for arg in args:
+    if isinstance(arg, np.ndarray) and np.may_share_memory(arg, out):
+      return True
+    elif isinstance(arg, tuple) and overlaps_inputs(out, arg):
+      return True
+  return False
@@ -8,8 +8,9 @@ class Ref(object):
     pass
 
 class GlobalValueRef(Ref):
-  def __init__(self, value):
+  def __init__(self, value, name = None):
     self.value = value 
+    self.name = name 
     
   def deref(self):
     return self.value 
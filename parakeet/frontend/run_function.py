@@ -1,12 +1,14 @@
 
 from .. import config, type_inference 
+from ..compile_lock import compile_lock
 from ..analysis import contains_loops 
-from ..ndtypes import type_conv, Type, typeof  
+from ..ndtypes import type_conv, Type, typeof, layout_compatible  
 from ..syntax import UntypedFn, TypedFn, ActualArgs
 from ..transforms import pipeline
 
 from .. import c_backend
 from .. import openmp_backend 
+from ..c_backend.prepare_args import prepare_args as prepare_c_args 
 
 import ast_conversion
 
@@ -43,29 +45,32 @@ def specialize(untyped, args, kwargs = {}, optimize = False):
   arguments in a linear order. 
   """
 
-  if not isinstance(untyped, UntypedFn):
-    untyped = ast_conversion.translate_function_value(untyped)
+  with compile_lock:
+    if not isinstance(untyped, UntypedFn):
+      untyped = ast_conversion.translate_function_value(untyped)
        
-  arg_values, arg_types = prepare_args(untyped, args, kwargs)
+    arg_values, arg_types = prepare_args(untyped, args, kwargs)
   
-  # convert the awkward mix of positional, named, and starargs 
-  # into a positional sequence of arguments
-  linear_args = untyped.args.linearize_without_defaults(arg_values)
+    # convert the awkward mix of positional, named, and starargs 
+    # into a positional sequence of arguments
+    linear_args = untyped.args.linearize_without_defaults(arg_values)
   
-  # propagate types through function representation and all
-  # other functions it calls
+    # propagate types through function representation and all
+    # other functions it calls
    
-  typed_fn = type_inference.specialize(untyped, arg_types)
-  if optimize: 
-    from .. transforms.pipeline import normalize 
-    # apply high level optimizations 
-    typed_fn = normalize.apply(typed_fn)
-  return typed_fn, linear_args 
+    typed_fn = type_inference.specialize(untyped, arg_types)
+    if optimize: 
+      from .. transforms.pipeline import normalize 
+      # apply high level optimizations 
+      typed_fn = normalize.apply(typed_fn)
+    return typed_fn, linear_args 
 
-def run_typed_fn(fn, args, backend = None):
+def run_typed_fn(fn, args, backend = None, schedule = None):
   actual_types = tuple(type_conv.typeof(arg) for arg in  args)
   expected_types = fn.input_types
-  assert actual_types == expected_types, \
+  assert len(actual_types) == len(expected_types) and \
+    all(layout_compatible(actual_t, expected_t) 
+        for (actual_t, expected_t) in zip(actual_types, expected_types)), \
     "Arg type mismatch, expected %s but got %s" % \
     (expected_types, actual_types)
   
@@ -76,7 +81,7 @@ def run_typed_fn(fn, args, backend = None):
     return c_backend.run(fn, args)
    
   elif backend == 'openmp':
-    return openmp_backend.run(fn, args)
+    return openmp_backend.run(fn, args, schedule)
   
   elif backend == 'cuda':
     # only selectively import cuda_backend since it required PyCUDA
@@ -87,8 +92,9 @@ def run_typed_fn(fn, args, backend = None):
     from ..llvm_backend.llvm_context import global_context
     from ..llvm_backend import generic_value_to_python 
     from ..llvm_backend import ctypes_to_generic_value, compile_fn 
-    lowered_fn = pipeline.lowering.apply(fn)
-    llvm_fn = compile_fn(lowered_fn).llvm_fn
+    with compile_lock:
+      lowered_fn = pipeline.lowering.apply(fn)
+      llvm_fn = compile_fn(lowered_fn).llvm_fn
 
     ctypes_inputs = [t.from_python(v) 
                    for (v,t) 
@@ -102,12 +108,30 @@ def run_typed_fn(fn, args, backend = None):
 
   elif backend == "interp":
     from .. import interp 
-    fn = pipeline.loopify(fn)
+    with compile_lock:
+      fn = pipeline.loopify(fn)
     return interp.eval_fn(fn, args)
   
   else:
     assert False, "Unknown backend %s" % backend 
 
+def compile_typed_fn(fn, args, backend = None, schedule = None):
+  """
+  For backends which build a Python extension module, return the CompiledPyFn
+  for the given typed function and linearized args (using the given schedule 
+  for the parallel loops of the OpenMP backend). 
+  Returns None for all other backends. 
+  """
+  if backend is None:
+    backend = config.backend
+  
+  if backend == 'c':
+    return c_backend.compile_fn(fn, prepare_c_args(args, fn.input_types))
+  elif backend == 'openmp':
+    return openmp_backend.compile_fn(fn, prepare_c_args(args, fn.input_types), schedule)
+  else:
+    return None 
+  
 def run_untyped_fn(fn, args, kwargs = None, backend = None):
   assert isinstance(fn, UntypedFn)
   if kwargs is None:
@@ -32,10 +32,18 @@ def typeof_tuple(python_tuple):
 
 register(types.TupleType, TupleT, typeof_tuple)
 
+def array_layout(x):
+  if x.flags.c_contiguous:
+    return 'C'
+  elif x.flags.f_contiguous:
+    return 'F'
+  else:
+    return 'A'
+
 def typeof_array(x):
   x = asarray(x)
   elt_t = scalar_types.from_dtype(x.dtype)
-  return make_array_type(elt_t, x.ndim)
+  return make_array_type(elt_t, x.ndim, array_layout(x))
 
 register(np.ndarray, ArrayT, typeof_array)
 
@@ -1,3 +1,4 @@
+import exceptions 
 import itertools 
 import numpy as np
 import types
@@ -7,7 +8,7 @@ from frontend import ast_conversion
 from ndtypes import ScalarT, StructT,  type_conv     
 from syntax import (Expr, Var, Tuple, 
                     UntypedFn, TypedFn, 
-                    Return, If, While, ForLoop, ParFor, ExprStmt,   
+                    Return, If, While, ForLoop, ParFor, ExprStmt, Check,  
                     ActualArgs, 
                     Assign, Index, )
 
@@ -274,6 +275,13 @@ def eval_fn(fn, actuals):
     def expr_Len():
       return len(eval_expr(expr.value))
     
+    # the interpreter runs everything on a single thread 
+    def expr_NumCores():
+      return 1
+    
+    def expr_ThreadId():
+      return 0
+    
     def normalize_axes(axis, args):
       if isinstance(axis, Expr):
         axis = eval_expr(axis)
@@ -494,6 +502,10 @@ def eval_fn(fn, actuals):
         
     elif isinstance(stmt, ExprStmt):
       eval_expr(stmt.value)
+    
+    elif isinstance(stmt, Check):
+      if not eval_expr(stmt.cond):
+        raise getattr(exceptions, stmt.error)(stmt.message)
       
     elif isinstance(stmt, ParFor):
       fn = eval_expr(stmt.fn)
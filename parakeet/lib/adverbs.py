@@ -4,9 +4,11 @@ from .. syntax import (none, zero_i64,
                        Map, Reduce, Scan, 
                        IndexMap, IndexReduce, 
                        ParFor, OuterMap,
-                       Filter, FilterReduce) 
+                       Filter, FilterReduce, 
+                       Conv, ConvBorderFn, ConvBorderValue, ConvPadding) 
 
 from .. frontend import macro, staged_macro, jit,  translate_function_value 
+from .. frontend.output_param import output_call
 from lib_helpers import _get_shape 
 @jit 
 def identity(x):
@@ -25,8 +27,12 @@ def map(f, *args, **kwds):
     del kwds['axis']
   else:
     axis = zero_i64
+  out = kwds.pop('out', None)
   assert len(kwds) == 0, "map got unexpected keywords %s" % (kwds.keys())
-  return Map(fn = f, args = args, axis = axis)
+  result = Map(fn = f, args = args, axis = axis)
+  if out is not None:
+    return output_call(out, result)
+  return result
 each = map
 
 @staged_macro("axis")
@@ -82,8 +88,13 @@ def scan(f, *args, **kwds):
                      init = init,
                      axis = axis)
 @macro
-def imap(fn, shape):
-  return IndexMap(shape = shape, fn = fn)
+def imap(fn, shape, **kwds):
+  out = kwds.pop('out', None)
+  assert len(kwds) == 0, "imap got unexpected keywords %s" % (kwds.keys())
+  result = IndexMap(shape = shape, fn = fn)
+  if out is not None:
+    return output_call(out, result)
+  return result
 
 
 @macro
@@ -122,3 +133,32 @@ def filter_reduce(f, pred, *args, **kwds):
                       args = args,
                       init = init,
                       axis = axis)
+
+@macro
+def conv(f, x, window_shape, border_value = None, border_fn = None, fill_value = None):
+  """
+  Apply f to every window of shape window_shape (one size or a size per dimension) 
+  in x. Without any border options, only windows which fit inside x are used and 
+  each dimension of the result shrinks by the window size minus one. Otherwise 
+  the result has the shape of x and every element which has its window 
+  sticking out of the array gets: 
+    - border_value 
+    - border_fn applied to the part of the window which is inside x 
+    - f applied to the window, with fill_value for elements outside x 
+  """
+  given = [name for (name, value) in [('border_value', border_value), 
+                                      ('border_fn', border_fn), 
+                                      ('fill_value', fill_value)]
+           if value is not None]
+  assert len(given) <= 1, "conv can't combine %s" % " and ".join(given)
+  if border_value is not None:
+    return ConvBorderValue(fn = f, x = x, window_shape = window_shape, 
+                           border_value = border_value)
+  elif border_fn is not None:
+    return ConvBorderFn(fn = f, x = x, window_shape = window_shape, 
+                        border_fn = border_fn)
+  elif fill_value is not None:
+    return ConvPadding(fn = f, x = x, window_shape = window_shape, 
+                       fill_value = fill_value)
+  return Conv(fn = f, x = x, window_shape = window_shape)
+stencil = conv
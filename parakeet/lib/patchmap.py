@@ -1,16 +1,14 @@
 import numpy as np 
 from .. frontend import jit 
-from adverbs import imap 
+from adverbs import conv
 
 @jit
 def pmap1(f, x, w = 3):
-  n = x.shape[0]
-  def local_apply(i):
-    lower = __builtins__.max(i-w/2, 0)
-    upper = __builtins__.min(i+w/2+1, n)
-    elts = x[lower:upper]
-    return f(elts)
-  return imap(local_apply, n)
+  """
+  Apply f to the window of width w centered on each element, 
+  where windows on the border are cut short
+  """
+  return conv(f, x, 2 * (w / 2) + 1, border_fn = f)
 
 @jit  
 def pmap2(f, x, width = (3,3)):
@@ -19,18 +17,7 @@ def pmap2(f, x, width = (3,3)):
   and smaller border windows
   """
   width_x, width_y = width 
-  n_rows, n_cols = x.shape
-  hx = width_x / 2
-  hy = width_y / 2
-  
-  def local_apply((i,j)):
-    lx = __builtins__.max(i-hx, 0)
-    ux = __builtins__.min(i+hx+1, n_rows)
-    ly = __builtins__.max(j-hy, 0)
-    uy = __builtins__.min(j+hy+1, n_cols)
-    return f(x[lx:ux, ly:uy])
-    
-  return imap(local_apply, x.shape)
+  return conv(f, x, (2 * (width_x / 2) + 1, 2 * (width_y / 2) + 1), border_fn = f)
     
 @jit  
 def pmap2_trim(f, x, width = (3,3), step = (1,1)):
@@ -5,7 +5,7 @@ from adverbs import scan
 
 from .. frontend import translate_function_value
 
-from .. syntax import Reduce, Const 
+from .. syntax import Reduce, Scan, Const 
 from ..syntax.helpers import none, false, true, one_i32, zero_i32, zero_i24
  
 from adverbs import reduce
@@ -22,6 +22,15 @@ def mk_reduce(combiner, x, init, axis):
                 init = init, 
                 axis = axis)
 
+def mk_scan(combiner, x, init, axis):
+  identity = translate_function_value(_identity)
+  return Scan(fn = identity, 
+              combine = translate_function_value(combiner), 
+              emit = identity, 
+              args = (x,), 
+              init = init, 
+              axis = axis)
+
 @axis_macro
 def reduce_min(x, axis = None):
   return mk_reduce(prims.minimum, x, init = None, axis = axis)
@@ -67,13 +76,13 @@ def prod(x, axis=None):
 def mean(x, axis = None):
   return sum(x, axis = axis) / x.shape[0]
 
-@jit 
+@axis_macro 
 def cumsum(x, axis = None):
-  return scan(prims.add, x, axis = axis)
+  return mk_scan(prims.add, x, init = zero_i24, axis = axis)
 
-@jit 
+@axis_macro 
 def cumprod(x, axis = None):
-  return scan(prims.multiply, x, axis = axis)
+  return mk_scan(prims.multiply, x, init = true, axis = axis)
 
 @jit 
 def vdot(x,y):
@@ -188,6 +188,8 @@ function_mappings = {
   np.where : lib.where,
   np.linspace : lib.linspace, 
   np.vdot : lib.vdot, 
+  np.cumsum : lib.cumsum, 
+  np.cumprod : lib.cumprod, 
   np.dot : lib.dot,
   np.linalg.norm : lib.linalg.norm,  
 }
@@ -1,4 +1,4 @@
-from array_type import (ArrayT, make_array_type,
+from array_type import (ArrayT, make_array_type, layout_compatible, is_mask,
                         elt_type, elt_types, rank,
                         get_rank, lower_rank,
                         lower_rank, lower_ranks, increase_rank)
@@ -4,14 +4,24 @@ from scalar_types import Int64, ScalarT, IntT, BoolT
 from tuple_type import TupleT, repeat_tuple
 from slice_type import SliceT
   
+# Memory layouts an array type can promise: 
+#   'C' -- contiguous in row-major order, 
+#   'F' -- contiguous in column-major order, 
+#   'A' -- any strides at all 
+# Only array values whose flags we can check (such as the inputs to 
+# a function) get a contiguous layout, everything derived from them is 'A' 
+layouts = ('C', 'F', 'A')
+
 class ArrayT(StructT):
   
-  def __init__(self, elt_type, rank):
+  def __init__(self, elt_type, rank, layout = 'A'):
     assert isinstance(elt_type, ScalarT), \
       "Can't create array with element type %s, currently only scalar elements supported" % \
       (elt_type,)
+    assert layout in layouts, "Unknown array layout %s" % (layout,)
     self.elt_type = elt_type
     self.rank = rank 
+    self.layout = layout 
     
     tuple_t = repeat_tuple(Int64, self.rank)
 
@@ -26,7 +36,7 @@ class ArrayT(StructT):
       ('size', Int64),
       # ('dtype', TypeValueT(self.elt_type))
     ]
-    self._hash = hash( (elt_type, rank) )
+    self._hash = hash( (elt_type, rank, layout) )
   
   def children(self):
     yield self.elt_type
@@ -38,14 +48,35 @@ class ArrayT(StructT):
     return self.elt_type.dtype
 
   def __str__(self):
-    return "array%d(%s)" % (self.rank, self.elt_type)
+    if self.layout == 'A':
+      return "array%d(%s)" % (self.rank, self.elt_type)
+    else:
+      return "array%d(%s, %s)" % (self.rank, self.elt_type, self.layout)
 
   def __eq__(self, other):
     if self is other:
       return True 
     return other.__class__ is ArrayT and \
         self.elt_type == other.elt_type and \
-        self.rank == other.rank
+        self.rank == other.rank and \
+        self.layout == other.layout 
+
+  def is_contiguous(self):
+    return self.layout != 'A'
+  
+  def without_layout(self):
+    return make_array_type(self.elt_type, self.rank)
+
+  def unit_stride_dim(self):
+    """
+    Which dimension is known to have a stride of one element, if any
+    """
+    if self.layout == 'C':
+      return self.rank - 1
+    elif self.layout == 'F':
+      return 0
+    else:
+      return None
 
   def __hash__(self):
     return self._hash 
@@ -60,7 +91,9 @@ class ArrayT(StructT):
     elif other.__class__ is ArrayT:
       assert self.rank == other.rank
       combined_elt_t = self.elt_type.combine(other.elt_type)
-      return make_array_type(combined_elt_t, self.rank)
+      # arrays with different layouts can only be merged as strided arrays 
+      layout = self.layout if self.layout == other.layout else 'A'
+      return make_array_type(combined_elt_t, self.rank, layout)
     else:
       raise IncompatibleTypes(self, other)
 
@@ -77,37 +110,66 @@ class ArrayT(StructT):
     else:
       indices = (idx,)
 
-    n_indices = len(indices)
+    # a boolean mask covers as many dimensions as it has
+    n_indices = sum(t.rank if is_mask(t) else 1 for t in indices)
     n_required = self.rank
     if n_required > n_indices:
       n_missing = n_required - n_indices
       extra_indices = (NoneType,) * n_missing
       indices = indices + extra_indices
 
-    # we lose one result dimension for each int in the index set
+    # we lose one result dimension for each int or index array in the 
+    # index set and as many as it has for each boolean mask, but the index 
+    # arrays all get broadcast together into dimensions of their own 
+    # (where a mask counts as a vector of the positions it selects)
     result_rank = n_required
+    broadcast_rank = 0
     for t in indices:
       if isinstance(t, (BoolT, IntT)):
         result_rank -= 1
+      elif is_mask(t):
+        result_rank -= t.rank
+        broadcast_rank = max(broadcast_rank, 1)
+      elif t.__class__ is ArrayT:
+        result_rank -= 1
+        broadcast_rank = max(broadcast_rank, t.rank)
       else:
-        assert isinstance(t,  (TupleT, NoneT, SliceT, ArrayT, )),  "Unexpected index type: %s " % t
+        assert isinstance(t,  (TupleT, NoneT, SliceT)),  "Unexpected index type: %s " % t
+    result_rank += broadcast_rank
     if result_rank > 0:
       return make_array_type(self.elt_type, result_rank)
     else:
       return self.elt_type
 
+def is_mask(t):
+  return t.__class__ is ArrayT and isinstance(t.elt_type, BoolT)
+
 _array_types = {}
-def make_array_type(elt_t, rank):
-  key = (elt_t, rank)
+def make_array_type(elt_t, rank, layout = 'A'):
+  # a contiguous vector is both C and F ordered 
+  if rank == 1 and layout == 'F':
+    layout = 'C'
+  key = (elt_t, rank, layout)
   arr_t = _array_types.get(key)
   if arr_t is None: 
     if rank == 0:  
       arr_t = elt_t 
     else: 
-      arr_t = ArrayT(elt_t, rank)
+      arr_t = ArrayT(elt_t, rank, layout)
     _array_types[key] = arr_t
   return arr_t
 
+def layout_compatible(t1, t2):
+  """
+  Is a value of type t1 usable where t2 is expected? Contiguous arrays 
+  can be used anywhere that strided arrays of the same element type 
+  and rank are expected.  
+  """
+  if t1 == t2:
+    return True 
+  return t1.__class__ is ArrayT and t2.__class__ is ArrayT and \
+    t2.layout == 'A' and t1.without_layout() == t2 
+
 def elt_type(t):
   if t.__class__ is ArrayT:
     return t.elt_type
@@ -0,0 +1,59 @@
+"""
+The number of threads which compiled OpenMP kernels should run on. The count
+gets passed to the entry point of each call, so changing it doesn't recompile
+anything. Without a count OpenMP picks the size of its teams itself
+(from OMP_NUM_THREADS or the number of cores).
+"""
+from contextlib import contextmanager
+import threading
+
+# count set by set_num_threads for every thread of the process,
+# None leaves the choice to OpenMP
+_process_count = None
+
+# counts chosen with the threads() context manager, which only
+# apply to calls made from the thread which entered the block
+_local = threading.local()
+
+def _check(n):
+  assert n is None or (isinstance(n, (int, long)) and n > 0), \
+    "Expected a positive number of threads, got %s" % (n,)
+
+def set_num_threads(n):
+  """
+  Run the parallel regions of every later call on n threads,
+  or let OpenMP decide again if n is None
+  """
+  global _process_count
+  _check(n)
+  _process_count = n
+
+def get_num_threads():
+  """
+  The number of threads which a call from this thread would ask for,
+  or None if it's left to OpenMP
+  """
+  n = getattr(_local, 'count', None)
+  if n is None:
+    return _process_count
+  return n
+
+@contextmanager
+def threads(n):
+  """
+  Run the parallel regions of calls made from inside the block on n threads
+  """
+  _check(n)
+  old_count = getattr(_local, 'count', None)
+  _local.count = n
+  try:
+    yield
+  finally:
+    _local.count = old_count
+
+def with_num_threads(args):
+  """Append the requested thread count, if any, to the arguments of an entry point"""
+  n = get_num_threads()
+  if n is None:
+    return args
+  return tuple(args) + (n,)
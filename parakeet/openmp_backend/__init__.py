@@ -1,2 +1,2 @@
 from multicore_compiler import MulticoreCompiler
-from run_function import run 
\ No newline at end of file
+from run_function import run, compile_fn 
\ No newline at end of file
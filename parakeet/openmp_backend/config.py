@@ -1,2 +1,32 @@
 collapse_nested_loops = True
 schedule = 'static'
+
+# schedules (OpenMP schedule kind and chunk size, 0 for the default chunk) timed 
+# by jit functions compiled with schedule = 'auto', each on auto_schedule_trials 
+# calls of every signature before the fastest gets used for the rest of them 
+auto_schedule_candidates = [('static', 0), ('dynamic', 1), ('dynamic', 16), 
+                            ('dynamic', 128), ('guided', 1), ('guided', 16)]
+auto_schedule_trials = 2
+
+# split IndexReduce across threads, each folding its own chunk 
+# into a partial result which gets combined at the end 
+parallel_reductions = True
+
+# split 1D IndexScans of at least min_parallel_scan_size elements into 
+# per-thread blocks, which costs an extra pass over the input 
+parallel_scans = True
+min_parallel_scan_size = 10000
+
+# pack the elements which pass an IndexFilter's predicate in two parallel passes
+# (counting, then writing each chunk at its offset) once there are at least 
+# min_parallel_filter_size indices to check, which evaluates the predicate twice 
+parallel_filters = True
+min_parallel_filter_size = 10000
+
+# give each top-level ParFor and parallel reduction an OpenMP if() clause which 
+# keeps it on the calling thread unless its iterations add up to at least 
+# min_parallel_work units of estimated work (about one arithmetic operation or 
+# memory access each). Leaving min_parallel_work as None measures the cost of 
+# starting a parallel loop once per machine and saves it under c_backend.config.cache_dir 
+parallel_if_clause = True
+min_parallel_work = None
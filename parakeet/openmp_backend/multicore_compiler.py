@@ -1,22 +1,32 @@
-import multiprocessing 
 
+import math
+
+from ..analysis import estimate_cost
 from ..syntax import Expr, Tuple
-from ..syntax.helpers import get_fn, return_type
+from ..syntax.helpers import get_fn, is_none, return_type
 from ..ndtypes import ScalarT, TupleT, ArrayT
 from ..c_backend import PyModuleCompiler
 
 import config 
+from parallel_threshold import min_parallel_work
+import schedule_tuning
 
 class MulticoreCompiler(PyModuleCompiler):
   
-  def __init__(self, depth = 0, *args, **kwargs):
+  def __init__(self, depth = 0, schedule = None, *args, **kwargs):
     self.depth = depth
+    # how the iterations of parallel loops get split between threads, 
+    # 'auto' picks a schedule at runtime (see schedule_tuning)
+    self.schedule = config.schedule if schedule is None else schedule 
     self.seen_parfor = None 
+    # holds the caller's thread count while the entry function runs with its own 
+    self.saved_num_threads = None 
+    self.saved_schedule = None 
     PyModuleCompiler.__init__(self, *args, **kwargs)
   
   @property 
   def cache_key(self):
-    return self.__class__, self.depth > 0
+    return self.__class__, self.depth > 0, self.schedule
   
   _loop_var_names = ["i","j","k","l","a","b","c","ii","jj","kk","ll","aa","bb","cc"] 
   def loop_vars(self, count, init_value = "0"):
@@ -25,8 +35,70 @@ class MulticoreCompiler(PyModuleCompiler):
             for i in xrange(count)]
        
   def visit_NumCores(self, expr):
-    # by default we're running sequentially 
-    return "%d" % multiprocessing.cpu_count()
+    # upper bound on the size of any team of threads running a ParFor
+    self.declare_omp_api()
+    return "omp_get_max_threads()"
+  
+  def visit_ThreadId(self, expr):
+    self.declare_omp_api()
+    return "omp_get_thread_num()"
+  
+  def enter_module_body(self):
+    # a thread count following the inputs sets the size of this call's teams,
+    # and with it the value of NumCores (modules without any parallel regions 
+    # don't get linked against OpenMP and have no teams to size) 
+    self.declare_omp_api()
+    args = self.entry_args
+    n = self.n_entry_args
+    saved = self.fresh_var("int", "saved_num_threads", "0")
+    self.append("""
+      #ifdef _OPENMP
+      if (PyTuple_GET_SIZE(%(args)s) > %(n)d) {
+        long requested = PyInt_AsLong(PyTuple_GET_ITEM(%(args)s, %(n)d));
+        if (requested > 0) {
+          %(saved)s = omp_get_max_threads();
+          omp_set_num_threads((int) requested);
+        }
+      }
+      #endif""" % locals())
+    self.saved_num_threads = saved 
+    if self.schedule == 'auto':
+      self.use_module_schedule()
+  
+  def use_module_schedule(self):
+    # run with the schedule stored in this extension module  
+    if schedule_tuning.state_sig not in self.extra_function_signatures:
+      self.extra_function_signatures.append(schedule_tuning.state_sig)
+      self.extra_functions[schedule_tuning.state_sig] = schedule_tuning.state_source
+      self.extra_method_names.append(schedule_tuning.setter_method_name)
+    self.add_decl("void omp_get_schedule(int*, int*)")
+    self.add_decl("void omp_set_schedule(int, int)")
+    kind = self.fresh_var("int", "saved_schedule_kind", "0")
+    chunk = self.fresh_var("int", "saved_schedule_chunk", "0")
+    self.append("""
+      #ifdef _OPENMP
+      omp_get_schedule(&%(kind)s, &%(chunk)s);
+      omp_set_schedule(parakeet_schedule_kind, parakeet_schedule_chunk);
+      #endif""" % locals())
+    self.saved_schedule = (kind, chunk)
+  
+  def exit_module_body(self):
+    self.saved_num_threads = None 
+    self.saved_schedule = None 
+  
+  def before_module_return(self):
+    # give the calling thread back its own thread count and schedule 
+    saved = self.saved_num_threads
+    if saved is not None:
+      self.append("""
+        #ifdef _OPENMP
+        if (%s > 0) { omp_set_num_threads(%s); }
+        #endif""" % (saved, saved))
+    if self.saved_schedule is not None:
+      self.append("""
+        #ifdef _OPENMP
+        omp_set_schedule(%s, %s);
+        #endif""" % self.saved_schedule)
   
   def tuple_to_var_list(self, expr):
     assert isinstance(expr, Expr)
@@ -40,11 +112,13 @@ class MulticoreCompiler(PyModuleCompiler):
       return [self.visit_expr(expr)]
   
   
-  def get_fn_name(self, fn_expr, attributes = [], inline = True):
+  def get_fn_name(self, fn_expr, attributes = [], inline = True, call_args = ()):
     return PyModuleCompiler.get_fn_name(self, fn_expr, 
-                                        compiler_kwargs = {'depth':self.depth}, 
+                                        compiler_kwargs = {'depth' : self.depth, 
+                                                           'schedule' : self.schedule}, 
                                         attributes = attributes, 
-                                        inline = inline)
+                                        inline = inline, 
+                                        call_args = call_args)
   
   def get_fn_info(self, fn_expr, attributes = [], inline = True):
     """
@@ -103,6 +177,28 @@ class MulticoreCompiler(PyModuleCompiler):
   def exit_parfor(self):
     self.depth -= 1
 
+  def build_tiled_loops(self, tile_vars, loop_vars, bounds, tile_sizes, body):
+    """
+    Outer loops step through the starting indices of each tile, 
+    inner loops cover the indices within a tile 
+    """
+    inner = body 
+    for (var, tile_var, bound, tile_size) in \
+        reversed(zip(loop_vars, tile_vars, bounds, tile_sizes)):
+      stop = "(%s + %s < %s ? %s + %s : %s)" % \
+        (tile_var, tile_size, bound, tile_var, tile_size, bound)
+      inner = """
+    for (%s = %s; %s < %s; ++%s) {
+      %s
+    }""" % (var, tile_var, var, stop, var, inner)
+    outer = inner 
+    for (tile_var, bound, tile_size) in reversed(zip(tile_vars, bounds, tile_sizes)):
+      outer = """
+    for (%s = 0; %s < %s; %s += %s) {
+      %s
+    }""" % (tile_var, tile_var, bound, tile_var, tile_size, outer)
+    return outer 
+
   def visit_ParFor(self, stmt):
     bounds = self.tuple_to_var_list(stmt.bounds)
     n_vars = len(bounds)
@@ -110,7 +206,14 @@ class MulticoreCompiler(PyModuleCompiler):
     
     self.enter_parfor()
     body, private_vars = self.build_loop_body(stmt.fn, loop_vars)
-    loops = self.build_loops(loop_vars, bounds, body)
+    if stmt.tile_sizes is None:
+      loops = self.build_loops(loop_vars, bounds, body)
+    else:
+      tile_sizes = self.tuple_to_var_list(stmt.tile_sizes)
+      tile_vars = [self.fresh_var("int64_t", "tile_" + var, "0") for var in loop_vars]
+      loops = self.build_tiled_loops(tile_vars, loop_vars, bounds, tile_sizes, body)
+      # only the loops over tiles get split between threads 
+      private_vars = tile_vars + private_vars 
     self.exit_parfor()
     
     if self.depth == 0:  
@@ -120,49 +223,314 @@ class MulticoreCompiler(PyModuleCompiler):
       
       if config.collapse_nested_loops:
         omp = "#pragma omp parallel for private(%s) schedule(%s)" % \
-          (", ".join(private_vars), config.schedule)
+          (", ".join(private_vars), schedule_tuning.omp_schedule(self.schedule))
         if len(loop_vars) > 1:
           omp += " collapse(%d)" % len(loop_vars)
       else:
         omp = "#pragma omp parallel for private(%s) schedule(%s)" % \
-          (private_vars[0], config.schedule)
+          (", ".join(private_vars), schedule_tuning.omp_schedule(self.schedule))
+      omp += self.parallel_if(bounds, [stmt.fn])
       return release_gil + omp + loops + acquire_gil    
     else:
       return loops 
      
+  def parallel_if(self, bounds, fns):
+    """
+    OpenMP clause which only forks a team of threads when the iterations 
+    (each calling all of the given functions) have enough work between them 
+    """
+    if not config.parallel_if_clause:
+      return ""
+    cost_per_iter = max(sum(estimate_cost(get_fn(fn)) for fn in fns), 1)
+    min_iters = int(math.ceil(min_parallel_work() / float(cost_per_iter)))
+    if min_iters <= 1:
+      return ""
+    n_iters = " * ".join("(%s)" % bound for bound in bounds)
+    return " if(%s >= %d)" % (n_iters, min_iters)
+  
+  def declare_omp_api(self):
+    self.add_decl("int omp_get_max_threads(void)")
+    self.add_decl("int omp_get_thread_num(void)")
+    self.add_decl("void omp_set_num_threads(int)")
+  
+  def omp_for(self, n_loops, schedule = None):
+    if schedule is None:
+      schedule = schedule_tuning.omp_schedule(self.schedule)
+    omp = "#pragma omp for schedule(%s)" % schedule
+    if config.collapse_nested_loops and n_loops > 1:
+      omp += " collapse(%d)" % n_loops
+    return omp 
+  
+  def parallel_reduction_ok(self, expr):
+    """
+    Partial results can only be combined with each other when the 
+    accumulator, the elements and both inputs of the combiner all share a type
+    """
+    if self.depth > 0 or not config.parallel_reductions:
+      return False 
+    if expr.start_index is not None and not is_none(expr.start_index):
+      return False 
+    combine_input_types = get_fn(expr.combine).input_types[-2:]
+    return return_type(expr.fn) == expr.type and \
+      tuple(combine_input_types) == (expr.type, expr.type)
+  
   def visit_IndexReduce(self, expr):
+    return self.visit_index_reduction(expr)
+  
+  def visit_IndexFilterReduce(self, expr):
+    return self.visit_index_reduction(expr, pred = expr.pred)
+  
+  def visit_index_reduction(self, expr, pred = None):
     """
-    For now, just use a sequential implementation for reductions
+    Reduce the elements which 'fn' produces at each index, skipping the indices 
+    where 'pred' is False if it's given. Only a filtered reduction can do 
+    without an initial value, in which case reducing no elements gives zero. 
     """
     bounds = self.tuple_to_var_list(expr.shape)
     n_vars = len(bounds)
-    combine_name, combine_closure_args, _ = self.get_fn_info(expr.combine)
     loop_vars = self.loop_vars(n_vars)
-    assert expr.init is not None, "Accumulator required but not given"
-    
+    has_init = expr.init is not None and not is_none(expr.init)
+    assert has_init or pred is not None, "Accumulator required but not given"
     
     elt = self.fresh_var(return_type(expr.fn), "elt")
-
-    body, _ = self.build_loop_body(expr.fn, loop_vars, target_name = elt)
-    acc = self.fresh_var(expr.type, "acc", self.visit_expr(expr.init))
-    combine_arg_str = ", ".join(tuple(combine_closure_args) + (acc, elt))
-    body += "\n%s = %s(%s);\n" % (acc, combine_name, combine_arg_str)
-    self.append(self.build_loops(loop_vars, bounds, body))
+    if has_init:
+      acc = self.fresh_var(expr.type, "acc", self.visit_expr(expr.init))
+    else:
+      acc = self.fresh_var(expr.type, "acc", "0")
+      acc_has_value = self.fresh_var("char", "acc_has_value", "0")
+    
+    parallel = self.parallel_reduction_ok(expr)
+    if parallel:
+      self.enter_parfor()
+    body, private_vars = self.build_loop_body(expr.fn, loop_vars, target_name = elt)
+    combine_name, combine_closure_args, _ = self.get_fn_info(expr.combine)
+    if pred is not None:
+      keep = self.fresh_var(return_type(pred), "keep")
+      pred_body, pred_private_vars = self.build_loop_body(pred, loop_vars, target_name = keep)
+      private_vars = private_vars + pred_private_vars[n_vars:] + [keep]
+    if parallel:
+      self.exit_parfor()
+    
+    def combine(x, y):
+      return "%s(%s)" % (combine_name, ", ".join(tuple(combine_closure_args) + (x, y)))
+    
+    def accumulate(acc, has_value, elt):
+      return """
+      if (%(has_value)s) { %(acc)s = %(combined)s; }
+      else { %(acc)s = %(elt)s; %(has_value)s = 1; }
+      """ % {'has_value' : has_value, 'acc' : acc, 'elt' : elt, 'combined' : combine(acc, elt)}
+    
+    def accumulate_into_acc(elt):
+      if has_init:
+        return "\n%s = %s;\n" % (acc, combine(acc, elt))
+      else:
+        return accumulate(acc, acc_has_value, elt)
+    
+    def filtered(body):
+      if pred is None:
+        return body 
+      return pred_body + "\nif (%s) {\n%s\n}\n" % (keep, body)
+    
+    if not parallel:
+      # sequential fallback, used inside parallel loops and 
+      # whenever partial accumulators can't be combined 
+      body += accumulate_into_acc(elt)
+      self.append(self.build_loops(loop_vars, bounds, filtered(body)))
+      return acc 
+    
+    # Each thread folds its own contiguous (static) chunk of the iteration space
+    # into a partial accumulator, then the partials get combined in thread order 
+    # so that only associativity of the combiner is required. 
+    self.declare_omp_api()
+    
+    acc_t = self.to_ctype(expr.type)
+    n_threads = self.fresh_var("int", "n_threads", "omp_get_max_threads()")
+    partials = self.fresh_var("%s*" % acc_t, "partials", 
+                              "(%s*) malloc(sizeof(%s) * %s)" % (acc_t, acc_t, n_threads))
+    has_partial = self.fresh_var("char*", "has_partial", 
+                                 "(char*) calloc(%s, sizeof(char))" % n_threads)
+    local_acc = self.fresh_name("local_acc")
+    local_has_value = self.fresh_name("local_has_value")
+    thread_id = self.fresh_name("thread_id")
+    
+    body += accumulate(local_acc, local_has_value, elt)
+    loops = self.build_loops(loop_vars, bounds, filtered(body))
+    private_vars.append(elt)
+    fns = [expr.fn, expr.combine] if pred is None else [expr.fn, expr.combine, pred]
+    self.append("""
+    Py_BEGIN_ALLOW_THREADS
+    #pragma omp parallel private(%(private_vars)s)%(parallel_if)s
+    {
+      int %(thread_id)s = omp_get_thread_num();
+      %(acc_t)s %(local_acc)s;
+      char %(local_has_value)s = 0;
+      %(omp_for)s nowait
+      %(loops)s
+      %(partials)s[%(thread_id)s] = %(local_acc)s;
+      %(has_partial)s[%(thread_id)s] = %(local_has_value)s;
+    }
+    Py_END_ALLOW_THREADS
+    """ % {'private_vars' : ", ".join(private_vars), 
+           'thread_id' : thread_id, 
+           'acc_t' : acc_t, 
+           'local_acc' : local_acc, 
+           'local_has_value' : local_has_value,
+           'parallel_if' : self.parallel_if(bounds, fns), 
+           'omp_for' : self.omp_for(n_vars, schedule = "static"), 
+           'loops' : loops,  
+           'partials' : partials, 
+           'has_partial' : has_partial})
+    t = self.fresh_var("int", "t")
+    self.append("""
+    for (%(t)s = 0; %(t)s < %(n_threads)s; ++%(t)s) {
+      if (%(has_partial)s[%(t)s]) { %(accumulate)s }
+    }
+    free(%(partials)s);
+    free(%(has_partial)s);
+    """ % {'t' : t, 
+           'n_threads' : n_threads, 
+           'has_partial' : has_partial, 
+           'accumulate' : accumulate_into_acc("%s[%s]" % (partials, t)), 
+           'partials' : partials})
     return acc 
+  
+  def parallel_filter_ok(self, expr):
+    return self.depth == 0 and config.parallel_filters and \
+      (expr.start_index is None or is_none(expr.start_index))
+  
+  def visit_IndexFilter(self, expr):
+    elt_t = return_type(expr.fn)
+    assert isinstance(elt_t, ScalarT), \
+      "Filtered values of type %s should have been gathered by an IndexMap" % elt_t  
+    bounds = self.tuple_to_var_list(expr.shape)
+    n_vars = len(bounds)
+    loop_vars = self.loop_vars(n_vars)
+    keep = self.fresh_var(return_type(expr.pred), "keep")
+    elt = self.fresh_var(elt_t, "elt")
+    count = self.fresh_var("int64_t", "count", "0")
     
-  def visit_IndexScan(self, expr):
+    parallel = self.parallel_filter_ok(expr)
+    if parallel:
+      self.enter_parfor()
+    pred_body, private_vars = self.build_loop_body(expr.pred, loop_vars, target_name = keep)
+    elt_body, elt_private_vars = self.build_loop_body(expr.fn, loop_vars, target_name = elt)
+    if parallel:
+      self.exit_parfor()
+    private_vars = private_vars + elt_private_vars[n_vars:] + [keep, elt]
+    
+    def count_body(counter):
+      return pred_body + "\nif (%s) { ++%s; }\n" % (keep, counter)
+    
+    def fill_body(result, pos):
+      return pred_body + """
+      if (%(keep)s) {
+        %(elt_body)s
+        %(store)s
+        ++%(pos)s;
+      }""" % {'keep' : keep, 
+              'elt_body' : elt_body, 
+              'pos' : pos, 
+              'store' : self.setidx(result, [pos], elt, full_array = True, return_stmt = True)}
+    
+    if not parallel:
+      self.append(self.build_loops(loop_vars, bounds, count_body(count)))
+      result = self.alloc_array_of_dims(expr.type, [count])
+      pos = self.fresh_var("int64_t", "pos", "0")
+      self.append(self.build_loops(loop_vars, bounds, fill_body(result, pos)))
+      return result 
+    
+    # Two parallel passes over contiguous chunks of the outermost loop: 
+    #   1) count how many elements of each chunk pass the predicate
+    #   2) after a sequential prefix sum over the chunk counts, each chunk 
+    #      writes the elements it keeps starting from its own offset 
+    # The chunks don't depend on the size of the team of threads,
+    # so both passes split up the iterations the same way.  
+    self.declare_omp_api()
+    n = bounds[0]
+    i = loop_vars[0]
+    chunk = self.fresh_var("int", "chunk")
+    n_chunks = self.fresh_var("int", "n_chunks", "omp_get_max_threads()")
+    chunk_offsets = self.fresh_var("int64_t*", "chunk_offsets", "NULL")
+    chunk_pos = self.fresh_name("chunk_pos")
+    names = {
+      'n' : n, 
+      'i' : i, 
+      'count' : count, 
+      'private_vars' : ", ".join(private_vars), 
+      'threshold' : config.min_parallel_filter_size, 
+      'n_iters' : " * ".join(bounds), 
+      'chunk' : chunk, 
+      'n_chunks' : n_chunks, 
+      'chunk_offsets' : chunk_offsets, 
+      'chunk_count' : self.fresh_name("chunk_count"),
+      'chunk_pos' : chunk_pos,
+      'start' : "(%s * %s) / %s" % (n, chunk, n_chunks),   
+      'stop' : "(%s * (%s + 1)) / %s" % (n, chunk, n_chunks),  
+      'sequential_count' : self.build_loops(loop_vars, bounds, count_body(count)), 
+      'inner_count' : self.build_loops(loop_vars[1:], bounds[1:], count_body(chunk_pos)), 
+    }
+    self.append("""
+    if (%(n_iters)s < %(threshold)s) {
+      %(sequential_count)s
+    } else {
+      %(chunk_offsets)s = (int64_t*) malloc(sizeof(int64_t) * %(n_chunks)s);
+      Py_BEGIN_ALLOW_THREADS
+      #pragma omp parallel for private(%(private_vars)s) schedule(static)
+      for (%(chunk)s = 0; %(chunk)s < %(n_chunks)s; ++%(chunk)s) {
+        int64_t %(chunk_pos)s = 0;
+        for (%(i)s = %(start)s; %(i)s < %(stop)s; ++%(i)s) {
+          %(inner_count)s
+        }
+        %(chunk_offsets)s[%(chunk)s] = %(chunk_pos)s;
+      }
+      Py_END_ALLOW_THREADS
+      for (%(chunk)s = 0; %(chunk)s < %(n_chunks)s; ++%(chunk)s) {
+        int64_t %(chunk_count)s = %(chunk_offsets)s[%(chunk)s];
+        %(chunk_offsets)s[%(chunk)s] = %(count)s;
+        %(count)s += %(chunk_count)s;
+      }
+    }
+    """ % names)
+    result = self.alloc_array_of_dims(expr.type, [count])
+    pos = self.fresh_var("int64_t", "pos", "0")
+    names['sequential_fill'] = self.build_loops(loop_vars, bounds, fill_body(result, pos))
+    names['inner_fill'] = self.build_loops(loop_vars[1:], bounds[1:], fill_body(result, chunk_pos))
+    self.append("""
+    if (%(chunk_offsets)s == NULL) {
+      %(sequential_fill)s
+    } else {
+      Py_BEGIN_ALLOW_THREADS
+      #pragma omp parallel for private(%(private_vars)s) schedule(static)
+      for (%(chunk)s = 0; %(chunk)s < %(n_chunks)s; ++%(chunk)s) {
+        int64_t %(chunk_pos)s = %(chunk_offsets)s[%(chunk)s];
+        for (%(i)s = %(start)s; %(i)s < %(stop)s; ++%(i)s) {
+          %(inner_fill)s
+        }
+      }
+      Py_END_ALLOW_THREADS
+      free(%(chunk_offsets)s);
+    }
+    """ % names)
+    return result 
+    
+  def parallel_scan_ok(self, expr, n_loops):
     """
-    For now, just use a sequential implementation for scans
+    Only 1D scans are split into blocks, and just like reductions, 
+    the partial results of blocks have to be combinable with each other
     """
+    if self.depth > 0 or n_loops != 1 or not config.parallel_scans:
+      return False 
+    combine_input_types = get_fn(expr.combine).input_types[-2:]
+    acc_t = expr.init.type
+    return return_type(expr.fn) == acc_t and tuple(combine_input_types) == (acc_t, acc_t)
+    
+  def visit_IndexScan(self, expr):
     assert isinstance(expr.type, ArrayT), "Expected output of Scan to be an array"
     
     bounds = self.tuple_to_var_list(expr.shape)
     n_vars = len(bounds)
-    
-    combine_name, combine_closure_args, _ = self.get_fn_info(expr.combine)
     loop_vars = self.loop_vars(n_vars)
     
-    
     result = self.alloc_array(expr.type, expr.shape)
     
     assert expr.init is not None, "Accumulator required but not given"
@@ -170,20 +538,116 @@ class MulticoreCompiler(PyModuleCompiler):
     elt_t = return_type(expr.fn) 
     assert isinstance(elt_t, ScalarT), "Scans of non-scalar values (%s) not yet implemented" % elt_t
     elt = self.fresh_var(elt_t, "elt")
-    body, _ = self.build_loop_body(expr.fn, loop_vars, target_name = elt)
     acc = self.fresh_var(expr.init.type, "acc", self.visit_expr(expr.init))
-    combine_arg_str = ", ".join(tuple(combine_closure_args) + (acc, elt))
-    body += "\n%s = %s(%s);\n" % (acc, combine_name, combine_arg_str)
+    
+    parallel = self.parallel_scan_ok(expr, n_vars)
+    if parallel:
+      self.enter_parfor()
+    elt_body, private_vars = self.build_loop_body(expr.fn, loop_vars, target_name = elt)
+    combine_name, combine_closure_args, _ = self.get_fn_info(expr.combine)
     emit_name, emit_closure_args, _ = self.get_fn_info(expr.emit)
-    body += "\n"
-    emit_args = tuple(emit_closure_args) + (acc,)
-    emit_args_str = ", ".join(emit_args)
-    body += self.setidx(result, 
-                        loop_vars, 
-                        "%s(%s)" % (emit_name, emit_args_str), 
-                        full_array = True, 
-                        return_stmt = True)
-    self.append(self.build_loops(loop_vars, bounds, body))
+    if parallel:
+      self.exit_parfor()
+    
+    def combine(x, y):
+      return "%s(%s)" % (combine_name, ", ".join(tuple(combine_closure_args) + (x, y)))
+    
+    def scan_body(acc):
+      body = elt_body + "\n%s = %s;\n" % (acc, combine(acc, elt))
+      emit_args_str = ", ".join(tuple(emit_closure_args) + (acc,))
+      body += "\n" + self.setidx(result, 
+                                  loop_vars, 
+                                  "%s(%s)" % (emit_name, emit_args_str), 
+                                  full_array = True, 
+                                  return_stmt = True)
+      return body 
+    
+    sequential = self.build_loops(loop_vars, bounds, scan_body(acc))
+    if not parallel:
+      self.append(sequential)
+      return result
+     
+    # Two passes over contiguous blocks, one per thread:
+    #   1) reduce each block to its total 
+    #   2) after a sequential scan over the block totals, rescan each block 
+    #      starting from the combined totals of all the blocks before it
+    # The second pass recomputes the block's scan (rather than fixing up stored 
+    # partial results) since emit may turn accumulators into a different type. 
+    self.declare_omp_api()
+    self.add_decl("int omp_get_num_threads(void)")
+    acc_t = self.to_ctype(expr.init.type)
+    n = bounds[0]
+    i = loop_vars[0]
+    block_totals = self.fresh_name("block_totals")
+    block_acc = self.fresh_name("block_acc")
+    names = {
+      'n' : n, 
+      'i' : i,
+      'acc' : acc, 
+      'acc_t' : acc_t,  
+      'elt' : elt, 
+      'block_totals' : block_totals, 
+      'block_acc' : block_acc, 
+      'thread_id' : self.fresh_name("thread_id"),
+      'n_threads' : self.fresh_name("n_threads"), 
+      'start' : self.fresh_name("block_start"), 
+      'stop' : self.fresh_name("block_stop"),
+      't' : self.fresh_name("t"), 
+      'total' : self.fresh_name("total"), 
+      'private_vars' : ", ".join(private_vars + [elt]), 
+      'threshold' : config.min_parallel_scan_size,  
+      'sequential' : sequential, 
+      'elt_body' : elt_body, 
+      'block_reduce' : combine(block_acc, elt), 
+      'block_scan' : scan_body(block_acc), 
+    }
+    names['running_total'] = combine(acc, names['total'])
+    self.append("""
+    if (%(n)s < %(threshold)s) {
+      %(sequential)s
+    } else {
+      %(acc_t)s* %(block_totals)s = (%(acc_t)s*) malloc(sizeof(%(acc_t)s) * omp_get_max_threads());
+      Py_BEGIN_ALLOW_THREADS
+      #pragma omp parallel private(%(private_vars)s)
+      {
+        int %(thread_id)s = omp_get_thread_num();
+        int %(n_threads)s = omp_get_num_threads();
+        int64_t %(start)s = (%(n)s * %(thread_id)s) / %(n_threads)s;
+        int64_t %(stop)s = (%(n)s * (%(thread_id)s + 1)) / %(n_threads)s;
+        %(acc_t)s %(block_acc)s;
+        if (%(start)s < %(stop)s) {
+          %(i)s = %(start)s;
+          %(elt_body)s
+          %(block_acc)s = %(elt)s;
+          for (%(i)s = %(start)s + 1; %(i)s < %(stop)s; ++%(i)s) {
+            %(elt_body)s
+            %(block_acc)s = %(block_reduce)s;
+          }
+          %(block_totals)s[%(thread_id)s] = %(block_acc)s;
+        }
+        #pragma omp barrier
+        #pragma omp single
+        {
+          int %(t)s;
+          for (%(t)s = 0; %(t)s < %(n_threads)s; ++%(t)s) {
+            if ((%(n)s * %(t)s) / %(n_threads)s < (%(n)s * (%(t)s + 1)) / %(n_threads)s) {
+              %(acc_t)s %(total)s = %(block_totals)s[%(t)s];
+              %(block_totals)s[%(t)s] = %(acc)s;
+              %(acc)s = %(running_total)s;
+            }
+          }
+        }
+        if (%(start)s < %(stop)s) {
+          %(block_acc)s = %(block_totals)s[%(thread_id)s];
+          for (%(i)s = %(start)s; %(i)s < %(stop)s; ++%(i)s) {
+            %(block_scan)s
+          }
+        }
+      }
+      Py_END_ALLOW_THREADS
+      free(%(block_totals)s);
+    }
+    """ % names)
     return result
     
   def visit_Map(self, expr):
@@ -0,0 +1,134 @@
+"""
+How much estimated work (see analysis.cost_model) a parallel region has to
+do before it's worth waking up a team of threads for. Unless
+config.min_parallel_work is set, the threshold comes from a microbenchmark
+which times an empty parallel loop against a simple sequential one. It runs
+once per machine, and its result is saved in the module cache directory.
+"""
+import json
+import multiprocessing
+import os
+import platform
+
+from ..c_backend import config as c_config
+from ..c_backend import instrumentation
+from ..c_backend.compile_util import compile_module_from_source
+from ..compile_lock import compile_lock
+import config
+
+_calibration_filename = "parallel_threshold.json"
+
+_benchmark_fn_name = "parakeet_calibrate_parallel_threshold"
+_benchmark_source = """
+PyObject* %(fn_name)s(PyObject* self, PyObject* args) {
+  int64_t n = 1 << 16, n_small, i, start, elapsed;
+  int64_t fork_ns = -1, work_ns = -1;
+  int batch, rep;
+  double* x = (double*) malloc(sizeof(double) * n);
+  double* y = (double*) malloc(sizeof(double) * n);
+  if (!x || !y) {
+    free(x); free(y);
+    return PyErr_NoMemory();
+  }
+  n_small = omp_get_max_threads();
+  for (i = 0; i < n; ++i) { x[i] = (double) i; y[i] = 0.0; }
+  Py_BEGIN_ALLOW_THREADS
+  for (batch = 0; batch < 5; ++batch) {
+    /* the smallest parallel loop: one iteration for each thread */
+    start = parakeet_clock_ns();
+    for (rep = 0; rep < 100; ++rep) {
+      #pragma omp parallel for schedule(static)
+      for (i = 0; i < n_small; ++i) { y[i] += x[i]; }
+    }
+    elapsed = (parakeet_clock_ns() - start) / 100;
+    if (fork_ns < 0 || elapsed < fork_ns) { fork_ns = elapsed; }
+    /* a sequential loop doing four units of work per iteration
+       (two loads, a multiply-add and a store) */
+    start = parakeet_clock_ns();
+    for (rep = 0; rep < 4; ++rep) {
+      for (i = 0; i < n; ++i) { y[i] = 1.0001 * x[i] + y[i]; }
+    }
+    elapsed = (parakeet_clock_ns() - start) / 4;
+    if (work_ns < 0 || elapsed < work_ns) { work_ns = elapsed; }
+  }
+  Py_END_ALLOW_THREADS
+  free(x);
+  free(y);
+  return Py_BuildValue("(dd)", (double) fork_ns, (double) work_ns / (4.0 * n));
+}
+""" % {'fn_name' : _benchmark_fn_name}
+
+def machine_key():
+  return "%s-%d" % (platform.node(), multiprocessing.cpu_count())
+
+def run_benchmark():
+  """
+  Returns the time (in nanoseconds) taken to start and finish
+  a parallel loop, along with the time taken by one unit of work
+  """
+  compiled = compile_module_from_source(
+    _benchmark_source,
+    fn_name = _benchmark_fn_name,
+    extra_function_sources = [instrumentation.clock_source],
+    declarations = ["int omp_get_max_threads(void)"],
+    extra_compile_flags = ["-fopenmp"],
+    extra_link_flags = ["-fopenmp"],
+    print_source = False)
+  return compiled.c_fn()
+
+def calibrate():
+  fork_ns, unit_ns = run_benchmark()
+  # splitting W units of work between p threads only pays off when
+  # W/p + fork_ns < W, which for any p >= 2 holds once W >= 2 * fork_ns
+  return int(2 * fork_ns / max(unit_ns, 1e-3))
+
+def _calibration_path():
+  if not c_config.cache_dir:
+    return None
+  return os.path.join(c_config.cache_dir, _calibration_filename)
+
+def load_calibration():
+  path = _calibration_path()
+  if path is None or not os.path.exists(path):
+    return None
+  try:
+    with open(path, 'r') as f:
+      return json.load(f).get(machine_key())
+  except (IOError, ValueError):
+    return None
+
+def save_calibration(threshold):
+  path = _calibration_path()
+  if path is None:
+    return
+  saved = {}
+  if os.path.exists(path):
+    try:
+      with open(path, 'r') as f:
+        saved = json.load(f)
+    except (IOError, ValueError):
+      pass
+  saved[machine_key()] = threshold
+  try:
+    if not os.path.exists(c_config.cache_dir):
+      os.makedirs(c_config.cache_dir)
+    tmp_path = "%s.%d" % (path, os.getpid())
+    with open(tmp_path, 'w') as f:
+      json.dump(saved, f)
+    os.rename(tmp_path, path)
+  except (IOError, OSError):
+    pass
+
+_calibrated = None
+def min_parallel_work():
+  global _calibrated
+  if config.min_parallel_work is not None:
+    return config.min_parallel_work
+  with compile_lock:
+    if _calibrated is None:
+      threshold = load_calibration()
+      if threshold is None:
+        threshold = calibrate()
+        save_calibration(threshold)
+      _calibrated = threshold
+  return _calibrated
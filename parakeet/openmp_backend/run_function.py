@@ -1,26 +1,40 @@
 from .. import config 
+from ..compile_lock import compile_lock
+from ..num_threads import with_num_threads
+from ..c_backend import config as c_config
 
 from ..c_backend.prepare_args import prepare_args  
-from ..transforms.pipeline import after_indexify, final_loop_optimizations  
+from ..transforms.pipeline import prealloc_arrays, final_loop_optimizations  
 from ..value_specialization import specialize
 
 
 from multicore_compiler import MulticoreCompiler 
+import config as openmp_config
+import schedule_tuning
 
 _cache = {}
-def run(fn, args):
+def compile_fn(fn, args, schedule = None):
+  """
+  Given a typed function and its already prepared arguments, 
+  return the CompiledPyFn whose entry point c_fn runs it 
+  (with the given OpenMP schedule, or the one from config if it's None)
+  """
+  if schedule is None:
+    schedule = openmp_config.schedule 
+  with compile_lock:
+    fn = prealloc_arrays(fn)
+    fn = final_loop_optimizations.apply(fn)
+    if config.value_specialization:
+      fn = specialize(fn, python_values = args)
+    key = fn.cache_key, c_config.instrument_kernels, schedule
+    if key in _cache:
+      return _cache[key]
+    else:
+      compiled_fn = MulticoreCompiler(schedule = schedule).compile_entry(fn)
+      schedule_tuning.register(compiled_fn.c_fn, compiled_fn.module)
+      _cache[key] = compiled_fn 
+      return compiled_fn
+
+def run(fn, args, schedule = None):
   args = prepare_args(args, fn.input_types)
-  
-  fn = after_indexify(fn)
-  fn = final_loop_optimizations.apply(fn)
-  if config.value_specialization:
-    fn = specialize(fn, python_values = args)
-  key = fn.cache_key 
-  if key in _cache:
-    return _cache[key](*args)
-  else:
-    compiled_fn = MulticoreCompiler().compile_entry(fn)
-    c_fn = compiled_fn.c_fn 
-    _cache[key] = c_fn 
-    return c_fn(*args)
-  
\ No newline at end of file
+  return compile_fn(fn, args, schedule).c_fn(*with_num_threads(args))
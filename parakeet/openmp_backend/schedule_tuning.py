@@ -0,0 +1,89 @@
+"""
+Support for jit functions compiled with schedule = 'auto'. Their parallel
+loops use OpenMP's runtime schedule, which each call's entry point takes from
+a pair of variables in its extension module. The first few calls of each
+signature time every candidate schedule in config.auto_schedule_candidates.
+After that the fastest schedule is kept for the rest of that signature's
+calls, and it's recorded with the signature's entry in the on-disk cache.
+"""
+import time
+
+import config
+
+# values of OpenMP's omp_sched_t
+schedule_kinds = {'static' : 1, 'dynamic' : 2, 'guided' : 3, 'auto' : 4}
+
+state_sig = "static int parakeet_schedule_kind"
+setter_method_name = "parakeet_set_schedule"
+state_source = """
+static int parakeet_schedule_kind = 1;
+static int parakeet_schedule_chunk = 0;
+
+PyObject* %(setter)s(PyObject* self, PyObject* args) {
+  int kind, chunk;
+  if (!PyArg_ParseTuple(args, "ii", &kind, &chunk)) { return NULL; }
+  parakeet_schedule_kind = kind;
+  parakeet_schedule_chunk = chunk;
+  Py_RETURN_NONE;
+}
+""" % {'setter' : setter_method_name}
+
+def omp_schedule(schedule):
+  """The argument of OpenMP's schedule clause for a function's schedule"""
+  if schedule == 'auto':
+    return 'runtime'
+  return schedule
+
+# compiled entry points mapped to the function which sets
+# the schedule of the extension module they live in
+_setters = {}
+
+def register(c_fn, module):
+  setter = getattr(module, setter_method_name, None)
+  if setter is not None:
+    _setters[c_fn] = setter
+
+def is_tunable(c_fn):
+  return c_fn in _setters
+
+def set_schedule(c_fn, schedule):
+  kind, chunk = schedule
+  _setters[c_fn](schedule_kinds[kind], chunk)
+
+class ScheduleTuner(object):
+  """
+  Runs the calls of one entry point under each candidate schedule in turn,
+  then settles on the one with the fastest call and passes it to on_choice
+  """
+
+  def __init__(self, c_fn, on_choice = None):
+    self.c_fn = c_fn
+    self.on_choice = on_choice
+    self.candidates = [(kind, chunk) for (kind, chunk) in config.auto_schedule_candidates]
+    self.n_trials = config.auto_schedule_trials * len(self.candidates)
+    self.best_times = [None] * len(self.candidates)
+    self.n_calls = 0
+    self.choice = None
+
+  @property
+  def done(self):
+    return self.choice is not None
+
+  def __call__(self, args):
+    # go round the candidates rather than trying each one several times in a
+    # row, so that warming up the caches doesn't count against the first
+    i = self.n_calls % len(self.candidates)
+    set_schedule(self.c_fn, self.candidates[i])
+    start = time.time()
+    result = self.c_fn(*args)
+    elapsed = time.time() - start
+    self.n_calls += 1
+    if self.best_times[i] is None or elapsed < self.best_times[i]:
+      self.best_times[i] = elapsed
+    if self.n_calls >= self.n_trials:
+      fastest = min(xrange(len(self.candidates)), key = lambda j: self.best_times[j])
+      self.choice = self.candidates[fastest]
+      set_schedule(self.c_fn, self.choice)
+      if self.on_choice is not None:
+        self.on_choice(self.choice)
+    return result
@@ -375,6 +375,13 @@ class ShapeInference(SyntaxVisitor):
   def visit_TypeValue(self, expr):
     return unknown_value
   
+  # only known once the code is running 
+  def visit_NumCores(self, expr):
+    return any_scalar 
+  
+  def visit_ThreadId(self, expr):
+    return any_scalar 
+  
   def visit_Struct(self, expr):
     if isinstance(expr.type, ArrayT):
       shape_tuple = self.visit_expr(expr.args[1])
@@ -643,6 +650,13 @@ class ShapeInference(SyntaxVisitor):
 
 
   
+  def bounds_dims(self, bounds):
+    """The iteration space of an indexed adverb may be a single bound or a tuple of them"""
+    if bounds.__class__ is Tuple:
+      return tuple(bounds.elts)
+    else:
+      return (bounds,)
+
   def visit_IndexMap(self, expr):
     bounds = self.visit_expr(expr.shape)
     clos = self.visit_expr(expr.fn)
@@ -651,7 +665,7 @@ class ShapeInference(SyntaxVisitor):
     else:
       indices = bounds.elts 
     elt_result = symbolic_call(clos, indices)
-    return make_shape(combine_dims(bounds, elt_result))
+    return make_shape(self.bounds_dims(bounds) + dims(elt_result))
     
     
   def visit_IndexReduce(self, expr):
@@ -666,6 +680,20 @@ class ShapeInference(SyntaxVisitor):
     init_shape = elt_shape if self.expr_is_none(expr.init) else self.visit_expr(expr.init) 
     return symbolic_call(combine, [init_shape, elt_shape])
 
+  def visit_IndexFilter(self, expr):
+    fn = self.visit_expr(expr.fn)
+    bounds = self.visit_expr(expr.shape)
+    if isinstance(fn.fn.input_types[-1], TupleT) or bounds.__class__ is not Tuple:
+      indices = [bounds]
+    else:
+      indices = bounds.elts
+    elt_shape = symbolic_call(fn, indices)
+    # the number of elements which pass the predicate isn't known until runtime
+    return make_shape((any_scalar,) + dims(elt_shape))
+  
+  def visit_IndexFilterReduce(self, expr):
+    return self.visit_IndexReduce(expr)
+
   def visit_IndexScan(self, expr):
     fn = self.visit_expr(expr.fn)
     combine = self.visit_expr(expr.combine)
@@ -679,7 +707,7 @@ class ShapeInference(SyntaxVisitor):
     init_shape = elt_shape if self.expr_is_none(expr.init) else self.visit_expr(expr.init) 
     acc_shape = symbolic_call(combine, [init_shape, elt_shape])
     output_elt_shape = symbolic_call(emit, [acc_shape])
-    return make_shape(combine_dims(bounds, output_elt_shape))
+    return make_shape(self.bounds_dims(bounds) + dims(output_elt_shape))
 
 
   def normalize_axes(self, axis, args):
@@ -757,6 +785,34 @@ class ShapeInference(SyntaxVisitor):
     init = elt_result if self.expr_is_none(expr.init) else self.visit_expr(expr.init) 
     return symbolic_call(combine, [init, elt_result])
       
+  def visit_Filter(self, expr):
+    arg_shape = self.visit_expr(expr.args[0])
+    axes = self.normalize_axes(expr.axis, expr.args)
+    if axes[0] is None:
+      return make_shape([any_scalar])
+    return make_shape((any_scalar,) + dims(arg_shape)[1:])
+  
+  def visit_FilterReduce(self, expr):
+    return self.visit_Reduce(expr)
+      
+  def visit_Conv(self, expr):
+    x = self.visit_expr(expr.x)
+    window_shape = self.visit_expr(expr.window_shape)
+    if window_shape.__class__ is not Tuple:
+      return make_shape([any_scalar] * x.rank)
+    # only the windows which fit inside x give an output 
+    return make_shape([self.add(self.sub(n, w), const(1)) 
+                       for (n, w) in zip(dims(x), window_shape.elts)])
+  
+  def visit_ConvBorderFn(self, expr):
+    return self.visit_expr(expr.x)
+  
+  def visit_ConvBorderValue(self, expr):
+    return self.visit_expr(expr.x)
+  
+  def visit_ConvPadding(self, expr):
+    return self.visit_expr(expr.x)
+      
   def visit_Scan(self, expr):
     fn = self.visit_expr(expr.fn)
     combine = self.visit_expr(expr.combine)
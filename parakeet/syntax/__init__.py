@@ -22,11 +22,11 @@ from formal_args import FormalArgs, MissingArgsError, TooManyArgsError
 import helpers 
 from helpers import * 
 
-from low_level import Alloc, Struct, Free, SourceExpr, SourceStmt
+from low_level import Alloc, Struct, Free, NumCores, SourceExpr, SourceStmt, ThreadId
 
 from seq_expr import Index, Enumerate, Len, Zip 
 
-from stmt import (Stmt, Assign, Comment, ExprStmt, ForLoop, If, Return, While, ParFor, 
+from stmt import (Stmt, Assign, Check, Comment, ExprStmt, ForLoop, If, Return, While, ParFor, 
                   PrintString, block_to_str) 
 
 from source_info import SourceInfo
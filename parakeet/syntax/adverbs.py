@@ -120,15 +120,16 @@ class Scan(DataAccumulative, HasEmit):
 
 
 
-class Filter(Adverb):
+class HasPred(Expr):
+  _members = ['pred']
+
+class Filter(DataAdverb):
   """
-  Filters its arguments using the boolean predicate field 'fn'
+  Keeps the slices of its argument (along 'axis') for which 
+  the boolean predicate field 'fn' is True 
   """
   pass 
 
-class HasPred(Filter):
-  _members = ['pred']
-
 
 class Where(DataAdverb):
   """
@@ -138,11 +139,16 @@ class Where(DataAdverb):
   """
   _members = ['pred']
 
-class IndexFilter(IndexAdverb, Filter):
+class IndexFilter(IndexAdverb, HasPred):
+  """
+  Evaluates 'fn' at every index in the shape for which 'pred' is True
+  and packs the results (in row-major order of the indices) into a 
+  one dimensional output 
+  """
   pass 
 
 
-class FilterReduce(Reduce, Filter):
+class FilterReduce(Reduce, HasPred):
   """
   Like a normal reduce but skips some elements if they don't pass
   the predicate 'pred'
@@ -150,10 +156,19 @@ class FilterReduce(Reduce, Filter):
   pass  
   
   
-class IndexFilterReduce(FilterReduce):
+class IndexFilterReduce(IndexReduce, HasPred):
+  """
+  IndexReduce which skips the indices for which 'pred' is False,
+  when 'init' is None the result of reducing no elements is zero
+  """
   pass 
 
 class Tiled(object):
+  """
+  'axes' are the axes of the adverb's arguments which get broken into tiles,
+  'fixed_tile_size' is a tuple of tile lengths along each of those axes
+  or None to pick them from the sizes of the data caches
+  """
   _members = ['axes', 'fixed_tile_size']
 
   def __repr__(self):
@@ -198,6 +213,10 @@ class TiledScan(Tiled, Scan):
 
   
 class Conv(Adverb):
+  """
+  Apply 'fn' to every window of shape 'window_shape' which fits 
+  entirely inside the array 'x', the result has one element per window
+  """
   _members = ['x', 'window_shape']
   
   def __repr__(self):
@@ -208,12 +227,24 @@ class Conv(Adverb):
       return repr(self)
 
 class ConvBorderFn(Conv):
+  """
+  Same shape as 'x', windows centered on its border are clipped 
+  to the array and passed to 'border_fn' instead of 'fn' 
+  """
   _members = ['border_fn']
   
 class ConvBorderValue(Conv):
+  """
+  Same shape as 'x', with 'border_value' wherever the 
+  window centered on an element doesn't fit inside the array 
+  """
   _members = ['border_value']
   
 class ConvPadding(Conv):
+  """
+  Same shape as 'x', treating everything outside 
+  the array as if it were 'fill_value' 
+  """
   _members = ['fill_value']
   
   
\ No newline at end of file
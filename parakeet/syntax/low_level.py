@@ -1,3 +1,5 @@
+from .. ndtypes import Int64
+
 from expr import Expr 
 from stmt import Stmt 
 
@@ -72,9 +74,9 @@ class NumCores(Expr):
   def __eq__(self, other):
     return other.__class__ is NumCores 
   
-  def node_init(self):
-    from ..ndtypes import Int64
-    self.type = Int64 
+  def __init__(self, type = Int64, source_info = None):
+    self.type = type 
+    self.source_info = source_info 
   
   def __hash__(self):
     return 0
@@ -82,6 +84,29 @@ class NumCores(Expr):
   def children(self):
     return ()
 
+class ThreadId(Expr):
+  
+  """
+  Index of the thread executing the current ParFor iteration, 
+  always less than NUM_CORES
+  """
+  
+  def __str__(self):
+    return "THREAD_ID"
+  
+  def __eq__(self, other):
+    return other.__class__ is ThreadId 
+  
+  def __init__(self, type = Int64, source_info = None):
+    self.type = type 
+    self.source_info = source_info 
+  
+  def __hash__(self):
+    return 1
+  
+  def children(self):
+    return ()
+
 class SourceExpr(Expr):
   """
   Splice this code directly into the low-level representation, 
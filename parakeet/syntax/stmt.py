@@ -48,6 +48,18 @@ class Comment(Stmt):
     return s
 
 
+class Check(Stmt):
+  """
+  Raise the named exception (e.g. IndexError) with the given message  
+  if the condition doesn't hold at runtime
+  """
+  
+  _members = ['cond', 'error', 'message']
+
+  def __str__(self):
+    return "Check(%s, %s: %s)" % (self.cond, self.error, self.message)
+
+
 class Return(Stmt):
   _members = ['value']
 
@@ -101,7 +113,9 @@ class ForLoop(Stmt):
   So, here we have the stately and ancient for loop.  All hail its glory.
   """
 
-  _members = ['var', 'start', 'stop', 'step', 'body', 'merge']
+  # vectorize gets set on innermost loops whose iterations are independent
+  # apart from reductions into the merge variables (see transforms/vectorize.py)
+  _members = ['var', 'start', 'stop', 'step', 'body', 'merge', 'vectorize']
     
   def __str__(self):
     s = "for %s in range(%s, %s, %s):" % \
@@ -109,6 +123,8 @@ class ForLoop(Stmt):
        self.start.short_str(),
        self.stop.short_str(),
        self.step.short_str())
+    if self.vectorize:
+      s = "(simd) " + s
 
     if self.merge and len(self.merge) > 0:
       s += "\n  (header)%s\n  (body)" % phi_nodes_to_str(self.merge)
@@ -117,10 +133,16 @@ class ForLoop(Stmt):
   
   
 class ParFor(Stmt):
-  _members = ['fn', 'bounds']
+  # tile_sizes is either None or a tuple of tile lengths along each
+  # dimension of the bounds, in which case the iteration space gets
+  # traversed one tile at a time
+  _members = ['fn', 'bounds', 'tile_sizes']
 
   def __str__(self):
-    return "ParFor(fn = %s, bounds = %s)" % (self.fn, self.bounds)
+    if self.tile_sizes is None:
+      return "ParFor(fn = %s, bounds = %s)" % (self.fn, self.bounds)
+    return "ParFor(fn = %s, bounds = %s, tile_sizes = %s)" % \
+      (self.fn, self.bounds, self.tile_sizes)
   
 #  
 # Consider using these in the future
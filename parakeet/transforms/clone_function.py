@@ -1,6 +1,6 @@
 from .. import names 
 from .. syntax import (TypedFn, Var, Const, Attribute, Index, PrimCall, 
-                       If, Assign, While, ExprStmt, Return, ForLoop, ParFor,  
+                       If, Assign, Check, While, ExprStmt, Return, ForLoop, ParFor,  
                        Slice, Struct, Tuple, TupleProj, Cast, Alloc, Closure, 
                        Map, Reduce, Scan, IndexMap, IndexReduce, IndexScan, 
                        UntypedFn )      
@@ -114,6 +114,9 @@ class CloneFunction(Transform):
   def transform_ExprStmt(self, stmt):
     return ExprStmt(self.transform_expr(stmt.value))
 
+  def transform_Check(self, stmt):
+    return Check(self.transform_expr(stmt.cond), stmt.error, stmt.message)
+
   def transform_Return(self, stmt):
     res = Return(self.transform_expr(stmt.value))
     return res 
@@ -138,12 +141,14 @@ class CloneFunction(Transform):
     new_step = self.transform_expr(stmt.step)
     new_body = self.transform_block(stmt.body)
     new_merge = self.transform_merge(stmt.merge)
-    return ForLoop(new_var, new_start, new_stop, new_step, new_body, new_merge)  
+    return ForLoop(new_var, new_start, new_stop, new_step, new_body, new_merge,
+                   vectorize = stmt.vectorize)
   
   def transform_ParFor(self, stmt):
     new_bounds = self.transform_expr(stmt.bounds)
     new_fn = self.transform_expr(stmt.fn)
-    return ParFor(fn = new_fn, bounds = new_bounds)
+    new_tile_sizes = self.transform_if_expr(stmt.tile_sizes)
+    return ParFor(fn = new_fn, bounds = new_bounds, tile_sizes = new_tile_sizes)
   
   def pre_apply(self, old_fn):
     new_fundef_args = old_fn.__dict__.copy()
@@ -68,4 +68,5 @@ class CloneStmt(CloneFunction):
     new_step = self.transform_expr(stmt.step)
     new_body = self.transform_block(stmt.body)
     merge = self.transform_merge_after_loop(merge)
-    return ForLoop(new_var, new_start, new_stop, new_step, new_body, merge)
+    return ForLoop(new_var, new_start, new_stop, new_step, new_body, merge,
+                   vectorize = stmt.vectorize)
@@ -253,7 +253,7 @@ class BuildFlatFn(Builder):
     step = self.flatten_scalar_expr(stmt.step)
     body = self.flatten_block(stmt.body)
     merge = self.flatten_merge(stmt.merge)
-    return ForLoop(var, start, stop, step, body, merge)
+    return ForLoop(var, start, stop, step, body, merge, vectorize = stmt.vectorize)
   
   def flatten_While(self, stmt):
     self.enter_branch(stmt.merge)
@@ -279,7 +279,11 @@ class BuildFlatFn(Builder):
     new_fn, closure_elts = self.flatten_fn(stmt.fn)
     closure = self.closure(new_fn, closure_elts)
     bounds = single_value(self.flatten_expr(stmt.bounds))
-    return ParFor(fn = closure, bounds = bounds)
+    if stmt.tile_sizes is None:
+      tile_sizes = None
+    else:
+      tile_sizes = single_value(self.flatten_expr(stmt.tile_sizes))
+    return ParFor(fn = closure, bounds = bounds, tile_sizes = tile_sizes)
     
   def flatten_Return(self, stmt):
     return Return(single_value(self.flatten_expr(stmt.value)))
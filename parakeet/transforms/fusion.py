@@ -3,7 +3,8 @@ from ..analysis.use_analysis import use_count
 from ..ndtypes import ArrayT 
 from ..transforms import inline, Transform 
 from .. syntax import Var, Const,  Return, TypedFn, DataAdverb, Adverb
-from .. syntax import IndexMap, IndexReduce, Map, Reduce, OuterMap 
+from .. syntax import (IndexMap, IndexReduce, Map, Reduce, OuterMap, 
+                       Filter, FilterReduce, IndexFilter, IndexFilterReduce) 
 from ..syntax.helpers import zero_i64, none 
 
 def fuse(prev_fn, prev_fixed_args, next_fn, next_fixed_args, fusion_args):
@@ -152,6 +153,11 @@ class Fusion(Transform):
       # can't introduce multiple new array arguments 
       if rhs.__class__ is OuterMap and len(prev_adverb.args) != 1:
         continue 
+      
+      # the predicate of a filter has to see the same elements 
+      # which the filter keeps, so don't fuse anything into just its function 
+      if rhs.__class__ in (Filter, FilterReduce):
+        continue 
        
       # 
       # Map(Map) -> Map
@@ -215,6 +221,49 @@ class Fusion(Transform):
                                combine = rhs.combine, 
                                type = rhs.type,
                                init = rhs.init)
+      
+      # 
+      # Reduce(Filter) -> FilterReduce
+      # 
+      elif prev_adverb.__class__ is Filter and \
+            rhs.__class__ is Reduce and \
+            len(rhs.args) == 1 and \
+            self.rank(prev_adverb.args[0]) == 1:
+        if self.use_counts[arg_name] == n_occurrences:
+          del self.adverb_bindings[arg_name]
+        rhs = FilterReduce(fn = rhs.fn, 
+                           pred = prev_adverb.fn, 
+                           combine = rhs.combine, 
+                           args = prev_adverb.args, 
+                           axis = prev_adverb.axis,  
+                           type = rhs.type, 
+                           init = rhs.init)
+      
+      # 
+      # Reduce(IndexFilter) -> IndexFilterReduce, 
+      # which skips building the filtered array 
+      #
+      elif prev_adverb.__class__ is IndexFilter and \
+            rhs.__class__ is Reduce and \
+            len(rhs.args) == 1 and \
+            prev_adverb.type.rank == 1:
+        new_fn, clos_args = \
+            fuse(self.get_fn(prev_adverb.fn),
+                 self.closure_elts(prev_adverb.fn),
+                 self.get_fn(rhs.fn),
+                 self.closure_elts(rhs.fn),
+                 [None])
+        assert new_fn.return_type == self.return_type(rhs.fn)
+        if self.use_counts[arg_name] == n_occurrences:
+          del self.adverb_bindings[arg_name]
+        if self.fn.created_by is not None:
+          new_fn = self.fn.created_by.apply(new_fn)
+        rhs = IndexFilterReduce(fn = self.closure(new_fn, clos_args), 
+                                pred = prev_adverb.pred,  
+                                shape = prev_adverb.shape, 
+                                combine = rhs.combine, 
+                                type = rhs.type,
+                                init = rhs.init)
     return rhs 
 
     
@@ -224,6 +273,10 @@ class Fusion(Transform):
     if self.recursive: 
       old_rhs = self.transform_expr(old_rhs)
     
+    if old_rhs.__class__ is IndexFilter and stmt.lhs.__class__ is Var:
+      # boolean mask indexing, which a later Reduce may absorb 
+      self.adverb_bindings[stmt.lhs.name] = old_rhs 
+    
     if not isinstance(old_rhs, DataAdverb):
       return stmt 
 
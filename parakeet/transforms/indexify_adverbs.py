@@ -1,11 +1,14 @@
 import itertools 
 
 
-from .. import names 
-from ..builder import build_fn 
-from ..ndtypes import Int64, repeat_tuple, NoneType, ScalarT, TupleT, ArrayT 
-from ..syntax import (ParFor, IndexReduce, IndexScan, Index, Map, OuterMap, Var, Const, Expr)
-from ..syntax.helpers import get_types, none, zero_i64 
+from .. import config, names 
+from ..builder import build_fn, mk_identity_fn 
+from ..ndtypes import (Int64, repeat_tuple, NoneType, ScalarT, TupleT, ArrayT, 
+                       make_array_type, make_tuple_type, lower_rank) 
+from ..syntax import (ParFor, IndexMap, IndexReduce, IndexScan, IndexFilter, IndexFilterReduce, 
+                      Index, Map, OuterMap, Reduce, Var, Const, Expr, ArrayView, 
+                      Conv, ConvBorderFn, ConvBorderValue, ConvPadding)
+from ..syntax.helpers import get_types, none, zero_i64, one_i64, const_int 
 from ..syntax.adverb_helpers import max_rank_arg, max_rank 
 from transform import Transform
 
@@ -287,6 +290,37 @@ class IndexifyAdverbs(Transform):
     return self.create_output_array(fn, inner_args, outer_shape_tuple, name)
 
   
+  def flat_view(self, array, nelts):
+    """
+    View the data of a C-contiguous array as a single vector 
+    """
+    view_t = make_array_type(array.type.elt_type, 1, 'C')
+    view = ArrayView(data = self.attr(array, 'data'), 
+                     shape = self.tuple([nelts]), 
+                     strides = self.tuple([one_i64]), 
+                     offset = self.attr(array, 'offset'), 
+                     size = nelts, 
+                     type = view_t)
+    return self.assign_name(view, "flat_" + names.original(array.name))
+  
+  def is_flat_map(self, args, axes, output):
+    """
+    An elementwise Map over C-contiguous arrays which all have the same rank 
+    as its (freshly allocated, so also C-contiguous) output can run as one 
+    loop over their data 
+    """
+    if not config.opt_flatten_contiguous_maps: 
+      return False 
+    if any(axis is not None for axis in axes) or output.__class__ is not Var:
+      return False 
+    output_t = output.type 
+    if output_t.__class__ is not ArrayT or output_t.rank < 2:
+      return False 
+    array_args = [arg for arg in args if arg.type.__class__ is ArrayT]
+    return len(array_args) > 0 and \
+      all(arg.__class__ is Var and arg.type.layout == 'C' and 
+          arg.type.rank == output_t.rank for arg in array_args)
+    
   def transform_Map(self, expr, output = None):
     # TODO: 
     # - recursively descend down the function bodies to pull together nested ParFors
@@ -298,6 +332,15 @@ class IndexifyAdverbs(Transform):
 
     if output is None:
       output = self.create_map_output_array(old_fn, args, axes)
+      if self.is_flat_map(args, axes, output):
+        nelts = self.prod(self.tuple_elts(self.shape(output)), name = "nelts")
+        flat_args = [self.flat_view(arg, nelts) if arg.type.__class__ is ArrayT else arg 
+                     for arg in args]
+        index_fn = self.indexify_fn(expr.fn, 0, flat_args, 
+                                    cartesian_product = False, 
+                                    output = self.flat_view(output, nelts))
+        self.parfor(index_fn, nelts)
+        return output 
 
     bounds = self.iter_bounds(args, axes)
     index_fn = self.indexify_fn(expr.fn, axes, args, 
@@ -306,7 +349,7 @@ class IndexifyAdverbs(Transform):
     self.parfor(index_fn, bounds)
     return output 
   
-  def transform_OuterMap(self, expr):
+  def transform_OuterMap(self, expr, tile_sizes = None):
     args = self.transform_expr_list(expr.args)
     axes = self.normalize_axes(args, expr.axis)
     
@@ -323,9 +366,44 @@ class IndexifyAdverbs(Transform):
     loop_body = self.indexify_fn(fn, axes, args, 
                                  cartesian_product = True, 
                                  output = output)
-    self.parfor(loop_body, outer_shape)
+    self.parfor(loop_body, outer_shape, tile_sizes = tile_sizes)
     return output 
   
+  # keep tiles small enough that there are plenty of them to run in parallel
+  max_tile_size = 256
+
+  def slice_nbytes(self, arg, axis):
+    nbytes = self.int(arg.type.elt_type.nbytes)
+    for i, dim in enumerate(self.tuple_elts(self.shape(arg))):
+      if i != axis:
+        nbytes = self.mul(nbytes, dim, "slice_nbytes")
+    return nbytes
+
+  def choose_tile_sizes(self, args, axes):
+    """
+    Within a tile, every slice of the second argument gets reused for
+    each slice of the first, so we fit as many of them as we can in L1.
+    The first argument's slices get reused by every tile along the second
+    axis, so they should fit together in (half of) L2.
+    """
+    from ..c_backend import system_info
+    cache_sizes = [system_info.l2_cache_size() / 2, system_info.l1_cache_size()]
+    tile_sizes = []
+    for arg, axis, cache_size in zip(args, axes, cache_sizes):
+      n = self.div(self.int(cache_size), self.slice_nbytes(arg, axis), "n_slices")
+      n = self.max(n, self.int(1))
+      tile_sizes.append(self.min(n, self.int(self.max_tile_size), "tile_size"))
+    return tile_sizes
+
+  def transform_TiledOuterMap(self, expr):
+    if self.is_none(expr.fixed_tile_size):
+      args = self.transform_expr_list(expr.args)
+      axes = self.normalize_axes(args, expr.axis)
+      tile_sizes = self.tuple(self.choose_tile_sizes(args, axes))
+    else:
+      tile_sizes = self.transform_expr(expr.fixed_tile_size)
+    return self.transform_OuterMap(expr, tile_sizes = tile_sizes)
+
   def transform_IndexMap(self, expr, output = None):
     shape = expr.shape
     
@@ -395,6 +473,58 @@ class IndexifyAdverbs(Transform):
     self.parfor(new_closure, shape)
     return output
   
+  def reduce_all_elements(self, expr):
+    """
+    Reduce every element of multidimensional arrays (and any scalars passed 
+    along with them) with an IndexReduce over all of their indices, since 
+    the arrays might be strided views (such as windows of a larger array) 
+    which can't just be raveled 
+    """
+    args = [arg if arg.__class__ is Var else self.assign_name(arg, "x") 
+            for arg in expr.args]
+    x = max_rank_arg(args)
+    rank = x.type.rank 
+    dims = [self.shape(x, d) for d in xrange(rank)]
+    init = expr.init 
+    first_row = zero_i64 
+    if init is None or self.is_none(init):
+      # reduce the first row to get a starting value, and the other rows into it 
+      rows = [self.index_along_axis(arg, 0, zero_i64, name = "first_row") 
+              if self.is_array(arg) else arg 
+              for arg in args]
+      init = self.assign_name(self.transform_Reduce(Reduce(fn = expr.fn, 
+                                                           combine = expr.combine, 
+                                                           args = tuple(rows), 
+                                                           axis = none, 
+                                                           init = none, 
+                                                           type = expr.type)), 
+                              "acc")
+      dims[0] = self.sub(dims[0], one_i64, "n_rows")
+      first_row = one_i64
+    closure_args = tuple(self.closure_elts(expr.fn))
+    fn = self.get_fn(expr.fn)
+    idx_t = make_tuple_type((Int64,) * rank)
+    input_types = tuple(get_types(closure_args)) + tuple(get_types(args)) + (idx_t,)
+    index_fn, builder, input_vars = build_fn(input_types, 
+                                             fn.return_type, 
+                                             name = self.fresh_fn_name("idx_", fn))
+    index_fn.created_by = self.fn.created_by 
+    n_closure_args = len(closure_args)
+    closure_vars = tuple(input_vars[:n_closure_args])
+    arg_vars = input_vars[n_closure_args:-1]
+    idx = input_vars[-1]
+    indices = list(builder.tuple_elts(idx))
+    indices[0] = builder.add(indices[0], first_row, "row")
+    elts = tuple(builder.index(arg_var, indices, temp = True) 
+                 if builder.is_array(arg_var) else arg_var 
+                 for arg_var in arg_vars)
+    builder.return_(builder.call(fn, closure_vars + elts))
+    return IndexReduce(fn = self.closure(index_fn, closure_args + tuple(args)), 
+                       init = init, 
+                       combine = expr.combine, 
+                       shape = self.tuple(dims), 
+                       type = expr.type)
+    
   def transform_Reduce(self, expr):
     fn = expr.fn 
     combine = expr.combine 
@@ -403,6 +533,11 @@ class IndexifyAdverbs(Transform):
     args = []
     axes = []
     raw_axes = self.normalize_axes(expr.args, expr.axis)
+    ranks = [self.rank(arg) for arg in expr.args]
+    if all(self.is_none(axis) for axis in raw_axes) and \
+       all(r in (0, max(ranks)) for r in ranks) and \
+       (max(ranks) > 1 or (max(ranks) == 1 and 0 in ranks)):
+      return self.reduce_all_elements(expr)
     for axis, arg in zip(raw_axes, expr.args):
       if self.is_none(axis):
         args.append(self.ravel(arg))
@@ -481,9 +616,204 @@ class IndexifyAdverbs(Transform):
                      type = expr.type)
   
   def transform_Filter(self, expr):
-    assert False, "Filter not implemented"
+    arg = expr.args[0]
+    axis = self.normalize_axes(expr.args, expr.axis)[0]
+    if self.is_none(axis):
+      arg = self.ravel(arg)
+    pred = self.indexify_fn(expr.fn, 0, [arg])
+    elt_t = lower_rank(arg.type, 1)
+    value_fn = self.indexify_fn(mk_identity_fn(elt_t), 0, [arg])
+    filtered = IndexFilter(fn = value_fn, 
+                           pred = pred, 
+                           shape = self.shape(arg, 0), 
+                           type = expr.type)
+    return self.transform_IndexFilter(filtered)
+  
+  def transform_IndexFilter(self, expr):
+    """
+    The backends only pack scalars into the output of an IndexFilter, 
+    so when the kept values are subarrays first find the indices which
+    pass the predicate and then gather their values with an IndexMap 
+    """
+    elt_t = self.return_type(expr.fn)
+    if isinstance(elt_t, ScalarT):
+      return expr 
+    assert isinstance(expr.shape.type, ScalarT), \
+      "Filtering subarrays over multiple dimensions (%s) not supported" % expr.shape 
+    kept = self.assign_name(IndexFilter(fn = mk_identity_fn(Int64), 
+                                        pred = expr.pred, 
+                                        shape = expr.shape, 
+                                        type = make_array_type(Int64, 1)), 
+                            "kept_indices")
+    closure_args = self.closure_elts(expr.fn)
+    fn = self.get_fn(expr.fn)
+    input_types = tuple(get_types(closure_args)) + (kept.type, Int64)
+    gather_fn, builder, input_vars = \
+      build_fn(input_types, fn.return_type, 
+               name = names.fresh("gather_" + names.original(fn.name)))
+    gather_fn.created_by = self.fn.created_by 
+    closure_vars = input_vars[:-2]
+    kept_var, k = input_vars[-2:]
+    idx = builder.index(kept_var, k, temp = True)
+    builder.return_(builder.call(fn, tuple(closure_vars) + (idx,)))
+    gather = self.closure(gather_fn, tuple(closure_args) + (kept,))
+    return self.transform_IndexMap(IndexMap(fn = gather, 
+                                            shape = self.tuple([self.shape(kept, 0)]), 
+                                            type = expr.type))
+  
+  def transform_FilterReduce(self, expr):
+    args = []
+    axes = []
+    for axis, arg in zip(self.normalize_axes(expr.args, expr.axis), expr.args):
+      if self.is_none(axis):
+        args.append(self.ravel(arg))
+        axes.append(0)
+      else:
+        args.append(arg)
+        axes.append(axis)
+    max_arg = max_rank_arg(args)
+    max_axis = [axis for (arg, axis) in zip(args, axes) if arg is max_arg][0]
+    return IndexFilterReduce(fn = self.indexify_fn(expr.fn, tuple(axes), args), 
+                             pred = self.indexify_fn(expr.pred, tuple(axes), args), 
+                             init = expr.init, 
+                             combine = expr.combine, 
+                             shape = self.shape(max_arg, max_axis), 
+                             type = expr.type)
     
   
+  def conv_region(self, expr, output, x, window_dims, offsets, starts, counts, border = False):
+    """
+    Fill the block of the output which begins at the indices 'starts' and spans
+    'counts' elements along each dimension. The window of output position p starts 
+    at p + offset in x, and only on the border might it stick out of the array. 
+    """
+    rank = len(starts)
+    conv_class = expr.__class__ 
+    fns = [expr.fn]
+    extra_args = []
+    if border:
+      if conv_class is ConvBorderFn:
+        fns = [expr.border_fn]
+      elif conv_class is ConvBorderValue:
+        fns = []
+        extra_args = [expr.border_value]
+      elif conv_class is ConvPadding:
+        extra_args = [expr.fill_value]
+    fn_closure_args = [self.closure_elts(fn) for fn in fns]
+    closure_args = [output, x] 
+    for clos_args in fn_closure_args:
+      closure_args.extend(clos_args)
+    closure_args.extend(extra_args)
+    closure_args.extend(window_dims)
+    closure_args.extend(offsets)
+    closure_args.extend(starts)
+    input_types = tuple(get_types(closure_args)) + (Int64,) * rank
+    prefix = "conv_border_" if border else "conv_"
+    new_fn, builder, input_vars = build_fn(input_types, NoneType, 
+                                           name = self.fresh_fn_name(prefix, expr.fn))
+    new_fn.created_by = self.fn.created_by 
+    output_var, x_var = input_vars[:2]
+    input_vars = list(input_vars[2:])
+    fn_vars = []
+    for clos_args in fn_closure_args:
+      fn_vars.append(input_vars[:len(clos_args)])
+      input_vars = input_vars[len(clos_args):]
+    extra_vars = input_vars[:len(extra_args)]
+    input_vars = input_vars[len(extra_args):]
+    window_vars = input_vars[:rank]
+    offset_vars = input_vars[rank:2*rank]
+    start_vars = input_vars[2*rank:3*rank]
+    idx_vars = input_vars[3*rank:]
+    
+    positions = [builder.add(idx, start, "pos") for (idx, start) in zip(idx_vars, start_vars)]
+    lower = [builder.add(pos, offset, "window_start") for (pos, offset) in zip(positions, offset_vars)]
+    upper = [builder.add(lo, w, "window_stop") for (lo, w) in zip(lower, window_vars)]
+    
+    if not border:
+      slices = [builder.slice_value(lo, hi, one_i64) for (lo, hi) in zip(lower, upper)]
+      window = builder.index(x_var, slices, name = "window")
+      value = builder.call(self.get_fn(fns[0]), fn_vars[0] + [window])
+    elif conv_class is ConvBorderFn:
+      # clip the window to the array 
+      dims = [builder.shape(x_var, d) for d in xrange(rank)]
+      slices = [builder.slice_value(builder.max(lo, zero_i64, "clipped_start"), 
+                                    builder.min(hi, n, "clipped_stop"), 
+                                    one_i64)
+                for (lo, hi, n) in zip(lower, upper, dims)]
+      window = builder.index(x_var, slices, name = "window")
+      value = builder.call(self.get_fn(fns[0]), fn_vars[0] + [window])
+    elif conv_class is ConvBorderValue:
+      value = extra_vars[0]
+    else:
+      assert conv_class is ConvPadding, "Unexpected border handling %s" % conv_class 
+      fill_value = extra_vars[0]
+      dims = [builder.shape(x_var, d) for d in xrange(rank)]
+      last_indices = [builder.sub(n, one_i64, "last") for n in dims]
+      window = builder.alloc_array(x.type.elt_type, window_vars, name = "window")
+      def fill_window(window_indices):
+        in_bounds = None 
+        src_indices = []
+        for (lo, i, n, last) in zip(lower, window_indices, dims, last_indices):
+          src = builder.add(lo, i, "src")
+          in_dim = builder.and_(builder.gte(src, zero_i64), builder.lt(src, n))
+          in_bounds = in_dim if in_bounds is None else builder.and_(in_bounds, in_dim)
+          # clamp the index so that reading x is safe even when its value isn't used 
+          src_indices.append(builder.min(builder.max(src, zero_i64, "src"), last, "src"))
+        elt = builder.index(x_var, src_indices, temp = True)
+        builder.setidx(window, window_indices, builder.select(in_bounds, elt, fill_value, "elt"))
+      builder.nested_loops(window_vars, fill_window, index_vars_as_list = True)
+      value = builder.call(self.get_fn(fns[0]), fn_vars[0] + [window])
+    
+    elt_t = output.type.elt_type 
+    if rank == 1:
+      builder.setidx(output_var, positions[0], builder.cast(value, elt_t))
+    else:
+      builder.setidx(output_var, builder.tuple(positions), builder.cast(value, elt_t))
+    builder.return_(none)
+    bounds = counts[0] if rank == 1 else self.tuple(counts)
+    self.parfor(self.closure(new_fn, closure_args), bounds)
+  
+  def transform_Conv(self, expr):
+    """
+    The windows centered on the interior of the array are computed by one
+    ParFor which doesn't need any bounds checks. Along each dimension there 
+    are then two ParFors for the border slabs on either side, which skip the
+    parts of previous dimensions' slabs that are already covered. 
+    """
+    x = expr.x 
+    if x.__class__ is not Var:
+      x = self.assign_name(x, "x")
+    rank = x.type.rank 
+    elt_t = expr.type.elt_type 
+    window_dims = list(self.tuple_elts(expr.window_shape))
+    dims = [self.shape(x, d) for d in xrange(rank)]
+    # number of windows which fit entirely inside x along each dimension 
+    n_windows = [self.max(self.add(self.sub(n, w), one_i64), zero_i64, "n_windows")
+                 for (n, w) in zip(dims, window_dims)]
+    zeros = [zero_i64] * rank 
+    if expr.__class__ is Conv:
+      output = self.alloc_array(elt_t, n_windows, name = "conv_output")
+      self.conv_region(expr, output, x, window_dims, zeros, zeros, n_windows)
+      return output 
+    
+    output = self.alloc_array(elt_t, dims, name = "conv_output")
+    half_window = [self.div(w, const_int(2), "half_window") for w in window_dims]
+    offsets = [self.sub(zero_i64, h, "window_offset") for h in half_window]
+    border_sizes = [self.min(h, n, "border_size") for (h, n) in zip(half_window, dims)]
+    upper_starts = [self.add(b, c, "upper_border_start") for (b, c) in zip(border_sizes, n_windows)]
+    upper_sizes = [self.sub(n, start, "upper_border_size") for (n, start) in zip(dims, upper_starts)]
+    self.conv_region(expr, output, x, window_dims, offsets, border_sizes, n_windows)
+    for d in xrange(rank):
+      for (start, count) in [(zero_i64, border_sizes[d]), (upper_starts[d], upper_sizes[d])]:
+        starts = border_sizes[:d] + [start] + zeros[d+1:]
+        counts = n_windows[:d] + [count] + dims[d+1:]
+        self.conv_region(expr, output, x, window_dims, offsets, starts, counts, border = True)
+    return output 
+  
+  transform_ConvBorderFn = transform_Conv 
+  transform_ConvBorderValue = transform_Conv 
+  transform_ConvPadding = transform_Conv 
+  
   def transform_Assign(self, stmt):
     """
     If you encounter an adverb being written to an output location, 
@@ -0,0 +1,338 @@
+from .. import names, prims
+from ..analysis.array_write_analysis import array_accesses
+from ..analysis.collect_vars import collect_var_names, SetCollector
+from ..analysis.escape_analysis import may_alias
+from ..builder import build_fn
+from ..ndtypes import ScalarT, TupleT, Int64, NoneType
+from ..syntax import (Assign, Comment, Const, ForLoop, ParFor, PrimCall, Return,
+                      Tuple, TupleProj, Var)
+from ..syntax.helpers import none
+from transform import Transform
+
+def collect_block_bindings(stmts, bindings):
+  """Map every variable assigned anywhere in a block (including nested blocks) to its value"""
+  for stmt in stmts:
+    c = stmt.__class__
+    if c is Assign and stmt.lhs.__class__ is Var:
+      bindings[stmt.lhs.name] = stmt.rhs
+    elif hasattr(stmt, 'true'):
+      collect_block_bindings(stmt.true, bindings)
+      collect_block_bindings(stmt.false, bindings)
+    elif hasattr(stmt, 'body'):
+      collect_block_bindings(stmt.body, bindings)
+  return bindings
+
+def block_var_names(stmts):
+  """Names of all the variables used anywhere in a block"""
+  collector = SetCollector()
+  collector.visit_block(stmts)
+  return collector.var_names
+
+class LoopSpace(object):
+  """
+  What LoopFusion needs to know about one loop: the names of its index
+  variables (or of the tuple which holds them), the bindings made in its
+  body, the arrays it reads and writes along with the index of each access
+  (named as they are outside the loop) and what the names of any
+  loop-invariant inputs stand for outside of it
+  """
+
+  def __init__(self, index_names, index_tuple, bindings, outer_values):
+    self.index_names = index_names
+    self.index_tuple = index_tuple
+    self.bindings = bindings
+    self.outer_values = outer_values
+    self.accesses = []
+    self.reads = set([])
+    self.writes = set([])
+
+  def invariant(self, expr):
+    """Describe a value which stays the same for the whole loop, or return None"""
+    if expr.__class__ is Const:
+      return expr.value
+    elif expr.__class__ is Var and expr.name not in self.bindings and \
+         expr.name not in self.index_names and expr.name != self.index_tuple:
+      outer = self.outer_values.get(expr.name, expr)
+      if outer.__class__ is Const:
+        return outer.value
+      elif outer.__class__ is Var:
+        return outer.name
+    return None
+
+  def affine(self, expr):
+    """
+    If the expression is (start + step * i) for one of the loop's
+    index variables i, return the triple (position of i, start, step)
+    """
+    c = expr.__class__
+    if c is Var:
+      if expr.name in self.index_names:
+        return (self.index_names.index(expr.name), 0, 1)
+      elif expr.name in self.bindings:
+        return self.affine(self.bindings[expr.name])
+    elif c is TupleProj:
+      if expr.tuple.__class__ is Var and expr.tuple.name == self.index_tuple and \
+         expr.index.__class__ is Const:
+        return (expr.index.value, 0, 1)
+    elif c is PrimCall and expr.prim in (prims.add, prims.multiply):
+      for (x, y) in (expr.args, reversed(expr.args)):
+        inner = self.affine(x)
+        value = self.invariant(y)
+        if inner is None or value is None:
+          continue
+        (position, start, step) = inner
+        if expr.prim == prims.add and start == 0:
+          return (position, value, step)
+        elif expr.prim == prims.multiply and start == 0 and \
+             isinstance(value, (int, long)) and value != 0:
+          return (position, 0, step * value)
+    return None
+
+  def index_elts(self, index):
+    if isinstance(index.type, ScalarT):
+      return [index]
+    if index.__class__ is Var:
+      if index.name == self.index_tuple:
+        return [Var(name = name, type = Int64) for name in self.index_names]
+      index = self.bindings.get(index.name, index)
+    if index.__class__ is Tuple:
+      return index.elts
+    return None
+
+  def index_positions(self, index):
+    """
+    Set of (dimension, index variable, start, step) for the dimensions of
+    an access which step through the array with the loop's indices
+    """
+    elts = self.index_elts(index)
+    if elts is None:
+      return None
+    positions = set([])
+    for (dim, elt) in enumerate(elts):
+      result = self.affine(elt)
+      if result is not None:
+        positions.add((dim,) + result)
+    return positions
+
+class LoopFusion(Transform):
+  """
+  Merge adjacent loops (or ParFors) which run over the same iteration space,
+  so that the arrays they share only get traversed once.
+
+  Merging is only legal when iteration i of the second loop can't see a
+  value written by a later iteration of the first (or overwrite one which a
+  later iteration of the first reads). We check the simplest sufficient
+  condition: every array which one loop writes and the other touches has to
+  be accessed through the same variable in both, always stepping through the
+  same dimensions with the loop's indices in the same way, so that each
+  iteration of the fused loop has its own elements of it.
+  """
+
+  def pre_apply(self, fn):
+    self.may_alias = may_alias(fn)
+
+  def aliases(self, name):
+    return self.may_alias.get(name, set([])).union([name])
+
+  def transform_block(self, stmts):
+    return self.fuse_block(Transform.transform_block(self, stmts))
+
+  def fuse_block(self, stmts):
+    result = []
+    # position in result of the last loop, which later loops might get merged into
+    candidate = None
+    for stmt in stmts:
+      if candidate is not None:
+        loop = result[candidate]
+        fused = self.try_to_fuse(loop, stmt)
+        if fused is not None:
+          # statements between the two loops now run before both of them
+          between = result[candidate+1:]
+          del result[candidate:]
+          result.extend(between)
+          result.append(fused)
+          candidate = len(result) - 1
+          continue
+        if self.can_move_above(loop, stmt):
+          result.append(stmt)
+          continue
+      result.append(stmt)
+      candidate = len(result) - 1 if stmt.__class__ in (ForLoop, ParFor) else None
+    return result
+
+  def can_move_above(self, loop, stmt):
+    """Can a statement following a loop run before it instead?"""
+    if stmt.__class__ is Comment:
+      return True
+    if stmt.__class__ is not Assign or stmt.lhs.__class__ is not Var:
+      return False
+    space = self.loop_space(loop)
+    accesses = array_accesses([stmt], self.may_alias)
+    if space is None or accesses.unknown_effects or len(accesses.writes) > 0:
+      return False
+    if len(accesses.reads.intersection(space.writes)) > 0:
+      return False
+    if loop.__class__ is ForLoop and \
+       len(collect_var_names(stmt.rhs).intersection(loop.merge.keys())) > 0:
+      return False
+    return True
+
+  def try_to_fuse(self, first, second):
+    if first.__class__ is not second.__class__:
+      return None
+    if first.__class__ is ForLoop:
+      if first.start != second.start or first.stop != second.stop or \
+         first.step != second.step:
+        return None
+      # the second loop can't use the values which the first one accumulates
+      if len(block_var_names([second]).intersection(first.merge.keys())) > 0:
+        return None
+    else:
+      if first.bounds != second.bounds or \
+         first.tile_sizes is not None or second.tile_sizes is not None:
+        return None
+    first_space = self.loop_space(first)
+    second_space = self.loop_space(second)
+    if first_space is None or second_space is None or \
+       not self.independent(first_space, second_space):
+      return None
+    if first.__class__ is ForLoop:
+      return self.fuse_loops(first, second)
+    else:
+      return self.fuse_parfors(first, second)
+
+  def independent(self, first, second):
+    conflicts = first.writes.intersection(second.reads.union(second.writes))
+    conflicts.update(first.reads.intersection(second.writes))
+    n_indices = len(first.index_names)
+    for name in conflicts:
+      accessed_names = set([])
+      common_positions = None
+      for (space, accessed_name, index) in first.accesses + second.accesses:
+        if name not in self.aliases(accessed_name):
+          continue
+        accessed_names.add(accessed_name)
+        positions = space.index_positions(index)
+        if positions is None:
+          return False
+        # the index variables of the two loops are paired up by position
+        if common_positions is None:
+          common_positions = positions
+        else:
+          common_positions = common_positions.intersection(positions)
+      if len(accessed_names) > 1 or common_positions is None:
+        return False
+      if set(position[1] for position in common_positions) != set(range(n_indices)):
+        return False
+    return True
+
+  def loop_space(self, loop):
+    if loop.__class__ is ForLoop:
+      accesses = array_accesses(loop.body, self.may_alias)
+      if accesses.unknown_effects:
+        return None
+      space = LoopSpace([loop.var.name], None, collect_block_bindings(loop.body, {}), {})
+      space.accesses = [(space, expr.value.name, expr.index) for expr in accesses.accesses]
+      space.reads = accesses.reads
+      space.writes = accesses.writes
+      return space
+    else:
+      return self.parfor_space(loop)
+
+  def parfor_space(self, stmt):
+    """
+    Describe the accesses of a ParFor's function in terms of the
+    arrays passed to it from here
+    """
+    fn = self.get_fn(stmt.fn)
+    closure_args = self.closure_elts(stmt.fn)
+    n_closure_args = len(closure_args)
+    outer_values = dict(zip(fn.arg_names[:n_closure_args], closure_args))
+    index_args = fn.arg_names[n_closure_args:]
+    if len(index_args) == 1 and isinstance(fn.type_env[index_args[0]], TupleT):
+      index_tuple = index_args[0]
+      n_indices = len(fn.type_env[index_tuple].elt_types)
+      index_names = ["%s.%d" % (index_tuple, i) for i in xrange(n_indices)]
+    else:
+      index_tuple = None
+      index_names = list(index_args)
+    # the accessed arrays get related to each other by the aliases
+    # of the variables passed in from outside, not from within the function
+    body = [s for s in fn.body if s.__class__ is not Return]
+    accesses = array_accesses(body, {})
+    if accesses.unknown_effects:
+      return None
+    inner_aliases = may_alias(fn)
+    space = LoopSpace(index_names, index_tuple, collect_block_bindings(body, {}), outer_values)
+    def outer_name(name):
+      outer = outer_values.get(name)
+      return outer.name if outer.__class__ is Var else None
+    for expr in accesses.accesses:
+      name = expr.value.name
+      if outer_name(name) is not None:
+        space.accesses.append((space, outer_name(name), expr.index))
+      elif any(alias in fn.arg_names for alias in inner_aliases.get(name, [])):
+        # a view of some input, which we can't line up with the loop indices
+        return None
+    def outer_aliases(inner_names):
+      result = set([])
+      for name in inner_names:
+        if outer_name(name) is not None:
+          result.update(self.aliases(outer_name(name)))
+      return result
+    space.reads = outer_aliases(accesses.reads)
+    space.writes = outer_aliases(accesses.writes)
+    return space
+
+  def fuse_loops(self, first, second):
+    merge = first.merge.copy()
+    merge.update(second.merge)
+    # the second loop's index variable is just a copy of the first's
+    body = first.body + [Assign(second.var, first.var)] + second.body
+    body = self.fuse_block(body)
+    return ForLoop(var = first.var,
+                   start = first.start,
+                   stop = first.stop,
+                   step = first.step,
+                   body = body,
+                   merge = merge)
+
+  def fuse_parfors(self, first, second):
+    """
+    Build a function which takes the closure arguments of both ParFors
+    (passing each distinct variable only once) and calls both of
+    their functions at the same indices
+    """
+    args = []
+    arg_positions = {}
+    fn_args = []
+    for clos in (first.fn, second.fn):
+      positions = []
+      for arg in self.closure_elts(clos):
+        key = arg.name if arg.__class__ is Var else id(arg)
+        if key not in arg_positions:
+          arg_positions[key] = len(args)
+          args.append(arg)
+        positions.append(arg_positions[key])
+      fn_args.append(positions)
+    bounds_t = first.bounds.type
+    n_indices = len(bounds_t.elt_types) if isinstance(bounds_t, TupleT) else 1
+    first_fn = self.get_fn(first.fn)
+    input_types = tuple(arg.type for arg in args) + (Int64,) * n_indices
+    fused_fn, builder, input_vars = \
+      build_fn(input_types, NoneType, name = "fused_" + names.original(first_fn.name))
+    fused_fn.created_by = first_fn.created_by
+    arg_vars = input_vars[:len(args)]
+    index_vars = input_vars[len(args):]
+    for (clos, positions) in zip((first.fn, second.fn), fn_args):
+      fn = self.get_fn(clos)
+      call_args = [arg_vars[i] for i in positions]
+      if len(fn.input_types) == len(positions) + n_indices:
+        call_args.extend(index_vars)
+      else:
+        call_args.append(builder.tuple(index_vars))
+      builder.call(fn, call_args)
+    builder.return_(none)
+    return ParFor(fn = self.closure(fused_fn, args),
+                  bounds = first.bounds,
+                  tile_sizes = None)
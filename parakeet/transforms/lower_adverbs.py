@@ -1,5 +1,6 @@
-from ..ndtypes import TupleT, Int64 
+from ..ndtypes import TupleT, Bool, Int64 
 from ..syntax import Index, Map, unwrap_constant, zero_i64 
+from ..syntax.helpers import false, true, zero 
 from transform import Transform
 from parakeet.syntax.stmt import ForLoop
 
@@ -135,13 +136,105 @@ class LowerAdverbs(Transform):
                                 old_acc = init, body_fn = body)
     return output 
   
+  def index_bounds(self, expr):
+    if isinstance(expr.shape.type, TupleT): 
+      bounds = self.tuple_elts(expr.shape)
+    else:
+      bounds = [expr.shape]
+    if expr.start_index is not None and not self.is_none(expr.start_index):
+      if isinstance(expr.start_index.type, TupleT):
+        starts = self.tuple_elts(expr.start_index)
+      else:
+        starts = [expr.start_index]
+    else:
+      starts = [self.int(0)] * len(bounds)
+    return starts, bounds 
+  
+  def call_pred(self, pred, indices):
+    keep = self.call(pred, (indices,))
+    if keep.type != Bool:
+      keep = self.cast(keep, Bool)
+    return keep 
+  
   def transform_IndexFilter(self, expr):
-    assert False, "IndexFilter not implemented"
-
+    fn = self.transform_expr(expr.fn)
+    pred = self.transform_expr(expr.pred)
+    starts, bounds = self.index_bounds(expr)
+    
+    # first count how many elements pass the predicate...
+    def count_body(indices, old_count):
+      keep = self.call_pred(pred, indices)
+      return self.select(keep, self.add(old_count, self.int(1)), old_count, "count")
+    count = self.build_nested_reduction(indices = (), 
+                                        starts = starts, 
+                                        bounds = bounds, 
+                                        old_acc = self.int(0), 
+                                        body_fn = count_body)
+    
+    # ...then evaluate the predicate again to fill in the output 
+    elt_shape = bounds[0] if len(bounds) == 1 else self.tuple(bounds)
+    output = self.create_output_array(fn, [elt_shape], [count])
+    def fill_body(indices, old_pos):
+      keep = self.call_pred(pred, indices)
+      new_pos = self.fresh_var(Int64, "pos")
+      def keep_elt(pos):
+        self.setidx(output, old_pos, self.call(fn, (indices,)))
+        self.assign(pos, self.add(old_pos, self.int(1)))
+      def skip_elt(pos):
+        self.assign(pos, old_pos)
+      self.if_(keep, keep_elt, skip_elt, result_vars = [new_pos])
+      return new_pos 
+    self.build_nested_reduction(indices = (), 
+                                starts = starts, 
+                                bounds = bounds, 
+                                old_acc = self.int(0), 
+                                body_fn = fill_body)
+    return output 
   
   def transform_IndexFilterReduce(self, expr):
-    assert False, "IndexFilterReduce not implemented"
+    init = self.transform_if_expr(expr.init)
+    fn = self.transform_expr(expr.fn)
+    combine = self.transform_expr(expr.combine)
+    pred = self.transform_expr(expr.pred)
+    starts, bounds = self.index_bounds(expr)
     
-  
-
-  
+    if not self.is_none(init):
+      def body(indices, old_acc):
+        keep = self.call_pred(pred, indices)
+        new_acc = self.fresh_var(old_acc.type, "acc")
+        def combine_elt(acc):
+          elt = self.call(fn, (indices,))
+          self.assign(acc, self.call(combine, (old_acc, elt)))
+        def skip_elt(acc):
+          self.assign(acc, old_acc)
+        self.if_(keep, combine_elt, skip_elt, result_vars = [new_acc])
+        return new_acc 
+      return self.build_nested_reduction(indices = (), 
+                                         starts = starts, 
+                                         bounds = bounds, 
+                                         old_acc = init, 
+                                         body_fn = body)
+    
+    # without an initial value, the accumulator is paired with a flag 
+    # for whether any element has passed the predicate yet 
+    acc_t = expr.type 
+    def body(indices, old_acc):
+      found = self.tuple_proj(old_acc, 0)
+      value = self.tuple_proj(old_acc, 1)
+      keep = self.call_pred(pred, indices)
+      new_acc = self.fresh_var(old_acc.type, "acc")
+      def combine_elt(acc):
+        elt = self.call(fn, (indices,))
+        combined = self.call(combine, (value, elt))
+        self.assign(acc, self.tuple([true, self.select(found, combined, elt)]))
+      def skip_elt(acc):
+        self.assign(acc, old_acc)
+      self.if_(keep, combine_elt, skip_elt, result_vars = [new_acc])
+      return new_acc
+    init = self.tuple([false, zero(acc_t)], "acc")
+    acc = self.build_nested_reduction(indices = (), 
+                                      starts = starts, 
+                                      bounds = bounds, 
+                                      old_acc = init, 
+                                      body_fn = body)
+    return self.tuple_proj(acc, 1)
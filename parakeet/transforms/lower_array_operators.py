@@ -144,9 +144,19 @@ class LowerArrayOperators(Transform):
       nelts = self.mul(nelts, shape_elt)
       stride_elt = strides[i]
       any_unit = self.or_(any_unit, self.eq(stride_elt, one_i64))      
-    array_result = self.fresh_var(expr.type, prefix = "raveled")
     data = self.attr(array, 'data')
     offset = self.attr(array, 'offset')
+    if array.type.layout == 'C':
+      # no need to check the strides, we already know the data is contiguous
+      return self.array_view(data, 
+                             shape = self.tuple([nelts]), 
+                             strides = self.tuple([one_i64]), 
+                             offset = offset, 
+                             nelts = nelts)
+    elif array.type.layout == 'F':
+      # contiguous, but in the wrong order
+      any_unit = false
+    array_result = self.fresh_var(expr.type, prefix = "raveled")
     def contiguous(x):
       view =  self.array_view(data, 
                               shape = self.tuple([nelts]), 
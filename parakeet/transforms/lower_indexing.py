@@ -36,6 +36,12 @@ class LowerIndexing(Transform):
     return Builder.attr(self, obj, field)
 
 
+  def stride(self, arr, strides, i):
+    # don't bother loading (or multiplying by) strides we know are 1
+    if arr.type.unit_stride_dim() == i:
+      return one_i64
+    return self.tuple_proj(strides, i)
+
   def array_slice(self, arr, indices):
     data_ptr = self.attr(arr, "data")
     shape = self.attr(arr, "shape")
@@ -47,7 +53,7 @@ class LowerIndexing(Transform):
     new_shape = []
 
     for (i, idx) in enumerate(indices):
-      stride_i = self.tuple_proj(strides, i)
+      stride_i = self.stride(arr, strides, i)
       shape_i = self.tuple_proj(shape, i)
       idx_t = idx.type
       if isinstance(idx_t, ScalarT):
@@ -120,7 +126,7 @@ class LowerIndexing(Transform):
       strides = self.attr(arr, "strides")
       offset_elts = self.attr(arr, "offset")
       for (i, idx_i) in enumerate(indices):
-        stride_i = self.tuple_proj(strides, i)
+        stride_i = self.stride(arr, strides, i)
 
         elts_i = self.mul(stride_i, idx_i, "offset_elts_%d" % i)
         offset_elts = self.add(offset_elts, elts_i, "total_offset")
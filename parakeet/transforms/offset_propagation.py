@@ -18,25 +18,55 @@ class OffsetPropagation(Transform):
       self.seen_binding.add(result.lhs.name)
     return result 
   
+  def transform_block(self, stmts):
+    # names bound inside a nested block (such as a loop body) 
+    # are out of scope once it ends 
+    outer_bindings = self.seen_binding 
+    self.seen_binding = outer_bindings.copy()
+    new_block = Transform.transform_block(self, stmts)
+    self.seen_binding = outer_bindings 
+    return new_block 
+  
   def transform_ForLoop(self, stmt):
-    self.known_ranges[stmt.var.name] = (stmt.start, stmt.stop)
+    # the loop variable only stays within [start, stop) for positive steps
+    if stmt.step.__class__ is Const and stmt.step.value > 0:
+      self.known_ranges[stmt.var.name] = (stmt.start, stmt.stop)
     stmt.body = self.transform_block(stmt.body)
     return stmt 
   
+  def offsets(self, x):
+    if x.__class__ is not Var:
+      return []
+    offsets = set([(x.name, 0)])
+    if x.name in self.known_offsets:
+      offsets = offsets.union(self.known_offsets[x.name])
+    return [(var_name, offset) for (var_name, offset) in offsets 
+            if var_name in self.known_ranges]
+  
   def compare_lt(self, x, y, inclusive = True):
-    if x.__class__ is Var:
-      offsets = [(x.name, 0)]
-      if x.name in self.known_offsets:
-        offsets = self.known_offsets[x.name].union(set(offsets))
-      for (var_name, offset) in offsets:
-        if var_name in self.known_ranges:
-          (low,high) = self.known_ranges[var_name]
-          if y == high:
-            if (offset >= 0 and inclusive) or (offset > 0):
-              return false
-          elif y == low:
-            if (offset <= 0 and inclusive) or (offset < 0):
-              return true
+    """
+    Is x < y (or x <= y when inclusive) for every value of a loop 
+    variable i in [low, high) when either side is i + offset 
+    and the other is one of the loop bounds?
+    """
+    # largest offset for which (i + offset) < high or <= high always holds  
+    max_below_high = 1 if inclusive else 0
+    for (var_name, offset) in self.offsets(x):
+      (low, high) = self.known_ranges[var_name]
+      if y == high:
+        if offset <= max_below_high:
+          return true
+      elif y == low:
+        if (offset > 0 and inclusive) or (offset >= 0 and not inclusive):
+          return false
+    for (var_name, offset) in self.offsets(y):
+      (low, high) = self.known_ranges[var_name]
+      if x == low:
+        if (offset >= 0 and inclusive) or (offset > 0):
+          return true
+      elif x == high:
+        if offset <= 1 - max_below_high:
+          return false
     return None 
   
   def const_additive_cancellation(self, x_name, y_value, output_type):
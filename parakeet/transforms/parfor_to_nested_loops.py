@@ -1,8 +1,24 @@
+from ..ndtypes import TupleT
+from ..syntax.helpers import none
 from transform import Transform
 
 class ParForToNestedLoops(Transform):
   def transform_ParFor(self, stmt):
     fn = self.transform_expr(stmt.fn)
-    self.nested_loops(stmt.bounds, fn)
-    
-    
\ No newline at end of file
+    if stmt.tile_sizes is None:
+      self.nested_loops(stmt.bounds, fn)
+      return
+    if isinstance(stmt.bounds.type, TupleT):
+      bounds = self.tuple_elts(stmt.bounds)
+      tile_sizes = self.tuple_elts(stmt.tile_sizes)
+    else:
+      bounds = [stmt.bounds]
+      tile_sizes = [stmt.tile_sizes]
+    def tile_body(tile_starts):
+      tile_stops = [self.min(self.add(start, tile_size), bound, "tile_stop")
+                    for (start, tile_size, bound) in zip(tile_starts, tile_sizes, bounds)]
+      self.nested_loops(tile_stops, fn, lower_bounds = tile_starts)
+      return none
+    self.nested_loops(bounds, tile_body, step_sizes = tile_sizes,
+                      index_vars_as_list = True)
+
@@ -1,68 +1,151 @@
-from ..builder import build_fn
-from ..ndtypes import ArrayT, lower_rank
-from ..prims import Prim  
-from ..syntax import Return, Map 
-from ..syntax.helpers import is_identity_fn, unwrap_constant
+from ..builder import build_fn, mk_identity_fn
+from ..ndtypes import ArrayT, ScalarT, make_array_type
+from ..syntax import ConstArrayLike, Map, Reduce, Return, Scan, Transpose, Var
+from ..syntax.helpers import is_identity_fn, none, unwrap_constant, zero_i64
 from transform import Transform
 
-def get_nested_map(fn):
-  if len(fn.body) != 1:
-    return None 
+def get_elementwise_fn(fn):
+  """
+  If a function of two arrays just returns Map(f, x, y) of them,
+  return the scalar function f
+  """
+  if len(fn.arg_names) != 2 or len(fn.body) != 1:
+    return None
   stmt = fn.body[0]
-  if stmt.__class__ is not Return:
-    return None 
-  if stmt.value.__class__ is not Map:
-    return None 
-  return stmt.value 
-     
+  if stmt.__class__ is not Return or stmt.value.__class__ is not Map:
+    return None
+  nested_map = stmt.value
+  if unwrap_constant(nested_map.axis) not in (None, 0):
+    return None
+  if len(nested_map.args) != 2 or \
+     any(arg.__class__ is not Var for arg in nested_map.args) or \
+     [arg.name for arg in nested_map.args] != list(fn.arg_names):
+    return None
+  return nested_map.fn
 
 class PermuteReductions(Transform):
   """
   When we have a reduction of array values, such as:
-     Reduce(combine = Map(f), X, axis = 0) 
+     Reduce(combine = Map(f), X, axis = 0)
   it can be more efficient to interchange the Map and Reduce:
-     Map(combine = f, X, axis = 1)
+     Map(Reduce(combine = f), X, axis = 1)
+  since then each reduction only needs a scalar accumulator instead of
+  allocating a new row for every step, and the outer Map runs in parallel.
   """
-  
-  
-  def transform_Reduce(self, expr):
-    return expr 
-  
-  def transform_Scan(self, expr):
-    if len(expr.args) > 1:
-      return expr 
-    
+
+  def column_fn(self, expr, col_t, init, init_in_closure):
+    """
+    Check that the given Reduce or Scan has no closure arguments and just
+    combines its array elements elementwise, then build the function which
+    performs the same reduction over each column of them (returns None if
+    it doesn't fit this pattern)
+    """
+    if len(self.closure_elts(expr.fn)) > 0 or len(self.closure_elts(expr.combine)) > 0:
+      return None
+    if not is_identity_fn(self.get_fn(expr.fn)):
+      return None
+    scalar_fn = get_elementwise_fn(self.get_fn(expr.combine))
+    if scalar_fn is None or len(self.closure_elts(scalar_fn)) > 0:
+      return None
+    scalar_fn = self.get_fn(scalar_fn)
+    acc_t = scalar_fn.return_type
+    if not isinstance(acc_t, ScalarT) or \
+       tuple(scalar_fn.input_types) != (acc_t, col_t.elt_type):
+      return None
+    if expr.__class__ is Scan and not is_identity_fn(self.get_fn(expr.emit)):
+      return None
+    if init is not None and not init_in_closure and init.type.elt_type != acc_t:
+      return None
+    if expr.__class__ is Reduce:
+      result_t = acc_t
+    else:
+      result_t = make_array_type(acc_t, 1)
+    if init is None:
+      input_types = (col_t,)
+    elif init_in_closure:
+      input_types = (acc_t, col_t)
+    else:
+      input_types = (col_t, acc_t)
+    fn, builder, input_vars = build_fn(input_types, result_t,
+                                       name = "permuted_" + expr.node_type().lower())
+    if init is None:
+      col, col_init = input_vars[0], none
+    elif init_in_closure:
+      col_init, col = input_vars
+    else:
+      col, col_init = input_vars
+    if expr.__class__ is Reduce:
+      result = Reduce(fn = mk_identity_fn(col_t.elt_type),
+                      combine = scalar_fn,
+                      args = (col,),
+                      init = col_init,
+                      axis = zero_i64,
+                      type = result_t)
+    else:
+      result = Scan(fn = mk_identity_fn(col_t.elt_type),
+                    combine = scalar_fn,
+                    emit = mk_identity_fn(acc_t),
+                    args = (col,),
+                    init = col_init,
+                    axis = zero_i64,
+                    type = result_t)
+    builder.return_(result)
+    return fn
+
+  def permute(self, expr):
+    """
+    Returns the Map over slices along the other axis of the only array
+    argument, along with the axis of the original reduction
+    """
+    if len(expr.args) != 1:
+      return None
+    x = expr.args[0]
     axis = unwrap_constant(expr.axis)
-    if axis is None or not isinstance(axis, (int,long)) or axis > 1 or axis < 0:
+    if not isinstance(x.type, ArrayT) or x.type.rank != 2 or axis not in (0, 1):
+      return None
+    col_t = make_array_type(x.type.elt_type, 1)
+    init = expr.init
+    if init is None or self.is_none(init):
+      init = None
+      map_args = (x,)
+      map_axis = self.int(1 - axis)
+    elif init.__class__ is ConstArrayLike and isinstance(init.value.type, ScalarT):
+      # every column starts from the same scalar value
+      init = init.value
+      map_args = (x,)
+      map_axis = self.int(1 - axis)
+    elif isinstance(init.type, ArrayT) and init.type.rank == 1:
+      map_args = (x, init)
+      map_axis = self.tuple([self.int(1 - axis), zero_i64])
+    else:
+      return None
+    init_in_closure = init is not None and len(map_args) == 1
+    fn = self.column_fn(expr, col_t, init, init_in_closure)
+    if fn is None:
+      return None
+    if init_in_closure:
+      closure = self.closure(fn, [self.cast(init, fn.input_types[0])])
+    else:
+      closure = fn
+    return Map(fn = closure,
+               args = map_args,
+               axis = map_axis,
+               type = expr.type), axis
+
+  def transform_Reduce(self, expr):
+    permuted = self.permute(expr)
+    if permuted is None:
       return expr
-     
-    if not isinstance(expr.type, ArrayT) or expr.type.rank != 2:
+    return permuted[0]
+
+  def transform_Scan(self, expr):
+    permuted = self.permute(expr)
+    if permuted is None:
       return expr
-    
-    fn = self.get_fn(expr.fn)
-    fn_closure_args = self.closure_elts(expr.fn)
-    if len(fn_closure_args) > 0:
-      return expr 
-    
-    combine = self.get_fn(expr.combine)
-    combine_closure_args = self.closure_elts(expr.closure)
-    if len(combine_closure_args) > 0:
-      return expr 
-    
-    if is_identity_fn(fn):
-      nested_map = get_nested_map(combine)
-    
-    if not isinstance(nested_map.fn, Prim):
-      return expr  
-    
-    arg_t = expr.args[0].type
-    elt_t = lower_rank(arg_t, 1)
-    new_nested_fn = None 
-    return Map(fn = new_nested_fn,  
-               args = expr.args, 
-               axis = 1 - axis, 
-               type = expr.type)
-      
-       
-  
-    
\ No newline at end of file
+    permuted, axis = permuted
+    if axis == 1:
+      return permuted
+    # like Map, the permuted Scan stacks its outputs along the first axis,
+    # so the scanned columns have to be transposed back into place
+    return Transpose(array = self.assign_name(permuted, "permuted_scan"),
+                     type = expr.type)
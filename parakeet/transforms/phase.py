@@ -1,6 +1,7 @@
 from itertools import izip 
 
 from .. import config
+from ..compile_profile import phase_cache_lookup, timed
 
 from .. syntax import TypedFn
 from clone_function import CloneFunction
@@ -138,14 +139,19 @@ class Phase(object):
     return not (self.should_skip(fn) or self.is_cached(fn)) 
     
   def apply(self, fn, run_dependencies = True):
-    
-      
+    with timed(self, phase = True):
+      return self._apply(fn, run_dependencies)
+  
+  def _apply(self, fn, run_dependencies):
     if self.memoize:
       original_key = fn.cache_key
       if fn.created_by is self:
+        phase_cache_lookup(self, hit = True)
         return fn 
       if original_key in self.cache:
+        phase_cache_lookup(self, hit = True)
         return self.cache[original_key] 
+      phase_cache_lookup(self, hit = False)
     
     if self.depends_on and run_dependencies:
       fn = apply_transforms(fn, self.depends_on)
@@ -1,6 +1,6 @@
 from .. import config 
 from ..analysis import (contains_adverbs, contains_calls, contains_loops, 
-                        contains_structs, contains_array_operators)
+                        contains_parfor, contains_structs, contains_array_operators)
 
 from combine_nested_maps import CombineNestedMaps 
 from copy_elimination import CopyElimination
@@ -14,6 +14,7 @@ from indexify_adverbs import IndexifyAdverbs
 
 from inline import Inliner
 from licm import LoopInvariantCodeMotion
+from loop_fusion import LoopFusion
 from loop_unrolling import LoopUnrolling
 from lower_adverbs import LowerAdverbs
 from lower_array_operators import LowerArrayOperators
@@ -23,7 +24,9 @@ from lower_structs import LowerStructs
 from negative_index_elim import NegativeIndexElim
 from offset_propagation import OffsetPropagation
 from parfor_to_nested_loops import ParForToNestedLoops
+from permute_reductions import PermuteReductions
 from phase import Phase
+from prealloc_arrays import PreallocArrays
 from range_propagation import RangePropagation
 from redundant_load_elim import RedundantLoadElimination
 from scalar_replacement import ScalarReplacement
@@ -31,6 +34,8 @@ from shape_elim import ShapeElimination
 from simplify import Simplify
 from simplify_array_operators import SimplifyArrayOperators
 from specialize_fn_args import SpecializeFnArgs
+from tiling import Tiling
+from vectorize import Vectorize
 
 ####################################
 #                                  #
@@ -105,6 +110,12 @@ combine_nested_maps = Phase([CombineNestedMaps],
                             run_if = contains_adverbs, 
                             config_param = "opt_combine_nested_maps")
 
+permute_reductions = Phase([PermuteReductions],
+                           copy = False,
+                           memoize = False,
+                           run_if = contains_adverbs,
+                           config_param = "opt_permute_reductions")
+
 arg_specialization = Phase([SpecializeFnArgs],
                            copy = False, 
                            memoize = False, 
@@ -114,6 +125,7 @@ adverb_optimizations = Phase([
                                 fusion_opt,
                                 simplify_array_operators, 
                                 combine_nested_maps,
+                                permute_reductions,
                                 arg_specialization,
                                 fusion_opt, 
                                 arg_specialization,
@@ -154,8 +166,12 @@ def print_indexified(fn):
     print
 
 
+tiling = Phase(Tiling, 
+               config_param = 'opt_tiling', 
+               memoize = False)
+
 indexify = Phase([
-                    IndexifyAdverbs, Simplify, DCE, 
+                    tiling, IndexifyAdverbs, Simplify, DCE, 
                  ],
                  name = "Indexify",  
                  run_if = contains_adverbs, 
@@ -164,15 +180,32 @@ indexify = Phase([
                  memoize = True, 
                  post_apply = print_indexified) 
 
+# merge neighboring loops (or ParFors) over the same indices
+loop_fusion = Phase(LoopFusion, 
+                    config_param = 'opt_loop_fusion', 
+                    run_if = lambda fn: contains_loops(fn) or contains_parfor(fn), 
+                    memoize = False)
+
 after_indexify = Phase([copy_elim, Simplify, DCE, 
                         LowerSlices, 
                         inline_opt, Simplify, DCE, 
-                        IndexMapElimination], 
+                        IndexMapElimination, 
+                        loop_fusion], 
                        name = "AfterIndexify", 
                        depends_on = indexify, 
                        copy = True, 
                        memoize = True)
 
+# the CUDA backend skips this phase, since it has no per-thread 
+# buffers to hand out 
+prealloc_arrays = Phase(PreallocArrays, 
+                        config_param = 'opt_prealloc_arrays', 
+                        run_if = contains_parfor, 
+                        depends_on = after_indexify, 
+                        cleanup = [Simplify, DCE], 
+                        copy = True, 
+                        memoize = True, 
+                        name = "PreallocArrays")
 
 flatten = Phase([Flatten, inline_opt, Simplify, DCE ], name="Flatten", 
                 depends_on=after_indexify,
@@ -197,9 +230,6 @@ def print_loopy(fn):
 
 
 
-# loop_fusion = Phase(LoopFusion, config_param = 'opt_loop_fusion')
-
-
 index_elim = Phase([NegativeIndexElim, IndexElim], config_param = 'opt_index_elimination')
 
 
@@ -219,11 +249,12 @@ loopify = Phase([lower_adverbs,
                  LowerSlices, 
                  licm, 
                  shape_elim, 
+                 loop_fusion, 
                  symbolic_range_propagation,
                  load_elim,  
                  index_elim, 
                 ],
-                depends_on = after_indexify,
+                depends_on = prealloc_arrays,
                 cleanup = [Simplify, DCE],
                 copy = True,
                 memoize = True, 
@@ -268,12 +299,17 @@ unroll = Phase([LoopUnrolling, licm],
 
 
 
+vectorize = Phase(Vectorize, 
+                  config_param = 'opt_vectorize', 
+                  run_if = contains_loops)
+
 final_loop_optimizations = Phase([
                               licm, 
                               unroll, 
                               load_elim, 
                               scalar_repl, 
-                              Simplify
+                              Simplify, 
+                              vectorize
                             ],
                            cleanup = [Simplify, DCE], 
                            copy = False, 
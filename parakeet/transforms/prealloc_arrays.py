@@ -0,0 +1,127 @@
+from .. import names
+from ..analysis import array_lifetimes
+from ..builder import Builder
+from ..shape_inference import shape_env, shapes_from_types, ShapeInferenceFailure
+from ..shape_inference.shape import Binop, Const, Shape, Var as ShapeVar, computable_dim
+from ..shape_inference.shape_codegen import make_shape_expr
+from ..syntax import AllocArray, Assign, NumCores, ParFor, ThreadId, TypedFn, Var
+from clone_function import CloneFunction
+from lower_slices import LowerSlices
+from transform import Transform
+
+def shape_vars(dim):
+  if dim.__class__ is ShapeVar:
+    return [dim.num]
+  elif isinstance(dim, Binop):
+    return shape_vars(dim.x) + shape_vars(dim.y)
+  else:
+    assert dim.__class__ is Const
+    return []
+
+class PreallocArrays(Transform):
+  """
+  Temporary arrays allocated in every iteration of a ParFor get replaced
+  by a slice of a buffer allocated once before the loop, with one slice
+  per thread:
+
+    ParFor(fn = Closure(f, args), bounds = n)
+    ... where f contains t = AllocArray(shape)
+
+  becomes
+
+    buffer = AllocArray((NUM_CORES,) + shape)
+    ParFor(fn = Closure(f', (buffer,) + args), bounds = n)
+    ... where f' contains t = buffer[THREAD_ID]
+
+  Only allocations whose (symbolic) shape depends on nothing but the closure
+  arguments and which are dead by the end of their iteration get moved.
+  Since the phase is applied to nested functions first, allocations
+  made by callees which have been inlined into a loop body get moved as well.
+  """
+
+  def hoistable_allocs(self, fn, closure_types):
+    """
+    Find the top-level statements of a loop body which allocate an array
+    of the same size on every iteration, paired with their symbolic shapes
+    """
+    n_closure_vars = len(shapes_from_types(closure_types))
+    try:
+      env = shape_env(fn)
+    except ShapeInferenceFailure:
+      # some value has an unknown shape, leave the allocations alone
+      return []
+    lifetimes = array_lifetimes(fn)
+    freeable = lifetimes.freeable()
+    allocs = []
+    for stmt in fn.body:
+      if stmt.__class__ is not Assign or \
+         stmt.lhs.__class__ is not Var or \
+         stmt.rhs.__class__ is not AllocArray or \
+         stmt.lhs.name not in freeable:
+        continue
+      shape = env.get(stmt.lhs.name)
+      if shape.__class__ is not Shape or not all(computable_dim(d) for d in shape.dims):
+        continue
+      if all(num < n_closure_vars for d in shape.dims for num in shape_vars(d)):
+        allocs.append((stmt, shape))
+    return allocs
+
+  def transform_ParFor(self, stmt):
+    fn = self.get_fn(stmt.fn)
+    if fn.__class__ is not TypedFn:
+      return stmt
+    closure_args = self.closure_elts(stmt.fn)
+    allocs = self.hoistable_allocs(fn, fn.input_types[:len(closure_args)])
+    if len(allocs) == 0:
+      return stmt
+
+    n_threads = self.assign_name(NumCores(), "n_threads")
+    buffers = []
+    for (alloc_stmt, shape) in allocs:
+      try:
+        shape_tuple = make_shape_expr(self, shape, closure_args)
+      except AssertionError:
+        continue
+      buffer_shape = self.concat_tuples(self.tuple([n_threads]), shape_tuple)
+      buffer = self.alloc_array(alloc_stmt.rhs.elt_type, buffer_shape,
+                                name = "thread_" + names.original(alloc_stmt.lhs.name))
+      buffers.append((alloc_stmt.lhs.name, buffer))
+    if len(buffers) == 0:
+      return stmt
+    new_fn = self.thread_local_fn(fn, buffers)
+    return ParFor(fn = self.closure(new_fn, [buffer for (_, buffer) in buffers] + list(closure_args)),
+                  bounds = stmt.bounds,
+                  tile_sizes = stmt.tile_sizes)
+
+  def thread_local_fn(self, fn, buffers):
+    """
+    Copy of the loop body which takes the buffers as extra leading
+    arguments and uses its thread's slice of each one instead of
+    allocating a fresh array
+    """
+    body_fn = CloneFunction().apply(fn)
+    type_env = body_fn.type_env
+    builder = Builder(type_env = type_env)
+    builder.blocks.push()
+    thread_id = builder.assign_name(ThreadId(), "thread_id")
+    buffer_names = []
+    slices = {}
+    for (name, buffer) in buffers:
+      buffer_name = names.refresh(buffer.name)
+      type_env[buffer_name] = buffer.type
+      buffer_names.append(buffer_name)
+      slices[name] = builder.slice_along_axis(Var(buffer_name, type = buffer.type), 0, thread_id)
+    prelude = builder.blocks.pop()
+
+    for stmt in body_fn.body:
+      if stmt.__class__ is Assign and stmt.lhs.__class__ is Var and stmt.lhs.name in slices:
+        stmt.rhs = slices[stmt.lhs.name]
+
+    new_fn = TypedFn(name = names.fresh("thread_local_" + names.original(fn.name)),
+                     arg_names = buffer_names + list(body_fn.arg_names),
+                     body = prelude + body_fn.body,
+                     input_types = [buffer.type for (_, buffer) in buffers] + list(body_fn.input_types),
+                     return_type = body_fn.return_type,
+                     type_env = type_env,
+                     created_by = fn.created_by)
+    return LowerSlices().apply(new_fn)
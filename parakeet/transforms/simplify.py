@@ -12,7 +12,7 @@ from .. syntax import (AllocArray, Assign, ExprStmt, Expr,
                        Slice, Index, Array, ArrayView, Attribute, Struct, Select, 
                        PrimCall, Call, TypedFn, UntypedFn, 
                        OuterMap, Map, Reduce, Scan, IndexMap, IndexReduce, 
-                       IndexScan, FilterReduce)
+                       IndexScan, Filter, FilterReduce, IndexFilter, IndexFilterReduce)
 from .. syntax.helpers import (collect_constants, is_one, is_zero, is_false, is_true, all_constants,
                                get_types, 
                                slice_none_t, const_int, one, none, true, false, slice_none, 
@@ -64,6 +64,7 @@ class Simplify(Transform):
                             Slice, 
                             Map, Reduce, Scan, OuterMap, 
                             IndexMap, IndexReduce, IndexScan, 
+                            Filter, FilterReduce, IndexFilter, IndexFilterReduce, 
                             ])
   
   def immutable(self, expr):
@@ -473,6 +474,8 @@ class Simplify(Transform):
   def transform_ParFor(self, stmt):
     stmt.bounds = self.transform_shape(stmt.bounds)
     stmt.fn = self.transform_expr(stmt.fn)
+    if stmt.tile_sizes is not None:
+      stmt.tile_sizes = self.transform_shape(stmt.tile_sizes)
     return stmt
   
   def transform_Reduce(self, expr):
@@ -487,6 +490,20 @@ class Simplify(Transform):
     elif expr.axis is None: expr.axis = none   
     return expr  
   
+  def transform_FilterReduce(self, expr):
+    expr = self.transform_Reduce(expr)
+    expr.pred = self.transform_expr(expr.pred)
+    return expr 
+  
+  def transform_Filter(self, expr):
+    expr.args = self.transform_simple_exprs(expr.args)
+    expr.fn = self.transform_expr(expr.fn)
+    expr.axis = self.transform_if_expr(expr.axis)
+    max_rank = max(self.rank(arg) for arg in expr.args)
+    if max_rank == 1 and self.is_none(expr.axis): expr.axis = zero_i64
+    elif expr.axis is None: expr.axis = none   
+    return expr 
+  
   def transform_Scan(self, expr):
     expr.axis = self.transform_if_expr(expr.axis)
     expr.fn = self.transform_expr(expr.fn)
@@ -512,6 +529,17 @@ class Simplify(Transform):
     expr.shape = self.transform_shape(expr.shape)
     return expr 
   
+  def transform_IndexFilter(self, expr):
+    expr.fn = self.transform_expr(expr.fn)
+    expr.pred = self.transform_expr(expr.pred)
+    expr.shape = self.transform_shape(expr.shape)
+    return expr 
+  
+  def transform_IndexFilterReduce(self, expr):
+    expr = self.transform_IndexReduce(expr)
+    expr.pred = self.transform_expr(expr.pred)
+    return expr 
+  
   def transform_IndexScan(self, expr):
     expr.fn = self.transform_if_expr(expr.fn)
     expr.combine = self.transform_expr(expr.combine)
@@ -592,6 +620,14 @@ class Simplify(Transform):
       stmt.value = v
       return stmt
 
+  def transform_Check(self, stmt):
+    """Drop checks which are known to pass"""
+    
+    stmt.cond = self.transform_simple_expr(stmt.cond, "cond")
+    if is_true(stmt.cond):
+      return None
+    return stmt
+
   def transform_Assign(self, stmt):
     
     lhs = stmt.lhs
@@ -782,10 +818,10 @@ class Simplify(Transform):
           var = Var(var_name, input_value.type)
           self.blocks.append(Assign(var, input_value))
         return None
-      elif stmt.start.value + stmt.step.value >= stmt.stop.value:
-        for (var_name, (input_value, _)) in stmt.merge.iteritems():
-          var = Var(var_name, input_value.type)
-          self.blocks.append(Assign(var, input_value))
+      elif stmt.start.value + stmt.step.value >= stmt.stop.value and \
+           len(stmt.merge) == 0:
+        # loop-carried variables take their values from the body after the
+        # loop, so only flatten loops which don't have any
         self.assign(stmt.var, stmt.start)
         self.blocks.top().extend(stmt.body)
         return None
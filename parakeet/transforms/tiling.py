@@ -0,0 +1,36 @@
+from ..analysis import contains_adverbs
+from ..ndtypes import ArrayT, ScalarT
+from ..syntax import OuterMap, TiledOuterMap
+from transform import Transform
+
+class Tiling(Transform):
+  """
+  Rewrite OuterMaps between the rows of two matrices whose elements
+  are themselves loops over those rows (e.g. np.dot, all-pairs distances)
+  into TiledOuterMaps, which IndexifyAdverbs turns into a ParFor over
+  tiles of the output, so that each tile's rows get reused from the cache
+  """
+
+  def is_tileable(self, expr):
+    if len(expr.args) != 2:
+      return False
+    for arg in expr.args:
+      if not isinstance(arg.type, ArrayT) or arg.type.rank != 2:
+        return False
+    axes = self.normalize_axes(expr.args, expr.axis)
+    if not all(isinstance(axis, (int,long)) for axis in axes):
+      return False
+    fn = self.get_fn(expr.fn)
+    return isinstance(fn.return_type, ScalarT) and contains_adverbs(fn)
+
+  def transform_OuterMap(self, expr):
+    if expr.__class__ is not OuterMap or not self.is_tileable(expr):
+      return expr
+    axes = self.normalize_axes(expr.args, expr.axis)
+    return TiledOuterMap(fn = expr.fn,
+                         args = expr.args,
+                         axis = expr.axis,
+                         axes = axes,
+                         fixed_tile_size = None,
+                         type = expr.type,
+                         source_info = expr.source_info)
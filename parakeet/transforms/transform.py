@@ -3,7 +3,7 @@ import time
 from .. import config
 from .. analysis import verify
 from .. builder import Builder  
-from .. syntax import (Expr, If, Assign, While, Return, ExprStmt, ForLoop, Comment, ParFor, 
+from .. syntax import (Expr, If, Assign, While, Return, ExprStmt, ForLoop, Comment, ParFor, Check, 
                        Var, Tuple, Index, Attribute, Const, PrimCall, Struct, Alloc, Cast,  
                        TupleProj, Slice, ArrayView, Call, TypedFn,  AllocArray, Len, UntypedFn,  
                        Map, Reduce) 
@@ -218,6 +218,17 @@ class Transform(Builder):
     expr.init = self.transform_if_expr(expr.init)
     return expr
   
+  def transform_IndexFilter(self, expr):
+    expr.fn = self.transform_expr(expr.fn)
+    expr.pred = self.transform_expr(expr.pred)
+    expr.shape = self.transform_expr(expr.shape)
+    return expr
+  
+  def transform_IndexFilterReduce(self, expr):
+    expr = self.transform_IndexReduce(expr)
+    expr.pred = self.transform_expr(expr.pred)
+    return expr
+  
   def transform_Map(self, expr):
     expr.axis = self.transform_if_expr(expr.axis)
     expr.fn = self.transform_expr(expr.fn)
@@ -241,11 +252,50 @@ class Transform(Builder):
     expr.emit = self.transform_expr(expr.emit)
     return expr
   
+  def transform_Filter(self, expr):
+    expr.axis = self.transform_if_expr(expr.axis)
+    expr.fn = self.transform_expr(expr.fn)
+    expr.args = self.transform_expr_list(expr.args)
+    return expr
+  
+  def transform_FilterReduce(self, expr):
+    expr = self.transform_Reduce(expr)
+    expr.pred = self.transform_expr(expr.pred)
+    return expr
+  
   def transform_OuterMap(self, expr):
     expr.axis = self.transform_if_expr(expr.axis)
     expr.fn = self.transform_expr(expr.fn)
     expr.args = self.transform_expr_tuple(expr.args)
     return expr
+
+  def transform_Conv(self, expr):
+    expr.fn = self.transform_expr(expr.fn)
+    expr.x = self.transform_expr(expr.x)
+    expr.window_shape = self.transform_expr(expr.window_shape)
+    return expr
+  
+  def transform_ConvBorderFn(self, expr):
+    expr = self.transform_Conv(expr)
+    expr.border_fn = self.transform_expr(expr.border_fn)
+    return expr
+  
+  def transform_ConvBorderValue(self, expr):
+    expr = self.transform_Conv(expr)
+    expr.border_value = self.transform_expr(expr.border_value)
+    return expr
+  
+  def transform_ConvPadding(self, expr):
+    expr = self.transform_Conv(expr)
+    expr.fill_value = self.transform_expr(expr.fill_value)
+    return expr
+
+  def transform_TiledOuterMap(self, expr):
+    expr.axis = self.transform_if_expr(expr.axis)
+    expr.fn = self.transform_expr(expr.fn)
+    expr.args = self.transform_expr_tuple(expr.args)
+    expr.fixed_tile_size = self.transform_if_expr(expr.fixed_tile_size)
+    return expr
   
   def transform_Closure(self, expr):
     expr.args = self.transform_expr_tuple(expr.args)
@@ -260,6 +310,12 @@ class Transform(Builder):
   def transform_TypeValue(self, expr):
     pass 
   
+  def transform_NumCores(self, expr):
+    pass 
+  
+  def transform_ThreadId(self, expr):
+    pass 
+  
   def transform_DelayUntilTyped(self, expr):
     expr.values = self.transform_expr_tuple(expr.values)
     return expr 
@@ -420,9 +476,14 @@ class Transform(Builder):
   def transform_Comment(self, stmt):
     return stmt 
   
+  def transform_Check(self, stmt):
+    stmt.cond = self.transform_expr(stmt.cond)
+    return stmt 
+  
   def transform_ParFor(self, stmt):
     stmt.fn = self.transform_expr(stmt.fn)
     stmt.bounds= self.transform_expr(stmt.bounds)
+    stmt.tile_sizes = self.transform_if_expr(stmt.tile_sizes)
     return stmt 
   
   def transform_stmt(self, stmt):
@@ -444,6 +505,8 @@ class Transform(Builder):
       return self.transform_ParFor(stmt)
     elif stmt_class is Comment:
       return self.transform_Comment(stmt)
+    elif stmt_class is Check:
+      return self.transform_Check(stmt)
     else:
       assert False, "Unexpected statement %s" % stmt_class
 
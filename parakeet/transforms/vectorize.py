@@ -1,35 +1,270 @@
-from ..ndtypes import Int32, Int64, Float32, Float64
+from .. import prims
+from ..analysis import collect_var_names_list
+from ..ndtypes import ArrayT, ScalarT, Int32, Int64, Float32, Float64
+from ..syntax import (Assign, Attribute, Cast, Const, ExprStmt, If, Index, PrimCall,
+                      Select, Tuple, TupleProj, Var)
 
 from loop_transform import LoopTransform
 
+vector_elt_types = (Int32, Int64, Float32, Float64)
+
+# accumulations which the backend can split across SIMD lanes
+reduction_prims = (prims.add, prims.multiply, prims.minimum, prims.maximum)
+
+# anything else (calls, allocations, views) keeps a loop scalar
+simple_expr_classes = (Var, Const, PrimCall, Index, Attribute, TupleProj, Tuple, Select, Cast)
+
+def is_simple_expr(expr):
+  c = expr.__class__
+  if c not in simple_expr_classes:
+    return False
+  elif c is PrimCall:
+    return all(is_simple_expr(arg) for arg in expr.args)
+  elif c is Tuple:
+    return all(is_simple_expr(elt) for elt in expr.elts)
+  elif c is Index:
+    return is_simple_expr(expr.value) and is_simple_expr(expr.index)
+  elif c is Attribute:
+    return is_simple_expr(expr.value)
+  elif c is TupleProj:
+    return is_simple_expr(expr.tuple)
+  elif c is Select:
+    return is_simple_expr(expr.cond) and \
+      is_simple_expr(expr.true_value) and \
+      is_simple_expr(expr.false_value)
+  elif c is Cast:
+    return is_simple_expr(expr.value)
+  return True
+
+def body_stmts(stmts):
+  """Flatten the branches of a simple block"""
+  for stmt in stmts:
+    yield stmt
+    if stmt.__class__ is If:
+      for nested in body_stmts(stmt.true):
+        yield nested
+      for nested in body_stmts(stmt.false):
+        yield nested
+
+def body_bindings(stmts):
+  """
+  Map every variable bound in a loop body to its right-hand side
+  (or to None if it comes out of a branch's merge)
+  """
+  bindings = {}
+  for stmt in body_stmts(stmts):
+    if stmt.__class__ is Assign and stmt.lhs.__class__ is Var:
+      bindings[stmt.lhs.name] = stmt.rhs
+    elif stmt.__class__ is If:
+      for name in stmt.merge.iterkeys():
+        bindings[name] = None
+  return bindings
+
+def body_exprs(stmts):
+  """Every expression which gets evaluated in a loop body"""
+  for stmt in body_stmts(stmts):
+    if stmt.__class__ is Assign:
+      yield stmt.rhs
+      if stmt.lhs.__class__ is Index:
+        yield stmt.lhs.value
+        yield stmt.lhs.index
+    elif stmt.__class__ is ExprStmt:
+      yield stmt.value
+    elif stmt.__class__ is If:
+      yield stmt.cond
+      for (left, right) in stmt.merge.itervalues():
+        yield left
+        yield right
+
+def count_uses(stmts):
+  counts = {}
+  for expr in body_exprs(stmts):
+    for name in collect_var_names_list(expr):
+      counts[name] = counts.get(name, 0) + 1
+  return counts
+
+def collect_indexing(expr, reads):
+  c = expr.__class__
+  if c is Index:
+    reads.append(expr)
+    collect_indexing(expr.index, reads)
+  elif c is PrimCall:
+    for arg in expr.args:
+      collect_indexing(arg, reads)
+  elif c is Tuple:
+    for elt in expr.elts:
+      collect_indexing(elt, reads)
+  elif c is Select:
+    collect_indexing(expr.cond, reads)
+    collect_indexing(expr.true_value, reads)
+    collect_indexing(expr.false_value, reads)
+  elif c is Cast:
+    collect_indexing(expr.value, reads)
+  elif c is Attribute:
+    collect_indexing(expr.value, reads)
+  elif c is TupleProj:
+    collect_indexing(expr.tuple, reads)
+
+def memory_accesses(stmts):
+  """Returns the Index expressions which a loop body reads and those it writes"""
+  reads = []
+  writes = []
+  for stmt in body_stmts(stmts):
+    if stmt.__class__ is Assign and stmt.lhs.__class__ is Index:
+      writes.append(stmt.lhs)
+  for expr in body_exprs(stmts):
+    collect_indexing(expr, reads)
+  return reads, writes
+
+def index_elts(index, bindings):
+  if isinstance(index.type, ScalarT):
+    return [index]
+  if index.__class__ is Var:
+    index = bindings.get(index.name, index)
+  if index.__class__ is Tuple:
+    return index.elts
+  return None
+
+def is_invariant(expr, loop_var, bindings):
+  return expr.__class__ is Const or \
+    (expr.__class__ is Var and expr.name != loop_var.name and expr.name not in bindings)
+
+def steps_with_loop(expr, loop_var, bindings):
+  """
+  Does this index move forward by one element on each iteration?
+  (either the loop variable itself or the loop variable plus something invariant)
+  """
+  if expr.__class__ is not Var:
+    return False
+  if expr.name == loop_var.name:
+    return True
+  rhs = bindings.get(expr.name)
+  if rhs.__class__ is not PrimCall or rhs.prim != prims.add:
+    return False
+  x, y = rhs.args
+  if x.__class__ is Var and x.name == loop_var.name:
+    return is_invariant(y, loop_var, bindings)
+  elif y.__class__ is Var and y.name == loop_var.name:
+    return is_invariant(x, loop_var, bindings)
+  return False
+
+def unit_stride_axes(loop):
+  """
+  Map the name of each array which the loop steps through to the axes along
+  which it does so, these need unit strides for the loop's accesses to be contiguous
+  """
+  bindings = body_bindings(loop.body)
+  reads, writes = memory_accesses(loop.body)
+  axes = {}
+  for expr in reads + writes:
+    elts = index_elts(expr.index, bindings)
+    if elts is None:
+      continue
+    for (i, elt) in enumerate(elts):
+      if steps_with_loop(elt, loop.var, bindings):
+        axes.setdefault(expr.value.name, set([])).add(i)
+  return axes
+
+def accessed_arrays(loop):
+  """Map the name of every array which the loop indexes into to its type"""
+  reads, writes = memory_accesses(loop.body)
+  return dict((expr.value.name, expr.value.type) for expr in reads + writes)
+
+def written_arrays(loop):
+  _, writes = memory_accesses(loop.body)
+  return set(expr.value.name for expr in writes)
+
+def simd_reductions(loop):
+  """
+  Map each merge variable which the loop accumulates into to the primitive
+  doing the accumulating, or return None if some merge variable is
+  carried between iterations in any other way
+  """
+  bindings = body_bindings(loop.body)
+  uses = count_uses(loop.body)
+  reductions = {}
+  for (name, (left, right)) in loop.merge.iteritems():
+    if left.type not in vector_elt_types or right.__class__ is not Var:
+      return None
+    if right.name == name:
+      continue
+    rhs = bindings.get(right.name)
+    if rhs.__class__ is not PrimCall or rhs.prim not in reduction_prims:
+      return None
+    # the accumulator can't be seen anywhere else in the body
+    arg_names = [arg.name for arg in rhs.args if arg.__class__ is Var]
+    if arg_names.count(name) != 1 or uses.get(name, 0) != 1 or \
+       uses.get(right.name, 0) != 0:
+      return None
+    reductions[name] = rhs.prim
+  return reductions
+
 class Vectorize(LoopTransform):
-  
+  """
+  Mark innermost loops whose iterations are independent of each other,
+  apart from reductions into their merge variables, so that the backend
+  can run them as SIMD lanes
+  """
+
   def pre_apply(self, _):
-    # skip the may-alias analysis from LoopTransform
-    pass 
-  
-  vector_elt_types = (Int32, Int64, Float32, Float64) 
-  def vectorize_loop(self, stmt):
-     
-    candidate_names = set([])
-    before_values = {}
-    after_values = {}
-    for (k, (before, after)) in stmt.merge.iteritems():
-      t = before.type
-      if t in self.vector_elt_types:
-        candidate_names.add(k)
-        before_values[k] = before
-        after_values[k] = after
-      
-  
+    # skip the may-alias analysis from LoopTransform,
+    # the backend checks at runtime that the arrays being
+    # written don't overlap the others
+    pass
+
+  def index_key(self, index, bindings):
+    elts = index_elts(index, bindings)
+    if elts is None:
+      return None
+    key = []
+    for elt in elts:
+      if elt.__class__ is Var:
+        key.append(elt.name)
+      elif elt.__class__ is Const:
+        key.append(("const", elt.value))
+      else:
+        return None
+    return tuple(key)
+
+  def independent_writes(self, stmt, bindings):
+    """
+    Every iteration has to write to its own element of each written array
+    and read only that element back
+    """
+    reads, writes = memory_accesses(stmt.body)
+    for name in set(expr.value.name for expr in writes):
+      accesses = [expr for expr in reads + writes if expr.value.name == name]
+      keys = set(self.index_key(expr.index, bindings) for expr in accesses)
+      if len(keys) != 1 or None in keys:
+        return False
+      elts = index_elts(accesses[0].index, bindings)
+      if not any(steps_with_loop(elt, stmt.var, bindings) for elt in elts):
+        return False
+    return True
+
+  def vectorizable(self, stmt):
+    if stmt.step.__class__ is not Const or stmt.step.value != 1:
+      return False
+    if not self.is_simple_block(stmt.body):
+      return False
+    if not all(is_simple_expr(expr) for expr in body_exprs(stmt.body)):
+      return False
+    reductions = simd_reductions(stmt)
+    if reductions is None:
+      return False
+    reads, writes = memory_accesses(stmt.body)
+    for expr in reads + writes:
+      t = expr.value.type
+      if expr.value.__class__ is not Var or not isinstance(t, ArrayT) or \
+         t.elt_type not in vector_elt_types:
+        return False
+    # for now only bother with loops which accumulate or write something
+    if len(reductions) == 0 and len(writes) == 0:
+      return False
+    return self.independent_writes(stmt, body_bindings(stmt.body))
+
   def transform_ForLoop(self, stmt):
-    # for now we only vectorize if 
-    # something is being accumulated, 
-    # otherwise you need more sophisticated
-    # cost-base heuristic to avoid lots of 
-    # redundant SIMD packing and unpacking
-    if self.is_simple_block(stmt.body) and len(stmt.merge) > 1:
-      return self.vectorize_loop(stmt)
-    else:
-      return stmt 
-      
\ No newline at end of file
+    stmt = LoopTransform.transform_ForLoop(self, stmt)
+    if self.vectorizable(stmt):
+      stmt.vectorize = True
+    return stmt
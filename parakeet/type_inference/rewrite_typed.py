@@ -3,10 +3,12 @@ from .. import names, syntax
 from ..ndtypes import (IncompatibleTypes, 
                        Bool, Type,  ArrayT, Int64, TupleT,
                        NoneT, SliceT, ScalarT,  
-                       make_tuple_type, make_array_type, lower_rank)
-from ..syntax import (Assign, Tuple, Var, Cast, Return, Index, Map, 
+                       make_tuple_type, make_array_type, lower_rank, increase_rank, 
+                       layout_compatible, is_mask)
+from ..builder import build_fn 
+from ..syntax import (Assign, Check, Tuple, Var, Cast, Return, Index, IndexFilter, IndexMap, 
                       ConstArrayLike, Const)
-from ..syntax.helpers import get_types, zero_i64, none, const 
+from ..syntax.helpers import get_types, zero_i64, one_i64, none, const, slice_none 
 from ..transforms import Transform 
 
 
@@ -29,7 +31,8 @@ class RewriteTyped(Transform):
   def coerce_expr(self, expr, t):
     assert t is not None
     expr = self.transform_expr(expr)
-    if expr.type == t:
+    if layout_compatible(expr.type, t):
+      # contiguous arrays can be used wherever strided ones are expected
       return expr
     elif expr.__class__ is Tuple:
       if t.__class__ is not TupleT or \
@@ -108,6 +111,7 @@ class RewriteTyped(Transform):
       return array
 
   def transform_Reduce(self, expr):
+    expr.args = self.transform_expr_list(expr.args)
     acc_type = self.return_type(expr.combine)
     if expr.init and \
         not self.is_none(expr.init) and \
@@ -117,6 +121,7 @@ class RewriteTyped(Transform):
     return expr
     
   def transform_Scan(self, expr):
+    expr.args = self.transform_expr_list(expr.args)
     acc_type = self.return_type(expr.combine)
     if expr.init and not self.is_none(expr.init) and expr.init.type != acc_type:
       if isinstance(acc_type, ScalarT):
@@ -125,9 +130,10 @@ class RewriteTyped(Transform):
            isinstance(expr.axis, Const) and \
            len(expr.args) == 1:
         arr_slice = self.slice_along_axis(expr.args[0], expr.axis, zero_i64)
-        init_type = make_array_type(elt_type = expr.init.type, rank = arr_slice.type.rank)
+        init_value = self.coerce_expr(expr.init, acc_type.elt_type)
+        init_type = make_array_type(init_value.type, arr_slice.type.rank)
         expr.init = ConstArrayLike(array = arr_slice, 
-                                   value = expr.init, 
+                                   value = init_value, 
                                    type = init_type)
       else:
         assert False, \
@@ -168,10 +174,12 @@ class RewriteTyped(Transform):
       # whereas by a scalar does 
       if isinstance(idx_t, ScalarT):
         lower_rank_by += 1 
+      elif isinstance(idx_t, TupleT):
+        lower_rank_by += len(idx_t.elt_types)
       idx_name = names.fresh("idx%d" % (i+1))
       idx_names.append(idx_name)
       idx_var = Var(idx_name, type = idx_t)
-      if idx_t is not Int64:
+      if isinstance(idx_t, ScalarT) and idx_t is not Int64:
         idx_var = Cast(value = idx_var,  type = Int64)
         idx_t = Int64 
       idx_types.append(index_types)
@@ -194,11 +202,235 @@ class RewriteTyped(Transform):
     _index_function_cache[key] = fn 
     return fn 
     
-  def transform_Index(self, expr):
-    # TODO: Make fancy indexing work 
-    # with multiple indices, boolean index elements, 
-    # and multi-dimensional indexing
+  def mask_index(self, array, mask):
+    """
+    Indexing by a boolean mask keeps the elements (or, for a mask of 
+    lower rank, the subarrays) of the array wherever the mask is True  
+    """
+    if array.__class__ is not Var:
+      array = self.assign_name(array, "array")
+    if mask.__class__ is not Var:
+      mask = self.assign_name(mask, "mask")
+    array_t = array.type 
+    mask_t = mask.type 
+    n_indices = mask_t.rank 
+    assert n_indices <= array_t.rank, \
+      "Mask of type %s has too many dimensions for %s" % (mask_t, array_t)
+    if n_indices == 1:
+      idx_t = Int64 
+      shape = self.shape(mask, 0)
+    else:
+      idx_t = make_tuple_type((Int64,) * n_indices)
+      shape = self.shape(mask)
+    value_fn = self.get_index_fn(array_t, [idx_t])
+    pred_fn = self.get_index_fn(mask_t, [idx_t])
+    return IndexFilter(fn = self.closure(value_fn, [array]), 
+                       pred = self.closure(pred_fn, [mask]), 
+                       shape = shape,
+                       type = increase_rank(value_fn.return_type, 1))
+    
+  def mask_positions(self, mask):
+    """
+    Integer vectors of the positions (one per dimension) where a boolean mask 
+    is True, which index the same elements as the mask itself
+    """
+    if mask.__class__ is not Var:
+      mask = self.assign_name(mask, "mask")
+    mask_t = mask.type 
+    if mask_t.rank == 1:
+      idx_t = Int64 
+      shape = self.shape(mask, 0)
+    else:
+      idx_t = make_tuple_type((Int64,) * mask_t.rank)
+      shape = self.shape(mask)
+    pred_fn = self.get_index_fn(mask_t, [idx_t])
+    positions = []
+    for i in xrange(mask_t.rank):
+      fn, builder, (idx,) = build_fn([idx_t], Int64, name = "mask_position%d" % i)
+      builder.return_(idx if mask_t.rank == 1 else builder.tuple_proj(idx, i))
+      positions.append(self.assign_name(IndexFilter(fn = fn, 
+                                                    pred = self.closure(pred_fn, [mask]), 
+                                                    shape = shape, 
+                                                    type = make_array_type(Int64, 1)), 
+                                        "positions"))
+    return positions
+  
+  def check_broadcast(self, dims, broadcast_dims, error, message):
+    """
+    Raise at runtime unless every dimension is either 1 or the 
+    corresponding broadcast dimension. Compiled code only raises once 
+    it's done, so callers should skip the work when this returns false. 
+    """
+    conds = [self.or_(self.eq(dim, broadcast_dim), self.eq(dim, one_i64))
+             for (dim, broadcast_dim) in zip(dims, broadcast_dims)]
+    cond = self.assign_name(reduce(self.and_, conds), "broadcastable")
+    self.blocks.append_to_current(Check(cond, error, message))
+    return cond 
+  
+  def fancy_indexing(self, array, indices):
+    """
+    Break up indexing by integer arrays (mixed with scalars and slices) 
+    into a view of the array which applies all the slices, the iteration 
+    space of the gather or scatter, and a function which builds the index 
+    into the view for one point of that space. Following NumPy, 
+    the index arrays get broadcast against each other and their dimensions
+    go where the first of them was if they're all next to each other 
+    or otherwise in front. Sliced dimensions after the index arrays stay 
+    as sub-arrays of each element, so gathering rows copies whole rows.  
+    """
+    n_consumed = sum(idx.type.rank if is_mask(idx.type) else 1 for idx in indices)
+    assert n_consumed <= array.type.rank, \
+      "Too many indices for array of type %s" % array.type
+    indices = list(indices) + [slice_none] * (array.type.rank - n_consumed)
+    expanded = []
+    # mask positions can't be negative so they don't need wrapping around 
+    positions = []
+    for idx in indices:
+      if isinstance(idx.type, NoneT):
+        expanded.append(slice_none)
+      elif is_mask(idx.type):
+        positions.extend(range(len(expanded), len(expanded) + idx.type.rank))
+        expanded.extend(self.mask_positions(idx))
+      elif isinstance(idx.type, ArrayT):
+        expanded.append(idx if idx.__class__ is Var else self.assign_name(idx, "idx"))
+      elif isinstance(idx.type, ScalarT):
+        expanded.append(self.cast(idx, Int64))
+      else:
+        expanded.append(idx)
+    
+    slices = [idx if isinstance(idx.type, SliceT) else slice_none for idx in expanded]
+    if any(idx.type != slice_none.type for idx in slices):
+      view = self.assign_name(self.index(array, self.tuple(slices)), "view")
+    else:
+      view = array 
+    if view.__class__ is not Var:
+      view = self.assign_name(view, "array")
+    
+    advanced = [i for (i, idx) in enumerate(expanded) if not isinstance(idx.type, SliceT)]
+    if advanced == range(advanced[0], advanced[-1] + 1):
+      leading = range(advanced[0])
+    else:
+      leading = []
+    index_args = [expanded[i] for i in advanced]
+    index_arrays = [idx for idx in index_args if isinstance(idx.type, ArrayT)]
+    broadcast_rank = max(idx.type.rank for idx in index_arrays)
+    broadcast_dims = []
+    for d in xrange(broadcast_rank):
+      dims = [self.shape(idx, d - broadcast_rank + idx.type.rank) 
+              for idx in index_arrays 
+              if d >= broadcast_rank - idx.type.rank]
+      broadcast_dim = self.assign_name(reduce(self.max, dims), "broadcast_dim")
+      if len(dims) > 1:
+        # indices past the end of shorter dimensions get clamped, 
+        # so only dimensions of length 1 are allowed to differ
+        ok = self.check_broadcast(dims, [broadcast_dim] * len(dims), "IndexError", 
+          "shape mismatch: indexing arrays could not be broadcast together")
+        broadcast_dim = self.select(ok, broadcast_dim, zero_i64, name = "broadcast_dim")
+      broadcast_dims.append(broadcast_dim)
+    loop_dims = [self.shape(view, i) for i in leading] + broadcast_dims 
+    
+    def build_index(builder, view_var, index_vars, loop_vars):
+      """
+      Given the view, index arguments and loop indices as inputs of a 
+      function, build the index into the view 
+      """
+      leading_vars = loop_vars[:len(leading)]
+      broadcast_vars = loop_vars[len(leading):]
+      index_elts = []
+      for (i, idx) in enumerate(expanded):
+        if i in advanced:
+          idx = index_vars[advanced.index(i)]
+          if isinstance(idx.type, ArrayT):
+            elt_idx = broadcast_vars[broadcast_rank - idx.type.rank:]
+            if len(index_arrays) > 1:
+              # dimensions of length 1 get repeated along the broadcast ones  
+              elt_idx = [builder.min(v, builder.sub(builder.shape(idx, d), one_i64))
+                         for (d, v) in enumerate(elt_idx)]
+            idx = builder.cast(builder.index(idx, elt_idx, temp = True), Int64)
+          if i not in positions:
+            # like NumPy, negative indices count back from the end 
+            idx = builder.select(builder.lt(idx, zero_i64), 
+                                 builder.add(idx, builder.shape(view_var, i)), 
+                                 idx, name = "idx")
+          index_elts.append(idx)
+        elif i in leading:
+          index_elts.append(leading_vars[leading.index(i)])
+        else:
+          index_elts.append(slice_none)
+      return builder.tuple(index_elts)
+    return view, index_args, self.tuple(loop_dims), build_index 
+  
+  def gather(self, array, indices, result_t):
+    view, index_args, loop_shape, build_index = self.fancy_indexing(array, indices)
+    n_loops = len(loop_shape.type.elt_types)
+    input_types = [view.type] + get_types(index_args) + [Int64] * n_loops
+    fn, builder, input_vars = build_fn(input_types, lower_rank(result_t, n_loops), 
+                                       name = "gather")
+    index_vars = input_vars[1:-n_loops]
+    loop_vars = input_vars[-n_loops:]
+    builder.return_(builder.index(input_vars[0], 
+                                  build_index(builder, input_vars[0], index_vars, loop_vars)))
+    return IndexMap(fn = self.closure(fn, [view] + index_args), 
+                    shape = loop_shape, 
+                    type = result_t)
+  
+  def scatter(self, array, indices, value):
+    """
+    Assign to the elements of an array selected by fancy indexing with a 
+    ParFor over the indices, with the value broadcast along them
+    """
+    if value.__class__ is not Var and not isinstance(value.type, ScalarT):
+      value = self.assign_name(value, "value")
+    if len(indices) == 1 and is_mask(indices[0].type) and isinstance(value.type, ScalarT):
+      # a mask which picks out positions to fill doesn't need to know how 
+      # many positions come before each of them
+      mask = indices[0]
+      if mask.__class__ is not Var:
+        mask = self.assign_name(mask, "mask")
+      n_loops = mask.type.rank 
+      input_types = [array.type, mask.type, value.type] + [Int64] * n_loops
+      fn, builder, input_vars = build_fn(input_types, name = "masked_scatter")
+      array_var, mask_var, value_var = input_vars[:3]
+      loop_vars = input_vars[3:]
+      def fill(): 
+        elt = builder.index(array_var, loop_vars)
+        builder.assign(elt, builder.cast(value_var, array.type.elt_type) 
+                            if isinstance(elt.type, ScalarT) else value_var)
+      builder.if_(builder.index(mask_var, loop_vars), fill, lambda: None)
+      builder.return_(none)
+      self.parfor(self.closure(fn, [array, mask, value]), self.shape(mask))
+      return 
     
+    view, index_args, loop_shape, build_index = self.fancy_indexing(array, indices)
+    n_loops = len(loop_shape.type.elt_types)
+    input_types = [view.type] + get_types(index_args) + [value.type] + [Int64] * n_loops
+    fn, builder, input_vars = build_fn(input_types, name = "scatter")
+    index_vars = input_vars[1:-n_loops - 1]
+    value_var = input_vars[-n_loops - 1]
+    loop_vars = input_vars[-n_loops:]
+    elt = builder.index(input_vars[0], build_index(builder, input_vars[0], index_vars, loop_vars))
+    elt_rank = elt.type.rank if isinstance(elt.type, ArrayT) else 0 
+    if isinstance(value.type, ArrayT) and value.type.rank > elt_rank:
+      # the value varies along the trailing loops, 
+      # except where it's only got length 1  
+      n_value_loops = value.type.rank - elt_rank
+      value_loop_vars = loop_vars[n_loops - n_value_loops:]
+      loop_dims = list(self.tuple_elts(loop_shape))
+      ok = self.check_broadcast([self.shape(value, d) for d in xrange(n_value_loops)], 
+                                loop_dims[n_loops - n_value_loops:], "ValueError", 
+        "shape mismatch: value array could not be broadcast to indexing result")
+      loop_shape = self.tuple([self.select(ok, loop_dims[0], zero_i64, name = "loop_dim")] + 
+                              loop_dims[1:])
+      value_idx = [builder.min(v, builder.sub(builder.shape(value_var, d), one_i64))
+                   for (d, v) in enumerate(value_loop_vars)]
+      value_var = builder.index(value_var, value_idx, temp = True)
+    if isinstance(elt.type, ScalarT):
+      value_var = builder.cast(value_var, elt.type)
+    builder.assign(elt, value_var)
+    builder.return_(none)
+    self.parfor(self.closure(fn, [view] + index_args + [value]), loop_shape)
+  
+  def transform_Index(self, expr):
     index = expr.index
     if index.type.__class__ is TupleT:
       indices = self.tuple_elts(index) 
@@ -208,34 +440,24 @@ class RewriteTyped(Transform):
     if all(isinstance(idx.type, (NoneT, SliceT, ScalarT)) for idx in indices):
       return expr 
     
-    map_args = []
-    index_elt_types = []
-    
-    for index in indices:
-      if index.type.__class__ is ArrayT:
-        assert index.type.rank == 1, \
-          "Don't yet support indexing by %s" % index.type 
-        index_elt_t = index.type.elt_type
-        
-        if index_elt_t == Bool:
-          assert False, "Indexing by boolean vector not yet implemented"
-          #index_array = Where(expr.index)
-          #index_elt_t = Int64
-        else:
-          map_args.append(expr.index)
-          index_elt_types.append(index_elt_t)
-      else:
-        map_args.append(expr.index)
-        index_elt_types.append(expr.index.type)
-      
-    index_fn = self.get_index_fn(expr.value.type, index_elt_types)
-    index_closure = self.closure(index_fn, [expr.value])
-    return Map(fn = index_closure, 
-                   args = map_args, 
-                   type = expr.value.type, 
-                   axis = none)
+    value = self.transform_expr(expr.value)
+    indices = self.transform_expr_list(indices)
+    if len(indices) == 1 and is_mask(indices[0].type):
+      return self.mask_index(value, indices[0])
+    return self.gather(value, indices, expr.type)
     
   def transform_Assign(self, stmt):
+    if stmt.lhs.__class__ is Index and \
+       isinstance(stmt.lhs.value.type, ArrayT):
+      if stmt.lhs.index.type.__class__ is TupleT:
+        indices = self.tuple_elts(stmt.lhs.index)
+      else:
+        indices = [stmt.lhs.index]
+      if any(isinstance(idx.type, ArrayT) for idx in indices):
+        self.scatter(self.transform_expr(stmt.lhs.value), 
+                     self.transform_expr_list(indices), 
+                     self.transform_expr(stmt.rhs))
+        return None 
     new_lhs = self.transform_lhs(stmt.lhs)
     lhs_t = new_lhs.type
     rhs = self.transform_expr(stmt.rhs)
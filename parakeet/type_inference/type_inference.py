@@ -1,6 +1,7 @@
 from itertools import izip 
 
 from .. import config, names,  prims, syntax
+from ..compile_profile import timed
 
 from ..builder import mk_prim_fn 
 from ..ndtypes import (Type, 
@@ -375,6 +376,53 @@ class TypeInference(LocalTypeInference):
                        type = result_type,
                        init = init)
 
+  def transform_Filter(self, expr):
+    pred = self.transform_fn(expr.fn)
+    new_args = self.transform_args(expr.args, flat = True)
+    assert len(new_args) == 1, "Filter expects exactly one argument, got %d" % len(new_args)
+    arg_t = new_args[0].type
+    assert isinstance(arg_t, ArrayT), "Filter expects an array argument, got %s" % arg_t
+    axis = self.transform_if_expr(expr.axis)
+    axes = self.normalize_axes(new_args, axis)
+    assert axes[0] in (None, 0), "Filter along axis %s not supported" % axes[0]
+    result_type, typed_pred = specialize_Filter(pred.type, arg_t, axes[0])
+    return syntax.Filter(fn = make_typed_closure(pred, typed_pred),
+                         args = new_args,
+                         axis = axis,
+                         type = result_type)
+
+  def transform_FilterReduce(self, expr):
+    new_args = self.transform_args(expr.args, flat = True)
+    arg_types = get_types(new_args)
+    assert any(isinstance(t, ArrayT) for t in arg_types), \
+      "FilterReduce requires array arguments, got %s" % (arg_types,)
+    axis = self.transform_if_expr(expr.axis)
+    axes = self.normalize_axes(new_args, axis)
+    map_fn = self.transform_fn(expr.fn if expr.fn else untyped_identity_function)
+    combine_fn = self.transform_fn(expr.combine)
+    pred = self.transform_fn(expr.pred)
+    if self.is_none(expr.init):
+      init = none
+    else:
+      init = self.transform_expr(expr.init)
+    result_type, typed_map_fn, typed_combine_fn = \
+      specialize_Reduce(map_fn.type, combine_fn.type, arg_types, axes, init.type)
+    _, typed_pred = specialize_Map(pred.type, arg_types, axes)
+    assert isinstance(typed_pred.return_type, ScalarT), \
+      "Filter predicate must return a scalar, got %s" % typed_pred.return_type
+    if init.type.__class__ is NoneT:
+      assert isinstance(result_type, ScalarT), \
+        "FilterReduce of %s values requires an initial value" % result_type
+    elif isinstance(result_type, ScalarT) and init.type != result_type:
+      init = self.cast(init, result_type)
+    return syntax.FilterReduce(fn = make_typed_closure(map_fn, typed_map_fn),
+                               combine = make_typed_closure(combine_fn, typed_combine_fn),
+                               pred = make_typed_closure(pred, typed_pred),
+                               args = new_args,
+                               axis = axis,
+                               init = init,
+                               type = result_type)
+
   def transform_OuterMap(self, expr):
     closure = self.transform_fn(expr.fn)
     new_args = self.transform_args (expr.args, flat = True)
@@ -390,10 +438,47 @@ class TypeInference(LocalTypeInference):
                              type = result_type)
     return result 
 
+  def transform_Conv(self, expr):
+    x = self.transform_expr(expr.x)
+    x_t = x.type
+    assert isinstance(x_t, ArrayT), "Conv expects an array argument, got %s" % x_t
+    window_shape = self.transform_expr(expr.window_shape)
+    window_t = window_shape.type
+    # a single window size applies to every dimension 
+    if isinstance(window_t, ScalarT):
+      window_dims = [window_shape] * x_t.rank
+    else:
+      assert isinstance(window_t, TupleT) and len(window_t.elt_types) == x_t.rank, \
+        "Expected window shape with %d dimensions, got %s" % (x_t.rank, window_t)
+      window_dims = self.tuple_elts(window_shape)
+    assert all(isinstance(d.type, IntT) for d in window_dims), \
+      "Window shape must be integers, got %s" % (window_t,)
+    window_shape = self.tuple([self.cast(d, Int64) for d in window_dims])
+    closure = self.transform_fn(expr.fn)
+    result_type, typed_fn = specialize_Conv(closure.type, x_t)
+    kwargs = dict(fn = make_typed_closure(closure, typed_fn), 
+                  x = x, 
+                  window_shape = window_shape, 
+                  type = result_type)
+    conv_class = expr.__class__ 
+    if conv_class is syntax.ConvBorderFn:
+      border_fn = self.transform_fn(expr.border_fn)
+      _, typed_border_fn = specialize_Conv(border_fn.type, x_t)
+      kwargs['border_fn'] = make_typed_closure(border_fn, typed_border_fn)
+    elif conv_class is syntax.ConvBorderValue:
+      border_value = self.transform_expr(expr.border_value)
+      kwargs['border_value'] = self.cast(border_value, result_type.elt_type)
+    elif conv_class is syntax.ConvPadding:
+      fill_value = self.transform_expr(expr.fill_value)
+      kwargs['fill_value'] = self.cast(fill_value, x_t.elt_type)
+    return conv_class(**kwargs)
+
+  transform_ConvBorderFn = transform_Conv
+  transform_ConvBorderValue = transform_Conv
+  transform_ConvPadding = transform_Conv
   
   
 
-
 def infer_types(untyped_fn, types):
   """
   Given an untyped function and input types, propagate the types through the
@@ -521,7 +606,8 @@ def specialize(fn, arg_types, return_type = None):
   
   full_arg_types = arg_types.prepend_positional(closure_t.arg_types)
   fundef = _get_fundef(closure_t.fn)
-  typed =  _specialize(fundef, full_arg_types, return_type)
+  with timed("type_inference"):
+    typed =  _specialize(fundef, full_arg_types, return_type)
   closure_t.specializations[key] = typed
 
   if config.print_specialized_function:
@@ -616,9 +702,33 @@ def specialize_Scan(map_fn, combine_fn, emit_fn, array_types, axes,  init_type =
       specialize_Reduce(map_fn, combine_fn, array_types, axes, init_type)
   typed_emit_fn = specialize(emit_fn, [acc_type])
   elt_result_t = typed_emit_fn.return_type
-  result_t = increase_adverb_output_rank(array_types, axes, elt_result_t)
+  if all(axis is None for axis in axes):
+    # like np.cumsum, scanning over every element gives a flat result 
+    result_t = array_type.increase_rank(elt_result_t, 1)
+  else:
+    result_t = increase_adverb_output_rank(array_types, axes, elt_result_t)
   return result_t, typed_map_fn, typed_combine_fn, typed_emit_fn
 
+def specialize_Filter(pred, array_t, axis):
+  _, typed_pred = specialize_Map(pred, [array_t], [axis])
+  assert isinstance(typed_pred.return_type, ScalarT), \
+    "Filter predicate must return a scalar, got %s" % typed_pred.return_type
+  # filtering every element gives a flat result,
+  # whereas filtering the rows of an array keeps its rank
+  if axis is None:
+    result_t = make_array_type(array_t.elt_type, 1)
+  else:
+    result_t = array_t
+  return result_t, typed_pred
+
+def specialize_Conv(fn, array_t):
+  # windows are slices of the input, so they have the same type 
+  typed_fn = specialize(fn, [array_t])
+  elt_result_t = typed_fn.return_type
+  assert isinstance(elt_result_t, ScalarT), \
+    "Conv function must return a scalar, got %s" % elt_result_t
+  return make_array_type(elt_result_t, array_t.rank), typed_fn
+
 def specialize_OuterMap(fn, array_types, axes):
   elt_types = peel_adverb_input_types(array_types, axes)
   typed_map_fn = specialize(fn, elt_types)
@@ -0,0 +1,52 @@
+import numpy as np
+
+from parakeet import filter, filter_reduce, add, multiply
+from parakeet.testing_helpers import run_local_tests, expect, expect_each
+
+int_1d = np.arange(10) - 4
+float_1d = np.random.randn(10)
+float_2d = np.random.randn(5, 3)
+big_float_1d = np.random.randn(20001)
+
+def positive(x):
+  return x > 0
+
+def first_positive(row):
+  return row[0] > 0
+
+def keep_positive(x):
+  return filter(positive, x)
+
+def test_filter_1d():
+  expect_each(keep_positive, lambda x: x[x > 0], [int_1d, float_1d, big_float_1d])
+
+def keep_rows(x):
+  return filter(first_positive, x)
+
+def test_filter_rows():
+  expect(keep_rows, [float_2d], float_2d[float_2d[:, 0] > 0])
+
+def sum_positive(x):
+  return filter_reduce(add, positive, x)
+
+def test_filter_reduce():
+  expect_each(sum_positive, lambda x: np.sum(x[x > 0]), 
+              [int_1d, float_1d, big_float_1d])
+
+def test_filter_reduce_nothing_kept():
+  expect(sum_positive, [-np.abs(float_1d)], 0.0)
+
+def prod_positive(x):
+  return filter_reduce(multiply, positive, x, init = 2)
+
+def test_filter_reduce_init():
+  expect_each(prod_positive, lambda x: 2 * np.prod(x[x > 0]), [int_1d, float_1d])
+
+def min_positive(x):
+  return filter_reduce(min, positive, x)
+
+def test_big_filter_reduce_min():
+  expect(min_positive, [big_float_1d], np.min(big_float_1d[big_float_1d > 0]))
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -55,5 +55,34 @@ def avg_along_axis_0(Xs):
     return s / Ys.shape[0]
   return parakeet.each(d, s)
 
+big_float_vec = np.random.randn(100000)
+
+def test_big_float_sum():
+  testing_helpers.expect(my_sum, [big_float_vec], np.sum(big_float_vec))
+
+def ireduce_argmin(x):
+  def elt(i):
+    return i, x[i]
+  def combine((i1, v1), (i2, v2)):
+    if v2 < v1:
+      return i2, v2
+    else:
+      return i1, v1
+  return parakeet.ireduce(elt, combine, x.shape, init = (0, x[0]))
+
+def test_ireduce_argmin():
+  # repeated values check that ties still go to the first index 
+  x = np.tile(big_float_vec[:1000], 100)
+  i = np.argmin(x)
+  testing_helpers.expect(ireduce_argmin, [x], (i, x[i]))
+
+def ireduce_2d_sum(x):
+  def elt((i, j)):
+    return x[i, j]
+  return parakeet.ireduce(elt, parakeet.add, x.shape, init = 0.0)
+
+def test_ireduce_2d_sum():
+  testing_helpers.expect(ireduce_2d_sum, [a], np.sum(a))
+
 if __name__ == '__main__':
   testing_helpers.run_local_tests()
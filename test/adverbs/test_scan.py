@@ -1,6 +1,6 @@
 import numpy as np
 
-from parakeet import scan, add
+from parakeet import scan, add, maximum
 from parakeet.testing_helpers import run_local_tests, expect, expect_each
 
 int_1d = np.arange(5)
@@ -14,6 +14,19 @@ def running_sum(x):
 def test_scan_add_1d():
   expect_each(running_sum, np.cumsum, [int_1d, float_1d])
 
+big_int_1d = np.arange(30001) % 13
+big_float_1d = np.random.randn(30001)
+
+def test_big_scan_add_1d():
+  # long enough to be split into per-thread blocks
+  expect_each(running_sum, np.cumsum, [big_int_1d, big_float_1d])
+
+def running_max(x):
+  return scan(maximum, x, init = x[0])
+
+def test_big_scan_max_1d():
+  expect_each(running_max, np.maximum.accumulate, [big_int_1d, big_float_1d])
+
 def loop_row_sums(x):
   n_rows = x.shape[0]
   y = np.zeros_like(x)
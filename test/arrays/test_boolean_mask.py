@@ -0,0 +1,51 @@
+import numpy as np
+from parakeet.testing_helpers import expect, run_local_tests
+
+vec_int = np.arange(10) - 4 
+vec_float = np.random.randn(10)
+mat_int = np.arange(12).reshape(4,3) % 5 - 2 
+mat_float = np.random.randn(4,3)
+
+def positive(x):
+  return x[x > 0]
+
+def test_1d_mask():
+  for x in [vec_int, vec_float]:
+    expect(positive, [x], x[x > 0])
+
+def test_2d_mask():
+  for x in [mat_int, mat_float]:
+    expect(positive, [x], x[x > 0])
+
+def test_empty_mask():
+  x = -np.abs(vec_float)
+  expect(positive, [x], x[x > 0])
+
+def mask_arg(x, mask):
+  return x[mask]
+
+def test_mask_arg():
+  mask = vec_int % 3 == 0
+  expect(mask_arg, [vec_float, mask], vec_float[mask])
+
+def test_row_mask():
+  mask = mat_float[:, 0] > 0
+  expect(mask_arg, [mat_float, mask], mat_float[mask])
+
+def sum_positive(x):
+  return np.sum(x[x > 0])
+
+def test_sum_mask():
+  for x in [vec_int, vec_float]:
+    expect(sum_positive, [x], np.sum(x[x > 0]))
+
+big_float = np.random.randn(20001)
+big_mat = np.random.randn(201, 101)
+
+def test_big_mask():
+  # large enough to be packed in parallel chunks by the openmp backend
+  for x in [big_float, big_mat]:
+    expect(positive, [x], x[x > 0])
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -1,4 +1,5 @@
 import numpy as np
+from parakeet import jit
 from parakeet.testing_helpers import expect, run_local_tests
 
 n = 8
@@ -25,5 +26,143 @@ def test_2d_by_idx():
   for m in matrices:
     expect(idx, [m, indices], idx(m, indices))
 
+rows = np.array([2, 0, 7, 7])
+cols = np.array([1, 5, 3, 0], dtype = np.int32)
+
+def idx2(x, i, j):
+  return x[i, j]
+
+def test_2d_by_two_vectors():
+  for m in matrices:
+    expect(idx2, [m, rows, cols], m[rows, cols])
+
+def test_broadcast_indices():
+  i = np.array([[0], [3], [5]])
+  j = np.array([[1, 2, 6, 7]])
+  for m in matrices:
+    expect(idx2, [m, i, j], m[i, j])
+
+def expect_error(fn, args, error):
+  for backend in ('interp', 'c', 'openmp'):
+    try:
+      jit(fn)(*args, _backend = backend)
+    except error:
+      pass 
+    else:
+      assert False, "Expected %s with backend=%s" % (error.__name__, backend)
+
+def test_mismatched_indices():
+  # unlike (3,1) and (1,4), these can't be broadcast together
+  expect_error(idx2, [mat_float, np.array([0, 1, 2]), cols], IndexError)
+  expect_error(idx2, [mat_float, np.array([[0, 1], [2, 3]]), np.array([0, 1, 2])], IndexError)
+
+def test_scalar_and_vector():
+  for m in matrices:
+    expect(idx2, [m, 3, cols], m[3, cols])
+
+def test_negative_indices():
+  i = np.array([-1, 0, -8, 3])
+  j = np.array([2, -3, -1, 0])
+  for v in vectors:
+    expect(idx, [v, i], v[i])
+  for m in matrices:
+    expect(idx, [m, i], m[i])
+    expect(idx2, [m, i, j], m[i, j])
+    expect(idx2, [m, -2, j], m[-2, j])
+
+def select_cols(x, j):
+  return x[:, j]
+
+def test_select_cols():
+  for m in matrices:
+    expect(select_cols, [m, cols], m[:, cols])
+
+def select_rows(x, i):
+  return x[i, 1:6]
+
+def test_select_rows():
+  for m in matrices:
+    expect(select_rows, [m, rows], m[rows, 1:6])
+
+tensor = np.arange(60.0).reshape(3, 4, 5)
+
+def split_indices(x, i, j):
+  # the indexed dimensions aren't next to each other, so they go first
+  return x[i, ::2, j]
+
+def test_split_indices():
+  i = np.array([0, 2, 1])
+  j = np.array([4, 0, 0])
+  expect(split_indices, [tensor, i, j], tensor[i, ::2, j])
+
+def mask_and_scalar(x, mask):
+  return x[mask, 2]
+
+def test_mask_and_scalar():
+  mask = mat_float[:, 0] > 0
+  expect(mask_and_scalar, [mat_float, mask], mat_float[mask, 2])
+
+def set_idx2(x, i, j, v):
+  x[i, j] = v
+  return x
+
+def test_scatter():
+  for m in matrices:
+    v = m[rows, cols] + 1
+    expected = m.copy()
+    expected[rows, cols] = v
+    expect(set_idx2, [m, rows, cols, v], expected)
+
+def test_scatter_negative():
+  i = np.array([-1, 2])
+  j = np.array([-2, 0])
+  expected = mat_float.copy()
+  expected[i, j] = 5.0
+  expect(set_idx2, [mat_float, i, j, 5.0], expected)
+
+def test_scatter_mismatched():
+  x = mat_float.copy()
+  expect_error(set_idx2, [x, np.array([0, 1, 2]), cols, 1.0], IndexError)
+  expect_error(set_idx2, [x, rows, cols, np.arange(3.0)], ValueError)
+  assert (x == mat_float).all()
+
+def test_scatter_scalar():
+  expected = mat_float.copy()
+  expected[rows, cols] = -1.0
+  expect(set_idx2, [mat_float, rows, cols, -1.0], expected)
+
+def set_rows(x, i, row):
+  x[i] = row
+  x[i + 1] *= 2
+  return x
+
+def test_scatter_rows():
+  row = np.arange(n) * 1.5
+  i = np.array([1, 4])
+  expected = mat_float.copy()
+  expected[i] = row
+  expected[i + 1] *= 2
+  expect(set_rows, [mat_float, i, row], expected)
+
+def clip_negative(x):
+  x[x < 0] = 0
+  return x
+
+def test_masked_fill():
+  x = np.random.randn(5, 6)
+  expected = x.copy()
+  expected[expected < 0] = 0
+  expect(clip_negative, [x], expected)
+
+def double_masked(x, mask):
+  x[mask] = x[mask] * 2
+  return x
+
+def test_masked_scatter():
+  mask = mat_float % 2 > 0.5
+  expected = mat_float.copy()
+  expected[mask] *= 2
+  expect(double_masked, [mat_float, mask], expected)
+
 if __name__ == '__main__':
     run_local_tests()
@@ -0,0 +1,70 @@
+import imp 
+import shutil 
+import tempfile 
+import numpy as np 
+
+from parakeet import aot, jit, Float64, Int64, Int32, make_array_type 
+from parakeet.testing_helpers import run_local_tests, eq 
+
+def add(x, y):
+  return x + y
+
+@jit 
+def norm(x):
+  return np.sqrt(np.sum(x * x))
+
+float_vec = make_array_type(Float64, 1)
+int_vec = make_array_type(Int32, 1)
+
+signatures = {
+  add : [(Int64, Int64), (Float64, Float64), (float_vec, float_vec)], 
+  norm : [(float_vec,), (np.arange(3, dtype = np.int32),)], 
+}
+
+def compile_and_load(backend):
+  output_dir = tempfile.mkdtemp(prefix = "parakeet_test_aot")
+  try: 
+    module_name = "aot_test_%s" % backend 
+    filename = aot.compile_module(module_name, signatures, output_dir, backend = backend)
+    return imp.load_dynamic(module_name, filename)
+  finally:
+    shutil.rmtree(output_dir)
+
+def check_module(m):
+  assert m.add(3, 4) == 7 
+  assert m.add(1.5, 2.0) == 3.5 
+  x = np.arange(10.0)
+  assert eq(m.add(x, x), x + x)
+  assert eq(m.norm(x), np.sqrt(np.sum(x*x)))
+  y = np.arange(10, dtype = np.int32)
+  assert eq(m.norm(y), np.sqrt(np.sum(y*y)))
+  try:
+    m.add(x, 3)
+  except TypeError:
+    pass 
+  else:
+    assert False, "Expected TypeError for signature which wasn't compiled"
+  # strided views can use the version compiled for any layout...
+  assert eq(m.add(x[::2], x[1::2]), x[::2] + x[1::2])
+  # ...but not the one compiled from a contiguous example value
+  try:
+    m.norm(y[::2])
+  except TypeError:
+    pass 
+  else:
+    assert False, "Expected TypeError for strided array passed to contiguous signature"
+  
+def test_aot_c():
+  check_module(compile_and_load('c'))
+
+def test_aot_openmp():
+  m = compile_and_load('openmp')
+  check_module(m)
+  # a trailing thread count sets the size of the call's teams 
+  x = np.arange(10.0)
+  assert eq(m.add(x, x, 2), x + x)
+  assert eq(m.norm(x, 3), np.sqrt(np.sum(x*x)))
+  assert m.add(3, 4, 2) == 7
+
+if __name__ == "__main__":
+  run_local_tests()
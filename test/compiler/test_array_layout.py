@@ -0,0 +1,75 @@
+import numpy as np
+
+from parakeet import jit, syntax
+from parakeet.frontend import specialize
+from parakeet.ndtypes import make_array_type, typeof, Float64, Int64
+from parakeet.transforms.pipeline import indexify
+from parakeet.testing_helpers import eq, expect, run_local_tests
+
+m = np.arange(20.0).reshape(4,5)
+v = np.arange(5)
+
+def test_typeof_layout():
+  assert typeof(m) == make_array_type(Float64, 2, 'C'), typeof(m)
+  assert typeof(m.T) == make_array_type(Float64, 2, 'F'), typeof(m.T)
+  assert typeof(m[:, ::2]) == make_array_type(Float64, 2), typeof(m[:, ::2])
+  # a contiguous vector is both C and F ordered
+  assert typeof(v) == make_array_type(Int64, 1, 'C'), typeof(v)
+  assert typeof(v[::2]) == make_array_type(Int64, 1), typeof(v[::2])
+
+def add(x, y):
+  return x + y
+
+def test_add():
+  expect(add, [m, m], m + m)
+
+def test_add_layouts():
+  # the interpreter assumes C order, so only check the compiled backends
+  for x in [m, np.asfortranarray(m), m[::-1, ::2], m[1:]]:
+    for y in [x, np.ascontiguousarray(x), np.asfortranarray(x)]:
+      for backend in ('c', 'openmp'):
+        result = jit(add)(x, y, _backend = backend)
+        assert eq(result, x + y), \
+          "Expected %s but got %s with backend=%s" % (x + y, result, backend)
+
+def add_rows(x):
+  n, _ = x.shape
+  result = x[0] * 1
+  for i in range(1, n):
+    result += x[i]
+  return result
+
+def test_add_rows():
+  for x in [m, np.asfortranarray(m), m[:, ::-2]]:
+    for backend in ('c', 'openmp'):
+      result = jit(add_rows)(x, _backend = backend)
+      assert eq(result, add_rows(x)), \
+        "Expected %s but got %s with backend=%s" % (add_rows(x), result, backend)
+
+def ravel(x):
+  return x.ravel()
+
+def test_ravel():
+  for x in [m, np.asfortranarray(m), m[:, ::2]]:
+    for backend in ('c', 'openmp'):
+      result = jit(ravel)(x, _backend = backend)
+      assert eq(result, x.ravel()), \
+        "Expected %s but got %s with backend=%s" % (x.ravel(), result, backend)
+
+def test_separate_specializations():
+  f = jit(add)
+  c_fn, _ = specialize(f, [m, m])
+  f_fn, _ = specialize(f, [np.asfortranarray(m), np.asfortranarray(m)])
+  assert c_fn is not f_fn
+  assert c_fn.input_types != f_fn.input_types
+
+def test_flat_map():
+  typed_fn, _ = specialize(jit(add), [m, m])
+  fn = indexify(typed_fn)
+  parfors = [stmt for stmt in fn.body if isinstance(stmt, syntax.ParFor)]
+  assert len(parfors) == 1, "Expected a single ParFor, got %s" % fn
+  assert parfors[0].bounds.type == Int64, \
+    "Expected a one dimensional ParFor, got %s" % fn
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -0,0 +1,121 @@
+import json
+import shutil
+import tempfile
+import numpy as np
+
+import parakeet
+from parakeet import config, jit
+from parakeet.c_backend import config as c_config
+from parakeet.c_backend import run_function as c_run_function
+from parakeet.c_backend.pymodule_compiler import PyModuleCompiler
+from parakeet.testing_helpers import eq, run_local_tests
+
+def scaled_sum(x, alpha):
+  return np.sum(x * alpha)
+
+x = np.arange(20.0)
+
+def profile_call(f, *args):
+  with parakeet.profile_compilation() as records:
+    assert eq(f(*args, _backend = 'c'), f.f(*args))
+  assert len(records) == 1, "Expected one compile record, got %s" % records
+  rec = records[0]
+  assert rec['backend'] == 'c'
+  assert len(rec['signature']) == len(args)
+  assert sum(rec['times'].values()) <= rec['total'] + 1e-3
+  json.dumps(records)
+  return rec
+
+def with_fresh_caches(test):
+  """
+  Run a test with empty on-disk caches, so that nothing it compiles 
+  can come from an earlier run 
+  """
+  def wrapper():
+    old_cache_dir = c_config.cache_dir
+    old_persistent = config.persistent_dispatch_cache
+    c_config.cache_dir = tempfile.mkdtemp(prefix = "parakeet_test_profile")
+    config.persistent_dispatch_cache = False
+    try:
+      test()
+    finally:
+      shutil.rmtree(c_config.cache_dir)
+      c_config.cache_dir = old_cache_dir
+      config.persistent_dispatch_cache = old_persistent
+  wrapper.__name__ = test.__name__
+  return wrapper 
+
+def scaled_max(x, alpha):
+  return np.max(x * alpha)
+
+@with_fresh_caches
+def test_uncached_compile():
+  rec = profile_call(jit(scaled_max), x, 3.0)
+  assert rec['function'] == 'scaled_max'
+  for step in ('type_inference', 'codegen', 'compile', 'link', 'load'):
+    assert step in rec['times'], "Missing %s in %s" % (step, rec['times'])
+  assert len(rec['phases']) > 0
+  for stats in rec['phases'].values():
+    assert stats['cache_hits'] + stats['cache_misses'] <= stats['calls']
+
+def scaled_min(x, alpha):
+  return np.min(x * alpha)
+
+@with_fresh_caches
+def test_cached_compile():
+  profile_call(jit(scaled_min), x, 3.0)
+  # forget the compiled module in this process so it has to be loaded 
+  # again from the shared library cache
+  c_run_function._cache.clear()
+  PyModuleCompiler._entry_compile_cache.clear()
+  rec = profile_call(jit(scaled_min), x, 3.0)
+  for step in ('codegen', 'load'):
+    assert step in rec['times'], "Missing %s in %s" % (step, rec['times'])
+  for step in ('compile', 'link'):
+    assert step not in rec['times'], "Unexpected %s in %s" % (step, rec['times'])
+
+def test_no_record_when_cached():
+  f = jit(scaled_sum)
+  f(x, 2.0, _backend = 'c')
+  with parakeet.profile_compilation() as records:
+    f(x, 4.0, _backend = 'c')
+  assert len(records) == 0, "Unexpected compile records %s" % records
+
+def test_compile_stats():
+  f = jit(scaled_sum)
+  with parakeet.profile_compilation():
+    f(x.astype('int32'), 2, _backend = 'c')
+  assert len(parakeet.compile_stats(f)) > 0
+  assert all(rec['function'] == 'scaled_sum' for rec in parakeet.compile_stats(f))
+  parakeet.clear_compile_stats()
+  assert len(parakeet.compile_stats()) == 0
+
+def make_fn():
+  def scaled_sum(x, alpha):
+    return np.sum(x * alpha) + 1
+  return scaled_sum
+
+def test_compile_stats_same_name():
+  f = jit(scaled_sum)
+  g = jit(make_fn())
+  parakeet.clear_compile_stats()
+  with parakeet.profile_compilation():
+    f(x.astype('int16'), 2, _backend = 'c')
+    g(x.astype('int16'), 2, _backend = 'c')
+  assert len(parakeet.compile_stats(f)) == 1, parakeet.compile_stats(f)
+  assert len(parakeet.compile_stats(g)) == 1, parakeet.compile_stats(g)
+  assert len(parakeet.compile_stats()) == 2
+
+def test_max_compile_stats():
+  old = config.max_compile_stats
+  config.max_compile_stats = 2
+  try:
+    with parakeet.profile_compilation():
+      for dtype in ('int8', 'uint8', 'uint16'):
+        jit(scaled_sum)(x.astype(dtype), 2, _backend = 'c')
+    assert len(parakeet.compile_stats()) == 2
+  finally:
+    config.max_compile_stats = old
+
+if __name__ == '__main__':
+  run_local_tests()
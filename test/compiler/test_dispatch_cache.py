@@ -0,0 +1,81 @@
+import numpy as np 
+
+from parakeet import jit, config  
+from parakeet.testing_helpers import run_local_tests, eq  
+
+def add_scalars(x, y, z = 1):
+  return x + y * z 
+
+def test_dispatch_scalars():
+  f = jit(add_scalars)
+  for (x,y) in [(0,1), (1,0), (3,4), (3.5, 2), (10L, 2), (True, 3)]:
+    result = f(x, y)
+    expected = add_scalars(x, y) 
+    assert eq(result, expected), "Expected %s but got %s" % (expected, result)
+  # 0 and 1 are specialized separately from other values  
+  assert len(f.dispatch_cache) == 6, \
+    "Expected 6 dispatch entries, got %d" % len(f.dispatch_cache)
+
+def test_dispatch_keywords():
+  f = jit(add_scalars)
+  assert f(2, 3, z = 4) == 14
+  assert f(2, 3, 4) == 14
+  assert f(2, 3) == 5
+  
+def test_dispatch_reuse():
+  f = jit(add_scalars)
+  f(2, 3)
+  entries = dict(f.dispatch_cache)
+  assert f(4, 5) == 9
+  assert f.dispatch_cache == entries, "Expected warm call to reuse compiled entry point"
+
+global_vec = np.arange(10.0)
+
+def add_global(x):
+  return x + global_vec
+
+def test_dispatch_strides():
+  f = jit(add_global)
+  x = np.arange(20.0)
+  for arg in [x[:10], x[::2], x[1::2], np.float32(2.0), np.array(3.0), (x[::2] > 3)]:
+    result = f(arg)
+    expected = add_global(arg)
+    assert eq(result, expected), "Expected %s but got %s" % (expected, result)
+  assert len(f.dispatch_cache) == 5, \
+    "Expected 5 dispatch entries, got %d" % len(f.dispatch_cache)
+
+def add1(x):
+  return x + 1
+
+def test_dispatch_layout():
+  # a view skipping rows has the same kinds of strides as a contiguous
+  # matrix but mustn't reuse code compiled for contiguous data
+  f = jit(add1)
+  a = np.arange(32.0).reshape(8, 4)
+  b = a[::2]
+  for arg in [a, b, np.asfortranarray(a)]:
+    result = f(arg)
+    assert eq(result, arg + 1), "Expected %s but got %s" % (arg + 1, result)
+  assert len(f.dispatch_cache) == 3, \
+    "Expected 3 dispatch entries, got %d" % len(f.dispatch_cache)
+
+def sum_tuple(t):
+  return t[0] + t[1] + t[2]
+
+def test_dispatch_tuples():
+  f = jit(sum_tuple)
+  assert f((1, 2, 3)) == 6
+  assert f((1, 2L, 3.5)) == 6.5
+  
+def test_dispatch_disabled():
+  f = jit(add_scalars)
+  old = config.opt_dispatch_cache
+  config.opt_dispatch_cache = False 
+  try: 
+    assert f(2, 3) == 5
+  finally:
+    config.opt_dispatch_cache = old
+  assert len(f.dispatch_cache) == 0
+
+if __name__ == "__main__":
+  run_local_tests()
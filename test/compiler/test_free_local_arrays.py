@@ -0,0 +1,40 @@
+import numpy as np
+
+from parakeet import jit
+from parakeet.testing_helpers import expect, run_local_tests
+
+def sum_of_temporaries(x, n):
+  total = 0.0
+  for i in range(n):
+    t = x * i
+    t[0] = 1.0
+    total += np.sum(t * t)
+  return total
+
+def test_loop_temporaries():
+  x = np.arange(100.0)
+  expect(sum_of_temporaries, [x, 5], sum_of_temporaries(x, 5))
+
+def fresh_and_input(x):
+  y = x + 1
+  y[1] = 2.0
+  z = y * 2
+  return z, x
+
+def test_returned_array_owns_data():
+  x = np.arange(10.0)
+  z, x2 = jit(fresh_and_input)(x, _backend = 'c')
+  assert np.all(z == fresh_and_input(x)[0])
+  assert type(z.base).__name__ == 'PyCapsule', "Expected capsule base, got %s" % type(z.base)
+  assert x2.base is x or x2.base is x.base
+
+def same_array_twice(x):
+  y = x * 2
+  return y, y
+
+def test_shared_return():
+  x = np.arange(10.0)
+  expect(same_array_twice, [x], same_array_twice(x))
+
+if __name__ == '__main__':
+  run_local_tests()
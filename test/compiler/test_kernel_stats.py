@@ -0,0 +1,64 @@
+import numpy as np
+
+import parakeet
+from parakeet import jit
+from parakeet.c_backend import config as c_config
+from parakeet.testing_helpers import eq, run_local_tests
+
+def row_sums(X):
+  total = 0.0
+  for i in range(X.shape[0]):
+    total += np.sum(X[i])
+  return total
+
+def sum_of_squares(x):
+  return np.sum(x * x)
+
+def add_one(x):
+  return x + 1
+
+X = np.random.randn(20, 30)
+
+def instrumented_stats(python_fn, args, backend, n_calls):
+  old = c_config.instrument_kernels
+  c_config.instrument_kernels = True
+  try:
+    f = jit(python_fn)
+    for _ in xrange(n_calls):
+      result = f(*args, _backend = backend)
+  finally:
+    c_config.instrument_kernels = old
+  assert eq(result, python_fn(*args))
+  stats = parakeet.kernel_stats(f)
+  assert len(stats) == 1, "Expected counters for one entry point, got %s" % stats
+  stats = stats[0]
+  assert stats['calls'] == n_calls, "Expected %d calls, got %s" % (n_calls, stats)
+  assert stats['time'] >= stats['boxing'] + stats['unboxing']
+  return stats
+
+def test_loop_nest():
+  for backend in ('c', 'openmp'):
+    stats = instrumented_stats(row_sums, [X], backend, 2)
+    assert len(stats['regions']) == 1, "Expected one region, got %s" % stats
+    region = stats['regions'][0]
+    assert region['name'].startswith('ForLoop'), region
+    assert region['calls'] == 2
+    assert region['iterations'] == 2 * X.shape[0], region
+
+def test_parallel_regions():
+  stats = instrumented_stats(sum_of_squares, [X[0]], 'openmp', 3)
+  names = [region['name'] for region in stats['regions']]
+  assert len(names) == 1 and names[0].startswith('IndexReduce'), names
+  assert stats['regions'][0]['iterations'] == 3 * X.shape[1]
+  stats = instrumented_stats(add_one, [X], 'openmp', 1)
+  names = [region['name'] for region in stats['regions']]
+  assert len(names) == 1 and names[0].startswith('ParFor'), names
+  assert stats['regions'][0]['iterations'] == X.size
+
+def test_not_instrumented_by_default():
+  f = jit(add_one)
+  f(X)
+  assert parakeet.kernel_stats(f) == []
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -0,0 +1,85 @@
+import numpy as np
+
+from parakeet import jit, syntax
+from parakeet.frontend import specialize
+from parakeet.transforms.pipeline import loopify
+from parakeet.testing_helpers import expect, run_local_tests
+
+x = np.arange(12.0) + 1
+m = np.arange(20.0).reshape(4,5)
+
+def two_loops(x):
+  n = x.shape[0]
+  y = np.empty_like(x)
+  for i in range(n):
+    y[i] = x[i] * 2
+  z = np.empty_like(x)
+  for i in range(n):
+    z[i] = y[i] + 1
+  return z
+
+def test_two_loops():
+  expect(two_loops, [x], two_loops(x))
+
+def test_two_loops_fused():
+  typed_fn, _ = specialize(jit(two_loops), [x])
+  fn = loopify(typed_fn)
+  loops = [stmt for stmt in fn.body if isinstance(stmt, syntax.ForLoop)]
+  assert len(loops) == 1, "Expected a single loop, got %s" % fn
+
+def shifted(x):
+  # reads y at other iterations' indices, so these loops must stay separate
+  n = x.shape[0]
+  y = np.empty_like(x)
+  for i in range(n):
+    y[i] = x[i] * 2
+  z = np.zeros_like(x)
+  for i in range(n - 1):
+    z[i] = y[i + 1]
+  for i in range(n):
+    z[i] = z[i] + y[(i + 1) % n]
+  return z
+
+def test_shifted():
+  expect(shifted, [x], shifted(x))
+
+def reduction_then_use(x):
+  n = x.shape[0]
+  total = 0.0
+  for i in range(n):
+    total += x[i]
+  y = np.empty_like(x)
+  for i in range(n):
+    y[i] = x[i] / total
+  return y
+
+def test_reduction_then_use():
+  expect(reduction_then_use, [x], reduction_then_use(x))
+
+def mirrored(x):
+  y = np.empty_like(x)
+  rows, cols = x.shape
+  for i in range(rows):
+    for j in range(cols):
+      y[i, j] = x[i, j] + 1
+  z = np.empty_like(x)
+  for i in range(rows):
+    for j in range(cols):
+      z[i, j] = y[i, j] * y[i, cols - 1 - j]
+  return z
+
+def test_mirrored():
+  expect(mirrored, [m], mirrored(m))
+
+def rotate_copies(grid, old_grid, previous_grid):
+  previous_grid[:, :] = old_grid
+  old_grid[:, :] = grid
+  return previous_grid.sum() + old_grid.sum()
+
+def test_rotate_copies():
+  a, b = m.copy(), m * 2
+  expected = rotate_copies(m, a.copy(), b.copy())
+  expect(rotate_copies, [m, a, b], expected)
+
+if __name__ == '__main__':
+  run_local_tests()
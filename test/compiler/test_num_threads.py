@@ -0,0 +1,75 @@
+import ctypes
+import numpy as np
+
+import parakeet
+from parakeet import jit
+from parakeet.c_backend.prepare_args import prepare_args
+from parakeet.frontend import specialize
+from parakeet.openmp_backend.run_function import compile_fn
+from parakeet.testing_helpers import eq, run_local_tests
+
+@jit
+def sum_of_squares(x):
+  return np.sum(x * x)
+
+@jit
+def row_norms(X):
+  return parakeet.each(lambda row: np.sqrt(np.sum(row * row)), X)
+
+x = np.random.randn(20001)
+X = np.random.randn(101, 201)
+
+def check_results():
+  assert eq(sum_of_squares(x, _backend = 'openmp'), np.sum(x * x))
+  assert eq(row_norms(X, _backend = 'openmp'), np.sqrt(np.sum(X * X, axis = 1)))
+
+def test_threads_context():
+  assert parakeet.get_num_threads() is None
+  for n in (1, 2, 3, 8):
+    with parakeet.threads(n):
+      assert parakeet.get_num_threads() == n
+      check_results()
+  assert parakeet.get_num_threads() is None
+
+def test_set_num_threads():
+  parakeet.set_num_threads(3)
+  try:
+    assert parakeet.get_num_threads() == 3
+    check_results()
+    with parakeet.threads(2):
+      assert parakeet.get_num_threads() == 2
+    assert parakeet.get_num_threads() == 3
+  finally:
+    parakeet.set_num_threads(None)
+  assert parakeet.get_num_threads() is None
+
+def test_num_threads_keyword():
+  expected = np.sum(x * x)
+  for n in (1, 4):
+    assert eq(sum_of_squares(x, _backend = 'openmp', _num_threads = n), expected)
+    assert eq(sum_of_squares(x, _backend = 'c', _num_threads = n), expected)
+  assert parakeet.get_num_threads() is None
+
+def test_caller_thread_count_restored():
+  try:
+    gomp = ctypes.CDLL("libgomp.so.1")
+  except OSError:
+    return
+  before = gomp.omp_get_max_threads()
+  sum_of_squares(x, _backend = 'openmp', _num_threads = before + 2)
+  assert gomp.omp_get_max_threads() == before, \
+    "Expected calling thread to keep %d threads, got %d" % (before, gomp.omp_get_max_threads())
+
+def test_error_returns_restore_thread_count():
+  # a NULL from boxing the result can't easily be forced, so check that 
+  # no way out of the entry function skips restoring the caller's count 
+  typed_fn, _ = specialize(row_norms, [X])
+  src = compile_fn(typed_fn, prepare_args([X], typed_fn.input_types)).src
+  entry = src[src.index("omp_set_num_threads((int) requested)"):src.index("PyMethodDef")]
+  assert "goto" in entry, "Expected errors to jump to a common exit"
+  for before_return in entry.split("return ")[:-1]:
+    assert "omp_set_num_threads(saved_num_threads" in before_return, \
+      "Return without restoring the thread count after:\n%s" % before_return
+
+if __name__ == '__main__':
+  run_local_tests()
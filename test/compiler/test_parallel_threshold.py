@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+
+import parakeet
+from parakeet import jit
+from parakeet.analysis import estimate_cost
+from parakeet.c_backend import config as c_config
+from parakeet.frontend import specialize
+from parakeet.openmp_backend import config as openmp_config, parallel_threshold
+from parakeet.testing_helpers import eq, run_local_tests
+
+def add_one(x):
+  return x + 1
+
+def exp_plus_one(x):
+  return np.exp(x) + 1
+
+def loop_sum(x):
+  total = 0.0
+  for i in range(10):
+    total += x
+  return total
+
+def row_sums(X):
+  return parakeet.each(np.sum, X)
+
+def cost(fn, *args):
+  typed_fn, _ = specialize(jit(fn), args)
+  return estimate_cost(typed_fn)
+
+def test_estimate_cost():
+  assert 0 < cost(add_one, 1.0) < cost(exp_plus_one, 1.0)
+  assert cost(loop_sum, 1.0) >= 10
+
+def run_with_threshold(threshold):
+  old = openmp_config.min_parallel_work
+  openmp_config.min_parallel_work = threshold
+  try:
+    X = np.random.randn(40, 50)
+    x = X.ravel()
+    assert eq(jit(exp_plus_one)(x, _backend = 'openmp'), np.exp(x) + 1)
+    assert eq(jit(row_sums)(X, _backend = 'openmp'), np.sum(X, axis = 1))
+    assert eq(jit(np.sum)(x, _backend = 'openmp'), np.sum(x))
+  finally:
+    openmp_config.min_parallel_work = old
+
+def test_always_parallel():
+  run_with_threshold(0)
+
+def test_never_parallel():
+  run_with_threshold(10 ** 12)
+
+def test_calibration_saved():
+  old_cache_dir = c_config.cache_dir
+  old_calibrated = parallel_threshold._calibrated
+  c_config.cache_dir = tempfile.mkdtemp()
+  parallel_threshold._calibrated = None
+  try:
+    threshold = parallel_threshold.min_parallel_work()
+    assert threshold >= 0, "Expected non-negative threshold, got %s" % threshold
+    assert os.path.exists(os.path.join(c_config.cache_dir, "parallel_threshold.json"))
+    assert parallel_threshold.load_calibration() == threshold
+  finally:
+    shutil.rmtree(c_config.cache_dir)
+    c_config.cache_dir = old_cache_dir
+    parallel_threshold._calibrated = old_calibrated
+
+if __name__ == '__main__':
+  run_local_tests()
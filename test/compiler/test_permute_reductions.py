@@ -0,0 +1,68 @@
+import numpy as np
+
+from parakeet import jit
+from parakeet.analysis.syntax_visitor import SyntaxVisitor
+from parakeet.frontend import specialize
+from parakeet.ndtypes import ArrayT
+from parakeet.transforms.pipeline import adverb_optimizations
+from parakeet.testing_helpers import eq, expect, run_local_tests
+
+float_mat = np.random.randn(7, 4)
+int_mat = np.arange(28).reshape(7, 4)
+matrices = [float_mat, int_mat]
+
+def col_sum(X):
+  return np.sum(X, axis = 0)
+
+def row_sum(X):
+  return np.sum(X, axis = 1)
+
+def col_mean(X):
+  return np.mean(X, axis = 0)
+
+def col_max(X):
+  return np.max(X, axis = 0)
+
+def row_min(X):
+  return np.min(X, axis = 1)
+
+def col_cumsum(X):
+  return np.cumsum(X, axis = 0)
+
+def row_cumsum(X):
+  return np.cumsum(X, axis = 1)
+
+fns = [col_sum, row_sum, col_mean, col_max, row_min, col_cumsum, row_cumsum]
+
+def test_axis_reductions():
+  for f in fns:
+    for X in matrices:
+      expect(f, [X], f(X))
+
+def test_fortran_order():
+  # the interpreter assumes C order, so only check the compiled backends
+  for f in fns:
+    for X in [np.asfortranarray(float_mat), float_mat[::2, ::-1]]:
+      for backend in ('c', 'openmp'):
+        result = jit(f)(X, _backend = backend)
+        assert eq(result, f(X)), \
+          "Expected %s but got %s from %s with backend=%s" % (f(X), result, f.__name__, backend)
+
+class FindArrayReductions(SyntaxVisitor):
+  def __init__(self):
+    self.reductions = []
+
+  def visit_Reduce(self, expr):
+    if isinstance(expr.type, ArrayT):
+      self.reductions.append(expr)
+
+def test_reduce_permuted():
+  typed_fn, _ = specialize(jit(col_sum), [float_mat])
+  fn = adverb_optimizations(typed_fn)
+  finder = FindArrayReductions()
+  finder.visit_fn(fn)
+  assert len(finder.reductions) == 0, \
+    "Expected only scalar reductions, got %s" % fn
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -0,0 +1,108 @@
+import linecache 
+import os 
+import shutil 
+import sys 
+import tempfile 
+import types 
+import numpy as np 
+
+from parakeet import jit, c_backend 
+from parakeet.frontend import disk_cache 
+from parakeet.testing_helpers import run_local_tests, eq 
+
+SCALE = 3 
+
+global_vec = np.arange(10.0)
+
+def helper(x):
+  return x * SCALE 
+
+def scaled_sum(x):
+  return helper(x) + global_vec 
+
+def run_in_temp_cache_dir(test):
+  old_cache_dir = c_backend.config.cache_dir 
+  cache_dir = tempfile.mkdtemp(prefix = "parakeet_test_cache")
+  c_backend.config.cache_dir = cache_dir
+  try:
+    test()
+  finally:
+    c_backend.config.cache_dir = old_cache_dir 
+    shutil.rmtree(cache_dir)
+  
+def test_load_without_translation():
+  def check():
+    x = np.ones(10)
+    expected = scaled_sum(x)
+    first = jit(scaled_sum)
+    assert eq(first(x), expected)
+    # a fresh jit wrapper behaves like a function in a new process 
+    second = jit(scaled_sum)
+    result = second(x)
+    assert eq(result, expected), "Expected %s but got %s" % (expected, result)
+    assert second.untyped is None, "Expected compiled function to be loaded from disk"
+  run_in_temp_cache_dir(check)
+  
+def test_new_signature_compiles():
+  def check():
+    jit(scaled_sum)(np.ones(10))
+    f = jit(scaled_sum)
+    x = np.arange(10, dtype = np.int32)
+    expected = scaled_sum(x)
+    result = f(x)
+    assert eq(result, expected), "Expected %s but got %s" % (expected, result)
+    assert f.untyped is not None 
+  run_in_temp_cache_dir(check)
+  
+def test_fingerprint_tracks_helpers():
+  global SCALE
+  before = disk_cache.fingerprint(scaled_sum)
+  assert before == disk_cache.fingerprint(scaled_sum)
+  old_scale = SCALE
+  SCALE = 4
+  try:
+    after = disk_cache.fingerprint(scaled_sum)
+  finally:
+    SCALE = old_scale 
+  assert before != after, "Expected fingerprint to change along with constant used by helper"
+
+helper_mod = None 
+
+def call_helper_mod(x):
+  return helper_mod.g(x)
+
+def test_fingerprint_tracks_other_modules():
+  global helper_mod
+  module_dir = tempfile.mkdtemp(prefix = "parakeet_test_module")
+  filename = os.path.join(module_dir, "parakeet_test_helper_mod.py")
+  def write_helper(body):
+    with open(filename, 'w') as f:
+      f.write("def g(x):\n  return %s\n" % body)
+    for compiled in (filename + "c", filename + "o"):
+      if os.path.exists(compiled):
+        os.remove(compiled)
+  def check():
+    global helper_mod
+    x = np.arange(3.0)
+    write_helper("x + 1")
+    helper_mod = __import__("parakeet_test_helper_mod")
+    assert eq(jit(call_helper_mod)(x), x + 1)
+    # editing the helper and reloading it is what a new process would see, 
+    # along with a function object which hasn't been translated yet
+    write_helper("x + 100")
+    helper_mod = reload(helper_mod)
+    linecache.checkcache(filename)
+    fresh_fn = types.FunctionType(call_helper_mod.func_code, globals())
+    result = jit(fresh_fn)(x)
+    assert eq(result, x + 100), "Expected %s but got stale result %s" % (x + 100, result)
+  sys.path.insert(0, module_dir)
+  try:
+    run_in_temp_cache_dir(check)
+  finally:
+    sys.path.remove(module_dir)
+    sys.modules.pop("parakeet_test_helper_mod", None)
+    helper_mod = None 
+    shutil.rmtree(module_dir)
+
+if __name__ == "__main__":
+  run_local_tests()
@@ -0,0 +1,101 @@
+import numpy as np
+import threading
+import time
+
+import parakeet
+from parakeet import jit, c_backend
+from parakeet.testing_helpers import eq, run_local_tests
+
+@jit
+def sum_of_temporaries(x, n):
+  total = 0.0
+  for i in range(n):
+    t = x * i
+    t[0] = 1.0
+    total += np.sum(t * t)
+  return total
+
+def test_reuse_temporaries():
+  x = np.arange(1000.0)
+  expected = sum((np.concatenate([[1.0], x[1:] * i]) ** 2).sum() for i in range(4))
+  assert eq(sum_of_temporaries(x, 4, _backend = 'c'), expected)
+  before = parakeet.allocator_stats(sum_of_temporaries)
+  assert eq(sum_of_temporaries(x, 4, _backend = 'c'), expected)
+  after = parakeet.allocator_stats(sum_of_temporaries)
+  assert after['hits'] - before['hits'] == 4, "Expected 4 pool hits, got %s => %s" % (before, after)
+  assert after['misses'] == before['misses'], "Expected no new allocations, got %s => %s" % (before, after)
+  assert after['retained_bytes'] > 0
+
+@jit
+def fresh(x):
+  y = x * 2
+  return y
+
+def test_returned_buffers_outlive_pool():
+  x = np.arange(100.0)
+  ys = [fresh(x, _backend = 'c') for _ in xrange(10)]
+  for y in ys:
+    assert eq(y, x * 2)
+
+def test_thread_exit_releases_pool():
+  x = np.arange(1000.0)
+  sum_of_temporaries(x, 4, _backend = 'c')
+  before = parakeet.allocator_stats(sum_of_temporaries)
+  results = []
+  def worker():
+    results.append(sum_of_temporaries(x, 4, _backend = 'c'))
+    results.append(parakeet.allocator_stats(sum_of_temporaries))
+  thread = threading.Thread(target = worker)
+  thread.start()
+  thread.join()
+  during = results[1]
+  # join returns before the OS thread is done exiting, so give its
+  # destructors a moment to run
+  for _ in xrange(100):
+    after = parakeet.allocator_stats(sum_of_temporaries)
+    if after['retained_bytes'] == before['retained_bytes']:
+      break
+    time.sleep(0.01)
+  assert eq(results[0], sum_of_temporaries(x, 4, _backend = 'c'))
+  assert during['retained_bytes'] > before['retained_bytes'], \
+    "Expected worker thread to retain buffers, got %s => %s" % (before, during)
+  assert after['retained_bytes'] == before['retained_bytes'], \
+    "Expected buffers to be released at thread exit, got %s => %s" % (before, after)
+
+def test_trim():
+  x = np.arange(1000.0)
+  sum_of_temporaries(x, 4, _backend = 'c')
+  assert parakeet.allocator_stats()['retained_bytes'] > 0
+  assert parakeet.trim_allocator_pool() > 0
+  assert parakeet.allocator_stats()['retained_bytes'] == 0
+  before = parakeet.allocator_stats(sum_of_temporaries)
+  assert eq(sum_of_temporaries(x, 4, _backend = 'c'), sum_of_temporaries(x, 4, _backend = 'interp'))
+  after = parakeet.allocator_stats(sum_of_temporaries)
+  assert after['misses'] > before['misses'], "Expected trimmed buffers to be allocated again"
+
+def temporaries_plus(x, n):
+  total = 0.0
+  for i in range(n):
+    t = x + i
+    t[0] = 1.0
+    total += np.sum(t * t)
+  return total
+
+def test_limit_shared_between_modules():
+  old_limit = c_backend.config.pool_max_retained_bytes
+  # room for one buffer of 1000 doubles
+  c_backend.config.pool_max_retained_bytes = 8192
+  try:
+    parakeet.trim_allocator_pool()
+    x = np.arange(1000.0)
+    first, second = jit(sum_of_temporaries.fn), jit(temporaries_plus)
+    first(x, 2, _backend = 'c')
+    second(x, 2, _backend = 'c')
+    retained = parakeet.allocator_stats()['retained_bytes']
+    assert retained == 8192, "Expected one buffer to be retained in total, got %d bytes" % retained
+  finally:
+    c_backend.config.pool_max_retained_bytes = old_limit
+    parakeet.trim_allocator_pool()
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -0,0 +1,53 @@
+import numpy as np
+
+from parakeet import jit, syntax
+from parakeet.analysis.syntax_visitor import SyntaxVisitor
+from parakeet.frontend import specialize
+from parakeet.transforms.pipeline import prealloc_arrays
+from parakeet.testing_helpers import expect, run_local_tests
+
+def closest(x, C):
+  d = np.zeros(C.shape[0])
+  for j in range(C.shape[0]):
+    d[j] = np.sum((x - C[j]) ** 2)
+  return np.argmin(d)
+
+def assign(X, C):
+  return np.array([closest(x, C) for x in X])
+
+X = np.random.randn(200, 3)
+C = np.random.randn(5, 3)
+
+def test_assign():
+  expect(assign, [X, C], assign(X, C))
+
+class FindAllocs(SyntaxVisitor):
+  def __init__(self):
+    self.allocs = []
+
+  def visit_AllocArray(self, expr):
+    self.allocs.append(expr)
+
+  def visit_ParFor(self, stmt):
+    self.visit_fn(syntax.helpers.get_fn(stmt.fn))
+
+def test_temporary_hoisted():
+  typed_fn, _ = specialize(jit(assign), [X, C])
+  fn = prealloc_arrays(typed_fn)
+  parfors = [stmt for stmt in fn.body if isinstance(stmt, syntax.ParFor)]
+  assert len(parfors) == 1, "Expected a single ParFor, got %s" % fn
+  finder = FindAllocs()
+  finder.visit_ParFor(parfors[0])
+  assert len(finder.allocs) == 0, \
+    "Expected no allocations inside ParFor, got %s" % finder.allocs
+
+def add_row_offsets(X, offsets):
+  return np.array([x + offsets[:x.shape[0]] for x in X])
+
+def test_temporary_returned():
+  # each row's array escapes into the output, so it must stay a fresh allocation
+  offsets = np.arange(3.0)
+  expect(add_row_offsets, [X, offsets], add_row_offsets(X, offsets))
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -0,0 +1,95 @@
+import imp
+import threading
+import numpy as np
+
+import parakeet
+from parakeet import jit, Float64, Int64, make_array_type
+from parakeet.frontend import compile_pool
+from parakeet.testing_helpers import run_local_tests, eq
+
+vec = make_array_type(Float64, 1)
+
+def axpy(a, x, y):
+  return a * x + y
+
+def add_one(x):
+  return x + 1
+
+def test_precompile_types():
+  f = jit(axpy)
+  futures = parakeet.precompile(f, [(Float64, vec, vec), (Int64, vec, vec)])
+  assert len(futures) == 2
+  for future in futures:
+    assert future.result() is not None
+  assert len(f.pending) == 0
+  n_entries = len(f.dispatch_cache)
+  x = np.arange(10.0)
+  y = np.ones(10)
+  assert eq(f(2.0, x, y), axpy(2.0, x, y))
+  assert eq(f(3, x, y), axpy(3, x, y))
+  assert len(f.dispatch_cache) == n_entries, "Expected calls to use precompiled entries"
+
+def test_precompile_compiled():
+  # jobs for signatures which are already compiled finish right away
+  f = jit(axpy)
+  sig = (Float64, vec, vec)
+  entry = parakeet.precompile(f, [sig])[0].result()
+  for _ in xrange(200):
+    future = parakeet.precompile(f, [sig])[0]
+    assert future.result() is entry
+  assert len(f.pending) == 0, "Expected no leftover pending jobs, got %s" % f.pending
+
+def test_eager_signatures():
+  @jit(eager_signatures = [(np.arange(5),)])
+  def inc(x):
+    return x + 1
+  x = np.arange(10)
+  assert eq(inc(x), x + 1)
+
+def test_precompile_requires_jit():
+  try:
+    parakeet.precompile(axpy, [(Float64, vec, vec)])
+  except AssertionError:
+    pass
+  else:
+    assert False, "Expected plain functions to be rejected"
+
+def test_precompile_during_import():
+  f = jit(add_one)
+  # pretend we're inside an import, so the job shouldn't start yet
+  imp.acquire_lock()
+  try:
+    future = f.precompile([(Int64,)])[0]
+  finally:
+    imp.release_lock()
+  assert not future.done()
+  assert len(f.dispatch_cache) == 0, "Expected compile job to be deferred"
+  assert f(2) == 3
+  assert future.result() is not None
+  assert len(f.pending) == 0
+
+def test_python_fallback():
+  f = jit(add_one, fallback = 'python')
+  # keep the compile job from finishing until we've made a call
+  gate = threading.Event()
+  future = compile_pool.submit(gate.wait)
+  f.pending[('c', ((int, 2),))] = future
+  assert f(2, _backend = 'c') == 3
+  assert len(f.dispatch_cache) == 0, "Expected call to skip the compiler"
+  gate.set()
+  future.result()
+
+def test_future_exception():
+  def fail():
+    raise RuntimeError("oops")
+  future = compile_pool.submit(fail)
+  assert isinstance(future.exception(), RuntimeError)
+  try:
+    future.result()
+  except RuntimeError:
+    pass
+  else:
+    assert False, "Expected exception to be re-raised"
+
+if __name__ == '__main__':
+  run_local_tests()
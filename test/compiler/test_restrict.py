@@ -0,0 +1,100 @@
+import numpy as np
+
+from parakeet import jit
+from parakeet.analysis.restrict_analysis import indexes_in_loop, restrict_arrays, written_inputs
+from parakeet.frontend import specialize
+from parakeet.transforms.pipeline import loopify
+from parakeet.testing_helpers import eq, expect, run_local_tests
+
+x = np.arange(10.0)
+
+def inc(x, y):
+  for i in range(x.shape[0]):
+    x[i] += y[i]
+  return 0
+
+def test_restrict_arrays():
+  typed_fn, _ = specialize(jit(inc), [x, x])
+  fn = loopify(typed_fn)
+  assert restrict_arrays(fn) == set([]), \
+    "Inputs which might overlap can't be restrict: %s" % restrict_arrays(fn)
+  distinct = restrict_arrays(fn, fn.arg_names)
+  assert distinct == set(fn.arg_names), \
+    "Expected distinct inputs to be restrict, got %s" % distinct
+
+def test_written_inputs():
+  typed_fn, _ = specialize(jit(inc), [x, x])
+  fn = loopify(typed_fn)
+  written = written_inputs(fn)
+  # y might be a view of the same data as x
+  assert written == set(fn.arg_names), "Expected both inputs, got %s" % written
+
+def copy_first(x, y):
+  x[0] = y[0]
+  return 0
+
+def call_inc(x, y):
+  return inc(x, y)
+
+def test_indexes_in_loop():
+  for (f, expected) in [(inc, True), (call_inc, True), (copy_first, False)]:
+    typed_fn, _ = specialize(jit(f), [x, x])
+    fn = loopify(typed_fn)
+    assert indexes_in_loop(fn) == expected, \
+      "Expected indexes_in_loop(%s) to be %s" % (f.__name__, expected)
+
+def test_copy_first_overlapping():
+  for backend in ('c', 'openmp'):
+    a = x.copy()
+    jit(copy_first)(a[1:], a[:-1], _backend = backend)
+    assert a[1] == x[0], "Wrong result for overlapping views with backend=%s" % backend
+
+def run_inc(x, y):
+  inc(x, y)
+  return x
+
+def test_inc():
+  expect(run_inc, [x.copy(), x * 2], x * 3)
+
+def test_overlapping_inputs():
+  # the interpreter handles these fine, so compare the compiled backends against numpy
+  for backend in ('c', 'openmp'):
+    a = x.copy()
+    b = x.copy()
+    inc(b, b)
+    jit(inc)(a, a, _backend = backend)
+    assert eq(a, b), "Expected %s but got %s with backend=%s" % (b, a, backend)
+    a = x.copy()
+    b = x.copy()
+    inc(b[1:], b[:-1])
+    jit(inc)(a[1:], a[:-1], _backend = backend)
+    assert eq(a, b), "Expected %s but got %s with backend=%s" % (b, a, backend)
+
+def test_unaligned_overlap():
+  # views at byte offsets which aren't a multiple of the element size 
+  # still overlap if any of their bytes do 
+  for backend in ('c', 'openmp'):
+    buf = bytearray(8 * 40)
+    expected_buf = bytearray(buf)
+    views = []
+    for data in (buf, expected_buf):
+      a = np.frombuffer(data, np.float64, count = 20, offset = 0)
+      b = np.frombuffer(data, np.float64, count = 20, offset = 57)
+      a[:] = x.repeat(2)
+      b[:] = x.repeat(2) * 3
+      views.append((a, b))
+    (a, b), (expected_a, expected_b) = views
+    inc(expected_b, expected_a)
+    jit(inc)(b, a, _backend = backend)
+    assert buf == expected_buf, "Wrong result for overlapping views with backend=%s" % backend
+
+def add(x, y):
+  return x + y
+
+def test_add_views():
+  m = np.arange(20.0).reshape(4, 5)
+  for y in [m, m.T.T[::-1], m[::2].repeat(2, axis = 0)]:
+    expect(add, [m, y], m + y)
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -0,0 +1,73 @@
+import numpy as np
+
+from benchmarks.run_benchmarks import find_regressions, scale_arg, min_scaled_length
+from parakeet.testing_helpers import run_local_tests
+
+def record(kernel, warm, compile_time, backend = 'c', scale = 1.0):
+  return {'benchmark' : 'bench', 'kernel' : kernel, 'backend' : backend,
+          'scale' : scale, 'warm' : {'median' : warm}, 'cold_compile' : compile_time}
+
+def failed(kernel, error = "RuntimeError: oops", backend = 'c', scale = 1.0):
+  return {'benchmark' : 'bench', 'kernel' : kernel, 'backend' : backend,
+          'scale' : scale, 'error' : error}
+
+baseline = [record('fast', 0.010, 1.0),
+            record('slow', 1.0, 2.0),
+            record('fast', 0.020, 1.0, backend = 'openmp'),
+            failed('broken')]
+
+def regressions(results, threshold = 0.25, min_delta = 0.001):
+  return find_regressions(results, baseline, threshold, min_delta)
+
+def test_no_regressions():
+  results = [record('fast', 0.011, 1.1),
+             record('slow', 0.5, 2.0),
+             record('fast', 0.020, 1.0, backend = 'openmp'),
+             # new kernels and ones which were already failing don't count
+             record('new', 5.0, 5.0),
+             failed('broken')]
+  assert regressions(results) == [], regressions(results)
+
+def test_warm_regression():
+  found = regressions([record('fast', 0.015, 1.0)])
+  assert len(found) == 1 and 'bench.fast' in found[0] and 'warm median' in found[0], found
+
+def test_compile_regression():
+  found = regressions([record('slow', 1.0, 3.0)])
+  assert len(found) == 1 and 'cold compile' in found[0], found
+
+def test_min_delta():
+  # a big relative slowdown which is too small to measure reliably
+  found = regressions([record('fast', 0.015, 1.0)], min_delta = 0.01)
+  assert found == [], found
+
+def test_other_backend():
+  # only compares against the baseline of the same backend and scale
+  found = regressions([record('fast', 0.015, 1.0, backend = 'openmp'),
+                       record('fast', 0.100, 1.0, scale = 0.5)])
+  assert found == [], found
+
+def test_new_failures():
+  found = regressions([failed('fast'), failed(None, "timed out after 600s")])
+  assert len(found) == 2, found
+  assert 'bench.fast' in found[0] and 'now fails' in found[0], found
+  assert 'timed out' in found[1], found
+
+def test_scale_arg():
+  x = np.arange(400.0).reshape(100, 4)
+  scaled = scale_arg(x, 0.5)
+  # short axes (like coordinates) keep their length
+  assert scaled.shape == (50, 4), scaled.shape
+  assert (scaled == x[:50]).all()
+  assert scale_arg(x, 1) is x
+  # long axes never get shorter than min_scaled_length
+  assert scale_arg(x, 0.01).shape == (min_scaled_length, 4)
+
+def test_scale_nested_args():
+  x = np.arange(64.0)
+  scaled = scale_arg([x, (x, 3), 2.0], 0.5)
+  assert scaled[0].shape == (32,) and scaled[1][0].shape == (32,)
+  assert scaled[1][1] == 3 and scaled[2] == 2.0
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+import numpy as np
+
+import parakeet
+from parakeet import jit, c_backend
+from parakeet.frontend.dispatch import DispatchEntry, TunedDispatchEntry
+from parakeet.openmp_backend import config as openmp_config
+from parakeet.testing_helpers import eq, run_local_tests
+
+def triangle_sums(x):
+  # later iterations do much more work than earlier ones
+  return parakeet.each(lambda n: np.sum(np.arange(n)), x)
+
+x = np.arange(300)
+expected = np.array([np.sum(np.arange(n)) for n in x])
+
+def only_entry(f):
+  entries = f.dispatch_cache.values()
+  assert len(entries) == 1, "Expected one compiled entry, got %s" % entries
+  return entries[0]
+
+def run_tuned(f):
+  n_calls = openmp_config.auto_schedule_trials * len(openmp_config.auto_schedule_candidates)
+  for _ in xrange(n_calls + 2):
+    result = f(x, _backend = 'openmp')
+    assert eq(result, expected), "Expected %s but got %s" % (expected, result)
+  return only_entry(f)
+
+def run_in_temp_cache_dir(test):
+  old_cache_dir = c_backend.config.cache_dir
+  old_min_parallel_work = openmp_config.min_parallel_work
+  c_backend.config.cache_dir = tempfile.mkdtemp(prefix = "parakeet_test_cache")
+  # make sure the loop actually runs in parallel
+  openmp_config.min_parallel_work = 0
+  try:
+    test()
+  finally:
+    shutil.rmtree(c_backend.config.cache_dir)
+    c_backend.config.cache_dir = old_cache_dir
+    openmp_config.min_parallel_work = old_min_parallel_work
+
+def test_auto_schedule():
+  def check():
+    entry = run_tuned(jit(triangle_sums, schedule = 'auto'))
+    assert isinstance(entry, TunedDispatchEntry)
+    assert entry.tuner.choice in openmp_config.auto_schedule_candidates, \
+      "Unexpected schedule %s" % (entry.tuner.choice,)
+    # a fresh jit wrapper behaves like a function in a new process
+    # and should pick up the recorded schedule instead of tuning again
+    entry = run_tuned(jit(triangle_sums, schedule = 'auto'))
+    assert type(entry) is DispatchEntry, "Expected untuned entry, got %s" % entry
+  run_in_temp_cache_dir(check)
+
+def test_fixed_schedule():
+  def check():
+    entry = run_tuned(jit(triangle_sums, schedule = 'dynamic, 4'))
+    assert type(entry) is DispatchEntry
+  run_in_temp_cache_dir(check)
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -0,0 +1,72 @@
+import numpy as np
+
+from parakeet import jit, syntax
+from parakeet.c_backend import system_info
+from parakeet.frontend import specialize
+from parakeet.transforms.pipeline import indexify
+from parakeet.testing_helpers import eq, expect, run_local_tests
+
+def matmult(X, Y):
+  return np.array([[np.dot(x, y) for y in Y.T] for x in X])
+
+def dot(X, Y):
+  return np.dot(X, Y)
+
+def dists(X, Y):
+  return np.array([[np.sum((x - y) * (x - y)) for y in Y] for x in X])
+
+def outer_product(x, y):
+  return np.array([[xi * yi for yi in y] for xi in x])
+
+# rows long enough that the output gets split into several tiles along both
+# axes, with some tiles cut short at the edges (too slow for the interpreter)
+X = np.random.randn(70, 2000)
+Y = np.random.randn(2000, 7)
+
+def expect_compiled(fn, args, expected):
+  f = jit(fn)
+  for backend in ('c', 'openmp'):
+    result = f(*args, _backend = backend)
+    assert eq(result, expected), \
+      "Wrong result with backend %s, expected %s but got %s" % (backend, expected, result)
+
+def test_matmult():
+  expect_compiled(matmult, [X, Y], np.dot(X, Y))
+
+def test_dot_float32():
+  X32 = X.astype('float32')
+  Y32 = Y.astype('float32')
+  expect_compiled(dot, [X32, Y32], np.dot(X32, Y32))
+
+def test_dists():
+  Z = np.random.randn(5, 2000)
+  expect_compiled(dists, [X, Z], dists(X, Z))
+
+def test_small():
+  A = np.random.randn(3, 2)
+  B = np.random.randn(2, 4)
+  expect(matmult, [A, B], np.dot(A, B))
+  expect(dists, [A, B.T], dists(A, B.T))
+
+def parfors(fn, args):
+  typed_fn, _ = specialize(jit(fn), args)
+  return [stmt for stmt in indexify(typed_fn).body if isinstance(stmt, syntax.ParFor)]
+
+def test_tiled_parfor():
+  stmts = parfors(matmult, [X, Y])
+  assert len(stmts) == 1, "Expected one ParFor, got %s" % stmts
+  assert stmts[0].tile_sizes is not None, "Expected tiled ParFor, got %s" % stmts[0]
+
+def test_elementwise_not_tiled():
+  x = np.arange(10.0)
+  stmts = parfors(outer_product, [x, x])
+  assert len(stmts) == 1, "Expected one ParFor, got %s" % stmts
+  assert stmts[0].tile_sizes is None, "Didn't expect tiles in %s" % stmts[0]
+
+def test_cache_sizes():
+  l1 = system_info.l1_cache_size()
+  l2 = system_info.l2_cache_size()
+  assert 0 < l1 <= l2, "Unexpected cache sizes L1 = %s, L2 = %s" % (l1, l2)
+
+if __name__ == '__main__':
+  run_local_tests()
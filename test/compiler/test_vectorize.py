@@ -0,0 +1,86 @@
+import numpy as np
+
+from parakeet import jit, syntax
+from parakeet.frontend import specialize
+from parakeet.transforms.pipeline import loopify, final_loop_optimizations
+from parakeet.testing_helpers import eq, expect, run_local_tests
+
+def vdot(x, y):
+  return sum(x * y)
+
+def axpy(a, x, y):
+  return a * x + y
+
+def axpy3(x, y):
+  return axpy(3, x, y)
+
+def vmin(x):
+  return np.min(x)
+
+def vmax(x):
+  return np.max(x)
+
+def prefix_sum(x):
+  for i in range(1, len(x)):
+    x[i] = x[i - 1] + x[i]
+  return x
+
+def scale_into(x, y):
+  for i in range(len(x)):
+    y[i] = 2 * x[i]
+  return y
+
+def loops(fn, args):
+  typed_fn, _ = specialize(jit(fn), args)
+  typed_fn = final_loop_optimizations.apply(loopify.apply(typed_fn))
+  return [stmt for stmt in typed_fn.body if isinstance(stmt, syntax.ForLoop)]
+
+def test_vectorized_loops():
+  x = np.arange(100.0)
+  for (fn, args) in [(vdot, [x, x]), (axpy, [2.0, x, x]), (vmax, [x])]:
+    stmts = loops(fn, args)
+    assert len(stmts) == 1 and stmts[0].vectorize, \
+      "Expected vectorized loop in %s, got %s" % (fn.__name__, stmts)
+
+def test_dependent_loop_not_vectorized():
+  stmts = loops(prefix_sum, [np.arange(10.0)])
+  assert len(stmts) == 1 and not stmts[0].vectorize, \
+    "Didn't expect %s to be vectorized" % stmts
+
+def expect_types(fn, n_arrays, expected_fn):
+  for t in ('int32', 'int64', 'float32', 'float64'):
+    # odd lengths leave a remainder after the vector loop
+    args = [np.arange(1, 1004).astype(t) for _ in xrange(n_arrays)]
+    expect(fn, args, expected_fn(*args))
+    # every other element, which shouldn't take the unit stride loop
+    strided = [arg[::2] for arg in args]
+    expect(fn, strided, expected_fn(*strided))
+
+def test_vdot():
+  expect_types(vdot, 2, lambda x, y: np.sum(x * y))
+
+def test_axpy():
+  expect_types(axpy3, 2, lambda x, y: 3 * x + y)
+
+def test_min_max():
+  x = np.random.randn(1003)
+  x[517] = -100
+  x[81] = 100
+  expect_types(vmin, 1, np.min)
+  expect_types(vmax, 1, np.max)
+  expect(vmin, [x], -100.0)
+  expect(vmax, [x], 100.0)
+
+def test_overlapping_output():
+  # writing through a view which overlaps the input
+  # has to see the values written by earlier iterations
+  expected = np.arange(11.0)
+  scale_into(expected[:-1], expected[1:])
+  for backend in ('c', 'openmp'):
+    x = np.arange(11.0)
+    jit(scale_into)(x[:-1], x[1:], _backend = backend)
+    assert eq(x, expected), \
+      "Wrong result with backend %s, expected %s but got %s" % (backend, expected, x)
+
+if __name__ == '__main__':
+  run_local_tests()
@@ -0,0 +1,83 @@
+import numpy as np
+
+import parakeet
+from parakeet import jit
+from parakeet.testing_helpers import eq, run_local_tests
+
+def axpy(a, x, y):
+  return a * x + y
+
+x = np.arange(12.0).reshape(3,4)
+y = np.ones((3,4))
+
+def test_jit_out():
+  f = jit(axpy)
+  for backend in ('c', 'openmp', 'interp'):
+    out = np.zeros_like(x)
+    result = f(2.0, x, y, out = out, _backend = backend)
+    assert result is out, "Expected the 'out' array to be returned"
+    assert eq(out, axpy(2.0, x, y)), "Wrong result with backend %s: %s" % (backend, out)
+
+def test_out_shape_mismatch():
+  f = jit(axpy)
+  try:
+    f(2.0, x, y, out = np.zeros((4,3)))
+  except ValueError:
+    pass
+  else:
+    assert False, "Expected ValueError for wrong output shape"
+
+def test_out_dtype_mismatch():
+  f = jit(axpy)
+  try:
+    f(2.0, x, y, out = np.zeros((3,4), dtype = np.int64))
+  except TypeError:
+    pass
+  else:
+    assert False, "Expected TypeError for wrong output dtype"
+
+def shift_add(v):
+  return v[1:] + v[:-1]
+
+def test_out_overlaps_input():
+  v = np.arange(6.0)
+  expected = shift_add(v)
+  assert eq(jit(shift_add)(v, out = v[:-1]), expected)
+  assert eq(v[:-1], expected)
+
+def test_ufunc_out():
+  out = np.zeros(5)
+  v = np.arange(5.0)
+  assert parakeet.square(v, out = out) is out
+  assert eq(out, v * v)
+
+def double(a):
+  return 2 * a
+
+def test_map_out():
+  out = np.zeros(5)
+  v = np.arange(5.0)
+  assert parakeet.map(double, v, out = out) is out
+  assert eq(out, 2 * v)
+
+def index_sum(idx):
+  return idx[0] + idx[1]
+
+def test_imap_out():
+  out = np.zeros((2,3), dtype = np.int64)
+  assert parakeet.imap(index_sum, (2,3), out = out) is out
+  assert eq(out, np.add.outer(np.arange(2), np.arange(3)))
+
+@jit
+def nested_out(v, buf):
+  np.add(v, v, out = buf)
+  parakeet.map(double, buf, out = buf)
+  return buf
+
+def test_nested_out():
+  v = np.arange(4.0)
+  buf = np.zeros(4)
+  assert eq(nested_out(v, buf), 4 * v)
+
+if __name__ == '__main__':
+  run_local_tests()
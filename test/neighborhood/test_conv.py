@@ -0,0 +1,97 @@
+import numpy as np
+
+import parakeet
+from parakeet.testing_helpers import expect, run_local_tests
+
+x = np.arange(30.0).reshape(5,6) ** 1.5
+
+def windows(x, window_shape, pad = None):
+  """
+  Python version of conv: every window, clipped to x, for each output position
+  """
+  wx, wy = window_shape
+  n_rows, n_cols = x.shape
+  if pad is None:
+    offsets = (0, 0)
+    rows, cols = n_rows - wx + 1, n_cols - wy + 1
+  else:
+    offsets = (-(wx / 2), -(wy / 2))
+    rows, cols = n_rows, n_cols
+  result = []
+  for i in xrange(rows):
+    for j in xrange(cols):
+      lx, ly = i + offsets[0], j + offsets[1]
+      result.append(((i,j), x[max(lx,0):lx+wx, max(ly,0):ly+wy]))
+  return result
+
+def test_valid_conv():
+  def window_sums(x):
+    return parakeet.conv(np.sum, x, (3,3))
+  expected = np.zeros((3,4))
+  for ((i,j), w) in windows(x, (3,3)):
+    expected[i,j] = np.sum(w)
+  expect(window_sums, [x], expected)
+
+def test_scalar_window():
+  def window_sums(x):
+    return parakeet.conv(np.sum, x, 2)
+  expected = np.zeros((4,5))
+  for ((i,j), w) in windows(x, (2,2)):
+    expected[i,j] = np.sum(w)
+  expect(window_sums, [x], expected)
+
+def test_conv_1d():
+  def window_max(y):
+    return parakeet.stencil(np.max, y, 3, border_fn = np.max)
+  y = np.array([3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0])
+  expected = np.array([y[max(i-1,0):i+2].max() for i in xrange(len(y))])
+  expect(window_max, [y], expected)
+
+def test_border_fn():
+  def window_max(x):
+    return parakeet.conv(np.max, x, 3, border_fn = np.max)
+  expected = np.zeros_like(x)
+  for ((i,j), w) in windows(x, (3,3), pad = True):
+    expected[i,j] = np.max(w)
+  expect(window_max, [x], expected)
+
+def test_border_value():
+  def window_sums(x):
+    return parakeet.stencil(np.sum, x, (3,5), border_value = -1)
+  expected = -np.ones_like(x)
+  expected[1:4, 2:4] = [[np.sum(x[i-1:i+2, j-2:j+3]) for j in (2,3)] for i in (1,2,3)]
+  expect(window_sums, [x], expected)
+
+def test_padding():
+  def window_sums(x):
+    return parakeet.conv(np.sum, x, (3,3), fill_value = 0.0)
+  padded = np.zeros((7,8))
+  padded[1:6, 1:7] = x
+  expected = np.zeros_like(x)
+  for ((i,j), w) in windows(padded, (3,3)):
+    if i < 5 and j < 6:
+      expected[i,j] = np.sum(w)
+  expect(window_sums, [x], expected)
+
+def test_window_larger_than_array():
+  def window_sums(x):
+    return parakeet.conv(np.sum, x, (7,3), border_fn = np.sum)
+  expected = np.zeros_like(x)
+  for ((i,j), w) in windows(x, (7,3), pad = True):
+    expected[i,j] = np.sum(w)
+  expect(window_sums, [x], expected)
+
+def test_sum_of_strided_view():
+  # reductions over every element of a non-contiguous view
+  def sum_view(x):
+    return np.sum(x[1:4, 2:5])
+  expect(sum_view, [x], np.sum(x[1:4, 2:5]))
+
+def test_max_of_strided_view():
+  def max_view(x, i, j):
+    return np.max(x[i:i+2, j:j+2])
+  expect(max_view, [x, 0, 0], np.max(x[0:2, 0:2]))
+  expect(max_view, [x, 2, 3], np.max(x[2:4, 3:5]))
+
+if __name__ == '__main__':
+  run_local_tests()
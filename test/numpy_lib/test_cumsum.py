@@ -0,0 +1,29 @@
+import numpy as np
+from parakeet.testing_helpers import run_local_tests, expect_each
+
+float_vec = np.random.randn(100)
+int_vec = np.arange(100) % 7
+float_mat = np.random.random((5, 3))
+int_mat = (float_mat * 10).astype('int64')
+inputs = [float_vec, int_vec, float_mat, int_mat]
+
+def cumsum(x):
+  return np.cumsum(x)
+
+def test_cumsum():
+  expect_each(cumsum, np.cumsum, inputs)
+
+def cumprod(x):
+  return np.cumprod(x)
+
+def test_cumprod():
+  expect_each(cumprod, np.cumprod, [float_vec[:10], int_vec[1:10], float_mat, int_mat])
+
+def cumsum_method(x):
+  return x.cumsum()
+
+def test_cumsum_method():
+  expect_each(cumsum_method, np.cumsum, inputs)
+
+if __name__ == '__main__':
+  run_local_tests()